@@ -0,0 +1,119 @@
+"""
+Endpoint /metrics no formato de texto do Prometheus
+"""
+import asyncio
+import time
+
+from fastapi import APIRouter
+from fastapi.responses import Response
+
+from app.api.websocket import manager, processing_tasks
+from app.services.alert_manager import alert_manager
+from app.services.analysis_job import analysis_jobs
+from app.services.stream_workers import stream_workers
+from app.services.inference_scheduler import inference_scheduler
+from app.services.metrics import CONTENT_TYPE, MetricsWriter, process_cpu_seconds, process_rss_bytes
+from app.services.pipeline_metrics import FRAME_COUNTERS, pipeline_metrics
+
+router = APIRouter()
+
+STREAM_STATUSES = ("pending", "active", "reconnecting", "failed")
+PROCESS_START_TIME = time.time()
+
+
+def _executor_queue_depth() -> int:
+    """Tarefas aguardando thread no executor padrão (asyncio.to_thread)"""
+    executor = getattr(asyncio.get_running_loop(), "_default_executor", None)
+    work_queue = getattr(executor, "_work_queue", None)
+    return work_queue.qsize() if work_queue is not None else 0
+
+
+def collect_metrics() -> str:
+    """Lê o estado atual dos serviços e monta a exposição de métricas"""
+    # Importar aqui para evitar import circular (como em process_video_stream)
+    from app.api.routes import stream_handler
+
+    out = MetricsWriter()
+    streams = list(stream_handler.active_streams.items())
+
+    # Streams RTMP/SRT
+    by_status = {status: 0 for status in STREAM_STATUSES}
+    for _, stream in streams:
+        by_status[stream["status"]] = by_status.get(stream["status"], 0) + 1
+    out.gauge("ppe_streams", "Streams de entrada registradas, por status",
+              [({"status": status}, n) for status, n in by_status.items()])
+    out.counter("ppe_stream_reconnects", "Reconexões após queda da stream de entrada",
+                [({"stream_id": sid, "protocol": s["protocol"]}, s["reconnects_total"]) for sid, s in streams])
+    out.counter("ppe_stream_frames_read", "Frames lidos da stream de entrada pela thread de captura",
+                [({"stream_id": sid, "protocol": s["protocol"]}, s["frames_read"]) for sid, s in streams])
+
+    # Pipeline de processamento (WebSocket de vídeo)
+    active = list(pipeline_metrics.active.values())
+    overall = pipeline_metrics.aggregate()
+    out.gauge("ppe_pipelines_active", "Pipelines de processamento em execução", [({}, len(processing_tasks))])
+    out.counter("ppe_pipeline_frames", "Frames por pipeline: lidos, descartados, repetidos e enviados",
+                [({"client_id": t.stream_id, "result": name}, t.frames[name]) for t in active for name in FRAME_COUNTERS])
+    out.counter("ppe_frames", "Frames de todos os pipelines, incluindo os encerrados",
+                [({"result": name}, overall.frames[name]) for name in FRAME_COUNTERS])
+    out.histogram("ppe_inference_duration_seconds", "Latência de inferência por pipeline",
+                  [({"client_id": t.stream_id}, t.stages["inference"]) for t in active])
+    out.histogram("ppe_frame_age_seconds", "Idade do frame da captura ao envio (ou descarte) por pipeline",
+                  [({"client_id": t.stream_id}, t.frame_age) for t in active])
+    out.histogram("ppe_pipeline_stage_duration_seconds", "Tempo por etapa do pipeline, todos os pipelines",
+                  [({"stage": stage}, hist) for stage, hist in overall.stages.items()])
+
+    # Executores
+    analysis = analysis_jobs.get_stats()
+    out.gauge("ppe_executor_queue_depth", "Tarefas aguardando execução",
+              [({"executor": "threads"}, _executor_queue_depth()),
+               ({"executor": "analysis"}, analysis["pending_segments"])])
+    out.gauge("ppe_analysis_jobs", "Jobs de análise offline, por status",
+              [({"status": status}, n) for status, n in analysis["jobs"].items()])
+    workers = stream_workers.get_stats()["workers"]
+    if workers:
+        out.gauge("ppe_stream_worker_up", "Worker de inferência das streams em execução",
+                  [({"worker": str(w["index"])}, int(w["alive"])) for w in workers])
+        out.gauge("ppe_stream_worker_pending", "Inferências em andamento no worker",
+                  [({"worker": str(w["index"])}, w["pending"]) for w in workers])
+        out.gauge("ppe_stream_worker_streams", "Streams atribuídas ao worker (ativas nos últimos 30 s)",
+                  [({"worker": str(w["index"])}, len(w["streams"])) for w in workers])
+        out.counter("ppe_stream_worker_restarts", "Reinicializações do worker",
+                    [({"worker": str(w["index"])}, w["restarts"]) for w in workers])
+    scheduler = inference_scheduler.get_stats()
+    if scheduler["enabled"]:
+        if scheduler["budget_fps"] is not None:
+            out.gauge("ppe_inference_budget_fps", "Inferências por segundo divididas entre as streams",
+                      [({}, scheduler["budget_fps"])])
+        out.gauge("ppe_stream_inference_allocated_fps", "Taxa de inferência alocada à stream pelo escalonador",
+                  [({"stream_id": s["stream_id"]}, s["allocated_fps"]) for s in scheduler["streams"]])
+        out.gauge("ppe_stream_inference_fps", "Taxa de inferência efetiva da stream (últimos 10 s)",
+                  [({"stream_id": s["stream_id"]}, s["actual_fps"]) for s in scheduler["streams"]])
+
+    # WebSockets
+    by_channel = {"video": 0, "alerts": 0}
+    for client_id in list(manager.active_connections):
+        by_channel[manager.channel(client_id)] += 1
+    out.gauge("ppe_websocket_clients", "Clientes WebSocket conectados",
+              [({"channel": channel}, n) for channel, n in by_channel.items()])
+    out.counter("ppe_websocket_messages_sent", "Mensagens enviadas por WebSocket",
+                [({"channel": channel}, n) for channel, n in manager.messages_sent.items()])
+    out.counter("ppe_websocket_bytes_sent", "Bytes enviados por WebSocket",
+                [({"channel": channel}, n) for channel, n in manager.bytes_sent.items()])
+
+    # Alertas
+    out.counter("ppe_alerts", "Alertas gerados",
+                [({"class": cls, "severity": severity}, n) for (cls, severity), n in alert_manager.raised_total.items()])
+    out.gauge("ppe_alerts_unacknowledged", "Alertas em memória ainda não reconhecidos",
+              [({}, alert_manager.get_stats()["unacknowledged"])])
+
+    # Processo
+    out.counter("process_cpu_seconds", "Tempo de CPU do processo (usuário + sistema)", [({}, process_cpu_seconds())])
+    out.gauge("process_resident_memory_bytes", "Memória residente do processo", [({}, process_rss_bytes())])
+    out.gauge("process_start_time_seconds", "Início do processo (epoch)", [({}, PROCESS_START_TIME)])
+    return out.render()
+
+
+@router.get("/metrics")
+async def metrics():
+    """Métricas de streams, inferência, WebSockets, alertas e processo"""
+    return Response(content=collect_metrics(), media_type=CONTENT_TYPE)
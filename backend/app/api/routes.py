@@ -1,24 +1,70 @@
 """
 Rotas da API REST
 """
+import asyncio
+import hmac
+import json
 import os
-import shutil
-import uuid
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException, BackgroundTasks
-from fastapi.responses import JSONResponse
-from app.config import ALLOWED_EXTENSIONS, MAX_FILE_SIZE, YOLO_CLASSES, POSITIVE_CLASSES, ALERT_CLASSES
-from app.services.video_processor import VideoProcessor
+import cv2
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, UploadFile, File, Form, Header, Query, Request, HTTPException, BackgroundTasks
+from fastapi.responses import JSONResponse, FileResponse, Response
+from app.config import YOLO_CLASSES, POSITIVE_CLASSES, ALERT_CLASSES, UPLOAD_CHUNK_SIZE, ADMIN_TOKEN
+from app.models.schemas import StreamSettings
 from app.services.stream_handler import StreamHandler
+from app.services.video_processor import VideoProcessor, get_keyframe_index
 from app.services.alert_manager import alert_manager
+from app.services.webhook_dispatcher import webhook_dispatcher
+from app.services.analysis_job import analysis_jobs
+from app.services.result_cache import result_cache
+from app.services.storage_manager import storage_manager
+from app.services.pipeline_metrics import pipeline_metrics
+from app.services.profiler import profiler
+from app.services.stream_workers import stream_workers
+from app.services.inference_scheduler import CRITICALITY_WEIGHTS, inference_scheduler
+from app.services.upload_manager import UploadError, upload_manager
+from app.services.progressive_feed import ProgressiveFeed
+from app.utils.helpers import find_upload, read_upload_meta
 
 router = APIRouter()
 stream_handler = StreamHandler()
 
 
 @router.get("/alerts")
-async def get_alerts(limit: int = 50):
-    """Retorna alertas recentes"""
-    return alert_manager.get_recent_alerts(limit)
+async def get_alerts(
+    limit: int = 50,
+    severity: Optional[str] = None,
+    unacknowledged_only: bool = False,
+    before: Optional[int] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    stream_id: Optional[str] = None,
+    class_name: Optional[str] = None
+):
+    """
+    Retorna alertas (mais recentes primeiro)
+    
+    Com persistência ativa, a consulta vai ao SQLite e suporta paginação por
+    cursor: passe em `before` o `seq` do último alerta da página anterior.
+    """
+    if alert_manager.store:
+        return await asyncio.to_thread(
+            alert_manager.store.query,
+            limit=limit,
+            before=before,
+            since=since,
+            until=until,
+            stream_id=stream_id,
+            class_name=class_name,
+            severity=severity,
+            unacknowledged_only=unacknowledged_only
+        )
+    return alert_manager.get_alerts(
+        limit=limit,
+        severity=severity,
+        unacknowledged_only=unacknowledged_only
+    )
 
 @router.get("/alerts/stats")
 async def get_alert_stats():
@@ -26,6 +72,116 @@ async def get_alert_stats():
     return alert_manager.get_stats()
 
 
+@router.post("/alerts/{alert_id}/acknowledge")
+async def acknowledge_alert(alert_id: str):
+    """Marca um alerta como reconhecido"""
+    if alert_manager.get_alert(alert_id) is not None:
+        acknowledged = alert_manager.acknowledge_alert(alert_id)
+    else:
+        # Fora do buffer em memória: aguarda a gravação em lote fora do event loop
+        acknowledged = await asyncio.to_thread(alert_manager.acknowledge_stored_alert, alert_id)
+    if not acknowledged:
+        raise HTTPException(status_code=404, detail="Alerta não encontrado")
+    return {"id": alert_id, "acknowledged": True}
+
+
+@router.get("/webhooks/stats")
+async def get_webhook_stats():
+    """Retorna fila e latência de entrega dos webhooks de alerta"""
+    return webhook_dispatcher.get_stats()
+
+
+@router.get("/storage/stats")
+async def get_storage_stats():
+    """Retorna ocupação do diretório de uploads, cota e contadores de limpeza"""
+    return await asyncio.to_thread(storage_manager.get_stats)
+
+
+@router.get("/pipeline/timings")
+async def get_pipeline_timings():
+    """Retorna percentis de tempo por etapa do streaming (agregado e por stream)"""
+    return pipeline_metrics.get_stats()
+
+
+@router.get("/pipeline/timings/{client_id}")
+async def get_stream_timings(client_id: str):
+    """Retorna percentis de tempo por etapa de um stream"""
+    timings = pipeline_metrics.get_stream(client_id)
+    if timings is None:
+        raise HTTPException(status_code=404, detail="Stream não encontrado")
+    return timings
+
+
+def _require_admin(token: Optional[str]):
+    """Valida o token administrativo (endpoints desativados sem ADMIN_TOKEN)"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not token or not hmac.compare_digest(token, ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Token administrativo inválido")
+
+
+@router.get("/admin/profile")
+async def profile_process(
+    seconds: float = Query(10.0, gt=0),
+    hz: int = Query(100, ge=1, le=1000),
+    workers: bool = True,
+    x_admin_token: Optional[str] = Header(None)
+):
+    """
+    Amostra as pilhas do servidor (event loop, threads de leitura e de
+    inferência) e dos workers de análise por `seconds` segundos
+
+    Retorna um arquivo collapsed stacks (flamegraph.pl, speedscope, inferno).
+    """
+    _require_admin(x_admin_token)
+    if profiler.busy:
+        raise HTTPException(status_code=409, detail="Já existe um perfil em andamento")
+    pids = analysis_jobs.worker_pids() + stream_workers.worker_pids() if workers else []
+    # Fora do event loop, que também é amostrado
+    folded = await asyncio.to_thread(profiler.profile, seconds, hz, pids)
+    if folded is None:
+        raise HTTPException(status_code=409, detail="Já existe um perfil em andamento")
+    filename = f"profile-{datetime.now().strftime('%Y%m%d-%H%M%S')}.folded"
+    return Response(
+        content=folded,
+        media_type="text/plain",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@router.get("/workers")
+async def get_stream_workers():
+    """Retorna os workers de inferência das streams e as streams atribuídas a cada um"""
+    return stream_workers.get_stats()
+
+
+@router.get("/scheduler")
+async def get_inference_scheduler():
+    """Retorna o orçamento de inferência e a taxa alocada a cada stream, com as entradas de prioridade"""
+    return inference_scheduler.get_stats()
+
+
+@router.post("/admin/workers/{index}/restart")
+async def restart_stream_worker(index: int, x_admin_token: Optional[str] = Header(None)):
+    """
+    Reinicia um worker de inferência
+
+    Apenas as streams atribuídas a ele perdem as detecções em andamento.
+    """
+    _require_admin(x_admin_token)
+    if not stream_workers.enabled:
+        raise HTTPException(status_code=409, detail="Workers de inferência desativados (STREAM_WORKERS=0)")
+    if not await asyncio.to_thread(stream_workers.restart, index):
+        raise HTTPException(status_code=404, detail="Worker não encontrado")
+    return {"index": index, "status": "restarting"}
+
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """Retorna ocupação e taxa de acerto do cache de resultados de análise"""
+    return result_cache.get_stats()
+
+
 @router.get("/status")
 async def get_status():
     """Retorna status da API e configurações"""
@@ -49,6 +205,29 @@ async def get_classes():
     }
 
 
+async def _upload_response(meta: dict, selected_epis: str) -> dict:
+    """Monta a resposta de um upload concluído"""
+    # Indicar se já existe análise deste conteúdo com a mesma configuração
+    try:
+        selected_classes = json.loads(selected_epis) or None
+    except json.JSONDecodeError:
+        selected_classes = None
+    cache_key = result_cache.make_key(meta["sha256"], selected_classes)
+    cached = await asyncio.to_thread(result_cache.contains, cache_key)
+    
+    return {
+        "message": "Upload realizado com sucesso",
+        "filename": meta["filename"],
+        "video_id": meta["video_id"],
+        "file_path": meta["file_path"],
+        "video_info": meta["video_info"],
+        "selected_epis": selected_epis,
+        "content_hash": meta["sha256"],
+        "cached_analysis": cached,
+        "status": "ready_for_processing"
+    }
+
+
 @router.post("/video/upload")
 async def upload_video(
     file: UploadFile = File(...),
@@ -56,57 +235,259 @@ async def upload_video(
 ):
     """
     Recebe upload de vídeo para processamento
+    
+    Para arquivos grandes prefira o upload retomável (/uploads).
     """
-    # Validar extensão
-    if file.filename:
-        extension = file.filename.split(".")[-1].lower()
-        if extension not in ALLOWED_EXTENSIONS:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Formato não suportado. Use: {', '.join(ALLOWED_EXTENSIONS)}"
-            )
+    # Tamanho conhecido pelo parser multipart; sem ele, medir o arquivo temporário
+    size = file.size
+    if size is None:
+        size = await asyncio.to_thread(file.file.seek, 0, os.SEEK_END)
+        await file.seek(0)
     
-    # Criar diretório temporário se não existir
-    os.makedirs("temp_videos", exist_ok=True)
+    async def chunks():
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            yield chunk
     
-    # Gerar nome único
-    file_id = str(uuid.uuid4())
-    file_path = f"temp_videos/{file_id}.{extension}"
+    try:
+        upload = await asyncio.to_thread(upload_manager.create, file.filename or "", size)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     
-    # Salvar arquivo
     try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro ao salvar arquivo: {str(e)}")
-        
-    # Validar se é um vídeo válido
-    processor = VideoProcessor()
-    if not processor.open_file(file_path):
-        os.remove(file_path)
+        await upload_manager.append(upload["upload_id"], 0, chunks())
+        meta = await upload_manager.finalize(upload["upload_id"])
+    except BaseException as e:
+        # O upload simples não é retomável: remover o arquivo parcial
+        try:
+            await asyncio.to_thread(upload_manager.abort, upload["upload_id"])
+        except UploadError:
+            pass  # já descartado (conteúdo inválido)
+        if isinstance(e, UploadError):
+            raise HTTPException(status_code=e.status_code, detail=str(e))
+        raise
+    
+    return JSONResponse(content=await _upload_response(meta, selected_epis), status_code=200)
+
+
+@router.post("/uploads")
+async def create_upload(
+    filename: str = Form(...),
+    size: int = Form(...)
+):
+    """
+    Inicia um upload retomável
+    
+    Envie o conteúdo com PATCH /uploads/{upload_id} (cabeçalho Upload-Offset).
+    """
+    try:
+        upload = await asyncio.to_thread(upload_manager.create, filename, size)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    upload["chunk_size"] = upload_manager.chunk_size
+    return JSONResponse(content=upload, status_code=201)
+
+
+@router.get("/uploads/{upload_id}")
+async def get_upload(upload_id: str):
+    """Retorna quantos bytes já foram recebidos (offset para retomada)"""
+    try:
+        return await asyncio.to_thread(upload_manager.status, upload_id)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+
+@router.patch("/uploads/{upload_id}")
+async def append_upload(
+    upload_id: str,
+    request: Request,
+    upload_offset: int = Header(...),
+    selected_epis: str = Query(default="[]")
+):
+    """
+    Recebe um trecho do arquivo (corpo binário) a partir de Upload-Offset
+    
+    Ao receber o último byte, o vídeo é validado e a resposta é a mesma do
+    upload simples.
+    """
+    try:
+        upload = await upload_manager.append(upload_id, upload_offset, request.stream())
+        if not upload["complete"]:
+            return upload
+        meta = await upload_manager.finalize(upload_id)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    return await _upload_response(meta, selected_epis)
+
+
+@router.delete("/uploads/{upload_id}")
+async def abort_upload(upload_id: str):
+    """Cancela um upload retomável"""
+    try:
+        await asyncio.to_thread(upload_manager.abort, upload_id)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    return {"message": "Upload cancelado"}
+
+
+@router.get("/video/{video_id}/index")
+async def get_video_index(video_id: str):
+    """
+    Retorna o índice de keyframes do vídeo (construído uma vez e persistido)
+    """
+    file_path = find_upload(video_id)
+    if not file_path:
+        raise HTTPException(status_code=404, detail="Vídeo não encontrado")
+    storage_manager.touch(video_id)
+    
+    index = await asyncio.to_thread(get_keyframe_index, file_path)
+    if index is None:
         raise HTTPException(status_code=400, detail="Arquivo de vídeo inválido ou corrompido")
+    return {k: v for k, v in index.items() if k != "source"}
+
+
+@router.get("/video/{video_id}/frame")
+async def get_video_frame(
+    video_id: str,
+    frame: Optional[int] = None,
+    time_s: Optional[float] = None
+):
+    """
+    Retorna um frame do vídeo como JPEG (ex.: o frame de um alerta)
     
-    video_info = processor.video_info
-    processor.release()
+    A busca parte do keyframe anterior, sem decodificar desde o início.
+    """
+    file_path = find_upload(video_id)
+    if not file_path:
+        raise HTTPException(status_code=404, detail="Vídeo não encontrado")
+    if frame is None and time_s is None:
+        raise HTTPException(status_code=400, detail="Informe frame ou time_s")
+    storage_manager.touch(video_id)
     
-    return JSONResponse(
-        content={
-            "message": "Upload realizado com sucesso",
-            "filename": file.filename,
-            "video_id": file_id,
-            "file_path": file_path,
-            "video_info": video_info,
-            "selected_epis": selected_epis,
-            "status": "ready_for_processing"
-        },
-        status_code=200
+    def read() -> Optional[bytes]:
+        processor = VideoProcessor()
+        if not processor.open_file(file_path):
+            return None
+        try:
+            index = get_keyframe_index(file_path)
+            if index:
+                processor.set_keyframe_index(index)
+            found = processor.seek_frame(frame) if frame is not None else processor.seek_time(time_s)
+            image = processor.read_frame() if found else None
+        finally:
+            processor.release()
+        if image is None:
+            return None
+        return cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 85])[1].tobytes()
+    
+    data = await asyncio.to_thread(read)
+    if data is None:
+        raise HTTPException(status_code=404, detail="Frame fora do vídeo")
+    return Response(content=data, media_type="image/jpeg")
+
+
+@router.post("/video/{video_id}/analyze")
+async def analyze_video(
+    video_id: str,
+    selected_epis: str = Form(default="[]"),
+    frame_stride: int = Form(default=1),
+    start_time: float = Form(default=0.0),
+    end_time: Optional[float] = Form(default=None)
+):
+    """
+    Inicia análise offline de um vídeo enviado
+    
+    O processamento roda em background na velocidade máxima da CPU, sem
+    depender de uma conexão WebSocket. Acompanhe por GET /jobs/{job_id}.
+    Com start_time/end_time (segundos), analisa apenas esse trecho, partindo
+    do keyframe anterior (útil para revisar um alerta ou retomar um job).
+    """
+    file_path = find_upload(video_id)
+    if not file_path:
+        raise HTTPException(status_code=404, detail="Vídeo não encontrado")
+    
+    try:
+        selected_classes = json.loads(selected_epis) or None
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="selected_epis deve ser uma lista JSON")
+    
+    storage_manager.touch(video_id)
+    meta = read_upload_meta(video_id) or {}
+    if start_time < 0 or (end_time is not None and end_time <= start_time):
+        raise HTTPException(status_code=400, detail="Intervalo inválido")
+    
+    job = await analysis_jobs.create_job(
+        video_id, file_path, selected_classes, frame_stride,
+        content_hash=meta.get("sha256"),
+        start_time=start_time,
+        end_time=end_time
     )
+    # Resultado em cache: o job já nasce concluído
+    return JSONResponse(content=job, status_code=200 if job["cached"] else 202)
+
+
+@router.post("/uploads/{upload_id}/analyze")
+async def analyze_upload(
+    upload_id: str,
+    selected_epis: str = Form(default="[]"),
+    frame_stride: int = Form(default=1)
+):
+    """
+    Inicia a análise de um vídeo cujo upload ainda está em andamento
+    
+    Em contêineres progressivos (MKV/WebM, AVI, MP4 fragmentado ou com moov
+    no início) os frames são analisados à medida que os bytes chegam; nos
+    demais, o job aguarda o fim do upload. O video_id final é o upload_id.
+    """
+    try:
+        session = await asyncio.to_thread(upload_manager.get_session, upload_id)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    
+    try:
+        selected_classes = json.loads(selected_epis) or None
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="selected_epis deve ser uma lista JSON")
+    
+    job = await analysis_jobs.create_job(
+        upload_id, session.final_path, selected_classes, frame_stride,
+        feed=ProgressiveFeed(session)
+    )
+    return JSONResponse(content=job, status_code=202)
+
+
+@router.get("/jobs/{job_id}")
+async def get_analysis_job(job_id: str):
+    """Retorna status e progresso de um job de análise"""
+    job = analysis_jobs.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    return job
+
+
+@router.get("/jobs/{job_id}/result")
+async def get_analysis_result(job_id: str):
+    """Retorna o arquivo JSON Lines com detecções e violações por frame"""
+    job = analysis_jobs.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    if not os.path.exists(job["result_path"]):
+        raise HTTPException(status_code=409, detail=f"Resultado indisponível (status: {job['status']})")
+    return FileResponse(job["result_path"], media_type="application/x-ndjson", filename=f"{job_id}.jsonl")
+
+
+@router.delete("/jobs/{job_id}")
+async def cancel_analysis_job(job_id: str):
+    """Cancela um job de análise em execução"""
+    if not analysis_jobs.cancel_job(job_id):
+        raise HTTPException(status_code=404, detail="Job não encontrado ou já finalizado")
+    return {"job_id": job_id, "status": "cancelling"}
 
 
 @router.post("/stream/connect")
 async def connect_stream(
     protocol: str = Form(default="rtmp"),
-    stream_key: str = Form(...)
+    stream_key: str = Form(...),
+    criticality: str = Form(default="normal")
 ):
     """
     Inicia processamento de uma stream (RTMP/SRT)
@@ -117,6 +498,11 @@ async def connect_stream(
             status_code=400,
             detail=f"Protocolo não suportado. Use: {', '.join(valid_protocols)}"
         )
+    if criticality not in CRITICALITY_WEIGHTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Criticidade inválida. Use: {', '.join(CRITICALITY_WEIGHTS)}"
+        )
     
     # Construir URL interna para o backend consumir
     # O backend conecta no container mediamtx
@@ -130,7 +516,7 @@ async def connect_stream(
     
     try:
         # Agora o connect retorna imediatamente e tenta conectar em background
-        stream_id = await stream_handler.connect(stream_url, protocol)
+        stream_id = await stream_handler.connect(stream_url, protocol, {"criticality": criticality})
     except Exception as e:
         print(f"Erro interno ao registrar stream: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
@@ -147,12 +533,24 @@ async def connect_stream(
             "stream_id": stream_id,
             "stream_url": stream_url,
             "protocol": protocol,
+            "criticality": criticality,
             "status": "pending"
         },
         status_code=200
     )
 
 
+@router.patch("/stream/{stream_id}/config")
+async def update_stream_config(stream_id: str, settings: StreamSettings):
+    """
+    Altera a configuração de uma stream em andamento (vale a partir do próximo frame)
+    """
+    config = stream_handler.update_config(stream_id, settings.model_dump(mode="json", exclude_none=True))
+    if config is None:
+        raise HTTPException(status_code=404, detail="Stream não encontrada")
+    return {"stream_id": stream_id, "config": config}
+
+
 @router.post("/stream/disconnect")
 async def disconnect_stream(stream_id: str = Form(...)):
     """
@@ -2,18 +2,27 @@
 WebSocket handlers para streaming em tempo real
 """
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from typing import Dict
+from typing import Dict, Optional, Tuple
 import json
 import asyncio
 import cv2
 import base64
 import time
-import os
-from app.services.video_processor import VideoProcessor
+from app.config import STREAM_MAX_FRAME_AGE
+from app.services.video_processor import VideoProcessor, get_keyframe_index
 from app.services.detector import PPEDetector
 from app.utils.frame_annotator import FrameAnnotator
 from app.services.smoother import DetectionSmoother
 from app.services.alert_manager import alert_manager
+from app.services.result_cache import result_cache, ResultReplay
+from app.services.storage_manager import storage_manager
+from app.services.pipeline_metrics import pipeline_metrics
+from app.services.client_render import DetectionDeltaEncoder, shared_frames
+from app.services.frame_ring import FrameOverwritten
+from app.services.inference_scheduler import inference_scheduler
+from app.services.stream_workers import WorkerUnavailable, stream_workers
+from app.services.tiling import TileGrid
+from app.utils.helpers import find_upload, read_upload_meta
 
 router = APIRouter()
 
@@ -23,6 +32,9 @@ class ConnectionManager:
     
     def __init__(self):
         self.active_connections: Dict[str, WebSocket] = {}
+        # Totais por canal ("video" ou "alerts"), expostos em /metrics
+        self.messages_sent: Dict[str, int] = {}
+        self.bytes_sent: Dict[str, int] = {}
     
     async def connect(self, websocket: WebSocket, client_id: str):
         """Aceita conexão WebSocket"""
@@ -34,17 +46,44 @@ class ConnectionManager:
         if client_id in self.active_connections:
             del self.active_connections[client_id]
     
-    async def send_message(self, client_id: str, message: dict):
-        """Envia mensagem JSON para cliente específico"""
-        if client_id in self.active_connections:
-            await self.active_connections[client_id].send_json(message)
+    @staticmethod
+    def channel(client_id: str) -> str:
+        return "alerts" if client_id.startswith("alerts_") else "video"
     
-    async def send_frame(self, client_id: str, frame_data: dict):
-        """Envia frame processado para cliente"""
-        await self.send_message(client_id, {
-            "type": "frame",
-            "data": frame_data
-        })
+    async def send_message(self, client_id: str, message: dict) -> int:
+        """
+        Envia mensagem JSON para cliente específico
+        
+        Returns:
+            Bytes enviados (0 se o cliente não está conectado)
+        """
+        websocket = self.active_connections.get(client_id)
+        if websocket is None:
+            return 0
+        # Mesma serialização de send_json, para contabilizar o tamanho
+        text = json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+        await websocket.send_text(text)
+        channel = self.channel(client_id)
+        size = len(text.encode("utf-8"))
+        self.messages_sent[channel] = self.messages_sent.get(channel, 0) + 1
+        self.bytes_sent[channel] = self.bytes_sent.get(channel, 0) + size
+        return size
+    
+    async def send_frame(self, client_id: str, frame_data: dict, captured_at: float = None, detections: dict = None) -> int:
+        """
+        Envia frame processado para cliente
+        
+        Args:
+            captured_at: Instante da captura (epoch); inclui a idade do frame na mensagem
+            detections: Alterações da lista de detecções (renderização no cliente)
+        """
+        message = {"type": "frame", "data": frame_data}
+        if detections is not None:
+            message["detections"] = detections
+        if captured_at is not None:
+            message["captured_at"] = captured_at
+            message["age_ms"] = round((time.time() - captured_at) * 1000, 1)
+        return await self.send_message(client_id, message)
     
     async def send_alert(self, client_id: str, alert: dict):
         """Envia alerta para cliente"""
@@ -74,9 +113,29 @@ processing_tasks = {}
 # Dicionário para controlar configurações do cliente
 client_configs = {}
 
-async def process_video_stream(client_id: str, source: str, video_id: str = None):
+
+def _open_replay(video_id: str) -> Tuple[Optional[str], Optional[ResultReplay]]:
+    """Abre as detecções em cache de um vídeo enviado (leitura em disco, fora do event loop)"""
+    meta = read_upload_meta(video_id)
+    if not meta or not meta.get("sha256"):
+        return None, None
+    replay_path = result_cache.get(result_cache.make_key(meta["sha256"]))
+    if not replay_path:
+        return None, None
+    return replay_path, ResultReplay(replay_path)
+
+
+async def process_video_stream(client_id: str, source: str, video_id: str = None, start_time: float = None, render: str = "server"):
     """
     Task de processamento de vídeo em background
+    
+    Args:
+        client_id: ID do cliente WebSocket
+        source: Arquivo de vídeo ou URL de stream
+        video_id: ID do upload (se arquivo)
+        start_time: Posição inicial em segundos (apenas arquivos)
+        render: "server" (caixas desenhadas no JPEG) ou "client" (JPEG sem
+            anotações e detecções como dados; alterável por update_config)
     """
     # Se a fonte for uma stream (começa com rtmp:// ou srt://), usamos o StreamHandler
     is_stream = source.startswith("rtmp://") or source.startswith("srt://")
@@ -86,6 +145,7 @@ async def process_video_stream(client_id: str, source: str, video_id: str = None
     annotator = FrameAnnotator()
     # Reduzir min_hits para 1 para garantir que detecções apareçam mesmo com baixo FPS
     smoother = DetectionSmoother(min_hits=1, max_disappeared=5)
+    delta_encoder = DetectionDeltaEncoder()
     
     # Tentar abrir vídeo (arquivo ou stream)
     if is_stream:
@@ -95,13 +155,53 @@ async def process_video_stream(client_id: str, source: str, video_id: str = None
         await manager.send_message(client_id, {"type": "error", "message": "Erro ao abrir vídeo"})
         return
 
-    # Carregar modelo
+    # Vídeo enviado já analisado com o mesmo modelo/configuração: reproduzir
+    # as detecções gravadas em vez de executar o modelo
+    replay = None
+    replay_path = None
+    if video_id and not is_stream:
+        replay_path, replay = await asyncio.to_thread(_open_replay, video_id)
+        if replay is not None:
+            await manager.send_message(client_id, {"type": "status", "message": "Reproduzindo análise em cache"})
+
+    # Carregar modelo (com workers de inferência, o modelo fica apenas neles)
     try:
-        detector.load_model()
+        if replay is None and not stream_workers.enabled:
+            detector.load_model()
     except Exception as e:
         await manager.send_message(client_id, {"type": "error", "message": f"Erro ao carregar modelo: {str(e)}"})
         return
     
+    # Upload em reprodução não pode ser removido pela limpeza de armazenamento
+    if video_id and not is_stream:
+        storage_manager.pin(video_id)
+        storage_manager.touch(video_id)
+    
+    # Histogramas de tempo por etapa deste stream
+    timings = pipeline_metrics.open_stream(client_id, source)
+    # Streams disputam a inferência por prioridade; arquivos seguem skip_frames
+    if is_stream:
+        inference_scheduler.register(client_id)
+    
+    async def seek(target_frame: int) -> bool:
+        """Reposiciona o vídeo usando o índice de keyframes e reinicia o rastreamento"""
+        nonlocal frame_count, smoother, replay, last_detections
+        if not processor.keyframes:
+            index = await asyncio.to_thread(get_keyframe_index, source)
+            if index:
+                processor.set_keyframe_index(index)
+        if not await asyncio.to_thread(processor.seek_frame, target_frame):
+            return False
+        frame_count = target_frame
+        last_detections = []
+        delta_encoder.reset()
+        smoother = DetectionSmoother(min_hits=1, max_disappeared=5)
+        if replay is not None:
+            # O replay só avança: reabrir para voltar no tempo
+            replay.close()
+            replay = await asyncio.to_thread(ResultReplay, replay_path)
+        return True
+    
     try:
         fps_limit = 30
         frame_duration = 1.0 / fps_limit
@@ -110,11 +210,26 @@ async def process_video_stream(client_id: str, source: str, video_id: str = None
         last_detections = []
         last_stats = {}
         
+        if start_time and not is_stream:
+            await seek(int(round(start_time * (processor.fps or 30.0))))
+        
         # Importar stream_handler aqui para evitar import circular
         from app.api.routes import stream_handler
         
+        target_stream_id = None
+        last_observed = 0
+        ring = None
+        zones = None
+        from_crop = False
+        tiled = None
+        wait_started = None
+        last_seq = 0
+        client_render = False
+        
         while True:
             start_time = time.time()
+            if wait_started is None:
+                wait_started = time.perf_counter()
             frame_count += 1
             
             # Verificar se cliente ainda está conectado
@@ -129,48 +244,163 @@ async def process_video_stream(client_id: str, source: str, video_id: str = None
             
             if is_stream:
                 # Encontrar stream_id correspondente à URL
-                target_stream_id = None
                 for sid, s_data in stream_handler.active_streams.items():
                     if s_data["url"] == source:
                         target_stream_id = sid
                         break
                 
-                if target_stream_id:
-                    frame = await stream_handler.get_frame(target_stream_id)
+                latest = stream_handler.get_latest(target_stream_id) if target_stream_id else None
                 
-                if frame is None:
+                if latest is None:
                     # Se não tem frame, aguarda um pouco e tenta de novo
                     await asyncio.sleep(0.1)
                     continue
+                
+                seq, captured_at, frame, zones = latest
+                # Buffer compartilhado com a thread de leitura (e outros clientes
+                # da stream); com o anel, é uma view somente leitura de um slot,
+                # exceto com ROIs (o slot guarda o recorte de entrada da inferência)
+                ring = stream_handler.get_ring(target_stream_id)
+                from_crop = zones is not None and zones[1] is not None
+                tiled = zones[2] if zones is not None else None
+                owns_frame = False
+                if seq == last_seq and STREAM_MAX_FRAME_AGE and time.time() - captured_at > STREAM_MAX_FRAME_AGE:
+                    # Stream parada: não repetir um frame antigo, aguardar o próximo
+                    await asyncio.sleep(0.1)
+                    continue
+                if seq == last_seq:
+                    timings.count("repeated")
+                else:
+                    timings.count("read")
+                    # Frames sobrescritos pela thread de leitura antes de serem consumidos
+                    if last_seq and seq > last_seq + 1:
+                        timings.count("dropped", seq - last_seq - 1)
+                    last_seq = seq
             else:
+                # Pedido de salto (ex.: revisar o frame de um alerta)
+                seek_request = client_configs.get(client_id, {}).pop("seek", None)
+                if seek_request is not None:
+                    target = seek_request.get("frame")
+                    if target is None:
+                        target = int(round(float(seek_request.get("time_s", 0)) * (processor.fps or 30.0)))
+                    if await seek(int(target)):
+                        frame_count += 1
+                        await manager.send_message(client_id, {"type": "status", "message": "Posicionado", "frame": int(target)})
+                    # O tempo do salto não conta como espera por frame
+                    wait_started = time.perf_counter()
+                
                 # Lógica para arquivo (VideoProcessor)
                 if processor.cap and processor.cap.isOpened():
                     ret, frame = processor.cap.read()
                     if not ret:
                         break
+                    captured_at = time.time()
+                    owns_frame = True
+                    timings.count("read")
                 else:
                     break
 
+            # Espera pelo frame (stream) ou leitura/decodificação (arquivo)
+            frame_started = wait_started
+            t = timings.lap("wait", wait_started)
+            wait_started = None
+
             # Obter configurações do cliente
             config = client_configs.get(client_id, {"show_boxes": True})
             show_boxes = config.get("show_boxes", True)
             selected_classes = config.get("selected_classes", None)
+            if (config.get("render", render) == "client") != client_render:
+                client_render = not client_render
+                # Cliente passa a desenhar: começar com a lista completa
+                delta_encoder.reset()
 
             # Redimensionar frame para garantir performance
             if frame is not None:
                 h, w = frame.shape[:2]
                 if w > 640 or h > 640:
                     frame = cv2.resize(frame, (640, 480))
+                    owns_frame = True
+            # Movimento do frame novo, para a prioridade da stream no escalonador
+            if is_stream and inference_scheduler.enabled and seq != last_observed:
+                last_observed = seq
+                stream_config = stream_handler.get_config(target_stream_id)
+                inference_scheduler.observe(
+                    client_id, frame, stream_config.get("criticality", "normal"), target_stream_id, seq
+                )
+            t = timings.lap("resize", t)
 
-            # Lógica de Skip Frames para Detecção
-            if frame_count % skip_frames == 0:
-                # 1. Detecção
-                result = detector.detect(frame)
-                raw_detections = result["detections"]
-                last_stats = result["stats"]
-                
-                # 2. Suavização (Debouncing)
-                smoothed_detections = smoother.update(raw_detections)
+            # Lógica de Skip Frames para Detecção (nas streams, pelo escalonador)
+            if is_stream and inference_scheduler.enabled:
+                run_inference = inference_scheduler.due(client_id)
+            else:
+                run_inference = frame_count % skip_frames == 0
+            if run_inference:
+                inference_ms = None
+                if replay is not None:
+                    # 1-2. Detecções já suavizadas, lidas do cache
+                    h, w = frame.shape[:2]
+                    smoothed_detections = replay.detections_at(frame_count - 1, (w, h))
+                    last_stats = {"processing_time_ms": 0.0, "cached": True}
+                    t = timings.lap("inference", t)
+                else:
+                    # 1. Detecção (no worker da stream, se houver workers),
+                    # apenas no recorte das ROIs se a stream as define
+                    input_frame = zones[1] if from_crop else frame
+                    try:
+                        if tiled is not None:
+                            # Modo em tiles: um lote por frame, unido por NMS entre tiles
+                            # (recorte e detector local fora do event loop)
+                            grid, native, _ = tiled
+                            if stream_workers.enabled:
+                                tiles = await asyncio.to_thread(grid.tiles, native)
+                                results = await stream_workers.detect_batch(target_stream_id, tiles)
+                            else:
+                                results = await asyncio.to_thread(lambda: detector.detect_batch(grid.tiles(native)))
+                            merged = grid.merge([r["detections"] for r in results])
+                            result = {"detections": merged, "stats": {
+                                "processing_time_ms": sum(r["stats"]["processing_time_ms"] for r in results),
+                                "tiles": len(grid.rects)
+                            }}
+                        elif stream_workers.enabled and ring is not None and (from_crop or not owns_frame):
+                            # O worker lê a entrada do anel da stream, sem cópia
+                            result = await stream_workers.detect_shared(target_stream_id, ring, seq)
+                        elif stream_workers.enabled:
+                            result = await stream_workers.detect(target_stream_id or video_id or client_id, input_frame)
+                        else:
+                            result = detector.detect(input_frame)
+                    except FrameOverwritten:
+                        # Frame reaproveitado pela leitura antes do fim da inferência
+                        timings.count("dropped")
+                        continue
+                    except WorkerUnavailable as e:
+                        # Worker reiniciando: manter as últimas detecções neste frame
+                        print(f"Inferência indisponível para {client_id}: {e}")
+                        result = None
+                    except ValueError as e:
+                        # Entrada maior que o slot do worker: manter as últimas
+                        # detecções e seguir com a stream
+                        if not timings.frames["rejected"]:
+                            print(f"Inferência recusada para {client_id}: {e}")
+                        timings.count("rejected")
+                        result = None
+                    t = timings.lap("inference", t)
+                    
+                    # 2. Suavização (Debouncing)
+                    if result is not None:
+                        raw_detections = result["detections"]
+                        h, w = frame.shape[:2]
+                        if tiled is not None and zones[0] is None:
+                            raw_detections = TileGrid.to_display(raw_detections, tiled[2], (w, h))
+                        elif zones is not None:
+                            # Coordenadas do frame exibido, apenas dentro das zonas ativas
+                            space = "source" if tiled is not None else "crop" if from_crop else "display"
+                            raw_detections = zones[0].restore(raw_detections, (w, h), space)
+                        last_stats = result["stats"]
+                        inference_ms = last_stats.get("processing_time_ms")
+                        smoothed_detections = smoother.update(raw_detections)
+                    else:
+                        smoothed_detections = last_detections
+                    t = timings.lap("smoothing", t)
                 last_detections = smoothed_detections
                 
                 # 3. Recalcular violações com base nas detecções suavizadas
@@ -179,9 +409,16 @@ async def process_video_stream(client_id: str, source: str, video_id: str = None
                 # Atualizar estatísticas com dados suavizados para evitar volatilidade
                 last_stats["total_detections"] = len(smoothed_detections)
                 last_stats["violations_count"] = len(violations)
+                if is_stream:
+                    # Violações abertas e capacidade medida alimentam a prioridade
+                    inference_scheduler.report(client_id, inference_ms, len(violations))
                 
                 # Processar alertas com cooldown
-                new_alerts = alert_manager.process_violations(violations)
+                new_alerts = alert_manager.process_violations(
+                    violations,
+                    frame_number=frame_count,
+                    stream_id=target_stream_id or video_id
+                )
                 
                 # Enviar alertas se houver NOVOS alertas
                 for alert in new_alerts:
@@ -189,9 +426,11 @@ async def process_video_stream(client_id: str, source: str, video_id: str = None
                 
                 # Enviar estatísticas
                 await manager.send_stats(client_id, last_stats)
+                t = timings.lap("alerting", t)
             
-            # 4. Anotação (usando as últimas detecções conhecidas)
-            if show_boxes:
+            # 4. Anotação (usando as últimas detecções conhecidas); na
+            # renderização no cliente, as caixas e filtros ficam no navegador
+            if show_boxes and not client_render:
                 detections_to_draw = last_detections
                 if selected_classes is not None:
                     # Expandir seleção para incluir classes negativas (NO-...)
@@ -205,24 +444,55 @@ async def process_video_stream(client_id: str, source: str, video_id: str = None
                     
                     detections_to_draw = [d for d in last_detections if d['class_name'] in expanded_selection]
                 
-                annotated_frame = annotator.annotate(frame, detections_to_draw)
+                # Desenhar direto no buffer quando ele pertence a este pipeline
+                annotated_frame = annotator.annotate(frame, detections_to_draw, in_place=owns_frame)
             else:
                 annotated_frame = frame
+            t = timings.lap("annotation", t)
             
-            # 5. Encoding (Qualidade reduzida para performance)
-            encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), 70]
-            ret, buffer = cv2.imencode('.jpg', annotated_frame, encode_param)
-            if not ret:
+            # Frame atrasado demais (ex.: inferência lenta): descartar em vez de exibir
+            frame_age = time.time() - captured_at
+            if STREAM_MAX_FRAME_AGE and frame_age > STREAM_MAX_FRAME_AGE:
+                timings.frame_age.record(frame_age * 1000)
+                timings.count("stale")
                 continue
-            frame_b64 = base64.b64encode(buffer).decode('utf-8')
+            
+            # Frame sem anotações: o mesmo JPEG serve a todos os clientes da stream
+            shared = client_render and is_stream
+            frame_b64 = shared_frames.get(target_stream_id, seq) if shared else None
+            if frame_b64 is not None:
+                timings.count("shared")
+            else:
+                # 5. Encoding (Qualidade reduzida para performance)
+                encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), 70]
+                ret, buffer = cv2.imencode('.jpg', annotated_frame, encode_param)
+                if not ret:
+                    timings.count("dropped")
+                    continue
+                t = timings.lap("encode", t)
+                if ring is not None and not from_crop and not owns_frame and not ring.is_current(seq):
+                    # Slot do anel reutilizado durante a anotação/codificação
+                    timings.count("dropped")
+                    continue
+                frame_b64 = base64.b64encode(buffer).decode('utf-8')
+                t = timings.lap("base64", t)
+                if shared:
+                    shared_frames.put(target_stream_id, seq, frame_b64)
             
             # 6. Enviar para cliente
-            await manager.send_frame(client_id, frame_b64)
+            detections_delta = delta_encoder.encode(last_detections) if client_render else None
+            timings.bytes_sent += await manager.send_frame(client_id, frame_b64, captured_at, detections_delta)
+            timings.count("processed")
+            t = timings.lap("send", t)
+            frame_age = time.time() - captured_at
+            timings.frame_age.record(frame_age * 1000)
+            timings.record("total", (t - frame_started) * 1000)
             
             # Enviar estatísticas (atualizar FPS)
             current_fps = 1.0 / (time.time() - start_time) if (time.time() - start_time) > 0 else 30.0
             if last_stats:
                 last_stats["fps"] = current_fps
+                last_stats["frame_age_ms"] = round(frame_age * 1000, 1)
                 await manager.send_stats(client_id, last_stats)
             
             # Controle de FPS
@@ -234,20 +504,22 @@ async def process_video_stream(client_id: str, source: str, video_id: str = None
         print(f"Erro no processamento: {e}")
         await manager.send_message(client_id, {"type": "error", "message": str(e)})
     finally:
+        pipeline_metrics.close_stream(timings)
+        inference_scheduler.unregister(client_id)
         if not is_stream:
             processor.release()
+        if replay is not None:
+            replay.close()
         if client_id in processing_tasks:
             del processing_tasks[client_id]
         if client_id in client_configs:
             del client_configs[client_id]
-            
-        # Remover arquivo temporário se for um upload
-        if video_id and source and os.path.exists(source):
-            try:
-                os.remove(source)
-                print(f"Arquivo temporário removido: {source}")
-            except Exception as e:
-                print(f"Erro ao remover arquivo temporário {source}: {e}")
+        
+        # O upload permanece disponível (replay, busca, análise); a remoção
+        # fica a cargo do StorageManager (cota e expiração)
+        if video_id and not is_stream:
+            storage_manager.touch(video_id)
+            storage_manager.unpin(video_id)
 
         await manager.send_message(client_id, {"type": "status", "message": "Processamento finalizado"})
 
@@ -281,6 +553,13 @@ async def video_websocket(websocket: WebSocket, client_id: str):
                     "timestamp": message.get("timestamp")
                 })
             
+            elif message.get("action") == "seek":
+                # Aplicado pela task de processamento antes do próximo frame
+                client_configs.setdefault(client_id, {})["seek"] = {
+                    "frame": message.get("frame"),
+                    "time_s": message.get("time_s")
+                }
+            
             elif message.get("action") == "update_config":
                 # Atualizar configurações em tempo real
                 config = message.get("config", {})
@@ -297,10 +576,7 @@ async def video_websocket(websocket: WebSocket, client_id: str):
                     # Tentar usar o path fornecido ou procurar
                     source = message.get("file_path")
                     if not source:
-                         import glob
-                         files = glob.glob(f"temp_videos/{video_id}.*")
-                         if files:
-                             source = files[0]
+                        source = find_upload(video_id)
                 elif stream_url:
                     source = stream_url
                 
@@ -310,7 +586,11 @@ async def video_websocket(websocket: WebSocket, client_id: str):
                         processing_tasks[client_id].cancel()
                     
                     # Iniciar nova tarefa
-                    task = asyncio.create_task(process_video_stream(client_id, source, video_id))
+                    task = asyncio.create_task(process_video_stream(
+                        client_id, source, video_id,
+                        start_time=message.get("start_time"),
+                        render=message.get("render", "server")
+                    ))
                     processing_tasks[client_id] = task
                     
                     await manager.send_message(client_id, {
@@ -347,23 +627,88 @@ async def video_websocket(websocket: WebSocket, client_id: str):
         print(f"Erro no websocket: {e}")
 
 
+def _split_param(value: str):
+    """Converte parâmetro separado por vírgulas em lista (None se vazio)"""
+    if not value:
+        return None
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+
 @router.websocket("/ws/alerts/{client_id}")
 async def alerts_websocket(websocket: WebSocket, client_id: str):
     """
     WebSocket dedicado para alertas em tempo real
+    
+    Parâmetros de query opcionais:
+        stream_id: Streams de interesse (separadas por vírgula)
+        severity: Severidades de interesse (separadas por vírgula)
+        last_seq: Último seq recebido, para reenviar alertas perdidos na reconexão
     """
-    await manager.connect(websocket, f"alerts_{client_id}")
+    connection_id = f"alerts_{client_id}"
+    await manager.connect(websocket, connection_id)
+    
+    params = websocket.query_params
+    # Assinar antes do replay para não perder alertas publicados no intervalo
+    subscription = alert_manager.bus.subscribe(
+        connection_id,
+        stream_ids=_split_param(params.get("stream_id")),
+        severities=_split_param(params.get("severity"))
+    )
     
+    async def send_alerts(last_seq: int):
+        if last_seq:
+            for alert in alert_manager.get_alerts_after(last_seq):
+                if subscription.matches(alert):
+                    await manager.send_alert(connection_id, alert)
+                    last_seq = alert["seq"]
+        
+        while True:
+            alert = await subscription.queue.get()
+            # Ignorar alertas já entregues pelo replay
+            if alert["seq"] <= last_seq:
+                continue
+            await manager.send_alert(connection_id, alert)
+            last_seq = alert["seq"]
+    
+    async def receive_commands():
+        while True:
+            message = json.loads(await websocket.receive_text())
+            
+            if message.get("action") == "ping":
+                await manager.send_message(connection_id, {
+                    "type": "pong",
+                    "timestamp": message.get("timestamp"),
+                    "dropped": subscription.dropped
+                })
+            
+            elif message.get("action") == "update_filters":
+                subscription.set_filters(
+                    stream_ids=message.get("stream_ids"),
+                    severities=message.get("severities")
+                )
+    
+    sender = None
     try:
-        await manager.send_message(f"alerts_{client_id}", {
+        await manager.send_message(connection_id, {
             "type": "connection",
             "status": "connected",
             "channel": "alerts"
         })
         
-        while True:
-            data = await websocket.receive_text()
-            # Manter conexão ativa
+        sender = asyncio.create_task(send_alerts(int(params.get("last_seq") or 0)))
+        receiver = asyncio.create_task(receive_commands())
+        done, pending = await asyncio.wait({sender, receiver}, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        for task in done:
+            task.result()
     
     except WebSocketDisconnect:
-        manager.disconnect(f"alerts_{client_id}")
+        pass
+    except Exception as e:
+        print(f"Erro no websocket de alertas: {e}")
+    finally:
+        if sender and not sender.done():
+            sender.cancel()
+        alert_manager.bus.unsubscribe(connection_id)
+        manager.disconnect(connection_id)
@@ -21,13 +21,75 @@ CONFIDENCE_THRESHOLD = float(os.getenv("CONFIDENCE_THRESHOLD", 0.5))
 # Configurações de Vídeo
 MAX_FILE_SIZE = int(os.getenv("MAX_FILE_SIZE", 500 * 1024 * 1024))  # 500MB
 ALLOWED_EXTENSIONS = {"mp4", "avi", "mov", "mkv", "webm"}
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "temp_videos")
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", 1024 * 1024))  # 1MB
 FRAME_RESIZE_WIDTH = int(os.getenv("FRAME_RESIZE_WIDTH", 640))
 FRAME_RESIZE_HEIGHT = int(os.getenv("FRAME_RESIZE_HEIGHT", 640))
 
+# Análise offline de vídeos enviados
+ANALYSIS_RESULTS_DIR = os.getenv("ANALYSIS_RESULTS_DIR", "data/results")
+ANALYSIS_BATCH_SIZE = int(os.getenv("ANALYSIS_BATCH_SIZE", 8))
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", 0))  # 0 = número de CPUs
+ANALYSIS_MIN_SEGMENT_SECONDS = float(os.getenv("ANALYSIS_MIN_SEGMENT_SECONDS", 60))
+ANALYSIS_SEGMENT_WARMUP_FRAMES = int(os.getenv("ANALYSIS_SEGMENT_WARMUP_FRAMES", 12))
+
+# Armazenamento de uploads (cota, expiração e limpeza periódica)
+STORAGE_QUOTA_BYTES = int(os.getenv("STORAGE_QUOTA_BYTES", 20 * 1024 * 1024 * 1024))  # 20GB
+STORAGE_TTL_SECONDS = float(os.getenv("STORAGE_TTL_SECONDS", 24 * 3600))
+STORAGE_PARTIAL_TTL_SECONDS = float(os.getenv("STORAGE_PARTIAL_TTL_SECONDS", 6 * 3600))
+STORAGE_SWEEP_INTERVAL = float(os.getenv("STORAGE_SWEEP_INTERVAL", 300))
+
+# Cache de resultados por conteúdo (hash do vídeo + modelo + configuração)
+RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR", "data/cache")
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", 2 * 1024 * 1024 * 1024))  # 2GB
+
 # Configurações de Streaming
 STREAM_RECONNECT_ATTEMPTS = int(os.getenv("STREAM_RECONNECT_ATTEMPTS", 3))
 STREAM_RECONNECT_DELAY = int(os.getenv("STREAM_RECONNECT_DELAY", 5))
 STREAM_BUFFER_SIZE = int(os.getenv("STREAM_BUFFER_SIZE", 30))
+# Idade máxima (s) de um frame desde a captura; frames mais antigos são
+# descartados em vez de exibidos com atraso (0 desativa)
+STREAM_MAX_FRAME_AGE = float(os.getenv("STREAM_MAX_FRAME_AGE", 2.0))
+# Renderização no cliente: mensagens entre listas completas de detecções
+# (as demais levam apenas as alterações)
+STREAM_DETECTION_KEYFRAME_INTERVAL = int(os.getenv("STREAM_DETECTION_KEYFRAME_INTERVAL", 30))
+# Processos de inferência das streams (0 = inferência no processo da API).
+# Cada stream é atribuída a um worker por hash consistente do seu ID
+STREAM_WORKERS = int(os.getenv("STREAM_WORKERS", 0))
+# Frames em trânsito por worker (slots de memória compartilhada)
+STREAM_WORKER_SLOTS = int(os.getenv("STREAM_WORKER_SLOTS", 16))
+# Escalonamento da inferência por prioridade (criticidade, violações, movimento)
+STREAM_SCHEDULER = os.getenv("STREAM_SCHEDULER", "true").lower() == "true"
+# Inferências por segundo do nó divididas entre as streams (0 = estimar pela latência)
+STREAM_INFERENCE_BUDGET = float(os.getenv("STREAM_INFERENCE_BUDGET", 0))
+# Taxa de inferência de uma stream ativa e de uma stream parada
+STREAM_INFERENCE_MAX_FPS = float(os.getenv("STREAM_INFERENCE_MAX_FPS", 10))
+STREAM_INFERENCE_MIN_FPS = float(os.getenv("STREAM_INFERENCE_MIN_FPS", 0.2))
+# Frames de cada stream no anel de memória compartilhada lido pelos workers
+STREAM_RING_SLOTS = int(os.getenv("STREAM_RING_SLOTS", 8))
+
+# Persistência de Alertas (SQLite/WAL). Caminho vazio desativa a persistência
+ALERT_DB_PATH = os.getenv("ALERT_DB_PATH", "data/alerts.db")
+ALERT_DB_BATCH_SIZE = int(os.getenv("ALERT_DB_BATCH_SIZE", 200))
+ALERT_DB_FLUSH_INTERVAL = float(os.getenv("ALERT_DB_FLUSH_INTERVAL", 0.5))
+
+# Tamanho da fila de cada assinante de /ws/alerts (alertas mais antigos são descartados)
+ALERT_SUBSCRIBER_QUEUE_SIZE = int(os.getenv("ALERT_SUBSCRIBER_QUEUE_SIZE", 100))
+
+# Webhooks de alertas (URLs separadas por vírgula; vazio desativa)
+WEBHOOK_URLS = [u.strip() for u in os.getenv("WEBHOOK_URLS", "").split(",") if u.strip()]
+WEBHOOK_BATCH_SIZE = int(os.getenv("WEBHOOK_BATCH_SIZE", 50))
+WEBHOOK_FLUSH_INTERVAL = float(os.getenv("WEBHOOK_FLUSH_INTERVAL", 1.0))
+WEBHOOK_MAX_RETRIES = int(os.getenv("WEBHOOK_MAX_RETRIES", 4))
+WEBHOOK_BACKOFF_BASE = float(os.getenv("WEBHOOK_BACKOFF_BASE", 0.5))
+WEBHOOK_RETRY_INTERVAL = float(os.getenv("WEBHOOK_RETRY_INTERVAL", 30))
+WEBHOOK_TIMEOUT = float(os.getenv("WEBHOOK_TIMEOUT", 5))
+WEBHOOK_SPOOL_DIR = os.getenv("WEBHOOK_SPOOL_DIR", "data/webhook_spool")
+
+# Endpoints administrativos (ex.: /api/admin/profile) exigem o cabeçalho
+# X-Admin-Token com este valor; vazio desativa os endpoints
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", 60))
 
 # Classes do modelo YOLO (conforme repositório de referência)
 YOLO_CLASSES = [
@@ -3,9 +3,17 @@ PPE Detection API - Entrada principal FastAPI
 """
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from app.config import CORS_ORIGINS, DEBUG
-from app.api.routes import router as api_router
+from app.config import CORS_ORIGINS, DEBUG, ALERT_DB_PATH, ALERT_DB_BATCH_SIZE, ALERT_DB_FLUSH_INTERVAL, STREAM_RING_SLOTS
+from app.api.routes import router as api_router, stream_handler
 from app.api.websocket import router as ws_router
+from app.api.metrics import router as metrics_router
+from app.services.alert_manager import alert_manager
+from app.services.alert_store import AlertStore
+from app.services.webhook_dispatcher import webhook_dispatcher
+from app.services.analysis_job import analysis_jobs
+from app.services.storage_manager import storage_manager
+from app.services.stream_workers import stream_workers
+from app.services.inference_scheduler import inference_scheduler
 
 app = FastAPI(
     title="PPE Detection API",
@@ -33,6 +41,38 @@ async def log_requests(request: Request, call_next):
 # Rotas
 app.include_router(api_router, prefix="/api", tags=["API"])
 app.include_router(ws_router, prefix="/api", tags=["WebSocket"])
+# Na raiz, onde os coletores do Prometheus procuram por padrão
+app.include_router(metrics_router, tags=["Metrics"])
+
+
+@app.on_event("startup")
+async def startup():
+    """Inicializa serviços persistentes"""
+    if ALERT_DB_PATH:
+        alert_manager.attach_store(
+            AlertStore(ALERT_DB_PATH, batch_size=ALERT_DB_BATCH_SIZE, flush_interval=ALERT_DB_FLUSH_INTERVAL)
+        )
+    if webhook_dispatcher.enabled:
+        await webhook_dispatcher.start(alert_manager.bus)
+    # Remove órfãos deixados por execuções anteriores e agenda a limpeza periódica
+    await storage_manager.start()
+    # Workers de inferência das streams (STREAM_WORKERS > 0)
+    stream_workers.start()
+    if stream_workers.enabled:
+        # Leitura das streams direto para memória compartilhada com os workers
+        stream_handler.frame_ring_slots = STREAM_RING_SLOTS
+        # Inferências simultâneas na estimativa do orçamento do escalonador
+        inference_scheduler.concurrency = stream_workers.workers
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Grava pendências antes de encerrar"""
+    await webhook_dispatcher.stop()
+    await storage_manager.stop()
+    analysis_jobs.shutdown()
+    stream_workers.stop()
+    alert_manager.close()
 
 
 @app.get("/")
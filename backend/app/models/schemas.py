@@ -2,7 +2,7 @@
 Pydantic schemas para validação de dados
 """
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Annotated, List, Literal, Optional, Tuple
 from datetime import datetime
 
 
@@ -60,6 +60,34 @@ class StreamConfig(BaseModel):
     protocol: str = Field(default="rtmp", description="Protocolo (rtmp, rtmps, srt)")
 
 
+# Ponto (x, y) normalizado pelo tamanho do frame
+NormalizedPoint = Tuple[Annotated[float, Field(ge=0, le=1)], Annotated[float, Field(ge=0, le=1)]]
+Polygon = Annotated[List[NormalizedPoint], Field(min_length=3)]
+
+
+class TilingSettings(BaseModel):
+    """Schema da grade do modo de inferência em tiles"""
+    cols: int = Field(1, ge=1, le=8, description="Tiles na horizontal")
+    rows: int = Field(1, ge=1, le=8, description="Tiles na vertical")
+    overlap: float = Field(0.2, ge=0, le=0.5, description="Sobreposição entre tiles vizinhos, em fração do tile")
+
+
+class StreamSettings(BaseModel):
+    """Schema para alteração da configuração de uma stream em andamento"""
+    criticality: Optional[Literal["low", "normal", "high", "critical"]] = Field(
+        None, description="Prioridade da stream no escalonamento da inferência"
+    )
+    roi: Optional[List[Polygon]] = Field(
+        None, description="Zonas monitoradas (polígonos normalizados); lista vazia monitora o frame inteiro"
+    )
+    exclusions: Optional[List[Polygon]] = Field(
+        None, description="Zonas ignoradas (polígonos normalizados), mesmo dentro das ROIs"
+    )
+    tiling: Optional[TilingSettings] = Field(
+        None, description="Inferência em tiles sobrepostos (câmeras de alta resolução); 1x1 desliga"
+    )
+
+
 class VideoUploadResponse(BaseModel):
     """Schema para resposta de upload de vídeo"""
     message: str
@@ -4,3 +4,18 @@ from .video_processor import VideoProcessor
 from .stream_handler import StreamHandler
 from .alert_manager import AlertManager
 from .smoother import DetectionSmoother
+from .alert_store import AlertStore
+from .alert_bus import AlertBus
+from .webhook_dispatcher import WebhookDispatcher
+from .analysis_job import AnalysisJobManager
+from .result_cache import ResultCache
+from .upload_manager import UploadManager
+from .progressive_feed import ProgressiveFeed
+from .storage_manager import StorageManager
+from .pipeline_metrics import PipelineMetrics
+from .client_render import DetectionDeltaEncoder, SharedFrameCache
+from .stream_workers import StreamWorkerPool
+from .frame_ring import FrameRing
+from .inference_scheduler import InferenceScheduler
+from .roi import RegionFilter
+from .tiling import TileGrid
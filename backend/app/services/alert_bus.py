@@ -0,0 +1,114 @@
+"""
+Barramento pub/sub em processo para distribuição de alertas
+"""
+import asyncio
+from typing import Dict, Iterable, Optional, Set
+
+
+class AlertSubscription:
+    """
+    Assinatura de alertas com fila limitada e filtros avaliados no servidor
+
+    Quando a fila enche (cliente lento), o alerta mais antigo é descartado e
+    contabilizado em `dropped`; o cliente pode retomar pelo último `seq`.
+    """
+
+    def __init__(
+        self,
+        subscriber_id: str,
+        queue_size: int,
+        stream_ids: Optional[Iterable[str]] = None,
+        severities: Optional[Iterable[str]] = None
+    ):
+        self.subscriber_id = subscriber_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.set_filters(stream_ids, severities)
+
+    def set_filters(self, stream_ids: Optional[Iterable[str]] = None, severities: Optional[Iterable[str]] = None):
+        """Atualiza filtros (None ou vazio = sem filtro)"""
+        self.stream_ids: Optional[Set[str]] = set(stream_ids) if stream_ids else None
+        self.severities: Optional[Set[str]] = set(severities) if severities else None
+
+    def matches(self, alert: dict) -> bool:
+        """Verifica se o alerta passa pelos filtros da assinatura"""
+        if self.stream_ids is not None and alert.get("stream_id") not in self.stream_ids:
+            return False
+        if self.severities is not None and alert.get("severity") not in self.severities:
+            return False
+        return True
+
+    def offer(self, alert: dict):
+        """Enfileira alerta sem bloquear, descartando o mais antigo se necessário"""
+        if not self.matches(alert):
+            return
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(alert)
+
+
+class AlertBus:
+    """
+    Distribui alertas publicados para todos os assinantes (fan-out)
+
+    A publicação é O(assinantes) e nunca bloqueia o produtor. Pode ser
+    chamada de fora do event loop (ex.: threads de processamento); nesse caso
+    a entrega é agendada no loop dos assinantes.
+    """
+
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self.subscribers: Dict[str, AlertSubscription] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def subscribe(
+        self,
+        subscriber_id: str,
+        stream_ids: Optional[Iterable[str]] = None,
+        severities: Optional[Iterable[str]] = None,
+        queue_size: int = None
+    ) -> AlertSubscription:
+        """
+        Registra um assinante (deve ser chamado dentro do event loop)
+
+        Args:
+            subscriber_id: Identificador único do assinante
+            stream_ids: Streams de interesse
+            severities: Severidades de interesse
+            queue_size: Tamanho da fila (padrão do barramento se omitido)
+
+        Returns:
+            AlertSubscription com a fila de alertas do assinante
+        """
+        self._loop = asyncio.get_running_loop()
+        subscription = AlertSubscription(subscriber_id, queue_size or self.queue_size, stream_ids, severities)
+        self.subscribers[subscriber_id] = subscription
+        return subscription
+
+    def unsubscribe(self, subscriber_id: str):
+        """Remove assinante"""
+        self.subscribers.pop(subscriber_id, None)
+
+    def publish(self, alert: dict):
+        """Publica alerta para todos os assinantes compatíveis"""
+        if not self.subscribers or self._loop is None:
+            return
+
+        try:
+            in_loop = asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            in_loop = False
+
+        if in_loop:
+            self._fan_out(alert)
+        elif not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._fan_out, alert)
+
+    def _fan_out(self, alert: dict):
+        for subscription in list(self.subscribers.values()):
+            subscription.offer(alert)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self.subscribers)
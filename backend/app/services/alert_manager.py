@@ -2,30 +2,83 @@
 Gerenciador de alertas de violações de EPI
 """
 from typing import List, Dict, Optional
-from datetime import datetime, timedelta
+from collections import deque
+from datetime import datetime
+from itertools import islice
 import uuid
-from app.config import ALERT_CLASSES
+from app.config import ALERT_CLASSES, ALERT_SUBSCRIBER_QUEUE_SIZE
+from app.services.alert_store import AlertStore
+from app.services.alert_bus import AlertBus
+
+SEVERITIES = ("high", "medium", "low")
 
 
 class AlertManager:
     """
     Gerenciador de alertas para violações de EPI
+    
+    Os alertas ficam em um buffer circular (mais recente à esquerda) com
+    índices secundários mantidos incrementalmente, de modo que inserção,
+    reconhecimento e estatísticas são O(1) e filtros são O(k).
     """
     
-    def __init__(self, cooldown_seconds: float = 5.0):
-        self.alerts: List[dict] = []
+    def __init__(self, cooldown_seconds: float = 5.0, max_alerts: int = 1000):
         self.alert_classes = ALERT_CLASSES
-        self.max_alerts = 1000  # Limite de alertas em memória
+        self.max_alerts = max_alerts  # Limite de alertas em memória
         self.cooldown_seconds = cooldown_seconds
         self.last_alerts: Dict[str, datetime] = {}  # violation_type -> last_time
+        self.store: Optional[AlertStore] = None  # Persistência opcional
+        self.bus = AlertBus(queue_size=ALERT_SUBSCRIBER_QUEUE_SIZE)
+        self._seq = 0  # Sequência monotônica usada como cursor
+        # Totais monotônicos por (classe, severidade) desde o início do processo
+        self.raised_total: Dict[tuple, int] = {}
+        self._reset_store()
     
-    def process_violations(self, violations: List[dict], frame_number: int = None) -> List[dict]:
+    def attach_store(self, store: AlertStore):
+        """
+        Conecta armazenamento persistente e recarrega os alertas mais recentes
+        
+        Args:
+            store: AlertStore a ser aberto e usado para gravação
+        """
+        store.open()
+        self.store = store
+        self._seq = max(self._seq, store.last_seq())
+        
+        self._reset_store()
+        for alert in reversed(store.query(limit=self.max_alerts)):
+            self.alerts.appendleft(alert)
+            self._index(alert)
+    
+    def close(self):
+        """Grava alertas pendentes e fecha o armazenamento"""
+        if self.store:
+            self.store.close()
+            self.store = None
+    
+    def _reset_store(self):
+        """Inicializa o buffer de alertas e os índices secundários"""
+        self.alerts: deque = deque()  # Mais recente primeiro
+        self._by_id: Dict[str, dict] = {}
+        self._by_severity: Dict[str, deque] = {sev: deque() for sev in SEVERITIES}
+        # Inserção em ordem cronológica; reversed() percorre do mais recente
+        self._unacknowledged: Dict[str, dict] = {}
+        self._count_by_class: Dict[str, int] = {}
+        self._count_by_severity: Dict[str, int] = {sev: 0 for sev in SEVERITIES}
+    
+    def process_violations(
+        self,
+        violations: List[dict],
+        frame_number: int = None,
+        stream_id: str = None
+    ) -> List[dict]:
         """
         Processa lista de violações e gera alertas respeitando cooldown
         
         Args:
             violations: Lista de violações detectadas no frame
             frame_number: Número do frame atual
+            stream_id: ID da stream ou vídeo de origem
             
         Returns:
             Lista de novos alertas gerados
@@ -43,7 +96,8 @@ class AlertManager:
                     confidence=violation.get("confidence", 0.0),
                     bbox=violation.get("bbox"),
                     frame_number=frame_number,
-                    timestamp=current_time.isoformat()
+                    timestamp=current_time.isoformat(),
+                    stream_id=stream_id
                 )
                 self.add_alert(alert)
                 new_alerts.append(alert)
@@ -61,13 +115,83 @@ class AlertManager:
 
     def add_alert(self, alert: dict):
         """Adiciona alerta ao histórico"""
-        self.alerts.insert(0, alert)  # Mais recente primeiro
+        self._seq += 1
+        alert["seq"] = self._seq
+        key = (alert["class"], alert["severity"])
+        self.raised_total[key] = self.raised_total.get(key, 0) + 1
+        self.alerts.appendleft(alert)  # Mais recente primeiro
+        self._index(alert)
+        if self.store:
+            self.store.append(alert)
+        self.bus.publish(alert)
         if len(self.alerts) > self.max_alerts:
-            self.alerts.pop()
+            self._unindex(self.alerts.pop())
+
+    def _index(self, alert: dict):
+        """Registra alerta nos índices secundários"""
+        severity = alert["severity"]
+        cls = alert["class"]
+        self._by_id[alert["id"]] = alert
+        self._by_severity.setdefault(severity, deque()).appendleft(alert)
+        self._count_by_class[cls] = self._count_by_class.get(cls, 0) + 1
+        self._count_by_severity[severity] = self._count_by_severity.get(severity, 0) + 1
+        if not alert["acknowledged"]:
+            self._unacknowledged[alert["id"]] = alert
+
+    def _unindex(self, alert: dict):
+        """
+        Remove dos índices o alerta mais antigo (despejado do buffer)
+        
+        Como o despejo sempre ocorre pelo final, o alerta também é o último
+        do índice de severidade correspondente.
+        """
+        severity = alert["severity"]
+        cls = alert["class"]
+        self._by_id.pop(alert["id"], None)
+        self._by_severity[severity].pop()
+        self._count_by_severity[severity] -= 1
+        self._count_by_class[cls] -= 1
+        if self._count_by_class[cls] == 0:
+            del self._count_by_class[cls]
+        self._unacknowledged.pop(alert["id"], None)
 
     def get_recent_alerts(self, limit: int = 10) -> List[dict]:
         """Retorna alertas mais recentes"""
-        return self.alerts[:limit]
+        return list(islice(self.alerts, limit))
+
+    def get_alerts_after(self, seq: int, limit: int = 500) -> List[dict]:
+        """
+        Retorna alertas com seq maior que o informado, do mais antigo ao mais recente
+        
+        Usado para retomar assinaturas após reconexão. Se o intervalo já saiu
+        do buffer em memória, a parte mais antiga vem do armazenamento
+        persistente: alertas anteriores ao buffer já foram gravados há muito
+        tempo, então a consulta não força a gravação das pendências (que
+        bloquearia o event loop até o fim do lote).
+        
+        Args:
+            seq: Último seq recebido pelo cliente
+            limit: Número máximo de alertas (os mais recentes são mantidos)
+        
+        Returns:
+            Lista de alertas em ordem cronológica
+        """
+        missed = []
+        for alert in self.alerts:
+            if alert["seq"] <= seq or len(missed) >= limit:
+                break
+            missed.append(alert)
+        missed.reverse()
+        
+        oldest_seq = self.alerts[-1]["seq"] if self.alerts else None
+        if self.store and oldest_seq is not None and oldest_seq > seq + 1 and len(missed) < limit:
+            stored = self.store.query(limit=limit - len(missed), after=seq, before=oldest_seq)
+            missed = list(reversed(stored)) + missed
+        return missed
+
+    def get_alert(self, alert_id: str) -> Optional[dict]:
+        """Retorna alerta pelo ID"""
+        return self._by_id.get(alert_id)
 
     def create_alert(
         self, 
@@ -75,7 +199,8 @@ class AlertManager:
         confidence: float,
         bbox: List[int],
         frame_number: int = None,
-        timestamp: str = None
+        timestamp: str = None,
+        stream_id: str = None
     ) -> dict:
         """
         Cria um objeto de alerta (sem salvar)
@@ -87,6 +212,7 @@ class AlertManager:
             "bbox": bbox,
             "frame_number": frame_number,
             "timestamp": timestamp or datetime.now().isoformat(),
+            "stream_id": stream_id,
             "severity": self._get_severity(violation_class),
             "acknowledged": False
         }
@@ -127,17 +253,19 @@ class AlertManager:
         Returns:
             Lista de alertas
         """
-        alerts = self.alerts.copy()
-        
+        # Percorrer o menor índice aplicável, sempre do mais recente
         if severity:
-            alerts = [a for a in alerts if a["severity"] == severity]
+            source = self._by_severity.get(severity, ())
+            if unacknowledged_only:
+                source = (a for a in source if not a["acknowledged"])
+        elif unacknowledged_only:
+            source = reversed(self._unacknowledged.values())
+        else:
+            source = self.alerts
         
-        if unacknowledged_only:
-            alerts = [a for a in alerts if not a["acknowledged"]]
-        
-        return alerts[-limit:][::-1]  # Mais recentes primeiro
+        return list(islice(source, limit))
     
-    def acknowledge_alert(self, alert_id: int) -> bool:
+    def acknowledge_alert(self, alert_id: str) -> bool:
         """
         Marca alerta como reconhecido
         
@@ -147,12 +275,33 @@ class AlertManager:
         Returns:
             True se reconhecido com sucesso
         """
-        for alert in self.alerts:
-            if alert["id"] == alert_id:
-                alert["acknowledged"] = True
-                return True
-        return False
+        alert = self._by_id.get(alert_id)
+        if alert is None:
+            return self.acknowledge_stored_alert(alert_id)
+        alert["acknowledged"] = True
+        self._unacknowledged.pop(alert_id, None)
+        if self.store:
+            self.store.acknowledge(alert_id)
+        return True
     
+    def acknowledge_stored_alert(self, alert_id: str) -> bool:
+        """
+        Reconhece um alerta já fora do buffer em memória, mas possivelmente gravado
+
+        Aguarda a gravação das pendências (bloqueante: nas rotas, chamar
+        fora do event loop). Não altera o estado em memória.
+
+        Returns:
+            True se o alerta está gravado
+        """
+        if self.store is None:
+            return False
+        self.store.flush()
+        if not self.store.exists(alert_id):
+            return False
+        self.store.acknowledge(alert_id)
+        return True
+
     def get_stats(self) -> dict:
         """
         Retorna estatísticas dos alertas
@@ -160,27 +309,16 @@ class AlertManager:
         Returns:
             Dict com estatísticas
         """
-        total = len(self.alerts)
-        unacknowledged = sum(1 for a in self.alerts if not a["acknowledged"])
-        
-        by_class = {}
-        by_severity = {"high": 0, "medium": 0, "low": 0}
-        
-        for alert in self.alerts:
-            cls = alert["class"]
-            by_class[cls] = by_class.get(cls, 0) + 1
-            by_severity[alert["severity"]] += 1
-        
         return {
-            "total": total,
-            "unacknowledged": unacknowledged,
-            "by_class": by_class,
-            "by_severity": by_severity
+            "total": len(self.alerts),
+            "unacknowledged": len(self._unacknowledged),
+            "by_class": dict(self._count_by_class),
+            "by_severity": dict(self._count_by_severity)
         }
     
     def clear_alerts(self):
-        """Limpa todos os alertas"""
-        self.alerts = []
+        """Limpa os alertas em memória (o histórico persistido é append-only)"""
+        self._reset_store()
 
 alert_manager = AlertManager()
 
@@ -0,0 +1,257 @@
+"""
+Persistência de alertas em SQLite (modo WAL) com escrita em lote
+"""
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import List, Optional
+
+_STOP = object()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS alerts (
+    seq INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    timestamp TEXT NOT NULL,
+    stream_id TEXT,
+    class TEXT NOT NULL,
+    severity TEXT NOT NULL,
+    confidence REAL,
+    bbox TEXT,
+    frame_number INTEGER,
+    acknowledged INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_alerts_timestamp ON alerts (timestamp);
+CREATE INDEX IF NOT EXISTS idx_alerts_stream ON alerts (stream_id, seq);
+CREATE INDEX IF NOT EXISTS idx_alerts_class ON alerts (class, seq);
+CREATE INDEX IF NOT EXISTS idx_alerts_severity ON alerts (severity, seq);
+"""
+
+_COLUMNS = "seq, id, timestamp, stream_id, class, severity, confidence, bbox, frame_number, acknowledged"
+
+
+class AlertStore:
+    """
+    Armazenamento append-only de alertas em SQLite
+
+    Inserções e reconhecimentos são enfileirados e gravados em lote por uma
+    thread dedicada, para que o loop de detecção nunca espere pelo fsync.
+    Consultas usam uma conexão de leitura própria (WAL permite leituras
+    concorrentes à escrita).
+    """
+
+    def __init__(self, db_path: str, batch_size: int = 200, flush_interval: float = 0.5):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: queue.Queue = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._read_conn: Optional[sqlite3.Connection] = None
+        self._read_lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Abre conexão configurada para WAL"""
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def open(self):
+        """Cria schema e inicia a thread de escrita"""
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._read_conn = self._connect()
+        self._read_conn.row_factory = sqlite3.Row
+        with self._read_conn:
+            self._read_conn.executescript(_SCHEMA)
+
+        self._writer = threading.Thread(target=self._writer_loop, name="alert-store-writer", daemon=True)
+        self._writer.start()
+
+    def close(self):
+        """Grava pendências e encerra a thread de escrita"""
+        if self._writer:
+            self._queue.put(_STOP)
+            self._writer.join()
+            self._writer = None
+        if self._read_conn:
+            self._read_conn.close()
+            self._read_conn = None
+
+    # Escrita
+
+    def append(self, alert: dict):
+        """Enfileira alerta para inserção (não bloqueia)"""
+        self._queue.put(("insert", alert))
+
+    def acknowledge(self, alert_id: str):
+        """Enfileira reconhecimento de alerta (não bloqueia)"""
+        self._queue.put(("ack", alert_id))
+
+    def flush(self, timeout: float = 5.0):
+        """Aguarda até que todos os itens enfileirados sejam gravados"""
+        done = threading.Event()
+        self._queue.put(("flush", done))
+        done.wait(timeout)
+
+    def _writer_loop(self):
+        """Thread que agrupa itens da fila em transações"""
+        conn = self._connect()
+        running = True
+
+        while running:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+
+            # Um flush pendente grava imediatamente, sem esperar o intervalo
+            while len(batch) < self.batch_size and batch[-1] is not _STOP and not self._is_flush(batch[-1]):
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            if batch[-1] is _STOP:
+                batch.pop()
+                running = False
+
+            try:
+                self._write_batch(conn, batch)
+            except Exception as e:
+                print(f"Erro ao gravar alertas: {e}")
+
+        conn.close()
+
+    @staticmethod
+    def _is_flush(item) -> bool:
+        return isinstance(item, tuple) and item[0] == "flush"
+
+    def _write_batch(self, conn: sqlite3.Connection, batch: list):
+        """Grava um lote em uma única transação, preservando a ordem"""
+        waiters = [payload for op, payload in batch if op == "flush"]
+        try:
+            self._execute_batch(conn, batch)
+        finally:
+            # Mesmo com erro na gravação, quem aguarda o flush é liberado
+            for done in waiters:
+                done.set()
+
+    def _execute_batch(self, conn: sqlite3.Connection, batch: list):
+        with conn:
+            for op, payload in batch:
+                if op == "insert":
+                    conn.execute(
+                        f"INSERT OR IGNORE INTO alerts ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (
+                            payload["seq"],
+                            payload["id"],
+                            payload["timestamp"],
+                            payload.get("stream_id"),
+                            payload["class"],
+                            payload["severity"],
+                            payload.get("confidence"),
+                            json.dumps(payload.get("bbox")),
+                            payload.get("frame_number"),
+                            int(payload.get("acknowledged", False))
+                        )
+                    )
+                elif op == "ack":
+                    conn.execute("UPDATE alerts SET acknowledged = 1 WHERE id = ?", (payload,))
+
+    # Leitura
+
+    def _fetch(self, sql: str, params: tuple = ()) -> List[sqlite3.Row]:
+        with self._read_lock:
+            return self._read_conn.execute(sql, params).fetchall()
+
+    @staticmethod
+    def _row_to_alert(row: sqlite3.Row) -> dict:
+        return {
+            "seq": row["seq"],
+            "id": row["id"],
+            "class": row["class"],
+            "confidence": row["confidence"],
+            "bbox": json.loads(row["bbox"]) if row["bbox"] else None,
+            "frame_number": row["frame_number"],
+            "timestamp": row["timestamp"],
+            "stream_id": row["stream_id"],
+            "severity": row["severity"],
+            "acknowledged": bool(row["acknowledged"])
+        }
+
+    def last_seq(self) -> int:
+        """Retorna o maior número de sequência gravado"""
+        rows = self._fetch("SELECT MAX(seq) FROM alerts")
+        return rows[0][0] or 0
+
+    def exists(self, alert_id: str) -> bool:
+        """Verifica se o alerta está gravado"""
+        return bool(self._fetch("SELECT 1 FROM alerts WHERE id = ?", (alert_id,)))
+
+    def query(
+        self,
+        limit: int = 50,
+        before: Optional[int] = None,
+        after: Optional[int] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        stream_id: Optional[str] = None,
+        class_name: Optional[str] = None,
+        severity: Optional[str] = None,
+        unacknowledged_only: bool = False
+    ) -> List[dict]:
+        """
+        Consulta alertas, mais recentes primeiro, com paginação por cursor
+
+        Args:
+            limit: Número máximo de alertas
+            before: Cursor - retorna alertas com seq menor que este valor
+            after: Retorna apenas alertas com seq maior que este valor
+            since: Timestamp ISO inicial (inclusivo)
+            until: Timestamp ISO final (exclusivo)
+            stream_id: Filtrar por stream/vídeo de origem
+            class_name: Filtrar por classe da violação
+            severity: Filtrar por severidade
+            unacknowledged_only: Apenas não reconhecidos
+
+        Returns:
+            Lista de alertas; o seq do último item é o cursor da próxima página
+        """
+        clauses = []
+        params = []
+
+        if before is not None:
+            clauses.append("seq < ?")
+            params.append(before)
+        if after is not None:
+            clauses.append("seq > ?")
+            params.append(after)
+        if since:
+            clauses.append("timestamp >= ?")
+            params.append(since)
+        if until:
+            clauses.append("timestamp < ?")
+            params.append(until)
+        if stream_id:
+            clauses.append("stream_id = ?")
+            params.append(stream_id)
+        if class_name:
+            clauses.append("class = ?")
+            params.append(class_name)
+        if severity:
+            clauses.append("severity = ?")
+            params.append(severity)
+        if unacknowledged_only:
+            clauses.append("acknowledged = 0")
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        params.append(limit)
+        rows = self._fetch(f"SELECT {_COLUMNS} FROM alerts {where} ORDER BY seq DESC LIMIT ?", tuple(params))
+        return [self._row_to_alert(row) for row in rows]
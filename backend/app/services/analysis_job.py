@@ -0,0 +1,871 @@
+"""
+Análise offline (headless) de vídeos enviados
+"""
+import asyncio
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime
+import multiprocessing
+import shutil
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Generator, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import (
+    ANALYSIS_RESULTS_DIR, ANALYSIS_BATCH_SIZE, ANALYSIS_WORKERS,
+    ANALYSIS_MIN_SEGMENT_SECONDS, ANALYSIS_SEGMENT_WARMUP_FRAMES
+)
+from app.services.detector import PPEDetector
+from app.services.smoother import DetectionSmoother
+from app.services.progressive_feed import ProgressiveFeed
+from app.services.profiler import PROFILE_DIR, install_worker_handler
+from app.services.result_cache import ResultCache, link_or_copy, read_summary, result_cache
+from app.services.storage_manager import StorageManager, storage_manager
+from app.services.video_processor import VideoProcessor, get_keyframe_index
+from app.utils.helpers import calculate_iou
+
+# IDs de trilhas de um segmento paralelo que não continuam do anterior:
+# (índice do segmento << TRACK_ID_SEGMENT_SHIFT) + ID local
+TRACK_ID_SEGMENT_SHIFT = 20
+
+
+def prefetch(frames: Iterable[np.ndarray], size: int) -> Generator[np.ndarray, None, None]:
+    """
+    Decodifica frames em uma thread auxiliar, em paralelo à inferência
+
+    Ao fechar o generator (close() ou fim da iteração), a thread é encerrada
+    antes do retorno, liberando o VideoCapture com segurança.
+
+    Args:
+        frames: Iterável de frames (ex.: VideoProcessor.get_frames())
+        size: Número máximo de frames decodificados à frente
+
+    Yields:
+        Frames na ordem original
+    """
+    buffer: queue.Queue = queue.Queue(maxsize=size)
+    stop = threading.Event()
+    end = object()
+    errors = []
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def reader():
+        try:
+            for frame in frames:
+                if not put(frame):
+                    break
+        except Exception as e:
+            errors.append(e)
+        finally:
+            put(end)
+
+    thread = threading.Thread(target=reader, daemon=True)
+    thread.start()
+
+    try:
+        while True:
+            frame = buffer.get()
+            if frame is end:
+                break
+            yield frame
+        if errors:
+            raise errors[0]
+    finally:
+        stop.set()
+        thread.join()
+
+
+class FrameAnalyzer:
+    """
+    Detecção + suavização de uma sequência de frames em lotes
+
+    Mantém o estado do rastreador entre lotes, de modo que o resultado por
+    frame é o mesmo da análise em tempo real sem skip de frames. Cada trilha
+    de violação nova conta como um evento (equivalente a um alerta).
+    """
+
+    def __init__(self, detector: PPEDetector, selected_classes: List[str] = None):
+        self.detector = detector
+        self.selected_classes = selected_classes
+        self.smoother = DetectionSmoother(min_hits=1, max_disappeared=5)
+        self.seen_violation_tracks = set()
+
+    def process_batch(self, frame_numbers: List[int], frames: List[np.ndarray], fps: float) -> List[dict]:
+        """
+        Processa um lote de frames
+
+        Returns:
+            Um registro por frame com detecções e violações suavizadas
+        """
+        records = []
+        for frame_number, result in zip(frame_numbers, self.detector.detect_batch(frames, self.selected_classes)):
+            detections = self.smoother.update(result["detections"])
+            violations = self.detector.get_violations(detections)
+            new_violations = [v for v in violations if v["track_id"] not in self.seen_violation_tracks]
+            self.seen_violation_tracks.update(v["track_id"] for v in new_violations)
+            records.append({
+                "type": "frame",
+                "frame": frame_number,
+                "timestamp_ms": round(frame_number * 1000.0 / fps, 1),
+                "detections": detections,
+                "violations": violations,
+                "new_violations": new_violations
+            })
+        return records
+
+
+def new_counts() -> dict:
+    """Contadores agregados de um trecho analisado"""
+    return {
+        "frames_analyzed": 0,
+        "frames_with_violations": 0,
+        "detections_by_class": {},
+        "violations_by_class": {},
+        "violation_events_by_class": {}
+    }
+
+
+def merge_counts(total: dict, part: dict) -> dict:
+    """Soma contadores de um trecho ao total"""
+    for key in ("frames_analyzed", "frames_with_violations"):
+        total[key] += part[key]
+    for key in ("detections_by_class", "violations_by_class", "violation_events_by_class"):
+        for cls, count in part[key].items():
+            total[key][cls] = total[key].get(cls, 0) + count
+    return total
+
+
+def analyze_range(
+    detector: PPEDetector,
+    file_path: str,
+    out,
+    start_frame: int = 0,
+    end_frame: Optional[int] = None,
+    emit_from: int = 0,
+    stride: int = 1,
+    selected_classes: List[str] = None,
+    batch_size: int = 8,
+    on_progress: Callable[[int], None] = None,
+    should_stop: Callable[[], bool] = None,
+    processor: Optional[VideoProcessor] = None,
+    boundary: Optional[dict] = None
+) -> dict:
+    """
+    Analisa o intervalo [start_frame, end_frame) de um vídeo
+
+    Frames anteriores a `emit_from` servem apenas de aquecimento do
+    rastreador (não são gravados nem contados). Isso permite que segmentos
+    processados em paralelo comecem com o mesmo estado de trilhas que teriam
+    na análise sequencial, sem duplicar eventos na fronteira.
+
+    Args:
+        detector: Detector já carregado
+        file_path: Caminho do vídeo
+        out: Arquivo texto onde gravar os registros JSON Lines
+        start_frame: Primeiro frame decodificado
+        end_frame: Frame final (exclusivo); None = até o fim
+        emit_from: Primeiro frame gravado
+        stride: Analisar 1 a cada N frames (alinhado ao frame 0)
+        selected_classes: Classes para filtrar
+        batch_size: Frames por chamada ao modelo
+        on_progress: Callback com o número de frames gravados a cada lote
+        should_stop: Callback de cancelamento
+        processor: VideoProcessor já aberto (ex.: leitura progressiva); se
+            informado, file_path é ignorado
+        boundary: Se informado, recebe as trilhas do último frame de
+            aquecimento ("head") e do último frame gravado ("tail"), como
+            (frame, detecções), para costurar segmentos (ver stitch_tracks)
+
+    Returns:
+        Contadores agregados (ver new_counts)
+    """
+    if processor is None:
+        processor = VideoProcessor()
+        if not processor.open_file(file_path):
+            raise ValueError("Arquivo de vídeo inválido ou corrompido")
+
+    fps = processor.fps or 30.0
+    if start_frame > 0 and file_path:
+        index = get_keyframe_index(file_path)
+        if index:
+            processor.set_keyframe_index(index)
+    if not processor.seek_frame(start_frame):
+        processor.release()
+        raise ValueError(f"Não foi possível posicionar no frame {start_frame}")
+
+    analyzer = FrameAnalyzer(detector, selected_classes)
+    counts = new_counts()
+
+    def run_batch(frame_numbers, frames):
+        emitted = 0
+        for record in analyzer.process_batch(frame_numbers, frames, fps):
+            if record["frame"] < emit_from:
+                if boundary is not None:
+                    boundary["head"] = (record["frame"], record["detections"])
+                continue
+            if boundary is not None:
+                boundary["tail"] = (record["frame"], record["detections"])
+            emitted += 1
+            for det in record["detections"]:
+                counts["detections_by_class"][det["class_name"]] = counts["detections_by_class"].get(det["class_name"], 0) + 1
+            for det in record["violations"]:
+                counts["violations_by_class"][det["class_name"]] = counts["violations_by_class"].get(det["class_name"], 0) + 1
+            for det in record["new_violations"]:
+                events = counts["violation_events_by_class"]
+                events[det["class_name"]] = events.get(det["class_name"], 0) + 1
+            if record["violations"]:
+                counts["frames_with_violations"] += 1
+            out.write(json.dumps(record) + "\n")
+        counts["frames_analyzed"] += emitted
+        if on_progress and emitted:
+            on_progress(emitted)
+
+    frame_source = prefetch(processor.get_frames(), batch_size * 2)
+    try:
+        frame_numbers, frames = [], []
+        for frame_number, frame in enumerate(frame_source, start=start_frame):
+            if end_frame is not None and frame_number >= end_frame:
+                break
+            if should_stop and should_stop():
+                break
+            if frame_number % stride:
+                continue
+            frame_numbers.append(frame_number)
+            frames.append(frame)
+            if len(frames) >= batch_size:
+                run_batch(frame_numbers, frames)
+                frame_numbers, frames = [], []
+
+        if frames and not (should_stop and should_stop()):
+            run_batch(frame_numbers, frames)
+    finally:
+        frame_source.close()
+        processor.release()
+
+    return counts
+
+
+def split_segments(
+    frame_count: int,
+    n_segments: int,
+    fps: float,
+    keyframes: List[float] = None,
+    start_frame: int = 0
+) -> List[Tuple[int, int]]:
+    """
+    Divide o intervalo [start_frame, frame_count) em segmentos de tamanho
+    aproximadamente igual
+
+    Com a lista de keyframes, cada fronteira é movida para o keyframe mais
+    próximo, para que cada worker comece a decodificar sem desperdício.
+
+    Returns:
+        Lista de (frame_inicial, frame_final_exclusivo)
+    """
+    if n_segments <= 1 or frame_count - start_frame <= 0:
+        return [(start_frame, frame_count)]
+
+    keyframe_frames = sorted({int(round(t * fps)) for t in keyframes or []})
+    boundaries = []
+    for i in range(1, n_segments):
+        target = start_frame + (frame_count - start_frame) * i // n_segments
+        if keyframe_frames:
+            target = min(keyframe_frames, key=lambda k: abs(k - target))
+        if start_frame < target < frame_count and (not boundaries or target > boundaries[-1]):
+            boundaries.append(target)
+
+    edges = [start_frame] + boundaries + [frame_count]
+    return list(zip(edges[:-1], edges[1:]))
+
+
+def stitch_tracks(boundaries: List[dict], iou_threshold: float = 0.5) -> List[Dict[int, int]]:
+    """
+    Numeração única das trilhas de segmentos analisados em paralelo
+
+    Cada segmento tem o próprio rastreador, com IDs a partir de 0. O último
+    frame de aquecimento de um segmento é o último frame gravado pelo
+    anterior; as trilhas desse frame são pareadas (mesma classe, IoU) com
+    as do segmento anterior e herdam o ID global delas. As demais recebem
+    (índice << TRACK_ID_SEGMENT_SHIFT) + ID local (ver global_track_id).
+
+    Args:
+        boundaries: Por segmento, o `boundary` preenchido por analyze_range
+
+    Returns:
+        Por segmento, mapa ID local -> ID global das trilhas herdadas
+    """
+    mappings: List[Dict[int, int]] = [{}]
+    for index in range(1, len(boundaries)):
+        mapping: Dict[int, int] = {}
+        head = boundaries[index].get("head")
+        tail = boundaries[index - 1].get("tail")
+        if head and tail and head[0] == tail[0]:
+            pairs = sorted(
+                (
+                    (calculate_iou(a["bbox"], b["bbox"]), a["track_id"], b["track_id"])
+                    for a in head[1] for b in tail[1] if a["class_name"] == b["class_name"]
+                ),
+                reverse=True
+            )
+            used = set()
+            for iou, local_id, previous_id in pairs:
+                if iou < iou_threshold:
+                    break
+                if local_id in mapping or previous_id in used:
+                    continue
+                mapping[local_id] = global_track_id(index - 1, previous_id, mappings[index - 1])
+                used.add(previous_id)
+        mappings.append(mapping)
+    return mappings
+
+
+def global_track_id(index: int, track_id: int, mapping: Dict[int, int]) -> int:
+    """ID global de uma trilha local do segmento `index`"""
+    if track_id in mapping:
+        return mapping[track_id]
+    return (index << TRACK_ID_SEGMENT_SHIFT) + track_id
+
+
+def remap_tracks(record: dict, index: int, mapping: Dict[int, int]) -> dict:
+    """Aplica a numeração global às detecções e violações de um registro do segmento `index`"""
+    for key in ("detections", "violations", "new_violations"):
+        for det in record.get(key, ()):
+            if "track_id" in det:
+                det["track_id"] = global_track_id(index, det["track_id"], mapping)
+    return record
+
+
+# Estado dos processos worker (um detector por processo)
+_worker_detector: Optional[PPEDetector] = None
+
+
+def _init_worker(torch_threads: int, profile_dir: str = PROFILE_DIR):
+    """Inicializa o processo worker: limita threads e carrega o modelo uma vez"""
+    global _worker_detector
+    install_worker_handler(profile_dir)
+    import torch
+    torch.set_num_threads(max(1, torch_threads))
+    _worker_detector = PPEDetector()
+    _worker_detector.load_model()
+
+
+def _analyze_segment(
+    index: int,
+    file_path: str,
+    out_path: str,
+    start_frame: int,
+    end_frame: int,
+    warmup_frames: int,
+    stride: int,
+    selected_classes: List[str],
+    batch_size: int,
+    progress_queue,
+    cancel_event
+) -> Tuple[dict, dict]:
+    """
+    Analisa um segmento em um processo worker, gravando em arquivo próprio
+
+    Returns:
+        (contadores, trilhas nas fronteiras do segmento)
+    """
+    # Aquecer o rastreador com frames anteriores ao segmento
+    decode_from = max(0, start_frame - warmup_frames * stride)
+    boundary = {}
+    with open(out_path, "w") as out:
+        counts = analyze_range(
+            _worker_detector, file_path, out,
+            start_frame=decode_from,
+            end_frame=end_frame,
+            emit_from=start_frame,
+            stride=stride,
+            selected_classes=selected_classes,
+            batch_size=batch_size,
+            on_progress=lambda n: progress_queue.put((index, n)),
+            should_stop=cancel_event.is_set,
+            boundary=boundary
+        )
+    return counts, boundary
+
+
+class AnalysisJobManager:
+    """
+    Executa análises completas de vídeos enviados, sem limite de FPS
+
+    Cada job roda fora do event loop, independente de qualquer WebSocket, e
+    grava um arquivo JSON Lines com um registro por frame analisado, precedido
+    de um registro "meta" e seguido de um "summary".
+
+    Vídeos longos são divididos em segmentos alinhados a keyframes e
+    processados em um pool de processos (um detector por processo); os
+    resultados são concatenados na ordem dos frames.
+    """
+
+    def __init__(
+        self,
+        results_dir: str = ANALYSIS_RESULTS_DIR,
+        batch_size: int = ANALYSIS_BATCH_SIZE,
+        workers: int = ANALYSIS_WORKERS,
+        min_segment_seconds: float = ANALYSIS_MIN_SEGMENT_SECONDS,
+        warmup_frames: int = ANALYSIS_SEGMENT_WARMUP_FRAMES,
+        cache: Optional[ResultCache] = None,
+        storage: Optional[StorageManager] = None
+    ):
+        self.results_dir = results_dir
+        self.batch_size = batch_size
+        self.workers = workers or os.cpu_count() or 1
+        self.min_segment_seconds = min_segment_seconds
+        self.warmup_frames = warmup_frames
+        self.cache = cache
+        self.storage = storage
+        self.jobs: Dict[str, dict] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._cancel: Dict[str, threading.Event] = {}
+        self._feeds: Dict[str, ProgressiveFeed] = {}
+        # Segmentos submetidos ao pool e ainda não concluídos, por job
+        self._pending_segments: Dict[str, int] = {}
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._mp_manager = None
+
+    async def create_job(
+        self,
+        video_id: str,
+        file_path: str,
+        selected_classes: List[str] = None,
+        frame_stride: int = 1,
+        content_hash: Optional[str] = None,
+        feed: Optional[ProgressiveFeed] = None,
+        start_time: float = 0.0,
+        end_time: Optional[float] = None
+    ) -> dict:
+        """
+        Cria e inicia um job de análise
+
+        Se o conteúdo do vídeo (content_hash) já foi analisado com o mesmo
+        modelo e configuração, o resultado em cache é reutilizado e o job é
+        criado já concluído, sem executar o modelo. A consulta ao cache e a
+        cópia do resultado rodam fora do event loop.
+
+        Args:
+            video_id: ID do vídeo enviado
+            file_path: Caminho do arquivo de vídeo
+            selected_classes: Classes para filtrar (None = todas)
+            frame_stride: Analisar 1 a cada N frames
+            content_hash: SHA-256 do arquivo (habilita o cache)
+            feed: Upload ainda em andamento; a análise acompanha a chegada
+                dos bytes (ver ProgressiveFeed)
+            start_time: Início do trecho a analisar, em segundos
+            end_time: Fim do trecho (None = até o fim do vídeo)
+
+        Returns:
+            Estado inicial do job
+        """
+        await asyncio.to_thread(os.makedirs, self.results_dir, exist_ok=True)
+        job_id = str(uuid.uuid4())
+        frame_stride = max(1, frame_stride)
+        ranged = start_time > 0 or end_time is not None
+        cache_key = None
+        # Apenas análises do vídeo inteiro vão para o cache
+        if self.cache and content_hash and not ranged:
+            # make_key calcula o hash do modelo na primeira chamada
+            cache_key = await asyncio.to_thread(self.cache.make_key, content_hash, selected_classes, frame_stride)
+
+        job = {
+            "job_id": job_id,
+            "video_id": video_id,
+            "file_path": file_path,
+            "selected_classes": selected_classes,
+            "frame_stride": frame_stride,
+            "start_time": start_time,
+            "end_time": end_time,
+            "content_hash": content_hash,
+            "cached": False,
+            "status": "queued",
+            "progress": 0.0,
+            "frames_processed": 0,
+            "total_frames": None,
+            "segments": 1,
+            "processing_fps": 0.0,
+            "first_result_s": None,
+            "created_at": datetime.now().isoformat(),
+            "finished_at": None,
+            "result_path": os.path.join(self.results_dir, f"{job_id}.jsonl"),
+            "summary": None,
+            "error": None
+        }
+        self.jobs[job_id] = job
+
+        cached = await asyncio.to_thread(self._restore_cached, cache_key, job["result_path"]) if cache_key else None
+        if cached is not None:
+            summary = cached or None
+            job.update({
+                "cached": True,
+                "status": "completed",
+                "progress": 1.0,
+                "frames_processed": summary["frames_analyzed"] if summary else None,
+                "summary": summary,
+                "finished_at": datetime.now().isoformat()
+            })
+            return self.get_job(job_id)
+
+        job["cache_key"] = cache_key
+        if feed:
+            job["upload_id"] = feed.session.upload_id
+            job["upload_progress"] = feed.upload_progress
+            self._feeds[job_id] = feed
+        self._cancel[job_id] = threading.Event()
+        self._tasks[job_id] = asyncio.create_task(self._run(job_id))
+        return self.get_job(job_id)
+
+    def _restore_cached(self, cache_key: str, result_path: str) -> Optional[dict]:
+        """
+        Copia o resultado em cache para o arquivo do job
+
+        Returns:
+            Resumo do resultado ({} se ausente) ou None se não há cache
+        """
+        cached_path = self.cache.get(cache_key)
+        if not cached_path:
+            return None
+        link_or_copy(cached_path, result_path)
+        summary = read_summary(result_path) or {}
+        summary.pop("type", None)
+        return summary
+
+    def get_job(self, job_id: str) -> Optional[dict]:
+        """Retorna cópia do estado do job"""
+        job = self.jobs.get(job_id)
+        if not job:
+            return None
+        feed = self._feeds.get(job_id)
+        if feed:
+            job["upload_progress"] = feed.upload_progress
+        return {k: v for k, v in job.items() if k != "cache_key"}
+
+    def cancel_job(self, job_id: str) -> bool:
+        """Solicita cancelamento de um job em execução"""
+        if job_id not in self._cancel or self.jobs[job_id]["status"] not in ("queued", "running"):
+            return False
+        self._cancel[job_id].set()
+        if job_id in self._feeds:
+            # Destravar o decodificador que aguarda novos bytes
+            self._feeds[job_id].stop()
+        return True
+
+    def get_stats(self) -> dict:
+        """Jobs por status e fila do pool de processos"""
+        by_status: Dict[str, int] = {}
+        for job in list(self.jobs.values()):
+            by_status[job["status"]] = by_status.get(job["status"], 0) + 1
+        return {
+            "jobs": by_status,
+            "workers": self.workers,
+            "pending_segments": sum(self._pending_segments.values())
+        }
+
+    def worker_pids(self) -> List[int]:
+        """PIDs dos processos do pool de análise (vazio se ainda não criado)"""
+        pool = self._pool
+        return list(pool._processes or {}) if pool else []
+
+    def shutdown(self):
+        """Encerra o pool de processos"""
+        for cancel in self._cancel.values():
+            cancel.set()
+        for feed in self._feeds.values():
+            feed.stop()
+        self._close_pool()
+
+    def _close_pool(self):
+        """Encerra o pool e o servidor do Manager (recriados no próximo job paralelo)"""
+        pool, self._pool = self._pool, None
+        manager, self._mp_manager = self._mp_manager, None
+        if pool:
+            pool.shutdown(wait=False, cancel_futures=True)
+        if manager:
+            manager.shutdown()
+
+    async def _run(self, job_id: str):
+        job = self.jobs[job_id]
+        job["status"] = "running"
+        if self.storage:
+            # O vídeo não pode ser removido durante a análise
+            self.storage.pin(job["video_id"])
+        try:
+            await asyncio.to_thread(self._analyze, job, self._cancel[job_id])
+            if self._cancel[job_id].is_set():
+                job["status"] = "cancelled"
+            else:
+                job["status"] = "completed"
+                if job["cache_key"]:
+                    await asyncio.to_thread(self.cache.put, job["cache_key"], job["result_path"])
+        except Exception as e:
+            print(f"Erro no job de análise {job_id}: {e}")
+            job["status"] = "failed"
+            job["error"] = str(e)
+        finally:
+            job["finished_at"] = datetime.now().isoformat()
+            if self.storage:
+                self.storage.unpin(job["video_id"])
+            self._tasks.pop(job_id, None)
+            self._cancel.pop(job_id, None)
+            feed = self._feeds.pop(job_id, None)
+            if feed:
+                job["upload_progress"] = feed.upload_progress
+                await asyncio.to_thread(feed.close)
+
+    def _plan_segments(
+        self,
+        file_path: str,
+        info: dict,
+        start_frame: int = 0,
+        end_frame: Optional[int] = None
+    ) -> List[Tuple[int, int]]:
+        """Define os segmentos do job (um único segmento para trechos curtos)"""
+        fps = info["fps"] or 30.0
+        if end_frame is None:
+            end_frame = info["frame_count"]
+        min_segment_frames = int(self.min_segment_seconds * fps)
+        n_segments = min(self.workers, (end_frame - start_frame) // max(1, min_segment_frames))
+        if n_segments <= 1:
+            return [(start_frame, end_frame)]
+        # Fronteiras nos keyframes do índice persistido do vídeo
+        index = get_keyframe_index(file_path)
+        keyframes = [t for _, t in index["keyframes"]] if index else []
+        return split_segments(end_frame, n_segments, fps, keyframes, start_frame=start_frame)
+
+    def _wait_streamable(self, feed: ProgressiveFeed, cancel: threading.Event) -> bool:
+        """
+        Aguarda bytes suficientes para saber se o contêiner é progressivo
+
+        Returns:
+            True se a análise pode começar antes do fim do upload
+        """
+        while not cancel.is_set():
+            streamable = feed.streamable()
+            if streamable is not None:
+                return streamable
+            if feed.session.closed.is_set():
+                return False
+            cancel.wait(feed.poll_interval)
+        return False
+
+    def _wait_upload(self, job: dict, feed: ProgressiveFeed, cancel: threading.Event):
+        """Aguarda a conclusão do upload e passa a usar o arquivo final"""
+        while not feed.session.closed.wait(feed.poll_interval):
+            if cancel.is_set():
+                return
+        if not feed.session.sha256:
+            raise ValueError("Upload cancelado ou vídeo inválido")
+        job["file_path"] = feed.session.final_path
+        job["content_hash"] = feed.session.sha256
+        if self.cache:
+            job["cache_key"] = self.cache.make_key(feed.session.sha256, job["selected_classes"], job["frame_stride"])
+
+    def _analyze(self, job: dict, cancel: threading.Event):
+        """Executa o job (em thread): sequencial ou em segmentos paralelos"""
+        feed = self._feeds.get(job["job_id"])
+        processor = VideoProcessor()
+        if feed and self._wait_streamable(feed, cancel):
+            # Decodificar enquanto o upload ainda está em andamento
+            if not processor.open_file(feed.open()):
+                raise ValueError("Arquivo de vídeo inválido ou corrompido")
+            segments = [(0, None)]
+        else:
+            if feed:
+                # Contêiner não progressivo (ex.: MP4 com moov no fim)
+                job["waiting_for_upload"] = True
+                self._wait_upload(job, feed, cancel)
+                job["waiting_for_upload"] = False
+                if cancel.is_set():
+                    return
+                feed = None
+            if not processor.open_file(job["file_path"]):
+                raise ValueError("Arquivo de vídeo inválido ou corrompido")
+            processor.release()
+        info = processor.video_info
+
+        stride = job["frame_stride"]
+        fps = info["fps"] or 30.0
+        start_frame = int(round(job["start_time"] * fps))
+        end_frame = info["frame_count"]
+        if job["end_time"] is not None:
+            end_frame = min(end_frame, int(round(job["end_time"] * fps)))
+        if end_frame > 0 and not feed:
+            # Frames alinhados ao stride dentro de [start_frame, end_frame)
+            first = -(-start_frame // stride) * stride
+            job["total_frames"] = max(0, (end_frame - first + stride - 1) // stride)
+
+        if not feed:
+            segments = self._plan_segments(job["file_path"], info, start_frame, end_frame)
+        job["segments"] = len(segments)
+        start_time = time.time()
+        created = datetime.fromisoformat(job["created_at"])
+
+        def on_progress(n: int):
+            if job["first_result_s"] is None:
+                job["first_result_s"] = round((datetime.now() - created).total_seconds(), 3)
+            job["frames_processed"] += n
+            elapsed = time.time() - start_time
+            job["processing_fps"] = round(job["frames_processed"] / elapsed, 2) if elapsed > 0 else 0.0
+            if job["total_frames"]:
+                job["progress"] = round(min(1.0, job["frames_processed"] / job["total_frames"]), 4)
+            elif feed:
+                # Total de frames desconhecido: estimar pelos bytes já decodificados
+                job["progress"] = min(0.99, feed.feed_progress)
+
+        tmp_path = job["result_path"] + ".part"
+        segment_paths = [f"{job['result_path']}.seg{i}" for i in range(len(segments))]
+        try:
+            if len(segments) == 1:
+                detector = PPEDetector()
+                detector.load_model()
+                start, end = segments[0]
+                if job["end_time"] is None:
+                    # Até o fim real do arquivo (frame_count do contêiner pode ser impreciso)
+                    end = None
+                with open(segment_paths[0], "w") as out:
+                    counts = analyze_range(
+                        detector, job["file_path"], out,
+                        start_frame=max(0, start - self.warmup_frames * stride),
+                        end_frame=end,
+                        emit_from=start,
+                        stride=stride,
+                        selected_classes=job["selected_classes"],
+                        batch_size=self.batch_size,
+                        on_progress=on_progress,
+                        should_stop=cancel.is_set,
+                        processor=processor if feed else None
+                    )
+                track_mappings = [{}]
+            else:
+                counts, boundaries = self._analyze_parallel(job, segments, segment_paths, on_progress, cancel)
+                track_mappings = stitch_tracks(boundaries)
+
+            if feed and not cancel.is_set():
+                # Upload concluído: registrar o hash e as dimensões reais do arquivo final
+                self._wait_upload(job, feed, cancel)
+                final = VideoProcessor()
+                if final.open_file(job["file_path"]):
+                    info = final.video_info
+                    final.release()
+
+            summary = {
+                **counts,
+                "segments": len(segments),
+                "processing_time_s": round(time.time() - start_time, 2),
+                "processing_fps": job["processing_fps"]
+            }
+
+            # Concatenar segmentos na ordem dos frames
+            with open(tmp_path, "w") as out:
+                out.write(json.dumps({
+                    "type": "meta",
+                    "video_id": job["video_id"],
+                    "video_info": info,
+                    "frame_stride": stride,
+                    "start_time": job["start_time"],
+                    "end_time": job["end_time"],
+                    "selected_classes": job["selected_classes"]
+                }) + "\n")
+                for index, (path, mapping) in enumerate(zip(segment_paths, track_mappings)):
+                    with open(path) as segment:
+                        if index == 0:
+                            shutil.copyfileobj(segment, out)
+                            continue
+                        # IDs de trilhas únicos no arquivo, contínuos entre segmentos
+                        for line in segment:
+                            out.write(json.dumps(remap_tracks(json.loads(line), index, mapping)) + "\n")
+                out.write(json.dumps({"type": "summary", **summary}) + "\n")
+
+            os.replace(tmp_path, job["result_path"])
+            job["summary"] = summary
+            if not cancel.is_set():
+                job["progress"] = 1.0
+        finally:
+            for path in segment_paths + [tmp_path]:
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: fork com torch já inicializado pode travar os workers
+            context = multiprocessing.get_context("spawn")
+            self._mp_manager = context.Manager()
+            threads = max(1, (os.cpu_count() or 1) // self.workers)
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(threads, PROFILE_DIR)
+            )
+        return self._pool
+
+    def _analyze_parallel(
+        self,
+        job: dict,
+        segments: List[Tuple[int, int]],
+        segment_paths: List[str],
+        on_progress: Callable[[int], None],
+        cancel: threading.Event
+    ) -> Tuple[dict, List[dict]]:
+        """
+        Distribui os segmentos no pool de processos e agrega os contadores
+
+        Returns:
+            (contadores agregados, trilhas nas fronteiras de cada segmento)
+        """
+        pool = self._get_pool()
+        progress_queue = self._mp_manager.Queue()
+        cancel_event = self._mp_manager.Event()
+
+        futures = [
+            pool.submit(
+                _analyze_segment, i, job["file_path"], segment_paths[i], start, end,
+                self.warmup_frames, job["frame_stride"], job["selected_classes"],
+                self.batch_size, progress_queue, cancel_event
+            )
+            for i, (start, end) in enumerate(segments)
+        ]
+
+        pending = set(futures)
+        while pending:
+            self._pending_segments[job["job_id"]] = len(pending)
+            _, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+            if cancel.is_set():
+                cancel_event.set()
+            while not progress_queue.empty():
+                _, n = progress_queue.get()
+                on_progress(n)
+
+        self._pending_segments.pop(job["job_id"], None)
+
+        counts = new_counts()
+        boundaries = []
+        try:
+            for future in futures:
+                part, boundary = future.result()
+                merge_counts(counts, part)
+                boundaries.append(boundary)
+        except BrokenProcessPool:
+            # Worker morreu (ex.: falha ao carregar o modelo): encerrar os
+            # processos restantes e o Manager e recriar no próximo job
+            self._close_pool()
+            raise
+        return counts, boundaries
+
+
+analysis_jobs = AnalysisJobManager(cache=result_cache, storage=storage_manager)
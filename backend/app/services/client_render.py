@@ -0,0 +1,102 @@
+"""
+Renderização no cliente: detecções como dados vetoriais e JPEG compartilhado
+
+No modo "client", o servidor envia o frame sem anotações e a lista de
+detecções; o navegador desenha as caixas e aplica os filtros de classe.
+Assim o JPEG de um frame da stream é o mesmo para todos os clientes e é
+codificado uma única vez.
+"""
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from app.config import STREAM_DETECTION_KEYFRAME_INTERVAL
+
+
+class DetectionDeltaEncoder:
+    """
+    Codifica a lista de detecções de cada frame como alterações desde a anterior
+
+    Cada detecção é uma linha compacta [track_id, x1, y1, x2, y2, classe,
+    confiança]. A primeira mensagem e uma a cada `keyframe_interval` levam a
+    lista completa ("keyframe"); as demais, apenas as linhas novas ou
+    alteradas ("set") e os track_ids que saíram ("removed").
+    """
+
+    def __init__(self, keyframe_interval: int = STREAM_DETECTION_KEYFRAME_INTERVAL):
+        self.keyframe_interval = max(1, keyframe_interval)
+        self._sent: Dict[int, tuple] = {}
+        self._since_keyframe: Optional[int] = None
+
+    @staticmethod
+    def _rows(detections: List[dict]) -> Dict[int, tuple]:
+        rows = {}
+        for i, det in enumerate(detections):
+            bbox = det.get("bbox", [])
+            if len(bbox) != 4:
+                continue
+            # Detecções sem rastreamento: identificadas pela posição (ids negativos)
+            track_id = det.get("track_id", -(i + 1))
+            rows[track_id] = (
+                int(bbox[0]), int(bbox[1]), int(bbox[2]), int(bbox[3]),
+                det.get("class_name", "Unknown"),
+                # Precisão exibida: variações menores não geram atualização
+                round(float(det.get("confidence", 0.0)), 2)
+            )
+        return rows
+
+    def encode(self, detections: List[dict]) -> Optional[dict]:
+        """
+        Args:
+            detections: Detecções do frame (com track_id)
+
+        Returns:
+            Mensagem de detecções, ou None se nada mudou desde a anterior
+        """
+        rows = self._rows(detections)
+        if self._since_keyframe is None or self._since_keyframe + 1 >= self.keyframe_interval:
+            self._sent = rows
+            self._since_keyframe = 0
+            return {"keyframe": True, "set": [[tid, *row] for tid, row in rows.items()]}
+
+        self._since_keyframe += 1
+        changed = [[tid, *row] for tid, row in rows.items() if self._sent.get(tid) != row]
+        removed = [tid for tid in self._sent if tid not in rows]
+        self._sent = rows
+        if not changed and not removed:
+            return None
+        return {"keyframe": False, "set": changed, "removed": removed}
+
+    def reset(self):
+        """Força uma lista completa na próxima mensagem (ex.: após um salto)"""
+        self._since_keyframe = None
+
+
+class SharedFrameCache:
+    """
+    Último JPEG (base64) de cada stream, reaproveitado entre clientes
+
+    Cada cliente tem seu próprio pipeline; os que renderizam no cliente e
+    estão no mesmo frame da stream recebem bytes idênticos, então apenas o
+    primeiro codifica. Usado só na thread do event loop (sem lock).
+    """
+
+    def __init__(self, max_streams: int = 64):
+        self.max_streams = max_streams
+        self._frames: "OrderedDict[str, Tuple[int, str]]" = OrderedDict()
+
+    def get(self, stream_id: str, seq: int) -> Optional[str]:
+        entry = self._frames.get(stream_id)
+        if entry is None or entry[0] != seq:
+            return None
+        self._frames.move_to_end(stream_id)
+        return entry[1]
+
+    def put(self, stream_id: str, seq: int, data: str):
+        self._frames[stream_id] = (seq, data)
+        self._frames.move_to_end(stream_id)
+        while len(self._frames) > self.max_streams:
+            self._frames.popitem(last=False)
+
+
+# Instância global (compartilhada pelos pipelines)
+shared_frames = SharedFrameCache()
@@ -87,33 +87,71 @@ class PPEDetector:
         results = self.model(frame, conf=conf, verbose=False)
         
         detections = []
-        
-        # Processar resultados
         for r in results:
-            boxes = r.boxes
-            for box in boxes:
-                # Bounding Box
-                x1, y1, x2, y2 = box.xyxy[0].tolist()
-                bbox = [int(x1), int(y1), int(x2), int(y2)]
-                
-                # Confiança
-                confidence = float(box.conf[0])
-                
-                # Classe
-                cls_id = int(box.cls[0])
-                class_name = self.model.names[cls_id]
-                
-                # Mapear nomes de classes se necessário (garantir compatibilidade)
-                # O modelo pode retornar nomes ligeiramente diferentes, mas assumimos que bate com YOLO_CLASSES
-                
-                detection = {
-                    "class_name": class_name,
-                    "confidence": confidence,
-                    "bbox": bbox
-                }
-                
-                detections.append(detection)
+            detections.extend(self._parse_boxes(r))
+        
+        processing_time = (time.time() - start_time) * 1000
+        return self._build_result(detections, selected_classes, processing_time)
+    
+    def detect_batch(
+        self,
+        frames: List[np.ndarray],
+        selected_classes: List[str] = None,
+        confidence_threshold: float = None
+    ) -> List[dict]:
+        """
+        Executa inferência em lote (uma chamada ao modelo para vários frames)
+        
+        Args:
+            frames: Lista de frames BGR
+            selected_classes: Lista de classes para filtrar
+            confidence_threshold: Threshold de confiança (padrão: 0.5)
+        
+        Returns:
+            Lista de resultados no mesmo formato de detect(), um por frame
+        """
+        if not frames:
+            return []
+        if not self.is_loaded:
+            self.load_model()
+            
+        conf = confidence_threshold or self.confidence_threshold
+        start_time = time.time()
         
+        results = self.model(frames, conf=conf, verbose=False)
+        parsed = [self._parse_boxes(r) for r in results]
+        
+        # Tempo amortizado por frame do lote
+        processing_time = (time.time() - start_time) * 1000 / len(frames)
+        return [self._build_result(detections, selected_classes, processing_time) for detections in parsed]
+    
+    def _parse_boxes(self, result) -> List[dict]:
+        """Converte as caixas de um resultado YOLO em dicts de detecção"""
+        detections = []
+        for box in result.boxes:
+            # Bounding Box
+            x1, y1, x2, y2 = box.xyxy[0].tolist()
+            bbox = [int(x1), int(y1), int(x2), int(y2)]
+            
+            # Confiança
+            confidence = float(box.conf[0])
+            
+            # Classe
+            cls_id = int(box.cls[0])
+            class_name = self.model.names[cls_id]
+            
+            # Mapear nomes de classes se necessário (garantir compatibilidade)
+            # O modelo pode retornar nomes ligeiramente diferentes, mas assumimos que bate com YOLO_CLASSES
+            
+            detections.append({
+                "class_name": class_name,
+                "confidence": confidence,
+                "bbox": bbox
+            })
+        return detections
+    
+    def _build_result(self, detections: List[dict], selected_classes: List[str], processing_time: float) -> dict:
+        """Aplica filtro de classes e monta o dict de resultado"""
         # Filtrar por classes selecionadas
         if selected_classes:
             detections = self.filter_by_classes(detections, selected_classes)
@@ -121,8 +159,6 @@ class PPEDetector:
         # Identificar violações
         violations = self.get_violations(detections)
         
-        processing_time = (time.time() - start_time) * 1000
-        
         return {
             "detections": detections,
             "violations": violations,
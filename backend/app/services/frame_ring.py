@@ -0,0 +1,182 @@
+"""
+Anel de frames em memória compartilhada entre a leitura das streams e os workers
+"""
+from multiprocessing import shared_memory
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+# Cabeçalho: número de slots, bytes por slot e último seq publicado
+_HEADER = np.dtype([("slots", "<u8"), ("slot_bytes", "<u8"), ("head", "<u8"), ("reserved", "<u8", (5,))])
+# Metadados de cada slot (32 bytes)
+_SLOT_META = np.dtype([("version", "<u8"), ("shape", "<u4", (3,)), ("pad", "<u4"), ("captured_at", "<f8")])
+# Dados alinhados a 64 bytes (linha de cache)
+_ALIGN = 64
+
+# Blocos cujo fechamento foi adiado porque ainda havia views de frames em uso
+_deferred: List[shared_memory.SharedMemory] = []
+
+
+class FrameOverwritten(RuntimeError):
+    """O slot do frame foi reutilizado por um frame mais novo antes da leitura terminar"""
+
+
+def _close_deferred():
+    for shm in list(_deferred):
+        try:
+            shm.close()
+            _deferred.remove(shm)
+        except BufferError:
+            pass
+
+
+class FrameRing:
+    """
+    Anel de slots de tamanho fixo para frames BGR, em memória compartilhada
+
+    Um único escritor (a thread de leitura da stream) publica frames em
+    ordem; qualquer número de leitores, em outros processos, lê os frames
+    direto dos slots, sem cópia e sem locks (protocolo seqlock):
+
+    - o frame `seq` ocupa o slot `seq % slots`, cuja versão passa a
+      `2*seq - 1` (ímpar: em escrita) antes dos dados e a `2*seq` depois;
+    - um leitor só usa o slot se a versão for `2*seq` e, ao terminar
+      (ex.: após a inferência), confere com `is_current(seq)` que o slot
+      não foi reutilizado no meio da leitura. Caso contrário, o resultado
+      é descartado (FrameOverwritten).
+
+    Com `slots` frames de folga, o escritor só alcança um leitor que demora
+    mais que `slots` intervalos de frame. A ordem das escritas (dados antes
+    da versão) depende de a CPU não reordenar stores, como em x86-64.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool):
+        self._shm = shm
+        self.owner = owner
+        self.name = shm.name
+        self._header = np.ndarray((), dtype=_HEADER, buffer=shm.buf)
+        self.slots = int(self._header["slots"])
+        self.slot_bytes = int(self._header["slot_bytes"])
+        self._meta = np.ndarray((self.slots,), dtype=_SLOT_META, buffer=shm.buf, offset=_ALIGN)
+        self._data_offset = self._layout(self.slots)
+
+    @staticmethod
+    def _layout(slots: int) -> int:
+        meta_end = _ALIGN + slots * _SLOT_META.itemsize
+        return (meta_end + _ALIGN - 1) // _ALIGN * _ALIGN
+
+    @classmethod
+    def create(cls, slots: int, slot_bytes: int) -> "FrameRing":
+        """
+        Cria um anel novo (processo escritor)
+
+        Args:
+            slots: Número de slots (frames de folga para leitores lentos)
+            slot_bytes: Tamanho máximo de um frame
+        """
+        _close_deferred()
+        shm = shared_memory.SharedMemory(create=True, size=cls._layout(slots) + slots * slot_bytes)
+        header = np.ndarray((), dtype=_HEADER, buffer=shm.buf)
+        header["slots"] = slots
+        header["slot_bytes"] = slot_bytes
+        header["head"] = 0
+        del header
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> "FrameRing":
+        """Abre um anel existente pelo nome (processos leitores)"""
+        _close_deferred()
+        return cls(shared_memory.SharedMemory(name=name), owner=False)
+
+    @property
+    def head(self) -> int:
+        """Seq do último frame publicado (0 se nenhum)"""
+        return int(self._header["head"])
+
+    def _slot_view(self, slot: int, shape: Tuple[int, ...]) -> np.ndarray:
+        return np.ndarray(shape, dtype=np.uint8, buffer=self._shm.buf,
+                          offset=self._data_offset + slot * self.slot_bytes)
+
+    def reserve(self, seq: int, shape: Tuple[int, ...]) -> np.ndarray:
+        """
+        Marca o slot do frame `seq` como em escrita e devolve sua área de dados
+
+        O chamador preenche a view (ex.: cv2.resize com dst=) e publica com
+        commit(); `seq` deve crescer a cada frame.
+
+        Raises:
+            ValueError: O frame não cabe no slot
+        """
+        if int(np.prod(shape)) > self.slot_bytes:
+            raise ValueError(f"Frame {shape} não cabe no slot de {self.slot_bytes} bytes")
+        slot = seq % self.slots
+        self._meta["version"][slot] = 2 * seq - 1
+        self._meta["shape"][slot] = shape if len(shape) == 3 else (*shape, 1)
+        return self._slot_view(slot, shape)
+
+    def commit(self, seq: int, captured_at: float):
+        """Publica o frame `seq` reservado (visível aos leitores a partir daqui)"""
+        slot = seq % self.slots
+        self._meta["captured_at"][slot] = captured_at
+        self._meta["version"][slot] = 2 * seq
+        self._header["head"] = seq
+
+    def write(self, frame: np.ndarray, seq: int, captured_at: float):
+        """Copia e publica um frame uint8"""
+        np.copyto(self.reserve(seq, frame.shape), frame)
+        self.commit(seq, captured_at)
+
+    def frame(self, seq: int) -> Optional[np.ndarray]:
+        """
+        View somente leitura do frame `seq`, sem cópia
+
+        Returns:
+            None se o slot já contém outro frame (ou está em escrita); a
+            view continua válida enquanto is_current(seq) for True
+        """
+        if not self.is_current(seq):
+            return None
+        slot = seq % self.slots
+        shape = tuple(int(v) for v in self._meta["shape"][slot])
+        view = self._slot_view(slot, shape if shape[2] != 1 else shape[:2])
+        view.flags.writeable = False
+        # Metadados lidos durante uma nova escrita: descartar
+        return view if self.is_current(seq) else None
+
+    def latest(self) -> Optional[Tuple[int, float, np.ndarray]]:
+        """Último frame publicado como (seq, captured_at, view) ou None"""
+        for _ in range(3):
+            seq = self.head if self._shm is not None else 0
+            if not seq:
+                return None
+            view = self.frame(seq)
+            captured_at = float(self._meta["captured_at"][seq % self.slots])
+            if view is not None and self.is_current(seq):
+                return seq, captured_at, view
+        return None
+
+    def is_current(self, seq: int) -> bool:
+        """True se o slot ainda contém o frame `seq` completo (False após close)"""
+        return self._shm is not None and seq > 0 and self._meta["version"][seq % self.slots] == 2 * seq
+
+    def close(self):
+        """
+        Libera o mapeamento deste processo (e remove o bloco, no escritor)
+
+        Views de frames ainda em uso mantêm o mapeamento até serem
+        descartadas; o fechamento é concluído na próxima abertura de anel.
+        """
+        if self._shm is None:
+            return
+        if self.owner:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+        del self._header, self._meta
+        try:
+            self._shm.close()
+        except BufferError:
+            _deferred.append(self._shm)
+        self._shm = None
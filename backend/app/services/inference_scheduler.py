@@ -0,0 +1,300 @@
+"""
+Escalonamento da inferência entre as streams por prioridade
+"""
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional, Set
+
+import cv2
+import numpy as np
+
+from app.config import (
+    STREAM_INFERENCE_BUDGET,
+    STREAM_INFERENCE_MAX_FPS,
+    STREAM_INFERENCE_MIN_FPS,
+    STREAM_SCHEDULER
+)
+
+# Peso de cada nível de criticidade configurado na stream
+CRITICALITY_WEIGHTS = {"low": 0.5, "normal": 1.0, "high": 2.0, "critical": 4.0}
+
+
+class _StreamState:
+    """Entradas de prioridade e taxa alocada de uma stream (compartilhadas pelos seus pipelines)"""
+
+    def __init__(self, key: str, stream_id: Optional[str]):
+        self.key = key
+        self.stream_id = stream_id
+        # Pipelines (conexões) que assistem à stream
+        self.pipelines: Set[str] = set()
+        self.criticality = "normal"
+        self.motion = 0.0
+        self.thumbnail: Optional[np.ndarray] = None
+        self.observed_seq: Optional[int] = None
+        self.violation_at = 0.0
+        self.violations = 0
+        self.allocated_fps = STREAM_INFERENCE_MAX_FPS
+        # Última inferência de cada pipeline
+        self.last_inference: Dict[str, float] = {}
+        # Instantes das inferências recentes (taxa efetiva)
+        self.recent: deque = deque(maxlen=256)
+
+
+class InferenceScheduler:
+    """
+    Distribui o orçamento de inferências por segundo entre as streams
+
+    Cada stream pede uma taxa (demanda) que depende da sua atividade:
+    movimento na imagem ou violações abertas levam à taxa máxima
+    (STREAM_INFERENCE_MAX_FPS); uma câmera parada cai até a mínima
+    (STREAM_INFERENCE_MIN_FPS). Quando a soma das demandas excede o
+    orçamento do nó, a sobra após o mínimo de cada stream é dividida em
+    proporção ao peso (criticidade x atividade, em dobro com violações),
+    sem ultrapassar a demanda de nenhuma (water-filling).
+
+    O orçamento é STREAM_INFERENCE_BUDGET ou, se 0, estimado pela latência
+    média de inferência e pelo número de inferências simultâneas (workers).
+
+    A alocação é por stream: os pipelines de vários clientes assistindo à
+    mesma câmera compartilham uma única taxa, e o número de espectadores
+    não altera a parcela da câmera no orçamento.
+    """
+
+    # Movimento: fração de pixels da miniatura que mudaram mais que o limiar
+    MOTION_SIZE = (80, 60)
+    MOTION_THRESHOLD = 25
+    # Fração de pixels em movimento que já conta como atividade plena
+    MOTION_FULL = 0.02
+    # Decaimento do movimento por frame (sobe imediatamente, desce devagar)
+    MOTION_DECAY = 0.97
+    # Atividade mínima de uma câmera parada (demanda = MAX_FPS x atividade)
+    IDLE_ACTIVITY = 0.02
+    # Violações mantêm a stream em prioridade por este tempo
+    VIOLATION_HOLD_S = 30.0
+    VIOLATION_BOOST = 2.0
+    # Fração da capacidade estimada usada como orçamento (resto: decodificação, JPEG)
+    UTILIZATION = 0.8
+    # Intervalo mínimo entre recálculos da alocação
+    REALLOCATE_INTERVAL = 0.5
+
+    def __init__(
+        self,
+        enabled: bool = STREAM_SCHEDULER,
+        budget_fps: float = STREAM_INFERENCE_BUDGET,
+        min_fps: float = STREAM_INFERENCE_MIN_FPS,
+        max_fps: float = STREAM_INFERENCE_MAX_FPS
+    ):
+        self.enabled = enabled
+        self.budget_fps = budget_fps
+        self.min_fps = min_fps
+        self.max_fps = max_fps
+        # Inferências simultâneas (número de workers; 1 no processo da API)
+        self.concurrency = 1
+        self._streams: Dict[str, _StreamState] = {}
+        # Pipeline -> chave da stream em _streams (stream_id ou, até ser
+        # conhecido, o próprio pipeline)
+        self._pipelines: Dict[str, str] = {}
+        self._latency_ms: Optional[float] = None
+        self._allocated_at = 0.0
+        self._lock = threading.Lock()
+
+    def register(self, key: str, stream_id: Optional[str] = None):
+        """Inclui um pipeline (uma conexão assistindo a uma stream)"""
+        with self._lock:
+            self._attach(key, stream_id or key, stream_id)
+            self._allocated_at = 0.0
+
+    def unregister(self, key: str):
+        with self._lock:
+            self._detach(key)
+            self._allocated_at = 0.0
+
+    def _attach(self, key: str, state_key: str, stream_id: Optional[str]) -> _StreamState:
+        self._detach(key)
+        state = self._streams.get(state_key)
+        if state is None:
+            state = self._streams[state_key] = _StreamState(state_key, stream_id)
+        state.pipelines.add(key)
+        self._pipelines[key] = state_key
+        return state
+
+    def _detach(self, key: str):
+        state_key = self._pipelines.pop(key, None)
+        state = self._streams.get(state_key)
+        if state is not None:
+            state.pipelines.discard(key)
+            state.last_inference.pop(key, None)
+            if not state.pipelines:
+                del self._streams[state_key]
+
+    def _state(self, key: str) -> Optional[_StreamState]:
+        return self._streams.get(self._pipelines.get(key))
+
+    def observe(
+        self,
+        key: str,
+        frame: np.ndarray,
+        criticality: str = "normal",
+        stream_id: Optional[str] = None,
+        seq: Optional[int] = None
+    ):
+        """
+        Atualiza movimento e criticidade com um frame novo da stream
+
+        O custo é o de uma miniatura em tons de cinza (~0,1 ms em 640x480).
+        Com `stream_id`, o pipeline passa a compartilhar o estado da stream;
+        com `seq`, um frame já observado por outro pipeline é ignorado.
+        """
+        state = self._state(key)
+        if state is None:
+            return
+        if stream_id and state.key != stream_id:
+            with self._lock:
+                state = self._attach(key, stream_id, stream_id)
+                self._allocated_at = 0.0
+        state.criticality = criticality if criticality in CRITICALITY_WEIGHTS else "normal"
+        if seq is not None:
+            if seq == state.observed_seq:
+                return
+            state.observed_seq = seq
+        small = cv2.resize(frame, self.MOTION_SIZE, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        if state.thumbnail is not None:
+            changed = cv2.absdiff(small, state.thumbnail) > self.MOTION_THRESHOLD
+            motion = float(np.count_nonzero(changed)) / changed.size
+            state.motion = max(motion, state.motion * self.MOTION_DECAY)
+        state.thumbnail = small
+
+    def due(self, key: str, now: Optional[float] = None) -> bool:
+        """
+        True se o pipeline deve executar a inferência neste frame
+
+        A taxa alocada é da stream e dividida igualmente entre os seus
+        pipelines (cada espectador recebe detecções, e o total da câmera
+        não cresce com o número de espectadores).
+        """
+        state = self._state(key)
+        if state is None or not self.enabled:
+            return True
+        now = now or time.time()
+        if now - self._allocated_at >= self.REALLOCATE_INTERVAL:
+            self._allocate(now)
+        interval = len(state.pipelines) / max(state.allocated_fps, 1e-6)
+        return now - state.last_inference.get(key, 0.0) >= interval
+
+    def report(self, key: str, inference_ms: Optional[float], violations: int = 0, now: Optional[float] = None):
+        """
+        Registra uma inferência executada
+
+        Args:
+            key: Pipeline
+            inference_ms: Tempo da inferência (do detector, sem filas), para
+                estimar a capacidade do nó
+            violations: Violações abertas após a suavização
+        """
+        now = now or time.time()
+        state = self._state(key)
+        if state is not None:
+            state.last_inference[key] = now
+            state.recent.append(now)
+            state.violations = violations
+            if violations:
+                state.violation_at = now
+        if inference_ms:
+            self._latency_ms = inference_ms if self._latency_ms is None else 0.9 * self._latency_ms + 0.1 * inference_ms
+
+    def _activity(self, state: _StreamState, now: float) -> float:
+        if now - state.violation_at <= self.VIOLATION_HOLD_S:
+            return 1.0
+        return min(1.0, max(self.IDLE_ACTIVITY, state.motion / self.MOTION_FULL))
+
+    def _weight(self, state: _StreamState, now: float) -> float:
+        boost = self.VIOLATION_BOOST if now - state.violation_at <= self.VIOLATION_HOLD_S else 1.0
+        return CRITICALITY_WEIGHTS[state.criticality] * self._activity(state, now) * boost
+
+    def _demand(self, state: _StreamState, now: float) -> float:
+        return max(self.min_fps, self.max_fps * self._activity(state, now))
+
+    @property
+    def budget(self) -> Optional[float]:
+        """Inferências por segundo disponíveis (None enquanto não há estimativa)"""
+        if self.budget_fps > 0:
+            return self.budget_fps
+        if not self._latency_ms:
+            return None
+        return self.concurrency * 1000.0 / self._latency_ms * self.UTILIZATION
+
+    def _allocate(self, now: float):
+        with self._lock:
+            self._allocated_at = now
+            states = list(self._streams.values())
+            if not states:
+                return
+            demand = {s.key: self._demand(s, now) for s in states}
+            budget = self.budget
+            if budget is None or budget >= sum(demand.values()):
+                for s in states:
+                    s.allocated_fps = demand[s.key]
+                return
+
+            # Mínimo para todos; a sobra vai por peso até cada demanda
+            floor = min(self.min_fps, budget / len(states))
+            rates = {s.key: floor for s in states}
+            remaining = budget - floor * len(states)
+            open_states = [s for s in states if demand[s.key] > floor]
+            while remaining > 1e-6 and open_states:
+                weights = {s.key: self._weight(s, now) for s in open_states}
+                total = sum(weights.values()) or 1.0
+                capped = []
+                for s in open_states:
+                    share = remaining * weights[s.key] / total
+                    if rates[s.key] + share >= demand[s.key]:
+                        capped.append(s)
+                if not capped:
+                    for s in open_states:
+                        rates[s.key] += remaining * weights[s.key] / total
+                    break
+                for s in capped:
+                    remaining -= demand[s.key] - rates[s.key]
+                    rates[s.key] = demand[s.key]
+                    open_states.remove(s)
+            for s in states:
+                s.allocated_fps = rates[s.key]
+
+    def _actual_fps(self, state: _StreamState, now: float, window: float = 10.0) -> float:
+        recent = [t for t in list(state.recent) if now - t <= window]
+        return round(len(recent) / window, 2)
+
+    def get_stats(self) -> dict:
+        """Orçamento, entradas de prioridade e taxa alocada por stream"""
+        now = time.time()
+        if self.enabled:
+            self._allocate(now)
+        budget = self.budget
+        return {
+            "enabled": self.enabled,
+            "budget_fps": round(budget, 2) if budget is not None else None,
+            "inference_ms": round(self._latency_ms, 2) if self._latency_ms else None,
+            "concurrency": self.concurrency,
+            "streams": [
+                {
+                    "stream_id": s.key,
+                    "clients": sorted(s.pipelines),
+                    "criticality": s.criticality,
+                    "motion": round(s.motion, 4),
+                    "violations": s.violations,
+                    "violation_age_s": round(now - s.violation_at, 1) if s.violation_at else None,
+                    "priority": round(self._weight(s, now), 3),
+                    "demand_fps": round(self._demand(s, now), 2),
+                    "allocated_fps": round(s.allocated_fps, 2),
+                    "actual_fps": self._actual_fps(s, now)
+                }
+                for s in list(self._streams.values())
+            ]
+        }
+
+
+# Instância global
+inference_scheduler = InferenceScheduler()
@@ -0,0 +1,91 @@
+"""
+Formatação de métricas no formato de exposição de texto do Prometheus
+"""
+import os
+import resource
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.services.pipeline_metrics import StageHistogram
+
+# Content-Type do formato de texto 0.0.4 (a Response acrescenta o charset)
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+Sample = Tuple[Dict[str, str], float]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: Optional[Dict[str, str]]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _number(value: float) -> str:
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, int):
+        return str(value)
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class MetricsWriter:
+    """
+    Monta a resposta de /metrics
+
+    Cada família é escrita uma única vez, com HELP e TYPE seguidos de
+    todas as amostras (exigência do formato).
+    """
+
+    def __init__(self):
+        self.lines: List[str] = []
+
+    def _family(self, name: str, kind: str, help_text: str):
+        self.lines.append(f"# HELP {name} {help_text}")
+        self.lines.append(f"# TYPE {name} {kind}")
+
+    def gauge(self, name: str, help_text: str, samples: Iterable[Sample]):
+        self._family(name, "gauge", help_text)
+        for labels, value in samples:
+            self.lines.append(f"{name}{_labels(labels)} {_number(value)}")
+
+    def counter(self, name: str, help_text: str, samples: Iterable[Sample]):
+        name = f"{name}_total"
+        self._family(name, "counter", help_text)
+        for labels, value in samples:
+            self.lines.append(f"{name}{_labels(labels)} {_number(value)}")
+
+    def histogram(self, name: str, help_text: str, histograms: Iterable[Tuple[Dict[str, str], StageHistogram]]):
+        """Histogramas em segundos a partir dos StageHistogram (em ms)"""
+        self._family(name, "histogram", help_text)
+        for labels, hist in histograms:
+            count = sum(hist.counts)
+            for bound_ms, seen in hist.cumulative():
+                le = {**labels, "le": f"{bound_ms / 1000:.6g}"}
+                self.lines.append(f"{name}_bucket{_labels(le)} {seen}")
+            self.lines.append(f"{name}_bucket{_labels({**labels, 'le': '+Inf'})} {count}")
+            self.lines.append(f"{name}_sum{_labels(labels)} {_number(hist.sum_ms / 1000)}")
+            self.lines.append(f"{name}_count{_labels(labels)} {count}")
+
+    def render(self) -> str:
+        return "\n".join(self.lines) + "\n"
+
+
+def process_cpu_seconds() -> float:
+    """Tempo de CPU (usuário + sistema) consumido pelo processo e suas threads"""
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def process_rss_bytes() -> int:
+    """Memória residente do processo (pico, se /proc não estiver disponível)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # ru_maxrss em KB no Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
@@ -0,0 +1,227 @@
+"""
+Tempo gasto em cada etapa do pipeline de streaming, por stream
+"""
+import bisect
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# Etapas de process_video_stream, na ordem em que ocorrem
+STAGES = (
+    "wait", "resize", "inference", "smoothing", "alerting",
+    "annotation", "encode", "base64", "send", "total"
+)
+
+# Contadores de frames por stream: lidos da fonte, descartados (sobrescritos
+# antes de serem consumidos ou com falha de codificação), repetidos (mesmo
+# frame da stream processado de novo), descartados por idade (acima de
+# STREAM_MAX_FRAME_AGE), enviados ao cliente e, destes, com o JPEG
+# reaproveitado de outro cliente da mesma stream (renderização no cliente);
+# `rejected` conta frames sem inferência porque a entrada não coube no slot
+# do worker (mantidas as últimas detecções)
+FRAME_COUNTERS = ("read", "dropped", "repeated", "stale", "processed", "shared", "rejected")
+
+# Limites superiores (ms) dos buckets: 10 µs a ~42 s, 4 buckets por
+# oitava (~19% de resolução), suficiente para p50/p95/p99
+BUCKET_BOUNDS_MS: List[float] = [0.01 * 2 ** (i / 4) for i in range(89)]
+
+
+class StageHistogram:
+    """
+    Histograma de latências com buckets fixos em escala logarítmica
+
+    Cada histograma tem um único escritor (a task do stream), então o
+    registro é apenas o incremento de um contador, sem locks. Leitores
+    copiam os contadores; uma leitura concorrente pode estar defasada em
+    uma amostra, o que é irrelevante para percentis.
+    """
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+        self.count = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, ms: float):
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS_MS, ms)] += 1
+        self.count += 1
+        self.sum_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+
+    def merge(self, other: "StageHistogram"):
+        for i, n in enumerate(other.counts):
+            self.counts[i] += n
+        self.count += other.count
+        self.sum_ms += other.sum_ms
+        self.max_ms = max(self.max_ms, other.max_ms)
+
+    def cumulative(self, step: int = 4) -> List[tuple]:
+        """
+        Contagens acumuladas (formato Prometheus) em um subconjunto dos buckets
+
+        Args:
+            step: Usar 1 a cada `step` limites (4 = potências de 2)
+
+        Returns:
+            Lista de (limite_ms, contagem <= limite)
+        """
+        counts = list(self.counts)
+        buckets = []
+        seen = 0
+        for i, bound in enumerate(BUCKET_BOUNDS_MS):
+            seen += counts[i]
+            if i % step == 0:
+                buckets.append((bound, seen))
+        return buckets
+
+    def percentile(self, q: float, counts: Optional[List[int]] = None) -> Optional[float]:
+        """
+        Percentil aproximado (limite superior do bucket, limitado ao máximo)
+
+        Args:
+            q: Quantil entre 0 e 1
+            counts: Cópia dos contadores (para leituras consistentes)
+        """
+        counts = counts if counts is not None else list(self.counts)
+        total = sum(counts)
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for i, n in enumerate(counts):
+            seen += n
+            if seen >= rank and n:
+                bound = BUCKET_BOUNDS_MS[i] if i < len(BUCKET_BOUNDS_MS) else self.max_ms
+                return round(min(bound, self.max_ms), 3)
+        return round(self.max_ms, 3)
+
+    def to_dict(self) -> dict:
+        counts = list(self.counts)
+        count = sum(counts)
+        return {
+            "count": count,
+            "mean_ms": round(self.sum_ms / count, 3) if count else None,
+            "p50_ms": self.percentile(0.50, counts),
+            "p95_ms": self.percentile(0.95, counts),
+            "p99_ms": self.percentile(0.99, counts),
+            "max_ms": round(self.max_ms, 3)
+        }
+
+
+class StreamTimings:
+    """Histogramas por etapa e contadores de frames de um stream"""
+
+    def __init__(self, stream_id: str, source: Optional[str] = None):
+        self.stream_id = stream_id
+        self.source = source
+        self.started_at = datetime.now().isoformat()
+        self.ended_at: Optional[str] = None
+        self.stages: Dict[str, StageHistogram] = {stage: StageHistogram() for stage in STAGES}
+        self.frames: Dict[str, int] = {name: 0 for name in FRAME_COUNTERS}
+        self.bytes_sent = 0
+        # Idade do frame (captura -> envio ou descarte)
+        self.frame_age = StageHistogram()
+
+    def reset(self):
+        """Zera histogramas e contadores (ex.: ao fim do aquecimento de um benchmark)"""
+        for stage in self.stages:
+            self.stages[stage] = StageHistogram()
+        for name in self.frames:
+            self.frames[name] = 0
+        self.bytes_sent = 0
+        self.frame_age = StageHistogram()
+
+    def record(self, stage: str, ms: float):
+        self.stages[stage].record(ms)
+
+    def count(self, counter: str, n: int = 1):
+        self.frames[counter] += n
+
+    def lap(self, stage: str, since: float) -> float:
+        """
+        Registra o tempo decorrido desde `since` na etapa
+
+        Returns:
+            Instante atual (perf_counter), início da próxima etapa
+        """
+        now = time.perf_counter()
+        self.stages[stage].record((now - since) * 1000)
+        return now
+
+    def merge(self, other: "StreamTimings"):
+        for stage, hist in other.stages.items():
+            self.stages[stage].merge(hist)
+        for name, n in other.frames.items():
+            self.frames[name] += n
+        self.bytes_sent += other.bytes_sent
+        self.frame_age.merge(other.frame_age)
+
+    def to_dict(self) -> dict:
+        return {
+            "stream_id": self.stream_id,
+            "source": self.source,
+            "started_at": self.started_at,
+            "ended_at": self.ended_at,
+            "frames": dict(self.frames),
+            "bytes_sent": self.bytes_sent,
+            "frame_age": self.frame_age.to_dict(),
+            "stages": {stage: hist.to_dict() for stage, hist in self.stages.items() if hist.count}
+        }
+
+
+class PipelineMetrics:
+    """
+    Registro dos tempos por etapa dos streams ativos e encerrados
+
+    Ao encerrar, o stream é somado ao agregado global e mantido entre os
+    `history` mais recentes.
+    """
+
+    def __init__(self, history: int = 20):
+        self.active: Dict[str, StreamTimings] = {}
+        self.finished: deque = deque(maxlen=history)
+        self.totals = StreamTimings("all")
+
+    def open_stream(self, stream_id: str, source: Optional[str] = None) -> StreamTimings:
+        timings = StreamTimings(stream_id, source)
+        self.active[stream_id] = timings
+        return timings
+
+    def close_stream(self, timings: StreamTimings):
+        if self.active.get(timings.stream_id) is timings:
+            del self.active[timings.stream_id]
+        timings.ended_at = datetime.now().isoformat()
+        self.totals.merge(timings)
+        self.finished.append(timings)
+
+    def get_stream(self, stream_id: str) -> Optional[dict]:
+        timings = self.active.get(stream_id)
+        if timings is None:
+            timings = next((t for t in reversed(self.finished) if t.stream_id == stream_id), None)
+        return timings.to_dict() if timings else None
+
+    def aggregate(self) -> StreamTimings:
+        """Soma dos streams encerrados e ativos"""
+        overall = StreamTimings("all")
+        overall.merge(self.totals)
+        for timings in list(self.active.values()):
+            overall.merge(timings)
+        return overall
+
+    def get_stats(self) -> dict:
+        """Percentis por etapa: agregado (encerrados + ativos) e por stream"""
+        active = list(self.active.values())
+        summary = self.aggregate().to_dict()
+        return {
+            "frames": summary["frames"],
+            "bytes_sent": summary["bytes_sent"],
+            "frame_age": summary["frame_age"],
+            "stages": summary["stages"],
+            "active": [t.to_dict() for t in active],
+            "finished": [t.to_dict() for t in reversed(self.finished)]
+        }
+
+
+pipeline_metrics = PipelineMetrics()
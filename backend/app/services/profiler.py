@@ -0,0 +1,199 @@
+"""
+Profiler por amostragem do processo em execução (formato collapsed stacks)
+"""
+import json
+import os
+import signal
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+from app.config import PROFILE_MAX_SECONDS
+
+# Diretório de troca entre o servidor e os workers de análise
+PROFILE_DIR = os.path.join(tempfile.gettempdir(), f"ppe-profile-{os.getpid()}")
+# Sinal que pede a um worker para se amostrar (não disponível no Windows)
+PROFILE_SIGNAL = getattr(signal, "SIGUSR2", None)
+
+
+def _frame_label(code) -> str:
+    """Função e arquivo de definição (sem a linha atual, para agregar por função)"""
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def sample_stacks(
+    seconds: float,
+    interval: float,
+    root: str,
+    stop: Optional[threading.Event] = None
+) -> Counter:
+    """
+    Amostra as pilhas de todas as threads do processo atual
+
+    A cada `interval` segundos as pilhas são lidas de sys._current_frames()
+    sem interromper as threads; o custo é proporcional ao número de threads
+    e à profundidade das pilhas, não à carga do processo.
+
+    Args:
+        seconds: Duração da amostragem
+        interval: Intervalo entre amostras
+        root: Primeiro elemento das pilhas (ex.: processo)
+        stop: Evento para encerrar antes do prazo
+
+    Returns:
+        Counter pilha -> número de amostras
+    """
+    own = threading.get_ident()
+    stacks: Counter = Counter()
+    labels: Dict[int, str] = {}
+    deadline = time.perf_counter() + seconds
+    next_sample = time.perf_counter()
+    while next_sample < deadline and not (stop and stop.is_set()):
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            parts = []
+            while frame is not None:
+                code = frame.f_code
+                label = labels.get(id(code))
+                if label is None:
+                    label = labels[id(code)] = _frame_label(code)
+                parts.append(label)
+                frame = frame.f_back
+            parts.append(names.get(ident, f"thread-{ident}"))
+            parts.append(root)
+            stacks[";".join(reversed(parts))] += 1
+        next_sample += interval
+        delay = next_sample - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        else:
+            # Amostragem atrasada (processo saturado): não acumular atraso
+            next_sample = time.perf_counter()
+    return stacks
+
+
+def format_collapsed(stacks: Counter) -> str:
+    """Uma linha por pilha: `frame;frame;... contagem` (flamegraph.pl, speedscope)"""
+    return "".join(f"{stack} {count}\n" for stack, count in sorted(stacks.items()))
+
+
+def parse_collapsed(text: str) -> Counter:
+    stacks: Counter = Counter()
+    for line in text.splitlines():
+        stack, _, count = line.rpartition(" ")
+        if stack and count.isdigit():
+            stacks[stack] += int(count)
+    return stacks
+
+
+def _worker_profile_handler(signum, frame):
+    """Executado no worker ao receber PROFILE_SIGNAL: amostra em uma thread"""
+    try:
+        with open(os.path.join(PROFILE_DIR, "request.json")) as f:
+            request = json.load(f)
+    except (OSError, ValueError):
+        return
+
+    def run():
+        stacks = sample_stacks(request["seconds"], request["interval"], f"analysis-worker-{os.getpid()}")
+        out_path = os.path.join(PROFILE_DIR, f"{request['id']}-{os.getpid()}.folded")
+        with open(out_path + ".tmp", "w") as f:
+            f.write(format_collapsed(stacks))
+        os.replace(out_path + ".tmp", out_path)
+
+    threading.Thread(target=run, name="profiler", daemon=True).start()
+
+
+def install_worker_handler(profile_dir: str):
+    """Habilita a amostragem sob demanda em um processo worker"""
+    global PROFILE_DIR
+    PROFILE_DIR = profile_dir
+    if PROFILE_SIGNAL is not None:
+        signal.signal(PROFILE_SIGNAL, _worker_profile_handler)
+
+
+class Profiler:
+    """
+    Amostragem sob demanda do servidor e dos workers de análise
+
+    Apenas um perfil por vez, para manter o custo previsível sob carga.
+    """
+
+    def __init__(self, max_seconds: float = PROFILE_MAX_SECONDS, profile_dir: str = PROFILE_DIR):
+        self.max_seconds = max_seconds
+        self.profile_dir = profile_dir
+        self._lock = threading.Lock()
+
+    @property
+    def busy(self) -> bool:
+        return self._lock.locked()
+
+    def profile(self, seconds: float, hz: int = 100, worker_pids: Iterable[int] = ()) -> Optional[str]:
+        """
+        Amostra o processo atual e, opcionalmente, os workers por `seconds`
+
+        Bloqueia durante a amostragem; chamar fora do event loop.
+
+        Args:
+            seconds: Duração (limitada a max_seconds)
+            hz: Amostras por segundo
+            worker_pids: PIDs dos workers de análise a incluir
+
+        Returns:
+            Pilhas no formato collapsed, ou None se já houver um perfil em andamento
+        """
+        if not self._lock.acquire(blocking=False):
+            return None
+        try:
+            seconds = max(0.1, min(seconds, self.max_seconds))
+            interval = 1.0 / max(1, min(hz, 1000))
+            profile_id = uuid.uuid4().hex[:8]
+            pids = self._signal_workers(profile_id, seconds, interval, list(worker_pids))
+
+            stacks = sample_stacks(seconds, interval, f"server-{os.getpid()}")
+            stacks.update(self._collect_workers(profile_id, pids, timeout=2.0))
+            return format_collapsed(stacks)
+        finally:
+            self._lock.release()
+
+    def _signal_workers(self, profile_id: str, seconds: float, interval: float, pids: List[int]) -> List[int]:
+        if not pids or PROFILE_SIGNAL is None:
+            return []
+        os.makedirs(self.profile_dir, exist_ok=True)
+        with open(os.path.join(self.profile_dir, "request.json"), "w") as f:
+            json.dump({"id": profile_id, "seconds": seconds, "interval": interval}, f)
+        signaled = []
+        for pid in pids:
+            try:
+                os.kill(pid, PROFILE_SIGNAL)
+                signaled.append(pid)
+            except OSError:
+                pass
+        return signaled
+
+    def _collect_workers(self, profile_id: str, pids: List[int], timeout: float) -> Counter:
+        """Lê os perfis gravados pelos workers (que podem terminar um pouco depois)"""
+        stacks: Counter = Counter()
+        pending = {pid: os.path.join(self.profile_dir, f"{profile_id}-{pid}.folded") for pid in pids}
+        deadline = time.time() + timeout
+        while pending and time.time() < deadline:
+            for pid, path in list(pending.items()):
+                if os.path.exists(path):
+                    with open(path) as f:
+                        stacks.update(parse_collapsed(f.read()))
+                    os.remove(path)
+                    del pending[pid]
+            if pending:
+                time.sleep(0.05)
+        for pid in pending:
+            print(f"Profiler: worker {pid} não respondeu")
+        return stacks
+
+
+profiler = Profiler()
@@ -0,0 +1,148 @@
+"""
+Leitura progressiva de vídeos cujo upload ainda está em andamento
+"""
+import os
+import shutil
+import struct
+import tempfile
+import threading
+from typing import Optional
+
+from app.services.upload_manager import UploadSession
+
+# Bytes lidos do arquivo parcial a cada escrita no decodificador
+FEED_CHUNK_SIZE = 256 * 1024
+
+
+def probe_streamable(path: str, container: Optional[str]) -> Optional[bool]:
+    """
+    Indica se o vídeo pode ser decodificado enquanto ainda é gravado
+
+    Matroska/WebM e AVI são sequenciais por natureza. Em MP4/MOV é preciso
+    que o índice (moov) venha antes dos dados (mdat), como em MP4
+    fragmentado ou "faststart".
+
+    Args:
+        path: Arquivo (possivelmente incompleto)
+        container: Contêiner identificado no upload (ver sniff_container)
+
+    Returns:
+        True/False, ou None se ainda não há bytes suficientes para decidir
+    """
+    if container in ("matroska", "avi"):
+        return True
+    if container != "isobmff":
+        return None if container is None else False
+
+    try:
+        size = os.path.getsize(path)
+        with open(path, "rb") as f:
+            offset = 0
+            while offset + 8 <= size:
+                f.seek(offset)
+                box_size, box_type = struct.unpack(">I4s", f.read(8))
+                if box_type == b"moov":
+                    return True
+                if box_type == b"mdat":
+                    return False
+                if box_size == 1:
+                    if offset + 16 > size:
+                        return None
+                    box_size = struct.unpack(">Q", f.read(8))[0]
+                if box_size < 8:
+                    # Tamanho 0 = caixa até o fim do arquivo, antes de moov
+                    return False
+                offset += box_size
+    except OSError:
+        return None
+    return None
+
+
+class ProgressiveFeed:
+    """
+    Alimenta o decodificador com um arquivo que ainda está sendo recebido
+
+    Os bytes do upload são copiados para um FIFO aberto pelo VideoCapture
+    (FFmpeg), que decodifica sequencialmente e bloqueia à espera de novos
+    dados; o FIFO é fechado quando o upload termina ou é cancelado.
+    """
+
+    def __init__(self, session: UploadSession, poll_interval: float = 0.2):
+        self.session = session
+        self.poll_interval = poll_interval
+        self.bytes_fed = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._dir: Optional[str] = None
+        self.fifo_path: Optional[str] = None
+
+    @property
+    def upload_progress(self) -> float:
+        return round(self.session.offset / self.session.size, 4)
+
+    @property
+    def feed_progress(self) -> float:
+        return round(self.bytes_fed / self.session.size, 4)
+
+    def streamable(self) -> Optional[bool]:
+        return probe_streamable(self.session.current_path, self.session.container)
+
+    def open(self) -> str:
+        """
+        Cria o FIFO e inicia a cópia em background
+
+        Returns:
+            Caminho a ser aberto pelo VideoProcessor
+        """
+        self._dir = tempfile.mkdtemp(prefix="feed_")
+        self.fifo_path = os.path.join(self._dir, "video")
+        os.mkfifo(self.fifo_path)
+        # Abrir o arquivo parcial já aqui: o descritor continua válido após o rename
+        source = open(self.session.current_path, "rb")
+        self._thread = threading.Thread(target=self._run, args=(source,), daemon=True)
+        self._thread.start()
+        return self.fifo_path
+
+    def _run(self, source):
+        session = self.session
+        try:
+            # Bloqueia até o decodificador abrir o FIFO para leitura
+            with open(self.fifo_path, "wb") as fifo:
+                while not self._stop.is_set():
+                    data = source.read(FEED_CHUNK_SIZE)
+                    if data:
+                        fifo.write(data)
+                        self.bytes_fed += len(data)
+                        continue
+                    if self.bytes_fed >= session.size:
+                        break
+                    # Upload cancelado ou inválido: encerrar com o que chegou
+                    if session.closed.is_set() and self.bytes_fed >= session.offset:
+                        break
+                    self._stop.wait(self.poll_interval)
+        except (BrokenPipeError, OSError):
+            # Decodificador fechou o FIFO (job cancelado ou vídeo inválido)
+            pass
+        finally:
+            source.close()
+
+    def stop(self):
+        """Fecha o FIFO (o decodificador recebe fim de arquivo) sem aguardar"""
+        self._stop.set()
+
+    def close(self):
+        """Interrompe a cópia e remove o FIFO"""
+        self.stop()
+        if self._thread:
+            if self._thread.is_alive():
+                # Destravar o open() do escritor caso o leitor nunca tenha aberto
+                try:
+                    fd = os.open(self.fifo_path, os.O_RDONLY | os.O_NONBLOCK)
+                    os.close(fd)
+                except OSError:
+                    pass
+            self._thread.join(timeout=5)
+            self._thread = None
+        if self._dir:
+            shutil.rmtree(self._dir, ignore_errors=True)
+            self._dir = None
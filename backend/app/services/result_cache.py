@@ -0,0 +1,235 @@
+"""
+Cache em disco de resultados de análise, endereçado por conteúdo
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from app.config import (
+    RESULT_CACHE_DIR, RESULT_CACHE_MAX_BYTES, MODEL_PATH, CONFIDENCE_THRESHOLD,
+    FRAME_RESIZE_WIDTH, FRAME_RESIZE_HEIGHT
+)
+
+_model_hashes: Dict[Tuple[str, float, int], str] = {}
+
+
+def model_hash(model_path: str = MODEL_PATH) -> str:
+    """
+    Hash SHA-256 dos pesos do modelo (memorizado por caminho, mtime e tamanho)
+
+    Se o caminho não for um arquivo local (ex.: nome de modelo do hub), o
+    próprio caminho é usado como identidade.
+    """
+    try:
+        stat = os.stat(model_path)
+    except OSError:
+        return hashlib.sha256(model_path.encode()).hexdigest()
+
+    key = (model_path, stat.st_mtime, stat.st_size)
+    if key not in _model_hashes:
+        hasher = hashlib.sha256()
+        with open(model_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                hasher.update(chunk)
+        _model_hashes[key] = hasher.hexdigest()
+    return _model_hashes[key]
+
+
+def link_or_copy(src: str, dst: str):
+    """Cria hard link (sem cópia de dados) ou copia se não for possível"""
+    if os.path.exists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+class ResultCache:
+    """
+    Cache LRU de arquivos de resultado (JSON Lines)
+
+    A chave combina o hash do vídeo, o hash do modelo e a configuração que
+    altera o resultado (threshold, classes, stride). O mtime de cada arquivo
+    registra o último acesso, de modo que a ordem LRU sobrevive a reinícios.
+    """
+
+    def __init__(self, cache_dir: str = RESULT_CACHE_DIR, max_bytes: int = RESULT_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, int]" = OrderedDict()  # key -> tamanho, do menos ao mais recente
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def _load(self):
+        """Indexa o diretório do cache na primeira utilização"""
+        if self._loaded:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".jsonl"):
+                stat = os.stat(os.path.join(self.cache_dir, name))
+                entries.append((stat.st_mtime, name[:-len(".jsonl")], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._entries[key] = size
+        self._loaded = True
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.jsonl")
+
+    @staticmethod
+    def make_key(
+        video_hash: str,
+        selected_classes: Optional[List[str]] = None,
+        frame_stride: int = 1,
+        confidence_threshold: float = CONFIDENCE_THRESHOLD,
+        model_path: str = MODEL_PATH
+    ) -> str:
+        """Monta a chave do cache para um vídeo e uma configuração de análise"""
+        config = {
+            "video": video_hash,
+            "model": model_hash(model_path),
+            "confidence": confidence_threshold,
+            "classes": sorted(selected_classes) if selected_classes else None,
+            "stride": frame_stride
+        }
+        return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Retorna o caminho do resultado em cache (e o marca como recente)
+
+        Returns:
+            Caminho do arquivo ou None se ausente
+        """
+        with self._lock:
+            self._load()
+            path = self._path(key)
+            if key not in self._entries or not os.path.exists(path):
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            os.utime(path)
+            self.hits += 1
+            return path
+
+    def contains(self, key: str) -> bool:
+        """Indica se há resultado em cache, sem contar acerto nem alterar a ordem de despejo"""
+        with self._lock:
+            self._load()
+            return key in self._entries and os.path.exists(self._path(key))
+
+    def put(self, key: str, result_path: str):
+        """Armazena um arquivo de resultado e aplica a política de despejo"""
+        with self._lock:
+            self._load()
+            path = self._path(key)
+            link_or_copy(result_path, path)
+            self._entries[key] = os.path.getsize(path)
+            self._entries.move_to_end(key)
+            self._evict()
+
+    def _evict(self):
+        """Remove as entradas menos usadas até caber em max_bytes"""
+        total = sum(self._entries.values())
+        while total > self.max_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            total -= size
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            self._load()
+            return {
+                "entries": len(self._entries),
+                "size_bytes": sum(self._entries.values()),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+def read_summary(result_path: str) -> Optional[dict]:
+    """Lê o registro "summary" (última linha) de um arquivo de resultado"""
+    with open(result_path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        f.seek(max(0, size - 64 * 1024))
+        last_line = f.read().splitlines()[-1]
+    record = json.loads(last_line)
+    return record if record.get("type") == "summary" else None
+
+
+class ResultReplay:
+    """
+    Reproduz detecções gravadas em um arquivo de resultado, frame a frame
+
+    Lê o arquivo sob demanda (memória constante) e exige frames em ordem
+    crescente, como na reprodução em tempo real.
+    """
+
+    def __init__(self, result_path: str):
+        self._file = open(result_path)
+        meta = json.loads(self._file.readline())
+        info = meta.get("video_info", {})
+        width, height = info.get("width", 0), info.get("height", 0)
+        # Mesmo redimensionamento de VideoProcessor.get_frames
+        if width > FRAME_RESIZE_WIDTH or height > FRAME_RESIZE_HEIGHT:
+            height = int(height * FRAME_RESIZE_WIDTH / float(width))
+            width = FRAME_RESIZE_WIDTH
+        self.frame_size = (width, height)
+        self._current: Optional[dict] = None
+        self._next: Optional[dict] = self._read()
+
+    def _read(self) -> Optional[dict]:
+        line = self._file.readline()
+        if not line:
+            return None
+        record = json.loads(line)
+        return record if record.get("type") == "frame" else None
+
+    def detections_at(self, frame_number: int, frame_size: Tuple[int, int] = None) -> List[dict]:
+        """
+        Retorna as detecções do último frame analisado até frame_number
+
+        Args:
+            frame_number: Índice do frame exibido
+            frame_size: (largura, altura) do frame exibido, para reescalar as caixas
+
+        Returns:
+            Lista de detecções suavizadas
+        """
+        while self._next is not None and self._next["frame"] <= frame_number:
+            self._current = self._next
+            self._next = self._read()
+        if self._current is None:
+            return []
+
+        detections = self._current["detections"]
+        if not frame_size or frame_size == self.frame_size or not all(self.frame_size):
+            return detections
+
+        sx = frame_size[0] / self.frame_size[0]
+        sy = frame_size[1] / self.frame_size[1]
+        return [
+            {**det, "bbox": [int(det["bbox"][0] * sx), int(det["bbox"][1] * sy),
+                             int(det["bbox"][2] * sx), int(det["bbox"][3] * sy)]}
+            for det in detections
+        ]
+
+    def close(self):
+        self._file.close()
+
+
+result_cache = ResultCache()
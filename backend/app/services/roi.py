@@ -0,0 +1,155 @@
+"""
+Regiões de interesse e máscaras de exclusão por câmera
+"""
+from typing import List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+# Resolução de entrada do modelo (lado maior); recortes maiores são reduzidos
+MODEL_INPUT_SIZE = 640
+
+Polygon = Sequence[Sequence[float]]
+
+
+class RegionFilter:
+    """
+    Zonas monitoradas de uma câmera, para um tamanho de frame de origem
+
+    Os polígonos da configuração da stream usam coordenadas normalizadas
+    (0 a 1), independentes da resolução. A inferência roda apenas no
+    retângulo que envolve as ROIs (com uma margem para objetos na borda),
+    recortado do frame na resolução original e reduzido até a resolução do
+    modelo; objetos pequenos ganham pixels em relação ao frame inteiro
+    reduzido. As detecções voltam às coordenadas do frame exibido e são
+    mantidas apenas se o centro da caixa está em uma ROI (ou em qualquer
+    ponto, sem ROIs) e fora das exclusões.
+    """
+
+    # Margem do recorte, em fração do retângulo das ROIs (mínimo em pixels)
+    MARGIN = 0.05
+    MIN_MARGIN_PX = 16
+    # Lado maior da máscara de zonas (a consulta é por ponto, não precisa da resolução cheia)
+    MASK_SIZE = 640
+
+    def __init__(
+        self,
+        roi: Optional[List[Polygon]],
+        exclusions: Optional[List[Polygon]],
+        width: int,
+        height: int,
+        model_size: int = MODEL_INPUT_SIZE
+    ):
+        self.width = width
+        self.height = height
+        size = np.array([width, height], dtype=np.float64)
+        self.roi = [np.asarray(p, dtype=np.float64) * size for p in roi or []]
+        self.exclusions = [np.asarray(p, dtype=np.float64) * size for p in exclusions or []]
+
+        if self.roi:
+            points = np.concatenate(self.roi)
+            x1, y1 = points.min(axis=0)
+            x2, y2 = points.max(axis=0)
+            margin_x = max(self.MIN_MARGIN_PX, (x2 - x1) * self.MARGIN)
+            margin_y = max(self.MIN_MARGIN_PX, (y2 - y1) * self.MARGIN)
+            self.crop_rect = (
+                int(max(0, np.floor(x1 - margin_x))), int(max(0, np.floor(y1 - margin_y))),
+                int(min(width, np.ceil(x2 + margin_x))), int(min(height, np.ceil(y2 + margin_y)))
+            )
+        else:
+            self.crop_rect = (0, 0, width, height)
+        crop_w = max(1, self.crop_rect[2] - self.crop_rect[0])
+        crop_h = max(1, self.crop_rect[3] - self.crop_rect[1])
+        # Nunca ampliar: o modelo já faz o letterbox até a sua resolução
+        self.scale = min(1.0, model_size / max(crop_w, crop_h))
+        self.input_size = (max(1, round(crop_w * self.scale)), max(1, round(crop_h * self.scale)))
+
+        self._mask_scale = min(1.0, self.MASK_SIZE / max(width, height))
+        mask_w, mask_h = max(1, round(width * self._mask_scale)), max(1, round(height * self._mask_scale))
+        if self.roi:
+            self.mask = np.zeros((mask_h, mask_w), dtype=np.uint8)
+            cv2.fillPoly(self.mask, [self._mask_points(p) for p in self.roi], 1)
+        else:
+            self.mask = np.ones((mask_h, mask_w), dtype=np.uint8)
+        if self.exclusions:
+            cv2.fillPoly(self.mask, [self._mask_points(p) for p in self.exclusions], 0)
+
+    @classmethod
+    def from_config(cls, config: dict, width: int, height: int) -> Optional["RegionFilter"]:
+        """Filtro da configuração da stream, ou None se ela não define zonas"""
+        if not config.get("roi") and not config.get("exclusions"):
+            return None
+        return cls(config.get("roi"), config.get("exclusions"), width, height)
+
+    def _mask_points(self, polygon: np.ndarray) -> np.ndarray:
+        return np.round(polygon * self._mask_scale).astype(np.int32).reshape(-1, 1, 2)
+
+    @property
+    def crops(self) -> bool:
+        """True se a inferência usa um recorte (há ROIs); só exclusões usam o frame inteiro"""
+        return bool(self.roi)
+
+    def crop(self, frame: np.ndarray, dst: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Recorte das ROIs na resolução de entrada do modelo
+
+        Args:
+            frame: Frame na resolução de origem (width x height)
+            dst: Destino com o formato (input_size[1], input_size[0], canais),
+                ex.: um slot do FrameRing
+
+        Returns:
+            O recorte (dst, se informado)
+        """
+        x1, y1, x2, y2 = self.crop_rect
+        region = frame[y1:y2, x1:x2]
+        if self.scale == 1.0:
+            if dst is None:
+                return region
+            np.copyto(dst, region)
+            return dst
+        return cv2.resize(region, self.input_size, dst=dst, interpolation=cv2.INTER_AREA)
+
+    @property
+    def input_shape(self) -> Tuple[int, int, int]:
+        return (self.input_size[1], self.input_size[0], 3)
+
+    def restore(self, detections: List[dict], display_size: Tuple[int, int], space: str = "crop") -> List[dict]:
+        """
+        Leva as detecções às coordenadas do frame exibido e aplica as zonas
+
+        Args:
+            detections: Detecções do modelo
+            display_size: (largura, altura) do frame exibido
+            space: Coordenadas das caixas recebidas: "crop" (recorte das
+                ROIs), "display" (frame exibido, apenas exclusões) ou
+                "source" (frame de origem, ex.: após juntar os tiles)
+
+        Returns:
+            Detecções com o centro dentro das zonas ativas, em coordenadas
+            do frame exibido
+        """
+        if not detections:
+            return []
+        boxes = np.array([d["bbox"] for d in detections], dtype=np.float64)
+        display_w, display_h = display_size
+        to_display = np.array([display_w / self.width, display_h / self.height] * 2)
+        if space == "crop":
+            x1, y1 = self.crop_rect[:2]
+            boxes = boxes / self.scale + np.array([x1, y1, x1, y1])
+        elif space == "display":
+            boxes = boxes / to_display
+
+        # Centro das caixas na máscara (origem -> máscara)
+        centers = (boxes[:, :2] + boxes[:, 2:]) / 2 * self._mask_scale
+        cx = np.clip(centers[:, 0].astype(np.int64), 0, self.mask.shape[1] - 1)
+        cy = np.clip(centers[:, 1].astype(np.int64), 0, self.mask.shape[0] - 1)
+        keep = self.mask[cy, cx].astype(bool)
+
+        boxes = np.round(boxes * to_display).astype(np.int64)
+        boxes[:, 0::2] = np.clip(boxes[:, 0::2], 0, display_w)
+        boxes[:, 1::2] = np.clip(boxes[:, 1::2], 0, display_h)
+        return [
+            {**detection, "bbox": [int(v) for v in box]}
+            for detection, box, kept in zip(detections, boxes, keep) if kept
+        ]
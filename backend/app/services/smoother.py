@@ -122,11 +122,12 @@ class DetectionSmoother:
     def get_active_objects(self) -> list:
         """Retorna objetos ativos (que satisfazem critérios de exibição)"""
         active = []
-        for obj in self.objects.values():
+        for obj_id, obj in self.objects.items():
             # Critério: Ter sido detectado pelo menos min_hits vezes
             # E não ter desaparecido por completo (embora se missing > 0 e < max, ainda mostramos)
             if obj['hits'] >= self.min_hits:
                  active.append({
+                     'track_id': obj_id,
                      'bbox': obj['bbox'],
                      'class_name': obj['class_name'],
                      'confidence': obj['confidence']
@@ -0,0 +1,265 @@
+"""
+Gerenciamento do diretório de uploads: cota, expiração e limpeza de órfãos
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Optional
+
+from app.config import (
+    ALLOWED_EXTENSIONS, UPLOAD_DIR, STORAGE_QUOTA_BYTES, STORAGE_TTL_SECONDS,
+    STORAGE_PARTIAL_TTL_SECONDS, STORAGE_SWEEP_INTERVAL
+)
+from app.utils.helpers import get_file_extension, upload_meta_path
+
+# Arquivos sem vídeo correspondente só são removidos após este tempo, para não
+# concorrer com uploads sendo finalizados
+ORPHAN_GRACE_SECONDS = 60
+
+
+class StorageManager:
+    """
+    Controla o espaço ocupado pelos vídeos enviados
+
+    Cada upload é o conjunto de arquivos `{video_id}.*` (vídeo, metadados,
+    índice, arquivo parcial). O último acesso é registrado no mtime do
+    arquivo de metadados, de modo que a ordem LRU sobrevive a reinícios.
+    Vídeos em uso (reprodução, análise, upload em andamento) ficam fixados
+    e nunca são removidos.
+    """
+
+    def __init__(
+        self,
+        directory: str = UPLOAD_DIR,
+        quota_bytes: int = STORAGE_QUOTA_BYTES,
+        ttl_seconds: float = STORAGE_TTL_SECONDS,
+        partial_ttl_seconds: float = STORAGE_PARTIAL_TTL_SECONDS,
+        sweep_interval: float = STORAGE_SWEEP_INTERVAL
+    ):
+        self.directory = directory
+        self.quota_bytes = quota_bytes
+        self.ttl_seconds = ttl_seconds
+        self.partial_ttl_seconds = partial_ttl_seconds
+        self.sweep_interval = sweep_interval
+        self._pins: Dict[str, int] = {}
+        self._lock = threading.RLock()
+        self._task: Optional[asyncio.Task] = None
+        self.evicted_ttl = 0
+        self.evicted_quota = 0
+        self.orphans_removed = 0
+        self.bytes_freed = 0
+        self.last_sweep: Optional[str] = None
+
+    def pin(self, video_id: str):
+        """Impede a remoção do vídeo enquanto estiver em uso"""
+        with self._lock:
+            self._pins[video_id] = self._pins.get(video_id, 0) + 1
+
+    def unpin(self, video_id: str):
+        with self._lock:
+            count = self._pins.get(video_id, 0) - 1
+            if count > 0:
+                self._pins[video_id] = count
+            else:
+                self._pins.pop(video_id, None)
+
+    @contextmanager
+    def pinned(self, video_id: str):
+        """Context manager para pin/unpin"""
+        self.pin(video_id)
+        try:
+            yield
+        finally:
+            self.unpin(video_id)
+
+    def touch(self, video_id: str):
+        """Registra acesso ao vídeo (atualiza a posição na ordem LRU)"""
+        path = upload_meta_path(video_id, self.directory)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # Upload sem metadados: criar um registro mínimo
+            if os.path.isdir(self.directory):
+                with open(path, "w") as f:
+                    json.dump({"video_id": video_id}, f)
+        except OSError:
+            pass
+
+    def _scan(self) -> Dict[str, dict]:
+        """
+        Agrupa os arquivos do diretório por video_id
+
+        Returns:
+            Dict video_id -> {files, size, reserved, last_access, video, partial}
+        """
+        entries: Dict[str, dict] = {}
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return entries
+
+        for name in names:
+            if name.startswith("."):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if not os.path.isfile(path):
+                continue
+            video_id = name.split(".", 1)[0]
+            entry = entries.setdefault(video_id, {
+                "files": [], "size": 0, "reserved": 0, "last_access": 0.0,
+                "video": False, "partial": False
+            })
+            entry["files"].append(path)
+            entry["size"] += stat.st_size
+            entry["last_access"] = max(entry["last_access"], stat.st_mtime)
+            if name.endswith(".upload.json"):
+                entry["partial"] = True
+                try:
+                    with open(path) as f:
+                        entry["reserved"] = json.load(f).get("size", 0)
+                except (OSError, ValueError):
+                    pass
+            elif "." in name and name.count(".") == 1 and get_file_extension(name) in ALLOWED_EXTENSIONS:
+                entry["video"] = True
+
+        for entry in entries.values():
+            # Upload parcial ocupa o tamanho declarado (espaço reservado)
+            entry["usage"] = max(entry["size"], entry["reserved"]) if entry["partial"] else entry["size"]
+        return entries
+
+    def _remove(self, video_id: str, entry: dict) -> int:
+        """Remove os arquivos de um upload e retorna os bytes liberados"""
+        freed = 0
+        for path in entry["files"]:
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+                freed += size
+            except OSError:
+                pass
+        self.bytes_freed += freed
+        print(f"Armazenamento: upload {video_id} removido ({freed} bytes)")
+        return freed
+
+    def _evict_lru(self, entries: Dict[str, dict], needed: int) -> bool:
+        """Remove uploads menos usados até caber `needed` bytes na cota"""
+        usage = sum(e["usage"] for e in entries.values())
+        candidates = sorted(
+            (e["last_access"], video_id) for video_id, e in entries.items()
+            if video_id not in self._pins
+        )
+        for _, video_id in candidates:
+            if usage + needed <= self.quota_bytes:
+                break
+            entry = entries.pop(video_id)
+            self._remove(video_id, entry)
+            usage -= entry["usage"]
+            self.evicted_quota += 1
+        return usage + needed <= self.quota_bytes
+
+    def make_room(self, nbytes: int) -> bool:
+        """
+        Libera espaço para um novo upload, removendo os menos usados
+
+        Args:
+            nbytes: Tamanho do novo arquivo
+
+        Returns:
+            False se nem removendo todos os uploads livres houver espaço
+        """
+        with self._lock:
+            return self._evict_lru(self._scan(), nbytes)
+
+    def sweep(self) -> dict:
+        """
+        Remove órfãos, uploads expirados e o excedente da cota
+
+        Returns:
+            Contagem de remoções desta varredura
+        """
+        now = time.time()
+        removed = {"orphans": 0, "expired": 0, "quota": 0}
+        with self._lock:
+            entries = self._scan()
+            for video_id, entry in list(entries.items()):
+                if video_id in self._pins:
+                    continue
+                idle = now - entry["last_access"]
+                if not entry["video"] and not entry["partial"]:
+                    # Metadados/índices sem vídeo, temporários de tarefas interrompidas
+                    if idle > ORPHAN_GRACE_SECONDS:
+                        self._remove(video_id, entries.pop(video_id))
+                        self.orphans_removed += 1
+                        removed["orphans"] += 1
+                elif entry["partial"] and idle > self.partial_ttl_seconds:
+                    # Upload abandonado
+                    self._remove(video_id, entries.pop(video_id))
+                    self.evicted_ttl += 1
+                    removed["expired"] += 1
+                elif not entry["partial"] and idle > self.ttl_seconds:
+                    self._remove(video_id, entries.pop(video_id))
+                    self.evicted_ttl += 1
+                    removed["expired"] += 1
+
+            before = self.evicted_quota
+            self._evict_lru(entries, 0)
+            removed["quota"] = self.evicted_quota - before
+            self.last_sweep = datetime.now().isoformat()
+        return removed
+
+    async def start(self):
+        """Limpa órfãos imediatamente e agenda varreduras periódicas"""
+        await asyncio.to_thread(self.sweep)
+        self._task = asyncio.create_task(self._sweep_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await asyncio.to_thread(self.sweep)
+            except Exception as e:
+                print(f"Erro na limpeza de uploads: {e}")
+
+    def get_stats(self) -> dict:
+        """Uso do diretório de uploads e contadores de limpeza"""
+        with self._lock:
+            entries = self._scan()
+            pinned = len(self._pins)
+        usage = sum(e["usage"] for e in entries.values())
+        oldest = min((e["last_access"] for e in entries.values()), default=None)
+        return {
+            "directory": self.directory,
+            "uploads": sum(1 for e in entries.values() if e["video"]),
+            "partial_uploads": sum(1 for e in entries.values() if e["partial"]),
+            "pinned": pinned,
+            "size_bytes": sum(e["size"] for e in entries.values()),
+            "usage_bytes": usage,
+            "quota_bytes": self.quota_bytes,
+            "usage_ratio": round(usage / self.quota_bytes, 4) if self.quota_bytes else None,
+            "oldest_access_age_s": round(time.time() - oldest, 1) if oldest else None,
+            "evicted_ttl": self.evicted_ttl,
+            "evicted_quota": self.evicted_quota,
+            "orphans_removed": self.orphans_removed,
+            "bytes_freed": self.bytes_freed,
+            "last_sweep": self.last_sweep
+        }
+
+
+storage_manager = StorageManager()
@@ -5,8 +5,12 @@ import numpy as np
 import cv2
 import time
 import asyncio
-from typing import Dict, Optional
+from typing import Dict, Optional, Tuple
 from app.config import STREAM_RECONNECT_ATTEMPTS, STREAM_RECONNECT_DELAY, STREAM_BUFFER_SIZE
+from app.services.frame_ring import FrameRing
+from app.services.roi import RegionFilter
+from app.services.stream_workers import MAX_FRAME_BYTES
+from app.services.tiling import TileGrid
 
 
 import threading
@@ -22,14 +26,18 @@ class StreamHandler:
         self.reconnect_attempts = STREAM_RECONNECT_ATTEMPTS
         self.reconnect_delay = STREAM_RECONNECT_DELAY
         self.buffer_size = STREAM_BUFFER_SIZE
+        # Slots do anel de memória compartilhada por stream (0 = frames em
+        # memória do processo); ativado no startup quando há workers de inferência
+        self.frame_ring_slots = 0
     
-    async def connect(self, stream_url: str, protocol: str) -> Optional[str]:
+    async def connect(self, stream_url: str, protocol: str, config: Optional[dict] = None) -> Optional[str]:
         """
         Registra uma stream e inicia o processo de conexão em background
         
         Args:
             stream_url: URL da stream
             protocol: Protocolo (rtmp, rtmps, srt)
+            config: Configuração da stream (ex.: criticality), ver update_config
         
         Returns:
             stream_id para referência
@@ -47,11 +55,15 @@ class StreamHandler:
         self.active_streams[stream_id] = {
             "url": stream_url,
             "protocol": protocol,
+            "config": {"criticality": "normal", **(config or {})},
             "status": "pending",
             "cap": None,
-            "last_frame": None,
-            "last_frame_time": 0,
+            # (seq, instante da captura, frame, (zonas, recorte) ou None),
+            # publicado atomicamente pela thread de leitura
+            "latest": None,
+            "frames_read": 0,
             "reconnect_count": 0,
+            "reconnects_total": 0,
             "stop_signal": False,
             "thread": None
         }
@@ -109,6 +121,7 @@ class StreamHandler:
                 if stream["thread"] and not stream["thread"].is_alive():
                     print(f"Thread de leitura da stream {stream_id} morreu. Reiniciando conexão.")
                     stream["status"] = "reconnecting"
+                    stream["reconnects_total"] += 1
                     if stream["cap"]:
                         stream["cap"].release()
                         stream["cap"] = None
@@ -119,6 +132,7 @@ class StreamHandler:
         if stream_id in self.active_streams:
             if self.active_streams[stream_id].get("cap"):
                 self.active_streams[stream_id]["cap"].release()
+            self.close_ring(stream_id)
 
     def _read_frames_thread(self, stream_id: str):
         """Thread dedicada para ler frames o mais rápido possível"""
@@ -142,8 +156,7 @@ class StreamHandler:
                 
             # Atualizar o último frame disponível
             # Isso descarta frames antigos automaticamente se o consumidor for lento
-            stream["last_frame"] = frame
-            stream["last_frame_time"] = time.time()
+            self.publish(stream_id, frame)
             
             # Pequeno sleep para não consumir 100% de CPU se o FPS for baixo,
             # mas baixo o suficiente para não perder frames de 60fps (16ms)
@@ -170,6 +183,7 @@ class StreamHandler:
         await asyncio.sleep(0.5)
         
         if stream_id in self.active_streams:
+            self.close_ring(stream_id)
             del self.active_streams[stream_id]
             
         return True
@@ -193,7 +207,8 @@ class StreamHandler:
             return None
             
         # Retornar o último frame capturado pela thread
-        frame = stream.get("last_frame")
+        latest = self.get_latest(stream_id)
+        frame = latest[2] if latest else None
         
         # Opcional: Limpar o frame após leitura para evitar processar o mesmo frame duas vezes?
         # Depende da lógica do detector. Se o detector for mais rápido que o vídeo, vai pegar duplicado.
@@ -203,6 +218,120 @@ class StreamHandler:
         return frame
 
     
+    def get_latest(self, stream_id: str) -> Optional[tuple]:
+        """
+        Retorna o último frame capturado com sua sequência e instante
+
+        Returns:
+            (seq, captured_at, frame, zonas) ou None; saltos em `seq` indicam
+            frames descartados por um consumidor mais lento que a fonte.
+            `zonas` é None ou (RegionFilter, recorte de entrada da inferência
+            ou None se a inferência usa o frame inteiro)
+        """
+        stream = self.active_streams.get(stream_id)
+        if not stream or stream["status"] != "active":
+            return None
+        return stream.get("latest")
+
+    def publish(self, stream_id: str, frame: np.ndarray):
+        """
+        Publica um frame lido da stream como o mais recente
+
+        Com o anel ativo, o frame é gravado (e redimensionado, se maior que
+        640 px, como no pipeline) direto em um slot de memória compartilhada,
+        e `latest` passa a ser uma view somente leitura desse slot, que os
+        workers de inferência leem sem cópia.
+
+        Com ROIs na configuração, a entrada da inferência é o recorte das
+        zonas feito aqui, na resolução original (e, com o anel, gravado no
+        slot no lugar do frame exibido). Com o modo em tiles, publica a grade
+        e o frame na resolução original; os tiles são recortados pelo
+        pipeline apenas nos frames que vão à inferência.
+        """
+        stream = self.active_streams.get(stream_id)
+        if stream is None or stream["stop_signal"]:
+            return
+        seq = stream["frames_read"] + 1
+        captured_at = time.time()
+        region, grid = self._region(stream, frame)
+        ring = stream.get("ring")
+        if ring is None and self.frame_ring_slots:
+            ring = stream["ring"] = FrameRing.create(self.frame_ring_slots, MAX_FRAME_BYTES)
+
+        crop = None
+        tiled = None
+        h, w = frame.shape[:2]
+        if grid is not None:
+            tiled = (grid, frame, (w, h))
+        elif region is not None and region.crops:
+            if ring is not None:
+                region.crop(frame, dst=ring.reserve(seq, region.input_shape))
+                ring.commit(seq, captured_at)
+                crop = ring.frame(seq)
+            else:
+                crop = region.crop(frame)
+        if ring is not None and crop is None:
+            if w > 640 or h > 640:
+                cv2.resize(frame, (640, 480), dst=ring.reserve(seq, (480, 640) + frame.shape[2:]))
+                ring.commit(seq, captured_at)
+            else:
+                ring.write(frame, seq, captured_at)
+            frame = ring.frame(seq)
+        elif ring is not None and (w > 640 or h > 640):
+            frame = cv2.resize(frame, (640, 480))
+        stream["frames_read"] = seq
+        zones = (region, crop, tiled) if region is not None or tiled is not None else None
+        stream["latest"] = (seq, captured_at, frame, zones)
+
+    def _region(self, stream: dict, frame: np.ndarray) -> Tuple[Optional[RegionFilter], Optional[TileGrid]]:
+        """
+        Zonas e grade de tiles da configuração para o tamanho do frame
+        (recalculadas quando a configuração muda)
+        """
+        config = stream.get("config") or {}
+        h, w = frame.shape[:2]
+        cached = stream.get("region")
+        # A configuração é substituída (não alterada) em update_config
+        if cached is None or cached[0] is not config or cached[1] != (w, h):
+            region = RegionFilter.from_config(config, w, h)
+            area = region.crop_rect if region is not None and region.crops else None
+            cached = stream["region"] = (config, (w, h), region, TileGrid.from_config(config, w, h, area))
+        return cached[2], cached[3]
+
+    def get_config(self, stream_id: str) -> dict:
+        """Configuração da stream (vazia se a stream não existe)"""
+        stream = self.active_streams.get(stream_id)
+        return stream.get("config", {}) if stream else {}
+
+    def update_config(self, stream_id: str, values: dict) -> Optional[dict]:
+        """
+        Altera a configuração de uma stream em andamento
+
+        Os pipelines leem a configuração a cada frame, então a mudança vale
+        a partir do próximo frame.
+
+        Returns:
+            Configuração resultante ou None se a stream não existe
+        """
+        stream = self.active_streams.get(stream_id)
+        if stream is None:
+            return None
+        stream["config"] = {**stream.get("config", {}), **values}
+        return stream["config"]
+
+    def get_ring(self, stream_id: str) -> Optional[FrameRing]:
+        """Anel de memória compartilhada da stream, se ativo"""
+        stream = self.active_streams.get(stream_id)
+        return stream.get("ring") if stream else None
+
+    def close_ring(self, stream_id: str):
+        """Remove o anel da stream (views ainda em uso continuam legíveis)"""
+        stream = self.active_streams.get(stream_id)
+        ring = stream.pop("ring", None) if stream else None
+        if ring is not None:
+            stream["latest"] = None
+            ring.close()
+
     # Método _reconnect removido pois a lógica agora está no loop principal
     
     def _validate_url(self, url: str, protocol: str) -> bool:
@@ -229,7 +358,11 @@ class StreamHandler:
         return {
             sid: {
                 "protocol": s["protocol"],
-                "status": s["status"]
+                "status": s["status"],
+                "frames_read": s["frames_read"],
+                "reconnects": s["reconnects_total"],
+                "config": s.get("config", {}),
+                "frame_ring": s["ring"].name if s.get("ring") else None
             }
             for sid, s in self.active_streams.items()
         }
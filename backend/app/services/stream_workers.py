@@ -0,0 +1,546 @@
+"""
+Inferência das streams distribuída em processos worker (um modelo por processo)
+"""
+import asyncio
+import bisect
+import hashlib
+import importlib
+import itertools
+import multiprocessing
+import multiprocessing.connection
+import os
+import queue
+import threading
+import time
+from collections import deque
+from multiprocessing import shared_memory
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import STREAM_WORKER_SLOTS, STREAM_WORKERS
+from app.services.frame_ring import FrameOverwritten, FrameRing
+from app.services.profiler import PROFILE_DIR, install_worker_handler
+
+# Maior frame aceito: o pipeline redimensiona frames acima de 640 px
+MAX_FRAME_BYTES = 640 * 640 * 3
+
+# Detector usado nos workers ("módulo:Classe", importável no processo filho)
+DEFAULT_DETECTOR = "app.services.detector:PPEDetector"
+
+# Anéis de frames sem requisições há este tempo são fechados no worker
+RING_IDLE_SECONDS = 30.0
+
+
+class WorkerUnavailable(RuntimeError):
+    """O worker da stream morreu com a requisição em andamento (será reiniciado)"""
+
+
+class ConsistentHashRing:
+    """
+    Anel de hash consistente: cada chave (stream) é atribuída a um nó (worker)
+
+    Com `replicas` pontos virtuais por nó, a carga fica equilibrada e
+    adicionar ou remover um nó move apenas as chaves desse nó.
+    """
+
+    def __init__(self, nodes: Iterable[int], replicas: int = 64):
+        self.replicas = replicas
+        self._points: List[Tuple[int, int]] = []
+        for node in nodes:
+            self.add(node)
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+    def add(self, node: int):
+        for i in range(self.replicas):
+            bisect.insort(self._points, (self._hash(f"{node}#{i}"), node))
+
+    def remove(self, node: int):
+        self._points = [point for point in self._points if point[1] != node]
+
+    def node_for(self, key: str) -> int:
+        if not self._points:
+            raise LookupError("Anel sem nós")
+        i = bisect.bisect(self._points, (self._hash(key), -1))
+        return self._points[i % len(self._points)][1]
+
+
+def _load_detector(path: str):
+    module, _, name = path.partition(":")
+    return getattr(importlib.import_module(module), name)()
+
+
+def _worker_main(
+    index: int,
+    detector_path: str,
+    shm_name: str,
+    slot_bytes: int,
+    commands,
+    results,
+    torch_threads: int,
+    profile_dir: str
+):
+    """
+    Processo worker: carrega o modelo uma vez e atende requisições de inferência
+
+    O frame é lido direto da memória compartilhada (slot do worker ou anel
+    da stream, sem serialização); apenas as detecções voltam, pelo pipe de
+    resultados exclusivo deste processo.
+    """
+    install_worker_handler(profile_dir)
+    try:
+        import torch
+        torch.set_num_threads(max(1, torch_threads))
+    except ImportError:
+        pass
+    shm = shared_memory.SharedMemory(name=shm_name)
+    detector = _load_detector(detector_path)
+    detector.load_model()
+    # Anéis das streams (nome -> (anel, último uso)), abertos sob demanda
+    rings: Dict[str, Tuple[FrameRing, float]] = {}
+    try:
+        while True:
+            try:
+                command = commands.get(timeout=RING_IDLE_SECONDS)
+            except queue.Empty:
+                command = ()
+            now = time.time()
+            for name, (ring, used) in list(rings.items()):
+                if now - used > RING_IDLE_SECONDS:
+                    ring.close()
+                    del rings[name]
+            if command is None:
+                break
+            if not command:
+                continue
+            request_id, source, selected_classes = command
+            ring = None
+            try:
+                if source[0] == "ring":
+                    # Frame lido direto do anel da stream (sem cópia)
+                    _, name, seq = source
+                    if name not in rings:
+                        rings[name] = (FrameRing.attach(name), now)
+                    ring = rings[name][0]
+                    rings[name] = (ring, now)
+                    frame = ring.frame(seq)
+                    if frame is None:
+                        raise FrameOverwritten(f"Frame {seq} já substituído no anel")
+                elif source[0] == "slots":
+                    # Lote (ex.: tiles de um frame), uma chamada ao modelo
+                    frame = [
+                        np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=slot * slot_bytes)
+                        for slot, shape in source[1]
+                    ]
+                else:
+                    _, slot, shape = source
+                    frame = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=slot * slot_bytes)
+                if source[0] == "slots":
+                    result = detector.detect_batch(frame, selected_classes)
+                else:
+                    result = detector.detect(frame, selected_classes)
+                if ring is not None and not ring.is_current(seq):
+                    # O escritor alcançou o slot durante a inferência
+                    raise FrameOverwritten(f"Frame {seq} substituído durante a inferência")
+                results.send((index, request_id, result, None))
+            except FileNotFoundError:
+                results.send((index, request_id, None, FrameOverwritten("Anel da stream encerrado")))
+            except FrameOverwritten as e:
+                results.send((index, request_id, None, e))
+            except Exception as e:
+                results.send((index, request_id, None, str(e)))
+            finally:
+                frame = None
+    finally:
+        for ring, _ in rings.values():
+            ring.close()
+        shm.close()
+        results.close()
+
+
+class _Worker:
+    """Estado de um worker no processo principal (sobrevive às reinicializações)"""
+
+    def __init__(self, index: int, slots: int, slot_bytes: int):
+        self.index = index
+        self.shm = shared_memory.SharedMemory(create=True, size=slots * slot_bytes)
+        self.free_slots: Deque[int] = deque(range(slots))
+        self.process = None
+        self.commands = None
+        self.started_at = 0.0
+        self.restarts = 0
+        self.failures = 0
+        self.restart_at = 0.0
+        self.requests = 0
+
+
+class StreamWorkerPool:
+    """
+    Supervisor dos processos de inferência das streams
+
+    Cada stream é atribuída a um worker por hash consistente do seu ID, de
+    modo que a mesma stream sempre usa o mesmo processo. O frame é copiado
+    para um slot de memória compartilhada do worker e as detecções voltam
+    ao processo principal (WebSockets) por uma fila de resultados. Frames
+    de streams com anel de memória compartilhada (FrameRing) são lidos pelo
+    worker direto do anel, sem a cópia para o slot.
+
+    Um worker que morre é reiniciado com o mesmo índice: apenas as
+    requisições em andamento nele falham (WorkerUnavailable); as streams
+    dos demais workers não são afetadas.
+    """
+
+    def __init__(
+        self,
+        workers: int = STREAM_WORKERS,
+        detector: str = DEFAULT_DETECTOR,
+        slots: int = STREAM_WORKER_SLOTS,
+        slot_bytes: int = MAX_FRAME_BYTES,
+        profile_dir: str = PROFILE_DIR
+    ):
+        self.workers = workers
+        self.detector = detector
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.profile_dir = profile_dir
+        self.ring = ConsistentHashRing(range(workers))
+        self._workers: List[_Worker] = []
+        self._context = None
+        # Pipes de resultados abertos (um por processo worker) -> worker
+        self._receivers: Dict[multiprocessing.connection.Connection, _Worker] = {}
+        self._pending: Dict[int, Tuple[asyncio.Future, asyncio.AbstractEventLoop, int, Tuple[int, ...]]] = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._running = False
+        self._threads: List[threading.Thread] = []
+        # Última atividade de cada stream (chave -> (worker, instante))
+        self._streams: Dict[str, Tuple[int, float]] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self._running
+
+    def start(self):
+        """Cria a memória compartilhada e inicia os workers e as threads de supervisão"""
+        if self._running or self.workers <= 0:
+            return
+        # spawn: fork com torch já inicializado pode travar os workers
+        self._context = multiprocessing.get_context("spawn")
+        self._workers = [_Worker(i, self.slots, self.slot_bytes) for i in range(self.workers)]
+        self._running = True
+        for worker in self._workers:
+            self._spawn(worker)
+        self._threads = [
+            threading.Thread(target=self._collect_results, name="stream-workers-results", daemon=True),
+            threading.Thread(target=self._supervise, name="stream-workers-supervisor", daemon=True)
+        ]
+        for thread in self._threads:
+            thread.start()
+        print(f"Workers de inferência iniciados: {self.workers}")
+
+    def _spawn(self, worker: _Worker):
+        """
+        Inicia o processo do worker com fila de comandos e pipe de resultados
+        novos: um processo morto no meio de uma escrita (segurando o lock da
+        fila ou com uma mensagem pela metade) não afeta os demais workers
+        nem o processo que o substitui.
+        """
+        threads = max(1, (os.cpu_count() or 1) // self.workers)
+        worker.commands = self._context.Queue()
+        receiver, sender = self._context.Pipe(duplex=False)
+        worker.process = self._context.Process(
+            target=_worker_main,
+            args=(worker.index, self.detector, worker.shm.name, self.slot_bytes,
+                  worker.commands, sender, threads, self.profile_dir),
+            name=f"stream-worker-{worker.index}",
+            daemon=True
+        )
+        worker.process.start()
+        # Só o filho escreve: com o processo encerrado, a leitura recebe EOF
+        sender.close()
+        with self._lock:
+            self._receivers[receiver] = worker
+        worker.started_at = time.time()
+
+    def worker_for(self, key: str) -> int:
+        """Índice do worker responsável pela stream"""
+        return self.ring.node_for(key)
+
+    async def detect(self, key: str, frame: np.ndarray, selected_classes: Optional[List[str]] = None) -> dict:
+        """
+        Executa a detecção no worker da stream
+
+        Args:
+            key: ID da stream (define o worker)
+            frame: Frame BGR de até MAX_FRAME_BYTES
+            selected_classes: Filtro de classes repassado ao detector
+
+        Returns:
+            Resultado de PPEDetector.detect
+
+        Raises:
+            WorkerUnavailable: O worker morreu antes de responder
+        """
+        if not self._running:
+            raise WorkerUnavailable("Workers de inferência não iniciados")
+        if frame.nbytes > self.slot_bytes or frame.dtype != np.uint8:
+            raise ValueError(f"Frame {frame.shape} {frame.dtype} não cabe no slot de {self.slot_bytes} bytes")
+
+        worker = self._workers[self.worker_for(key)]
+        self._streams[key] = (worker.index, time.time())
+        # Cada stream aguarda o próprio resultado, então os slots só se esgotam
+        # com mais streams que slots no mesmo worker
+        while True:
+            with self._lock:
+                slot = worker.free_slots.popleft() if worker.free_slots else None
+            if slot is not None:
+                break
+            await asyncio.sleep(0.005)
+
+        view = np.ndarray(frame.shape, dtype=np.uint8, buffer=worker.shm.buf, offset=slot * self.slot_bytes)
+        view[...] = frame
+        del view
+        return await self._submit(worker, ("slot", slot, frame.shape), selected_classes, (slot,))
+
+    async def detect_batch(self, key: str, frames: List[np.ndarray], selected_classes: Optional[List[str]] = None) -> List[dict]:
+        """
+        Executa a detecção de vários frames em um lote no worker da stream
+
+        Cada frame é copiado para um slot do worker; os slots do lote são
+        reservados juntos, e lotes maiores que os slots do worker são
+        divididos em lotes sucessivos.
+
+        Returns:
+            Resultados de PPEDetector.detect_batch, um por frame
+
+        Raises:
+            WorkerUnavailable: O worker morreu antes de responder
+        """
+        if not self._running:
+            raise WorkerUnavailable("Workers de inferência não iniciados")
+        if not frames:
+            return []
+        if len(frames) > self.slots:
+            results = []
+            for i in range(0, len(frames), self.slots):
+                results.extend(await self.detect_batch(key, frames[i:i + self.slots], selected_classes))
+            return results
+        for frame in frames:
+            if frame.nbytes > self.slot_bytes or frame.dtype != np.uint8:
+                raise ValueError(f"Frame {frame.shape} {frame.dtype} não cabe no slot de {self.slot_bytes} bytes")
+
+        worker = self._workers[self.worker_for(key)]
+        self._streams[key] = (worker.index, time.time())
+        while True:
+            with self._lock:
+                if len(worker.free_slots) >= len(frames):
+                    slots = tuple(worker.free_slots.popleft() for _ in frames)
+                    break
+            await asyncio.sleep(0.005)
+
+        for slot, frame in zip(slots, frames):
+            view = np.ndarray(frame.shape, dtype=np.uint8, buffer=worker.shm.buf, offset=slot * self.slot_bytes)
+            view[...] = frame
+            del view
+        source = ("slots", [(slot, frame.shape) for slot, frame in zip(slots, frames)])
+        return await self._submit(worker, source, selected_classes, slots)
+
+    async def detect_shared(self, key: str, ring: FrameRing, seq: int, selected_classes: Optional[List[str]] = None) -> dict:
+        """
+        Executa a detecção no worker da stream lendo o frame do anel da stream
+
+        Nenhuma cópia é feita: o worker lê o slot do anel e confere, ao fim
+        da inferência, que ele não foi reutilizado.
+
+        Args:
+            key: ID da stream (define o worker)
+            ring: Anel em que o frame foi publicado
+            seq: Sequência do frame no anel
+
+        Raises:
+            WorkerUnavailable: O worker morreu antes de responder
+            FrameOverwritten: O frame foi substituído antes de ser lido por inteiro
+        """
+        if not self._running:
+            raise WorkerUnavailable("Workers de inferência não iniciados")
+        worker = self._workers[self.worker_for(key)]
+        self._streams[key] = (worker.index, time.time())
+        return await self._submit(worker, ("ring", ring.name, seq), selected_classes)
+
+    async def _submit(self, worker: _Worker, source: tuple, selected_classes: Optional[List[str]], slots: Tuple[int, ...] = ()):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        request_id = next(self._ids)
+        with self._lock:
+            self._pending[request_id] = (future, loop, worker.index, slots)
+            worker.requests += 1
+        worker.commands.put((request_id, source, selected_classes))
+        return await future
+
+    def _release(self, request_id: int) -> Optional[Tuple[asyncio.Future, asyncio.AbstractEventLoop]]:
+        """Remove a requisição pendente e devolve os slots (o worker não os lê mais)"""
+        with self._lock:
+            entry = self._pending.pop(request_id, None)
+            if entry is None:
+                return None
+            future, loop, index, slots = entry
+            self._workers[index].free_slots.extend(slots)
+        return future, loop
+
+    @staticmethod
+    def _resolve(future: asyncio.Future, result, error):
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def _settle(self, request_id: int, result, error):
+        entry = self._release(request_id)
+        if entry is None:
+            return
+        future, loop = entry
+        try:
+            loop.call_soon_threadsafe(self._resolve, future, result, error)
+        except RuntimeError:
+            # Event loop do solicitante já encerrado
+            pass
+
+    def _collect_results(self):
+        while self._running:
+            with self._lock:
+                receivers = list(self._receivers)
+            if not receivers:
+                time.sleep(0.05)
+                continue
+            for receiver in multiprocessing.connection.wait(receivers, timeout=0.2):
+                try:
+                    index, request_id, result, error = receiver.recv()
+                except (EOFError, OSError):
+                    # Processo encerrado (mensagem incompleta é descartada);
+                    # o supervisor falha as requisições pendentes dele
+                    with self._lock:
+                        self._receivers.pop(receiver, None)
+                    receiver.close()
+                    continue
+                if isinstance(error, str):
+                    error = RuntimeError(error)
+                self._settle(request_id, result, error)
+
+    def _supervise(self):
+        """Reinicia workers que morreram, com espera crescente se falham ao iniciar"""
+        while self._running:
+            now = time.time()
+            for worker in self._workers:
+                if worker.process is None or worker.process.is_alive() or not self._running:
+                    continue
+                if not worker.restart_at:
+                    self._fail_pending(worker, f"Worker {worker.index} encerrado (código {worker.process.exitcode})")
+                    # Morreu logo após iniciar (ex.: falha ao carregar o modelo)
+                    worker.failures = worker.failures + 1 if now - worker.started_at < 30 else 0
+                    worker.restart_at = now + min(30.0, 0.5 * 2 ** worker.failures) if worker.failures else now
+                    print(f"Worker de inferência {worker.index} encerrado (código {worker.process.exitcode})")
+                if now >= worker.restart_at:
+                    worker.restart_at = 0.0
+                    worker.restarts += 1
+                    self._spawn(worker)
+            time.sleep(0.2)
+
+    def _fail_pending(self, worker: _Worker, reason: str):
+        with self._lock:
+            ids = [rid for rid, entry in self._pending.items() if entry[2] == worker.index]
+        for request_id in ids:
+            self._settle(request_id, None, WorkerUnavailable(reason))
+
+    def restart(self, index: int, timeout: float = 5.0) -> bool:
+        """
+        Encerra um worker; o supervisor o reinicia em seguida
+
+        O worker recebe o comando de parada e termina as requisições já
+        enfileiradas; se não encerrar em `timeout` segundos (ex.: travado),
+        é terminado à força.
+
+        Returns:
+            False se o índice não existe
+        """
+        if not self._running or not 0 <= index < len(self._workers):
+            return False
+        worker = self._workers[index]
+        process = worker.process
+        if process is not None and process.is_alive():
+            try:
+                worker.commands.put(None)
+            except (OSError, ValueError):
+                pass
+            process.join(timeout=timeout)
+            if process.is_alive():
+                process.terminate()
+                process.join(timeout=5)
+        return True
+
+    def worker_pids(self) -> List[int]:
+        """PIDs dos workers em execução"""
+        return [w.process.pid for w in self._workers if w.process is not None and w.process.is_alive()]
+
+    def get_stats(self, active_seconds: float = 30.0) -> dict:
+        now = time.time()
+        streams: Dict[int, List[str]] = {}
+        for key, (index, seen) in list(self._streams.items()):
+            if now - seen <= active_seconds:
+                streams.setdefault(index, []).append(key)
+        with self._lock:
+            pending = {}
+            for _, _, index, _ in self._pending.values():
+                pending[index] = pending.get(index, 0) + 1
+        return {
+            "enabled": self._running,
+            "slots_per_worker": self.slots,
+            "workers": [
+                {
+                    "index": w.index,
+                    "pid": w.process.pid if w.process else None,
+                    "alive": bool(w.process and w.process.is_alive()),
+                    "uptime_s": round(now - w.started_at, 1) if w.process and w.process.is_alive() else 0.0,
+                    "restarts": w.restarts,
+                    "requests": w.requests,
+                    "pending": pending.get(w.index, 0),
+                    "streams": sorted(streams.get(w.index, []))
+                }
+                for w in self._workers
+            ]
+        }
+
+    def stop(self):
+        """Encerra os workers e libera a memória compartilhada"""
+        if not self._running:
+            return
+        self._running = False
+        for worker in self._workers:
+            try:
+                worker.commands.put(None)
+            except (OSError, ValueError):
+                pass
+        for worker in self._workers:
+            worker.process.join(timeout=5)
+            if worker.process.is_alive():
+                worker.process.terminate()
+                worker.process.join(timeout=5)
+            self._fail_pending(worker, "Workers de inferência encerrados")
+        for thread in self._threads:
+            thread.join(timeout=1)
+        with self._lock:
+            receivers, self._receivers = list(self._receivers), {}
+        for receiver in receivers:
+            receiver.close()
+        for worker in self._workers:
+            worker.shm.close()
+            worker.shm.unlink()
+        self._workers = []
+
+
+# Instância global (iniciada no startup se STREAM_WORKERS > 0)
+stream_workers = StreamWorkerPool()
@@ -0,0 +1,201 @@
+"""
+Inferência em blocos (tiles) sobrepostos para câmeras de alta resolução
+"""
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from app.services.roi import MODEL_INPUT_SIZE
+
+# Limites da grade configurável por stream
+MAX_TILES_PER_SIDE = 8
+MAX_OVERLAP = 0.5
+
+
+def nms(
+    boxes: np.ndarray,
+    scores: np.ndarray,
+    classes: np.ndarray,
+    iou_threshold: float = 0.5,
+    containment_threshold: float = 0.8
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Supressão de não-máximos por classe, vetorizada
+
+    Além do IoU, suprime caixas quase contidas em outra da mesma classe
+    (interseção / área da menor acima de `containment_threshold`): um
+    objeto cortado na borda de um tile gera uma caixa parcial, com IoU
+    baixo em relação à caixa completa do tile vizinho. A caixa mantida é
+    expandida para cobrir as parciais (não as duplicatas) que absorveu.
+
+    Args:
+        boxes: (N, 4) x1, y1, x2, y2
+        scores: (N,) confianças
+        classes: (N,) ids ou nomes de classe
+
+    Returns:
+        (índices mantidos, em ordem de confiança decrescente; caixas
+        mantidas após a expansão)
+    """
+    if len(boxes) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros((0, 4), dtype=np.float64)
+    order = np.argsort(-scores, kind="stable")
+    b = boxes[order].astype(np.float64)
+    cls = np.asarray(classes)[order]
+
+    area = np.maximum(0.0, b[:, 2] - b[:, 0]) * np.maximum(0.0, b[:, 3] - b[:, 1])
+    w = np.clip(np.minimum(b[:, None, 2], b[None, :, 2]) - np.maximum(b[:, None, 0], b[None, :, 0]), 0, None)
+    h = np.clip(np.minimum(b[:, None, 3], b[None, :, 3]) - np.maximum(b[:, None, 1], b[None, :, 1]), 0, None)
+    inter = w * h
+    iou = inter / np.maximum(area[:, None] + area[None, :] - inter, 1e-9)
+    contained = inter / np.maximum(np.minimum(area[:, None], area[None, :]), 1e-9)
+    same = cls[:, None] == cls[None, :]
+    duplicate = same & (iou > iou_threshold)
+    partial = same & (contained > containment_threshold)
+    # Apenas caixas de menor confiança (à direita da diagonal) são suprimidas
+    later = np.triu(np.ones((len(b), len(b)), dtype=bool), k=1)
+    suppresses = (duplicate | partial) & later
+
+    suppressed = np.zeros(len(b), dtype=bool)
+    keep = []
+    merged = []
+    for i in range(len(b)):
+        if suppressed[i]:
+            continue
+        victims = suppresses[i] & ~suppressed
+        suppressed |= victims
+        keep.append(i)
+        # Duplicatas (IoU alto) apenas somem; parciais ampliam a caixa mantida
+        absorbed = np.flatnonzero(victims & partial[i] & ~duplicate[i])
+        box = b[i].copy()
+        if len(absorbed):
+            box[:2] = np.minimum(box[:2], b[absorbed, :2].min(axis=0))
+            box[2:] = np.maximum(box[2:], b[absorbed, 2:].max(axis=0))
+        merged.append(box)
+    return order[keep], np.array(merged)
+
+
+class TileGrid:
+    """
+    Grade de tiles sobrepostos sobre uma área do frame de origem
+
+    Cada tile é recortado na resolução original e reduzido só até a
+    resolução do modelo, então objetos distantes em uma câmera 4K mantêm
+    pixels suficientes para serem detectados; todos os tiles vão ao modelo
+    em um único lote. As caixas voltam às coordenadas de origem e as
+    duplicadas na sobreposição são unidas por NMS entre tiles.
+    """
+
+    def __init__(
+        self,
+        cols: int,
+        rows: int,
+        overlap: float,
+        area: Tuple[int, int, int, int],
+        model_size: int = MODEL_INPUT_SIZE
+    ):
+        """
+        Args:
+            cols: Tiles na horizontal
+            rows: Tiles na vertical
+            overlap: Sobreposição entre tiles vizinhos, em fração do tile
+            area: (x1, y1, x2, y2) do frame de origem coberta pela grade
+                (o frame inteiro ou o recorte das ROIs)
+        """
+        self.cols = cols
+        self.rows = rows
+        self.overlap = overlap
+        self.area = area
+        x1, y1, x2, y2 = area
+        tile_w = self._tile_length(x2 - x1, cols, overlap)
+        tile_h = self._tile_length(y2 - y1, rows, overlap)
+        self.rects: List[Tuple[int, int, int, int]] = []
+        for row in range(rows):
+            ty = self._tile_start(y1, y2, tile_h, row, rows)
+            for col in range(cols):
+                tx = self._tile_start(x1, x2, tile_w, col, cols)
+                self.rects.append((tx, ty, tx + tile_w, ty + tile_h))
+        self.scale = min(1.0, model_size / max(tile_w, tile_h))
+        self.tile_size = (max(1, round(tile_w * self.scale)), max(1, round(tile_h * self.scale)))
+
+    @staticmethod
+    def _tile_length(length: int, count: int, overlap: float) -> int:
+        # count * tile - (count - 1) * overlap * tile = length
+        return int(np.ceil(length / (count - (count - 1) * overlap)))
+
+    @staticmethod
+    def _tile_start(start: int, end: int, tile: int, i: int, count: int) -> int:
+        if count == 1:
+            return start
+        # Distribuição uniforme: o primeiro tile começa em `start`, o último termina em `end`
+        return start + int(round(i * (end - start - tile) / (count - 1)))
+
+    @classmethod
+    def from_config(
+        cls,
+        config: dict,
+        width: int,
+        height: int,
+        area: Optional[Tuple[int, int, int, int]] = None,
+        model_size: int = MODEL_INPUT_SIZE
+    ) -> Optional["TileGrid"]:
+        """
+        Grade da configuração da stream (`tiling`), ou None se o modo está
+        desligado ou a área já cabe na resolução do modelo
+        """
+        tiling = config.get("tiling") or {}
+        cols, rows = int(tiling.get("cols", 1)), int(tiling.get("rows", 1))
+        area = area or (0, 0, width, height)
+        if cols * rows <= 1 or max(area[2] - area[0], area[3] - area[1]) <= model_size:
+            return None
+        return cls(cols, rows, float(tiling.get("overlap", 0.2)), area, model_size)
+
+    def tiles(self, frame: np.ndarray) -> List[np.ndarray]:
+        """Tiles do frame de origem, na resolução do modelo"""
+        tiles = []
+        for x1, y1, x2, y2 in self.rects:
+            tile = frame[y1:y2, x1:x2]
+            if self.scale < 1.0:
+                tile = cv2.resize(tile, self.tile_size, interpolation=cv2.INTER_AREA)
+            tiles.append(tile)
+        return tiles
+
+    def merge(self, tile_detections: List[List[dict]], iou_threshold: float = 0.5) -> List[dict]:
+        """
+        Junta as detecções dos tiles em coordenadas do frame de origem
+
+        Args:
+            tile_detections: Detecções de cada tile, na ordem de tiles()
+
+        Returns:
+            Detecções sem as duplicadas da sobreposição
+        """
+        detections, boxes = [], []
+        for (x1, y1, _, _), items in zip(self.rects, tile_detections):
+            for detection in items:
+                detections.append(detection)
+                boxes.append(np.asarray(detection["bbox"], dtype=np.float64) / self.scale + (x1, y1, x1, y1))
+        if not detections:
+            return []
+        keep, merged = nms(
+            np.array(boxes),
+            np.array([d["confidence"] for d in detections]),
+            np.array([d["class_name"] for d in detections]),
+            iou_threshold
+        )
+        return [
+            {**detections[i], "bbox": [int(round(v)) for v in box]}
+            for i, box in zip(keep, merged)
+        ]
+
+    @staticmethod
+    def to_display(detections: List[dict], source_size: Tuple[int, int], display_size: Tuple[int, int]) -> List[dict]:
+        """Converte caixas do frame de origem para o frame exibido"""
+        sx = display_size[0] / source_size[0]
+        sy = display_size[1] / source_size[1]
+        return [
+            {**d, "bbox": [int(round(d["bbox"][0] * sx)), int(round(d["bbox"][1] * sy)),
+                           int(round(d["bbox"][2] * sx)), int(round(d["bbox"][3] * sy))]}
+            for d in detections
+        ]
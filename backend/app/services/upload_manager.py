@@ -0,0 +1,371 @@
+"""
+Upload de vídeos em blocos, com limite de tamanho e retomada
+"""
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import uuid
+from datetime import datetime
+from typing import AsyncIterator, Dict, Optional
+
+from app.config import ALLOWED_EXTENSIONS, MAX_FILE_SIZE, UPLOAD_DIR, UPLOAD_CHUNK_SIZE
+from app.services.storage_manager import StorageManager, storage_manager
+from app.services.video_processor import VideoProcessor, get_keyframe_index
+from app.utils.helpers import get_file_extension, write_upload_meta
+
+# Bytes iniciais necessários para identificar o contêiner
+SNIFF_BYTES = 12
+
+
+def sniff_container(head: bytes) -> Optional[str]:
+    """
+    Identifica o contêiner de vídeo pelos primeiros bytes do arquivo
+
+    Args:
+        head: Início do arquivo (ao menos SNIFF_BYTES)
+
+    Returns:
+        "isobmff", "avi", "matroska" ou None se não reconhecido
+    """
+    if len(head) < SNIFF_BYTES:
+        return None
+    if head[4:8] in (b"ftyp", b"moov", b"mdat", b"free", b"skip", b"wide", b"pnot"):
+        return "isobmff"
+    if head[:4] == b"RIFF" and head[8:12] == b"AVI ":
+        return "avi"
+    if head[:4] == b"\x1a\x45\xdf\xa3":
+        return "matroska"
+    return None
+
+
+class UploadError(Exception):
+    """Falha de upload com o status HTTP correspondente"""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class UploadSession:
+    """Estado de um upload em andamento"""
+
+    def __init__(self, upload_id: str, filename: str, size: int, directory: str):
+        self.upload_id = upload_id
+        self.filename = filename
+        self.extension = get_file_extension(filename)
+        self.size = size
+        self.directory = directory
+        self.offset = 0
+        self.container: Optional[str] = None
+        self.head = b""
+        self.created_at = datetime.now().isoformat()
+        self.hasher = hashlib.sha256()
+        self.sha256: Optional[str] = None
+        self.lock = asyncio.Lock()
+        # Sinalizado quando o upload termina, é cancelado ou falha
+        self.closed = threading.Event()
+
+    @property
+    def part_path(self) -> str:
+        return os.path.join(self.directory, f"{self.upload_id}.part")
+
+    @property
+    def session_path(self) -> str:
+        return os.path.join(self.directory, f"{self.upload_id}.upload.json")
+
+    @property
+    def final_path(self) -> str:
+        return os.path.join(self.directory, f"{self.upload_id}.{self.extension}")
+
+    @property
+    def current_path(self) -> str:
+        """Arquivo parcial ou, após a conclusão, o arquivo final"""
+        return self.part_path if os.path.exists(self.part_path) else self.final_path
+
+    def to_dict(self) -> dict:
+        return {
+            "upload_id": self.upload_id,
+            "filename": self.filename,
+            "size": self.size,
+            "offset": self.offset,
+            "complete": self.offset == self.size,
+            "created_at": self.created_at
+        }
+
+
+class UploadManager:
+    """
+    Recebe vídeos em blocos sem bloquear o event loop
+
+    Cada bloco é gravado e adicionado ao hash SHA-256 em uma thread; o
+    tamanho declarado é validado na criação e imposto byte a byte, e o
+    contêiner é identificado pelos primeiros bytes, antes de receber o resto
+    do arquivo. Uploads interrompidos são retomados a partir de `offset`,
+    inclusive após reinício do servidor (o estado fica em disco).
+    """
+
+    def __init__(
+        self,
+        upload_dir: str = UPLOAD_DIR,
+        max_size: int = MAX_FILE_SIZE,
+        chunk_size: int = UPLOAD_CHUNK_SIZE,
+        storage: Optional[StorageManager] = None
+    ):
+        self.upload_dir = upload_dir
+        self.max_size = max_size
+        self.chunk_size = chunk_size
+        self.storage = storage
+        self.sessions: Dict[str, UploadSession] = {}
+        # Indexações em segundo plano de uploads concluídos (video_id -> tarefa)
+        self.indexing: Dict[str, asyncio.Task] = {}
+
+    def create(self, filename: str, size: int) -> dict:
+        """
+        Inicia um upload
+
+        Args:
+            filename: Nome original do arquivo (define a extensão)
+            size: Tamanho total em bytes
+
+        Returns:
+            Estado do upload, incluindo `upload_id`
+        """
+        if get_file_extension(filename or "") not in ALLOWED_EXTENSIONS:
+            raise UploadError(f"Formato não suportado. Use: {', '.join(ALLOWED_EXTENSIONS)}", 400)
+        if size <= 0:
+            raise UploadError("Tamanho do arquivo inválido", 400)
+        if size > self.max_size:
+            raise UploadError(f"Arquivo excede o limite de {self.max_size} bytes", 413)
+        if self.storage and not self.storage.make_room(size):
+            raise UploadError("Espaço de armazenamento insuficiente", 507)
+
+        os.makedirs(self.upload_dir, exist_ok=True)
+        session = UploadSession(str(uuid.uuid4()), filename, size, self.upload_dir)
+        open(session.part_path, "wb").close()
+        with open(session.session_path, "w") as f:
+            json.dump({"filename": filename, "size": size, "created_at": session.created_at}, f)
+        self.sessions[session.upload_id] = session
+        return session.to_dict()
+
+    def _load(self, upload_id: str) -> Optional[UploadSession]:
+        """Recupera um upload do disco (ex.: após reinício), refazendo o hash parcial"""
+        if not upload_id or os.path.basename(upload_id) != upload_id:
+            return None
+        session_path = os.path.join(self.upload_dir, f"{upload_id}.upload.json")
+        try:
+            with open(session_path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        session = UploadSession(upload_id, data["filename"], data["size"], self.upload_dir)
+        session.created_at = data.get("created_at", session.created_at)
+        try:
+            with open(session.part_path, "rb") as f:
+                head = f.read(SNIFF_BYTES)
+                f.seek(0)
+                for chunk in iter(lambda: f.read(self.chunk_size), b""):
+                    session.hasher.update(chunk)
+                    session.offset += len(chunk)
+        except OSError:
+            return None
+        session.head = head
+        if len(head) >= SNIFF_BYTES:
+            session.container = sniff_container(head)
+        self.sessions[upload_id] = session
+        return session
+
+    def _get(self, upload_id: str) -> UploadSession:
+        session = self.sessions.get(upload_id)
+        if session and not os.path.exists(session.session_path):
+            # Removido pela limpeza de uploads abandonados
+            self.sessions.pop(upload_id, None)
+            session.closed.set()
+            session = None
+        session = session or self._load(upload_id)
+        if session is None:
+            raise UploadError("Upload não encontrado", 404)
+        return session
+
+    async def _get_async(self, upload_id: str) -> UploadSession:
+        """_get sem bloquear o event loop (recuperar do disco refaz o hash do arquivo parcial)"""
+        session = self.sessions.get(upload_id)
+        if session is not None and os.path.exists(session.session_path):
+            return session
+        return await asyncio.to_thread(self._get, upload_id)
+
+    def get_session(self, upload_id: str) -> UploadSession:
+        """Retorna a sessão de um upload em andamento (UploadError 404 se inexistente)"""
+        return self._get(upload_id)
+
+    def status(self, upload_id: str) -> dict:
+        """Retorna o estado de um upload (use `offset` para retomar)"""
+        return self._get(upload_id).to_dict()
+
+    def abort(self, upload_id: str):
+        """Cancela um upload e remove os arquivos parciais"""
+        session = self._get(upload_id)
+        self._discard(session)
+
+    def _discard(self, session: UploadSession):
+        self.sessions.pop(session.upload_id, None)
+        for path in (session.part_path, session.session_path):
+            if os.path.exists(path):
+                os.remove(path)
+        session.closed.set()
+
+    @staticmethod
+    def _write(path: str, hasher, data: bytes):
+        with open(path, "ab") as f:
+            f.write(data)
+        hasher.update(data)
+
+    async def append(self, upload_id: str, offset: int, chunks: AsyncIterator[bytes]) -> dict:
+        """
+        Recebe um trecho do arquivo a partir de `offset`
+
+        Se a conexão cair no meio do trecho, os bytes já gravados são
+        mantidos e o cliente retoma do `offset` informado por status().
+
+        Args:
+            upload_id: ID do upload
+            offset: Posição do primeiro byte enviado (deve ser o offset atual)
+            chunks: Iterador assíncrono com o corpo da requisição
+
+        Returns:
+            Estado do upload
+        """
+        session = await self._get_async(upload_id)
+        if session.lock.locked():
+            raise UploadError("Upload já está recebendo dados", 409)
+
+        if self.storage:
+            self.storage.pin(upload_id)
+        try:
+            return await self._append(session, offset, chunks)
+        finally:
+            if self.storage:
+                self.storage.unpin(upload_id)
+
+    async def _append(self, session: UploadSession, offset: int, chunks: AsyncIterator[bytes]) -> dict:
+        async with session.lock:
+            if offset != session.offset:
+                raise UploadError(f"Offset inválido: esperado {session.offset}", 409)
+
+            buffer = bytearray()
+
+            async def flush():
+                if session.container is None:
+                    # Identificar o contêiner assim que chegam os primeiros bytes
+                    session.head += bytes(buffer[:SNIFF_BYTES - len(session.head)])
+                    if len(session.head) >= SNIFF_BYTES or session.offset + len(buffer) == session.size:
+                        session.container = sniff_container(session.head)
+                        if session.container is None:
+                            await asyncio.to_thread(self._discard, session)
+                            raise UploadError("Conteúdo não é um contêiner de vídeo suportado", 415)
+                data = bytes(buffer)
+                buffer.clear()
+                await asyncio.to_thread(self._write, session.part_path, session.hasher, data)
+                session.offset += len(data)
+
+            try:
+                async for chunk in chunks:
+                    if session.offset + len(buffer) + len(chunk) > session.size:
+                        raise UploadError("Dados excedem o tamanho declarado", 413)
+                    buffer += chunk
+                    if len(buffer) >= self.chunk_size:
+                        await flush()
+            finally:
+                # Conexão interrompida: manter o que já chegou para retomada
+                if buffer and session.upload_id in self.sessions:
+                    await flush()
+
+        return session.to_dict()
+
+    async def finalize(self, upload_id: str) -> dict:
+        """
+        Conclui um upload completo: valida o vídeo e grava os metadados
+
+        A validação decodifica apenas o primeiro frame (ver _probe); o índice
+        de keyframes, que percorre todos os pacotes, é construído em segundo
+        plano (ver _index), sem atrasar a resposta.
+
+        Returns:
+            Metadados do upload (video_id, sha256, video_info...)
+        """
+        session = await self._get_async(upload_id)
+        if session.offset != session.size:
+            raise UploadError(f"Upload incompleto: {session.offset}/{session.size} bytes", 409)
+        if session.container is None:
+            await asyncio.to_thread(self._discard, session)
+            raise UploadError("Conteúdo não é um contêiner de vídeo suportado", 415)
+
+        await asyncio.to_thread(os.replace, session.part_path, session.final_path)
+        video_info = await asyncio.to_thread(self._probe, session.final_path)
+        if video_info is None:
+            await asyncio.to_thread(os.remove, session.final_path)
+            await asyncio.to_thread(self._discard, session)
+            raise UploadError("Arquivo de vídeo inválido ou corrompido", 400)
+
+        meta = {
+            "video_id": session.upload_id,
+            "filename": session.filename,
+            "file_path": session.final_path,
+            "size": session.size,
+            "sha256": session.hasher.hexdigest(),
+            "container": session.container,
+            "video_info": video_info
+        }
+        await asyncio.to_thread(write_upload_meta, session.upload_id, meta, self.upload_dir)
+        session.sha256 = meta["sha256"]
+        await asyncio.to_thread(self._discard, session)
+
+        if self.storage:
+            self.storage.pin(upload_id)
+        task = asyncio.create_task(asyncio.to_thread(self._index, upload_id, session.final_path))
+        self.indexing[upload_id] = task
+        task.add_done_callback(lambda _: self._indexed(upload_id))
+        return meta
+
+    @staticmethod
+    def _probe(file_path: str) -> Optional[dict]:
+        """
+        Valida o vídeo pelo início do arquivo
+
+        O demuxer lê apenas os cabeçalhos e os primeiros megabytes (e, em
+        MP4 com o índice no fim, o `moov`) para decodificar o primeiro frame;
+        o restante do arquivo não é lido.
+
+        Returns:
+            Informações do vídeo ou None se o primeiro frame não decodifica
+        """
+        processor = VideoProcessor()
+        if not processor.open_file(file_path):
+            return None
+        try:
+            ret, _ = processor.cap.read()
+            if not ret or not processor.width or not processor.height:
+                return None
+            return processor.video_info
+        finally:
+            processor.release()
+
+    def _indexed(self, upload_id: str):
+        self.indexing.pop(upload_id, None)
+        if self.storage:
+            self.storage.unpin(upload_id)
+
+    @staticmethod
+    def _index(upload_id: str, file_path: str):
+        """Constrói o índice de keyframes (busca aleatória e análise em segmentos)"""
+        try:
+            if get_keyframe_index(file_path) is None:
+                print(f"Upload {upload_id}: não foi possível indexar o vídeo")
+        except OSError as e:
+            # Ex.: vídeo removido durante a indexação
+            print(f"Erro ao indexar upload {upload_id}: {e}")
+
+
+upload_manager = UploadManager(storage=storage_manager)
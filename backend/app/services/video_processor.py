@@ -1,9 +1,14 @@
 """
 Serviço de processamento de vídeo
 """
+import bisect
+import json
+import os
 import numpy as np
 import cv2
-from typing import Generator, Optional
+import shutil
+import subprocess
+from typing import Generator, List, Optional
 from app.config import FRAME_RESIZE_WIDTH, FRAME_RESIZE_HEIGHT
 
 
@@ -18,6 +23,7 @@ class VideoProcessor:
         self.fps = 0
         self.width = 0
         self.height = 0
+        self.keyframes: List[int] = []  # frames-chave (ver get_keyframe_index)
     
     def open_file(self, file_path: str) -> bool:
         """
@@ -44,6 +50,68 @@ class VideoProcessor:
             print(f"Erro ao abrir vídeo: {e}")
             return False
     
+    def set_keyframe_index(self, index: dict):
+        """
+        Usa um índice de keyframes (get_keyframe_index) para buscas exatas
+        
+        Args:
+            index: Índice persistido do vídeo
+        """
+        self.keyframes = [frame for frame, _ in index.get("keyframes", [])]
+    
+    def seek_frame(self, frame_number: int) -> bool:
+        """
+        Posiciona a leitura em um frame
+        
+        Com índice de keyframes, posiciona no keyframe anterior e avança
+        apenas demultiplexando/decodificando até o frame pedido (grab, sem
+        conversão de cor). Sem índice, delega a busca ao backend do OpenCV.
+        
+        Args:
+            frame_number: Índice do frame (0 = início)
+        
+        Returns:
+            True se o reposicionamento foi aceito
+        """
+        if not self.cap or not self.cap.isOpened():
+            return False
+        frame_number = max(0, frame_number)
+        if frame_number == 0 and self.cap.get(cv2.CAP_PROP_POS_FRAMES) == 0:
+            return True
+        if not self.keyframes:
+            return self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
+        
+        keyframe = self.keyframes[max(0, bisect.bisect_right(self.keyframes, frame_number) - 1)]
+        if not self.cap.set(cv2.CAP_PROP_POS_FRAMES, keyframe):
+            return False
+        for _ in range(frame_number - keyframe):
+            if not self.cap.grab():
+                return False
+        return True
+    
+    def seek_time(self, seconds: float) -> bool:
+        """
+        Posiciona a leitura no frame correspondente a um instante do vídeo
+        
+        Args:
+            seconds: Posição em segundos
+        
+        Returns:
+            True se o reposicionamento foi aceito
+        """
+        return self.seek_frame(int(round(seconds * (self.fps or 30.0))))
+    
+    def read_frame(self) -> Optional[np.ndarray]:
+        """Lê o próximo frame (redimensionado como em get_frames) ou None no fim"""
+        if not self.cap or not self.cap.isOpened():
+            return None
+        ret, frame = self.cap.read()
+        if not ret:
+            return None
+        if self.width > FRAME_RESIZE_WIDTH or self.height > FRAME_RESIZE_HEIGHT:
+            frame = self.resize_frame(frame, FRAME_RESIZE_WIDTH, FRAME_RESIZE_HEIGHT)
+        return frame
+    
     def get_frames(self) -> Generator[np.ndarray, None, None]:
         """
         Generator que retorna frames do vídeo
@@ -111,3 +179,132 @@ class VideoProcessor:
             "width": self.width,
             "height": self.height
         }
+
+
+def probe_keyframes(file_path: str, timeout: float = 60) -> List[float]:
+    """
+    Lista os timestamps (s) dos keyframes do vídeo usando ffprobe
+    
+    Lê apenas os pacotes do container (sem decodificar), por isso é rápido
+    mesmo para arquivos longos.
+    
+    Args:
+        file_path: Caminho do vídeo
+        timeout: Tempo máximo de execução do ffprobe
+    
+    Returns:
+        Timestamps ordenados, ou lista vazia se ffprobe não estiver disponível
+    """
+    if not shutil.which("ffprobe"):
+        return []
+    
+    try:
+        output = subprocess.run(
+            [
+                "ffprobe", "-v", "error", "-select_streams", "v:0",
+                "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", file_path
+            ],
+            capture_output=True, text=True, timeout=timeout, check=True
+        ).stdout
+    except (subprocess.SubprocessError, OSError) as e:
+        print(f"Erro ao listar keyframes de {file_path}: {e}")
+        return []
+    
+    keyframes = []
+    for line in output.splitlines():
+        parts = line.split(",")
+        if len(parts) >= 2 and "K" in parts[1] and parts[0] not in ("", "N/A"):
+            keyframes.append(float(parts[0]))
+    return sorted(keyframes)
+
+
+INDEX_VERSION = 1
+
+
+def keyframe_index_path(file_path: str) -> str:
+    """Caminho do índice de keyframes persistido ao lado do vídeo"""
+    return os.path.splitext(file_path)[0] + ".index.json"
+
+
+def build_keyframe_index(file_path: str) -> Optional[dict]:
+    """
+    Indexa os keyframes do vídeo lendo apenas os pacotes (sem decodificar)
+    
+    Usa o modo de leitura bruta do backend FFmpeg do OpenCV; se a versão do
+    OpenCV não informar keyframes, recorre ao ffprobe.
+    
+    Args:
+        file_path: Caminho do vídeo
+    
+    Returns:
+        Dict com fps, frame_count, duration_s e keyframes ([frame, tempo_s]),
+        ou None se o arquivo não puder ser aberto
+    """
+    cap = cv2.VideoCapture(file_path, cv2.CAP_FFMPEG, [cv2.CAP_PROP_FORMAT, -1])
+    if not cap.isOpened():
+        return None
+    
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    has_key_flag = hasattr(cv2, "CAP_PROP_LRF_HAS_KEY_FRAME")
+    keyframes = []
+    frame_count = 0
+    while cap.grab():
+        if has_key_flag and cap.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME):
+            keyframes.append([frame_count, round(cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0, 3)])
+        frame_count += 1
+    cap.release()
+    
+    if not has_key_flag:
+        keyframes = sorted({
+            int(round(t * fps)): [int(round(t * fps)), round(t, 3)] for t in probe_keyframes(file_path)
+        }.values())
+    # O primeiro frame é sempre um ponto de entrada válido
+    if not keyframes or keyframes[0][0] != 0:
+        keyframes.insert(0, [0, 0.0])
+    
+    return {
+        "version": INDEX_VERSION,
+        "fps": fps,
+        "frame_count": frame_count,
+        "duration_s": round(frame_count / fps, 3),
+        "keyframes": keyframes
+    }
+
+
+def get_keyframe_index(file_path: str) -> Optional[dict]:
+    """
+    Retorna o índice de keyframes do vídeo, construindo-o uma única vez
+    
+    O índice é gravado ao lado do arquivo e reconstruído apenas se o vídeo
+    mudar (tamanho ou mtime diferentes).
+    
+    Args:
+        file_path: Caminho do vídeo
+    
+    Returns:
+        Índice (ver build_keyframe_index) ou None se o vídeo for inválido
+    """
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    source = {"size": stat.st_size, "mtime": stat.st_mtime}
+    index_path = keyframe_index_path(file_path)
+    
+    try:
+        with open(index_path) as f:
+            index = json.load(f)
+        if index.get("version") == INDEX_VERSION and index.get("source") == source:
+            return index
+    except (OSError, ValueError):
+        pass
+    
+    index = build_keyframe_index(file_path)
+    if index is None:
+        return None
+    index["source"] = source
+    tmp_path = index_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(index, f)
+    os.replace(tmp_path, index_path)
+    return index
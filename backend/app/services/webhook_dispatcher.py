@@ -0,0 +1,354 @@
+"""
+Encaminhamento de alertas para webhooks externos (sistemas de incidentes)
+"""
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+import httpx
+
+from app.config import (
+    WEBHOOK_URLS, WEBHOOK_BATCH_SIZE, WEBHOOK_FLUSH_INTERVAL, WEBHOOK_MAX_RETRIES,
+    WEBHOOK_BACKOFF_BASE, WEBHOOK_RETRY_INTERVAL, WEBHOOK_TIMEOUT, WEBHOOK_SPOOL_DIR
+)
+from app.services.alert_bus import AlertBus
+
+
+class WebhookDestination:
+    """
+    Fila de entrega de um único webhook
+
+    Alertas são agrupados em lotes (até `batch_size` ou `flush_interval`).
+    Cada lote é reenviado com backoff exponencial; se todas as tentativas
+    falharem, o lote é gravado em disco e o destino passa a "down". Enquanto
+    houver lotes em disco, novos lotes também vão para o disco (preservando a
+    ordem) e o mais antigo é reenviado a cada `retry_interval`.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        client: httpx.AsyncClient,
+        spool_dir: str,
+        batch_size: int,
+        flush_interval: float,
+        max_retries: int,
+        backoff_base: float,
+        retry_interval: float
+    ):
+        self.url = url
+        self.client = client
+        self.spool_dir = os.path.join(spool_dir, hashlib.sha1(url.encode()).hexdigest()[:12])
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.retry_interval = retry_interval
+
+        self.pending: Deque[Tuple[float, dict]] = deque()  # (enqueued_at, alert)
+        self._has_items = asyncio.Event()
+        self._batch_full = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        # Gravação em disco em andamento (thread), concluída mesmo no stop()
+        self._spilling: Optional[asyncio.Future] = None
+        self._next_retry_at = 0.0
+
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self.spooled_batches = len(self._spool_files())
+
+        self.delivered = 0
+        self.batches_sent = 0
+        self.failed_attempts = 0
+        self.latencies_ms: Deque[float] = deque(maxlen=1000)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Interrompe o envio e grava em disco o que ainda estiver pendente"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        while self.pending:
+            self._spill(self._take(self.batch_size))
+
+    def enqueue(self, alert: dict):
+        """Adiciona alerta à fila de entrega (não bloqueia)"""
+        self.pending.append((time.time(), alert))
+        self._has_items.set()
+        if len(self.pending) >= self.batch_size:
+            self._batch_full.set()
+
+    @property
+    def is_down(self) -> bool:
+        return self.spooled_batches > 0
+
+    def _take(self, n: int) -> List[Tuple[float, dict]]:
+        return [self.pending.popleft() for _ in range(min(n, len(self.pending)))]
+
+    async def _next_batch(self) -> List[Tuple[float, dict]]:
+        """Aguarda um lote cheio ou o fim da janela de agregação"""
+        if not self.pending:
+            self._has_items.clear()
+            # Com lotes em disco, acordar periodicamente para tentar reenviá-los
+            timeout = self.retry_interval if self.is_down else None
+            try:
+                await asyncio.wait_for(self._has_items.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+
+        if len(self.pending) < self.batch_size:
+            self._batch_full.clear()
+            try:
+                await asyncio.wait_for(self._batch_full.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+
+        return self._take(self.batch_size)
+
+    async def _run(self):
+        batch: List[Tuple[float, dict]] = []
+        try:
+            while True:
+                batch = await self._next_batch()
+
+                if self.is_down and not await self._try_recover():
+                    if batch:
+                        await self._spill_in_thread(batch)
+                    batch = []
+                    continue
+
+                if batch and not await self._deliver(batch, self.max_retries):
+                    await self._spill_in_thread(batch)
+                    self._next_retry_at = time.monotonic() + self.retry_interval
+                batch = []
+        except asyncio.CancelledError:
+            # Lote já retirado da fila (em envio ou no backoff): gravar em disco
+            if self._spilling is not None:
+                await self._spilling
+                self._spilling = None
+            elif batch:
+                self._spill(batch)
+            raise
+
+    async def _spill_in_thread(self, batch: List[Tuple[float, dict]]):
+        """Grava o lote em disco fora do event loop (a gravação termina mesmo se a tarefa for cancelada)"""
+        self._spilling = asyncio.ensure_future(asyncio.to_thread(self._spill, batch))
+        await asyncio.shield(self._spilling)
+        self._spilling = None
+
+    async def _try_recover(self) -> bool:
+        """Tenta esvaziar a fila em disco, no máximo uma vez por retry_interval"""
+        if time.monotonic() < self._next_retry_at:
+            return False
+        if await self._drain_spool():
+            return True
+        self._next_retry_at = time.monotonic() + self.retry_interval
+        return False
+
+    async def _deliver(self, batch: List[Tuple[float, dict]], retries: int) -> bool:
+        """Envia lote com até `retries` novas tentativas em backoff exponencial"""
+        payload = {"source": "ppe-detection-api", "alerts": [alert for _, alert in batch]}
+
+        for attempt in range(retries + 1):
+            try:
+                response = await self.client.post(self.url, json=payload)
+                if response.is_success:
+                    now = time.time()
+                    self.latencies_ms.extend((now - enqueued_at) * 1000 for enqueued_at, _ in batch)
+                    self.delivered += len(batch)
+                    self.batches_sent += 1
+                    return True
+                print(f"Webhook {self.url} respondeu {response.status_code}")
+            except httpx.HTTPError as e:
+                print(f"Erro ao enviar webhook {self.url}: {e}")
+
+            self.failed_attempts += 1
+            if attempt < retries:
+                await asyncio.sleep(self.backoff_base * (2 ** attempt))
+
+        return False
+
+    # Fila em disco
+
+    def _spool_files(self) -> List[str]:
+        return sorted(f for f in os.listdir(self.spool_dir) if f.endswith(".json"))
+
+    def _spill(self, batch: List[Tuple[float, dict]]):
+        """Grava lote em disco (nome ordenável por tempo de gravação)"""
+        path = os.path.join(self.spool_dir, f"{time.time_ns():020d}.json")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(batch, f)
+        os.replace(tmp_path, path)
+        self.spooled_batches += 1
+
+    def _load_spooled(self, path: str) -> Optional[List[Tuple[float, dict]]]:
+        """
+        Lê um lote gravado em disco
+
+        Returns:
+            None se o arquivo está corrompido ou incompleto; ele é movido
+            para `.bad` (fora da fila) para não bloquear os lotes seguintes
+        """
+        try:
+            with open(path) as f:
+                return [(float(enqueued_at), alert) for enqueued_at, alert in json.load(f)]
+        except (OSError, ValueError, TypeError) as e:
+            print(f"Lote inválido na fila em disco de {self.url} ({os.path.basename(path)}): {e}")
+            try:
+                os.replace(path, path + ".bad")
+            except OSError:
+                pass
+            return None
+
+    async def _drain_spool(self) -> bool:
+        """
+        Reenvia lotes gravados em disco, do mais antigo ao mais novo
+
+        Returns:
+            True se a fila em disco foi totalmente esvaziada
+        """
+        for name in await asyncio.to_thread(self._spool_files):
+            path = os.path.join(self.spool_dir, name)
+            batch = await asyncio.to_thread(self._load_spooled, path)
+            if batch is None:
+                self.spooled_batches -= 1
+                continue
+
+            # Uma única tentativa: o ritmo de reenvio é dado por retry_interval
+            if not await self._deliver(batch, retries=0):
+                return False
+
+            await asyncio.to_thread(os.remove, path)
+            self.spooled_batches -= 1
+
+        self.spooled_batches = 0
+        return True
+
+    def get_stats(self) -> dict:
+        """Métricas de entrega do destino"""
+        latencies = sorted(self.latencies_ms)
+
+        def percentile(p: float) -> float:
+            if not latencies:
+                return 0.0
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 2)
+
+        return {
+            "url": self.url,
+            "status": "down" if self.is_down else "ok",
+            "queue_depth": len(self.pending),
+            "spooled_batches": self.spooled_batches,
+            "delivered": self.delivered,
+            "batches_sent": self.batches_sent,
+            "failed_attempts": self.failed_attempts,
+            "latency_ms": {
+                "p50": percentile(0.50),
+                "p95": percentile(0.95),
+                "max": round(latencies[-1], 2) if latencies else 0.0
+            }
+        }
+
+
+class WebhookDispatcher:
+    """
+    Assina o barramento de alertas e distribui cada alerta para todos os
+    webhooks configurados, usando um único cliente HTTP com keep-alive
+    """
+
+    def __init__(
+        self,
+        urls: List[str] = None,
+        batch_size: int = WEBHOOK_BATCH_SIZE,
+        flush_interval: float = WEBHOOK_FLUSH_INTERVAL,
+        max_retries: int = WEBHOOK_MAX_RETRIES,
+        backoff_base: float = WEBHOOK_BACKOFF_BASE,
+        retry_interval: float = WEBHOOK_RETRY_INTERVAL,
+        timeout: float = WEBHOOK_TIMEOUT,
+        spool_dir: str = WEBHOOK_SPOOL_DIR
+    ):
+        self.urls = urls if urls is not None else WEBHOOK_URLS
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.retry_interval = retry_interval
+        self.timeout = timeout
+        self.spool_dir = spool_dir
+
+        self.destinations: Dict[str, WebhookDestination] = {}
+        self.client: Optional[httpx.AsyncClient] = None
+        self._bus: Optional[AlertBus] = None
+        self._consumer: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.urls)
+
+    async def start(self, bus: AlertBus = None):
+        """
+        Cria o pool HTTP, inicia os destinos e (opcionalmente) assina o barramento
+
+        Args:
+            bus: Barramento de alertas; sem ele, use enqueue() diretamente
+        """
+        self.client = httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=len(self.urls) * 2, max_keepalive_connections=len(self.urls) * 2)
+        )
+        for url in self.urls:
+            destination = WebhookDestination(
+                url, self.client, self.spool_dir, self.batch_size, self.flush_interval,
+                self.max_retries, self.backoff_base, self.retry_interval
+            )
+            destination.start()
+            self.destinations[url] = destination
+
+        if bus is not None:
+            self._bus = bus
+            # Fila grande: o consumidor apenas repassa para as filas dos destinos
+            subscription = bus.subscribe("webhook_dispatcher", queue_size=10000)
+            self._consumer = asyncio.create_task(self._consume(subscription))
+
+    async def _consume(self, subscription):
+        while True:
+            self.enqueue(await subscription.queue.get())
+
+    def enqueue(self, alert: dict):
+        """Encaminha alerta para todos os destinos"""
+        for destination in self.destinations.values():
+            destination.enqueue(alert)
+
+    async def stop(self):
+        """Encerra entregas, gravando pendências em disco para o próximo início"""
+        if self._consumer:
+            self._consumer.cancel()
+            self._consumer = None
+        if self._bus:
+            self._bus.unsubscribe("webhook_dispatcher")
+            self._bus = None
+        for destination in self.destinations.values():
+            await destination.stop()
+        self.destinations = {}
+        if self.client:
+            await self.client.aclose()
+            self.client = None
+
+    def get_stats(self) -> dict:
+        """Métricas de todos os destinos"""
+        return {
+            "enabled": self.enabled,
+            "destinations": [d.get_stats() for d in self.destinations.values()]
+        }
+
+
+webhook_dispatcher = WebhookDispatcher()
@@ -3,7 +3,7 @@ Utilitário para anotação de frames com bounding boxes
 """
 import numpy as np
 import cv2
-from typing import List, Tuple
+from typing import Dict, List, Optional, Tuple
 
 
 class FrameAnnotator:
@@ -30,6 +30,12 @@ class FrameAnnotator:
     
     DEFAULT_COLOR = (128, 128, 128)  # Cinza para classes desconhecidas
     
+    # Limite de labels renderizados em cache (classe x confiança arredondada)
+    SPRITE_CACHE_SIZE = 1024
+    
+    # Compartilhado entre instâncias: os labels são os mesmos em todas as streams
+    _sprites: Dict[Tuple, Tuple[int, int, np.ndarray, np.ndarray]] = {}
+    
     def __init__(self):
         self.font_scale = 0.6
         self.font_thickness = 2
@@ -41,7 +47,8 @@ class FrameAnnotator:
         frame: np.ndarray, 
         detections: List[dict],
         show_labels: bool = True,
-        show_confidence: bool = True
+        show_confidence: bool = True,
+        in_place: bool = False
     ) -> np.ndarray:
         """
         Desenha bounding boxes e labels no frame
@@ -51,20 +58,27 @@ class FrameAnnotator:
             detections: Lista de detecções com class_name, confidence, bbox
             show_labels: Mostrar labels das classes
             show_confidence: Mostrar valores de confiança
+            in_place: Desenhar diretamente em `frame` (o chamador é dono do
+                buffer). Caso contrário, o frame original não é alterado e é
+                copiado apenas se houver algo a desenhar.
         
         Returns:
-            Frame anotado
+            Frame anotado (o próprio `frame` se in_place ou sem detecções)
         """
-        annotated = frame.copy()
+        annotated = frame
+        copied = in_place
         
         for det in detections:
-            class_name = det.get('class_name', 'Unknown')
-            confidence = det.get('confidence', 0.0)
             bbox = det.get('bbox', [])
             
             if len(bbox) != 4:
                 continue
+            
+            if not copied:
+                annotated = frame.copy()
+                copied = True
                 
+            class_name = det.get('class_name', 'Unknown')
             x1, y1, x2, y2 = bbox
             color = self.COLORS.get(class_name, self.DEFAULT_COLOR)
             
@@ -72,22 +86,94 @@ class FrameAnnotator:
             cv2.rectangle(annotated, (x1, y1), (x2, y2), color, self.box_thickness)
             
             if show_labels:
-                label = class_name
-                if show_confidence:
-                    label += f" {confidence:.2f}"
-                
-                # Tamanho do texto para fundo
-                (w, h), _ = cv2.getTextSize(label, self.font, self.font_scale, self.font_thickness)
-                
-                # Fundo do texto
-                cv2.rectangle(annotated, (x1, y1 - 20), (x1 + w, y1), color, -1)
-                
-                # Texto
-                text_color = (255, 255, 255) if sum(color) < 400 else (0, 0, 0)
-                cv2.putText(annotated, label, (x1, y1 - 5), self.font, self.font_scale, text_color, self.font_thickness)
+                confidence = round(float(det.get('confidence', 0.0)), 2) if show_confidence else None
+                self._paste_sprite(annotated, self._label_sprite(class_name, confidence), int(x1), int(y1))
                 
         return annotated
     
+    def _label_sprite(self, class_name: str, confidence: Optional[float]) -> Tuple[int, int, np.ndarray, np.ndarray]:
+        """
+        Label (fundo + texto) renderizado uma vez por classe e confiança
+        
+        Returns:
+            (deslocamento x, deslocamento y em relação ao canto da caixa,
+            pixels BGR, máscara dos pixels desenhados)
+        """
+        key = (class_name, confidence, self.font, self.font_scale, self.font_thickness)
+        sprite = self._sprites.get(key)
+        if sprite is not None:
+            return sprite
+        
+        label = class_name if confidence is None else f"{class_name} {confidence:.2f}"
+        color = self.COLORS.get(class_name, self.DEFAULT_COLOR)
+        text_color = (255, 255, 255) if sum(color) < 400 else (0, 0, 0)
+        (w, h), baseline = cv2.getTextSize(label, self.font, self.font_scale, self.font_thickness)
+        
+        # Tela com margem para o traço e as descendentes do texto; origem = canto da caixa
+        pad = self.font_thickness + 4
+        ox, oy = pad, 20 + pad
+        image = np.zeros((20 + baseline + 2 * pad, w + 2 * pad, 3), dtype=np.uint8)
+        mask = np.zeros(image.shape[:2], dtype=np.uint8)
+        for canvas, fill, ink in ((image, color, text_color), (mask, 255, 255)):
+            cv2.rectangle(canvas, (ox, oy - 20), (ox + w, oy), fill, -1)
+            cv2.putText(canvas, label, (ox, oy - 5), self.font, self.font_scale, ink, self.font_thickness)
+        
+        ys, xs = np.nonzero(mask)
+        top, bottom, left, right = ys.min(), ys.max() + 1, xs.min(), xs.max() + 1
+        sprite = (
+            int(left - ox), int(top - oy),
+            np.ascontiguousarray(image[top:bottom, left:right]),
+            # Máscara com os 3 canais: copyto com máscara broadcast é ~7x mais lento
+            np.repeat(mask[top:bottom, left:right, None] > 0, 3, axis=2)
+        )
+        if len(self._sprites) >= self.SPRITE_CACHE_SIZE:
+            self._sprites.clear()
+        self._sprites[key] = sprite
+        return sprite
+    
+    @staticmethod
+    def _paste_sprite(frame: np.ndarray, sprite: Tuple[int, int, np.ndarray, np.ndarray], x: int, y: int):
+        """Copia os pixels desenhados do sprite para o frame, recortando nas bordas"""
+        dx, dy, image, mask = sprite
+        sh, sw = image.shape[:2]
+        fh, fw = frame.shape[:2]
+        x0, y0 = x + dx, y + dy
+        fx0, fy0 = max(x0, 0), max(y0, 0)
+        fx1, fy1 = min(x0 + sw, fw), min(y0 + sh, fh)
+        if fx0 >= fx1 or fy0 >= fy1:
+            return
+        sx, sy = fx0 - x0, fy0 - y0
+        np.copyto(
+            frame[fy0:fy1, fx0:fx1],
+            image[sy:sy + fy1 - fy0, sx:sx + fx1 - fx0],
+            where=mask[sy:sy + fy1 - fy0, sx:sx + fx1 - fx0]
+        )
+    
+    @staticmethod
+    def _blend_roi(frame: np.ndarray, rect: Tuple[int, int, int, int], draw, alpha: float):
+        """
+        Desenha em uma cópia da região e a mistura de volta no frame
+        
+        Equivale a desenhar em uma cópia do frame inteiro e misturar tudo, já
+        que os pixels não desenhados permanecem iguais após a mistura.
+        
+        Args:
+            frame: Frame alterado in-place
+            rect: Região (x1, y1, x2, y2), recortada nas bordas do frame
+            draw: Função que desenha na cópia da região, recebendo (roi, x1, y1)
+                para converter coordenadas do frame
+            alpha: Peso do desenho na mistura
+        """
+        h, w = frame.shape[:2]
+        x1, y1 = max(rect[0], 0), max(rect[1], 0)
+        x2, y2 = min(rect[2], w), min(rect[3], h)
+        if x1 >= x2 or y1 >= y2:
+            return
+        roi = frame[y1:y2, x1:x2]
+        overlay = roi.copy()
+        draw(overlay, x1, y1)
+        cv2.addWeighted(overlay, alpha, roi, 1 - alpha, 0, roi)
+    
     def draw_alert_overlay(
         self, 
         frame: np.ndarray, 
@@ -98,7 +184,7 @@ class FrameAnnotator:
         Adiciona overlay de alerta quando há violações
         
         Args:
-            frame: Frame de vídeo
+            frame: Frame de vídeo (alterado in-place)
             violations: Lista de violações detectadas
             alpha: Transparência do overlay
         
@@ -108,21 +194,33 @@ class FrameAnnotator:
         if not violations:
             return frame
             
-        overlay = frame.copy()
         h, w = frame.shape[:2]
-        
-        # Desenhar borda vermelha grossa
-        cv2.rectangle(overlay, (0, 0), (w, h), (0, 0, 255), 20)
-        
-        # Adicionar texto de alerta piscante (simulado aqui apenas com texto fixo)
         text = f"ALERTA: {len(violations)} VIOLACOES DETECTADAS"
-        (tw, th), _ = cv2.getTextSize(text, self.font, 1.0, 2)
+        (tw, th), baseline = cv2.getTextSize(text, self.font, 1.0, 2)
         
-        cv2.rectangle(overlay, (w//2 - tw//2 - 10, 50 - th - 10), (w//2 + tw//2 + 10, 50 + 10), (0, 0, 255), -1)
-        cv2.putText(overlay, text, (w//2 - tw//2, 50), self.font, 1.0, (255, 255, 255), 2)
+        def draw(roi, ox, oy):
+            # Borda vermelha grossa
+            cv2.rectangle(roi, (-ox, -oy), (w - ox, h - oy), (0, 0, 255), 20)
+            # Texto de alerta (simulado aqui apenas com texto fixo)
+            cv2.rectangle(roi, (w//2 - tw//2 - 10 - ox, 50 - th - 10 - oy), (w//2 + tw//2 + 10 - ox, 50 + 10 - oy), (0, 0, 255), -1)
+            cv2.putText(roi, text, (w//2 - tw//2 - ox, 50 - oy), self.font, 1.0, (255, 255, 255), 2)
         
-        # Aplicar transparência
-        cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0, frame)
+        # Apenas as faixas da borda e a caixa do texto são misturadas, em
+        # regiões disjuntas (um pixel misturado duas vezes ficaria mais escuro)
+        border = 12
+        bottom = max(border, h - border)
+        tx1, tx2 = w//2 - tw//2 - 12, w//2 + tw//2 + 12
+        ty1, ty2 = max(50 - th - 12, border), min(50 + max(10, baseline) + 2, bottom)
+        side_rows = [(border, bottom)]
+        if tx1 < border or tx2 > w - border:
+            # Texto mais largo que o frame: a faixa do texto ocupa toda a largura
+            tx1, tx2 = 0, w
+            side_rows = [(border, ty1), (ty2, bottom)]
+        rects = [(0, 0, w, border), (0, bottom, w, h), (tx1, ty1, tx2, ty2)]
+        for r1, r2 in side_rows:
+            rects += [(0, r1, border, r2), (w - border, r1, w, r2)]
+        for rect in rects:
+            self._blend_roi(frame, rect, draw, alpha)
         
         return frame
     
@@ -136,32 +234,34 @@ class FrameAnnotator:
         Adiciona overlay com estatísticas no frame
         
         Args:
-            frame: Frame de vídeo
+            frame: Frame de vídeo (alterado in-place)
             stats: Estatísticas para exibir
             position: Posição do overlay
         
         Returns:
             Frame com overlay de estatísticas
         """
-        overlay = frame.copy()
-        
         lines = [
             f"Total Detections: {stats.get('total_detections', 0)}",
             f"Violations: {stats.get('violations_count', 0)}",
             f"FPS: {stats.get('fps', 0):.1f}"
         ]
+        sizes = [cv2.getTextSize(line, self.font, 0.6, 1) for line in lines]
         
-        x, y = 10, 30
+        x, y0 = 10, 30
         
-        for line in lines:
-            # Fundo semi-transparente para texto
-            (w, h), _ = cv2.getTextSize(line, self.font, 0.6, 1)
-            cv2.rectangle(overlay, (x - 5, y - h - 5), (x + w + 5, y + 5), (0, 0, 0), -1)
-            
-            cv2.putText(overlay, line, (x, y), self.font, 0.6, (255, 255, 255), 1)
-            y += 30
-            
-        # Aplicar transparência apenas no fundo do texto seria ideal, mas aqui aplicamos direto
-        cv2.addWeighted(overlay, 0.6, frame, 0.4, 0, frame)
+        def draw(roi, ox, oy):
+            y = y0
+            for line, ((w, h), _) in zip(lines, sizes):
+                # Fundo semi-transparente para texto
+                cv2.rectangle(roi, (x - 5 - ox, y - h - 5 - oy), (x + w + 5 - ox, y + 5 - oy), (0, 0, 0), -1)
+                cv2.putText(roi, line, (x - ox, y - oy), self.font, 0.6, (255, 255, 255), 1)
+                y += 30
+        
+        # Mistura apenas a região dos textos
+        width = max(w for (w, _), _ in sizes)
+        top = y0 - max(h for (_, h), _ in sizes) - 6
+        bottom = y0 + 30 * (len(lines) - 1) + max(5, max(b for _, b in sizes)) + 2
+        self._blend_roi(frame, (x - 6, top, x + width + 6, bottom), draw, 0.6)
         
         return frame
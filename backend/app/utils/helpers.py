@@ -2,9 +2,11 @@
 Funções auxiliares
 """
 import base64
+import json
 import numpy as np
 from typing import Optional
 import os
+from app.config import ALLOWED_EXTENSIONS, UPLOAD_DIR
 
 
 def frame_to_base64(frame: np.ndarray, format: str = "jpeg") -> str:
@@ -63,6 +65,60 @@ def get_file_extension(filename: str) -> str:
     return ""
 
 
+def find_upload(video_id: str, directory: str = UPLOAD_DIR) -> Optional[str]:
+    """
+    Localiza o arquivo de um vídeo enviado pelo seu ID
+    
+    Args:
+        video_id: ID retornado pelo upload
+        directory: Diretório dos uploads
+    
+    Returns:
+        Caminho do arquivo ou None
+    """
+    import glob
+    # Evitar que o ID seja usado para sair do diretório
+    if not video_id or os.path.basename(video_id) != video_id:
+        return None
+    # Ignorar arquivos auxiliares (metadados, índices) com o mesmo prefixo
+    for path in glob.glob(os.path.join(directory, f"{glob.escape(video_id)}.*")):
+        if get_file_extension(path) in ALLOWED_EXTENSIONS:
+            return path
+    return None
+
+
+def upload_meta_path(video_id: str, directory: str = UPLOAD_DIR) -> str:
+    """Caminho do arquivo de metadados de um upload"""
+    return os.path.join(directory, f"{video_id}.meta.json")
+
+
+def write_upload_meta(video_id: str, meta: dict, directory: str = UPLOAD_DIR):
+    """
+    Grava metadados de um upload ao lado do arquivo de vídeo
+    
+    Args:
+        video_id: ID do upload
+        meta: Metadados (hash, tamanho, informações do vídeo...)
+        directory: Diretório dos uploads
+    """
+    with open(upload_meta_path(video_id, directory), "w") as f:
+        json.dump(meta, f)
+
+
+def read_upload_meta(video_id: str, directory: str = UPLOAD_DIR) -> Optional[dict]:
+    """
+    Lê metadados de um upload
+    
+    Returns:
+        Dict de metadados ou None se inexistente
+    """
+    try:
+        with open(upload_meta_path(video_id, directory)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
 def ensure_dir(directory: str) -> bool:
     """
     Garante que diretório existe, criando se necessário
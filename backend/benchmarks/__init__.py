@@ -0,0 +1 @@
+# Benchmarks do pipeline (ver docs/benchmarks.md)
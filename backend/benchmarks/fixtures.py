@@ -0,0 +1,346 @@
+"""
+Fontes sintéticas, detector determinístico e clientes simulados para benchmarks
+"""
+import json
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from app.services.detector import PPEDetector
+
+# Classes sorteadas pelo StubDetector, metade delas violações
+STUB_CLASSES = ["Person", "Hardhat", "NO-Hardhat", "Safety Vest", "NO-Safety Vest", "NO-Mask"]
+
+
+def synthetic_frames(count: int, width: int = 1280, height: int = 720, seed: int = 0) -> List[np.ndarray]:
+    """
+    Gera frames determinísticos: fundo com ruído fixo e retângulos em movimento
+
+    O conteúdo varia entre frames (compressão JPEG e redimensionamento têm
+    custo realista), mas é idêntico entre execuções.
+
+    Args:
+        count: Número de frames (reproduzidos em ciclo pelas fontes)
+        width: Largura
+        height: Altura
+        seed: Semente do ruído e das trajetórias
+    """
+    rng = np.random.default_rng(seed)
+    background = rng.integers(40, 90, size=(height, width, 3), dtype=np.uint8)
+    boxes = rng.integers(0, min(width, height) // 2, size=(6, 4))
+    frames = []
+    for i in range(count):
+        frame = background.copy()
+        for j, (x, y, dx, dy) in enumerate(boxes):
+            cx = int((x + i * (dx % 9 + 1)) % (width - 80))
+            cy = int((y + i * (dy % 7 + 1)) % (height - 160))
+            color = (50 * j % 255, 120, 255 - 40 * j % 255)
+            cv2.rectangle(frame, (cx, cy), (cx + 80, cy + 160), color, -1)
+        frames.append(frame)
+    return frames
+
+
+def write_synthetic_video(path: str, frames: List[np.ndarray], fps: float = 30.0, repeat: int = 1):
+    """Grava os frames em um arquivo (reproduzidos `repeat` vezes)"""
+    height, width = frames[0].shape[:2]
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (width, height))
+    for _ in range(repeat):
+        for frame in frames:
+            writer.write(frame)
+    writer.release()
+
+
+def small_object_frames(
+    count: int,
+    width: int = 3840,
+    height: int = 2160,
+    objects: int = 30,
+    sizes: Tuple[int, int] = (8, 48),
+    seed: int = 0
+) -> List[Tuple[np.ndarray, List[List[int]]]]:
+    """
+    Gera frames de alta resolução com objetos pequenos e suas caixas reais
+
+    Os objetos (retângulos claros de proporção 1:2, como pessoas distantes)
+    ficam sobre um fundo escuro com ruído; servem de ground truth para
+    medir o recall do BlobDetector.
+
+    Args:
+        count: Número de frames
+        width: Largura
+        height: Altura
+        objects: Objetos por frame
+        sizes: Faixa da largura dos objetos, em pixels do frame
+        seed: Semente do ruído e das posições
+
+    Returns:
+        Lista de (frame, caixas [x1, y1, x2, y2])
+    """
+    rng = np.random.default_rng(seed)
+    background = rng.integers(20, 70, size=(height, width, 3), dtype=np.uint8)
+    samples = []
+    for _ in range(count):
+        frame = background.copy()
+        boxes: List[List[int]] = []
+        while len(boxes) < objects:
+            w = int(rng.integers(sizes[0], sizes[1] + 1))
+            h = 2 * w
+            x = int(rng.integers(0, width - w))
+            y = int(rng.integers(0, height - h))
+            # Objetos separados (um componente conexo por objeto)
+            if any(x < b[2] + 4 and b[0] < x + w + 4 and y < b[3] + 4 and b[1] < y + h + 4 for b in boxes):
+                continue
+            frame[y:y + h, x:x + w] = 230
+            boxes.append([x, y, x + w, y + h])
+        samples.append((frame, boxes))
+    return samples
+
+
+def synthetic_detections(count: int, width: int = 1280, height: int = 720, seed: int = 0, jitter: int = 0) -> List[dict]:
+    """
+    Gera detecções determinísticas no formato do detector
+
+    Args:
+        count: Número de caixas
+        width: Largura do frame
+        height: Altura do frame
+        seed: Semente das posições e classes
+        jitter: Deslocamento aleatório (pixels) aplicado às caixas, para
+            simular o movimento entre frames consecutivos
+    """
+    rng = np.random.default_rng(seed)
+    base = np.random.default_rng(0)
+    detections = []
+    for i in range(count):
+        w = int(base.integers(40, max(41, width // 6)))
+        h = int(base.integers(80, max(81, height // 3)))
+        x = int(base.integers(0, width - w)) + int(rng.integers(-jitter, jitter + 1))
+        y = int(base.integers(21, height - h)) + int(rng.integers(-jitter, jitter + 1))
+        x, y = min(max(x, 0), width - w), min(max(y, 21), height - h)
+        detections.append({
+            "class_name": STUB_CLASSES[i % len(STUB_CLASSES)],
+            "confidence": round(0.5 + (i % 5) / 10, 2),
+            "bbox": [x, y, x + w, y + h]
+        })
+    return detections
+
+
+class SyntheticStream:
+    """
+    Stream de entrada simulada, registrada no StreamHandler como uma stream RTMP
+
+    Uma thread publica os frames em ciclo na taxa da fonte pelo mesmo
+    StreamHandler.publish da thread de leitura real (incluindo o anel de
+    memória compartilhada, se ativo).
+    """
+
+    def __init__(self, stream_handler, stream_id: str, frames: List[np.ndarray], fps: float = 30.0, config: Optional[dict] = None):
+        self.stream_handler = stream_handler
+        self.stream_id = stream_id
+        self.url = f"rtmp://benchmark/{stream_id}"
+        self.frames = frames
+        self.fps = fps
+        self.config = config
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self.stream_handler.active_streams[self.stream_id] = {
+            "url": self.url,
+            "protocol": "rtmp",
+            "config": {"criticality": "normal", **(self.config or {})},
+            "status": "active",
+            "cap": None,
+            "latest": None,
+            "frames_read": 0,
+            "reconnect_count": 0,
+            "reconnects_total": 0,
+            "stop_signal": False,
+            "thread": None
+        }
+        self._thread = threading.Thread(target=self._run, name=f"synthetic-{self.stream_id}", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        stream = self.stream_handler.active_streams[self.stream_id]
+        interval = 1.0 / self.fps
+        next_frame = time.perf_counter()
+        while not self._stop.is_set():
+            frame = self.frames[(stream["frames_read"] + 1) % len(self.frames)]
+            self.stream_handler.publish(self.stream_id, frame)
+            next_frame += interval
+            self._stop.wait(max(0.0, next_frame - time.perf_counter()))
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.stream_handler.close_ring(self.stream_id)
+        self.stream_handler.active_streams.pop(self.stream_id, None)
+
+
+class LoopedFileStream(SyntheticStream):
+    """
+    Câmera simulada que decodifica um arquivo local em ciclo
+
+    Inclui o custo real de decodificação (como a thread de leitura de uma
+    stream RTMP/SRT) e publica na taxa nativa do arquivo.
+    """
+
+    def __init__(self, stream_handler, stream_id: str, video_path: str, fps: Optional[float] = None):
+        super().__init__(stream_handler, stream_id, [], fps or 0.0)
+        self.video_path = video_path
+
+    def _run(self):
+        stream = self.stream_handler.active_streams[self.stream_id]
+        cap = cv2.VideoCapture(self.video_path)
+        interval = 1.0 / (self.fps or cap.get(cv2.CAP_PROP_FPS) or 30.0)
+        next_frame = time.perf_counter()
+        try:
+            while not self._stop.is_set():
+                ret, frame = cap.read()
+                if not ret:
+                    # Fim do arquivo: recomeçar
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    ret, frame = cap.read()
+                    if not ret:
+                        stream["status"] = "failed"
+                        break
+                self.stream_handler.publish(self.stream_id, frame)
+                next_frame += interval
+                self._stop.wait(max(0.0, next_frame - time.perf_counter()))
+        finally:
+            cap.release()
+
+
+class StubDetector(PPEDetector):
+    """
+    Detector sem modelo, determinístico
+
+    A latência é simulada com sleep (bloqueando como a inferência real) e
+    as caixas dependem apenas do número da chamada.
+    """
+
+    latency_ms = 20.0
+    boxes = 4
+
+    def load_model(self):
+        self._model_loaded = True
+
+    def _stub_detections(self, frame: np.ndarray, n: int) -> List[dict]:
+        height, width = frame.shape[:2]
+        detections = []
+        for i in range(self.boxes):
+            x = (37 * (n + i * 11)) % max(1, width - 60)
+            y = (53 * (n + i * 7)) % max(1, height - 120)
+            detections.append({
+                "class_name": STUB_CLASSES[(n + i) % len(STUB_CLASSES)],
+                "confidence": 0.5 + ((n + i) % 5) / 10,
+                "bbox": [x, y, x + 60, y + 120]
+            })
+        return detections
+
+    def detect(self, frame, selected_classes=None, confidence_threshold=None):
+        start = time.time()
+        self._calls = getattr(self, "_calls", 0) + 1
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        detections = self._stub_detections(frame, self._calls)
+        return self._build_result(detections, selected_classes, (time.time() - start) * 1000)
+
+    def detect_batch(self, frames, selected_classes=None, confidence_threshold=None):
+        return [self.detect(frame, selected_classes) for frame in frames]
+
+
+class BlobDetector(PPEDetector):
+    """
+    Detector sem modelo que enxerga objetos claros a partir de um tamanho mínimo
+
+    Como o YOLO, reduz a imagem até a resolução do modelo antes de
+    detectar; objetos com menos de `min_size` pixels (lado menor) na
+    resolução do modelo não são encontrados. A latência simulada é a de
+    uma imagem (`latency_ms`); em lote, cada imagem extra custa
+    `batch_cost` da latência de uma (1.0: sem ganho, como em CPU).
+    """
+
+    model_size = 640
+    min_size = 6
+    threshold = 140
+
+    def __init__(self, latency_ms: float = 20.0, batch_cost: float = 1.0):
+        super().__init__()
+        self.latency_ms = latency_ms
+        self.batch_cost = batch_cost
+        self.model_calls = 0
+
+    def load_model(self):
+        self._model_loaded = True
+
+    def _find(self, frame: np.ndarray) -> List[dict]:
+        scale = min(1.0, self.model_size / max(frame.shape[:2]))
+        if scale < 1.0:
+            size = (max(1, round(frame.shape[1] * scale)), max(1, round(frame.shape[0] * scale)))
+            frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        _, mask = cv2.threshold(gray, self.threshold, 255, cv2.THRESH_BINARY)
+        count, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+        detections = []
+        for x, y, w, h, _ in stats[1:count]:
+            if min(w, h) < self.min_size:
+                continue
+            detections.append({
+                "class_name": "Person",
+                "confidence": round(min(0.99, 0.5 + min(w, h) / 100), 2),
+                "bbox": [int(round(v / scale)) for v in (x, y, x + w, y + h)]
+            })
+        return detections
+
+    def detect(self, frame, selected_classes=None, confidence_threshold=None):
+        return self.detect_batch([frame], selected_classes)[0]
+
+    def detect_batch(self, frames, selected_classes=None, confidence_threshold=None):
+        if not frames:
+            return []
+        start = time.time()
+        self.model_calls += 1
+        parsed = [self._find(frame) for frame in frames]
+        if self.latency_ms:
+            time.sleep(self.latency_ms * (1 + (len(frames) - 1) * self.batch_cost) / 1000)
+        processing_time = (time.time() - start) * 1000 / len(frames)
+        return [self._build_result(detections, selected_classes, processing_time) for detections in parsed]
+
+
+def stub_detector(latency_ms: float, boxes: int) -> type:
+    """Subclasse do StubDetector com latência e número de caixas fixos"""
+    return type("StubDetector", (StubDetector,), {"latency_ms": latency_ms, "boxes": boxes})
+
+
+class FakeViewer:
+    """
+    Cliente WebSocket simulado: aceita tudo o que o servidor envia
+
+    Implementa apenas o send_text usado pelo ConnectionManager e contabiliza
+    mensagens, bytes e a idade dos frames recebidos, sem decodificar o JSON
+    dos frames (o custo ficaria no mesmo processo medido).
+    """
+
+    def __init__(self):
+        self.messages: Dict[str, int] = {}
+        self.bytes_received = 0
+        self.frame_ages: List[float] = []
+
+    async def send_text(self, text: str):
+        self.bytes_received += len(text)
+        # Mensagens começam com {"type":"<tipo>"
+        kind = text[9:text.find('"', 9)] if text.startswith('{"type":"') else "other"
+        self.messages[kind] = self.messages.get(kind, 0) + 1
+        if kind == "frame":
+            pos = text.rfind('"age_ms":')
+            if pos != -1:
+                self.frame_ages.append(float(text[pos + 9:].rstrip("}")))
+
+    async def send_json(self, message: dict):
+        await self.send_text(json.dumps(message, separators=(",", ":")))
@@ -0,0 +1,403 @@
+"""
+Gerador de carga: muitas câmeras simuladas no caminho de streams
+
+Publica arquivos de vídeo locais em ciclo como streams simultâneas,
+aumentando a quantidade em degraus, e mede em cada degrau FPS por stream,
+frames descartados, reconexões, CPU, memória e idade dos frames. O
+resultado é uma curva de capacidade: o maior número de streams que ainda
+atende aos limites de FPS e latência.
+
+Modos:
+    inprocess  Câmeras decodificam o arquivo dentro do processo e publicam
+               no StreamHandler; pipelines e clientes WebSocket simulados
+               (não requer servidor nem media server)
+    server     Um ffmpeg por câmera publica no media server (MediaMTX do
+               docker-compose); as streams são registradas na API em
+               execução e consumidas por clientes WebSocket reais
+
+Uso:
+    python -m benchmarks.loadgen --video camera.mp4 --ramp 1,2,4,8,16
+    python -m benchmarks.loadgen --mode server --video camera.mp4 \\
+        --api http://localhost:8000 --rtmp rtmp://localhost:1935/live
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+from unittest.mock import patch
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.pipeline import RESULTS_DIR, git_revision
+
+
+def _percentiles(values: List[float]) -> dict:
+    if not values:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50_ms": round(float(p50), 1), "p95_ms": round(float(p95), 1), "p99_ms": round(float(p99), 1)}
+
+
+class InProcessTarget:
+    """Câmeras, pipelines e clientes no próprio processo"""
+
+    def __init__(self, video_path: str, fps: Optional[float], detector_cls=None):
+        from app.api import websocket
+        from app.api.routes import stream_handler
+        self.websocket = websocket
+        self.stream_handler = stream_handler
+        self.video_path = video_path
+        self.fps = fps
+        self.detector_cls = detector_cls
+        self.cameras = []
+        self.viewers = {}
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self._patch = None
+
+    async def start(self):
+        if self.detector_cls:
+            self._patch = patch.object(self.websocket, "PPEDetector", self.detector_cls)
+            self._patch.start()
+
+    async def add_streams(self, n: int):
+        from benchmarks.fixtures import FakeViewer, LoopedFileStream
+        for _ in range(n):
+            i = len(self.cameras)
+            camera = LoopedFileStream(self.stream_handler, f"load{i}", self.video_path, self.fps)
+            camera.start()
+            self.cameras.append(camera)
+            client_id = f"loadgen-{i}"
+            self.viewers[client_id] = FakeViewer()
+            self.websocket.manager.active_connections[client_id] = self.viewers[client_id]
+            task = asyncio.create_task(self.websocket.process_video_stream(client_id, camera.url))
+            self.tasks[client_id] = task
+            self.websocket.processing_tasks[client_id] = task
+
+    async def begin_window(self) -> dict:
+        for client_id in self.tasks:
+            timings = self.websocket.pipeline_metrics.active.get(client_id)
+            if timings:
+                timings.reset()
+        for viewer in self.viewers.values():
+            viewer.frame_ages.clear()
+        return {"reconnects": self._reconnects(), **self._process()}
+
+    async def end_window(self, start: dict, elapsed: float) -> dict:
+        frames = {"processed": [], "dropped": 0, "stale": 0, "read": 0}
+        for client_id in self.tasks:
+            timings = self.websocket.pipeline_metrics.active.get(client_id)
+            if timings is None:
+                frames["processed"].append(0)
+                continue
+            frames["processed"].append(timings.frames["processed"])
+            for name in ("dropped", "stale", "read"):
+                frames[name] += timings.frames[name]
+        ages = [age for viewer in self.viewers.values() for age in viewer.frame_ages]
+        end = self._process()
+        return {
+            "frames": frames,
+            "ages": ages,
+            "reconnects": self._reconnects() - start["reconnects"],
+            "cpu_seconds": end["cpu_seconds"] - start["cpu_seconds"],
+            "rss_bytes": end["rss_bytes"]
+        }
+
+    def _reconnects(self) -> int:
+        return sum(s.get("reconnects_total", 0) for s in list(self.stream_handler.active_streams.values()))
+
+    @staticmethod
+    def _process() -> dict:
+        from app.services.metrics import process_cpu_seconds, process_rss_bytes
+        return {"cpu_seconds": process_cpu_seconds(), "rss_bytes": process_rss_bytes()}
+
+    async def stop(self):
+        for client_id in self.tasks:
+            self.websocket.processing_tasks.pop(client_id, None)
+        await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+        for client_id in self.tasks:
+            self.websocket.manager.disconnect(client_id)
+        for camera in self.cameras:
+            camera.stop()
+        if self._patch:
+            self._patch.stop()
+
+
+class ServerTarget:
+    """
+    Câmeras publicadas com ffmpeg no media server e consumidas pela API real
+
+    Contadores do servidor vêm de /metrics; FPS e idade dos frames, dos
+    clientes WebSocket.
+    """
+
+    def __init__(self, video_path: str, api: str, rtmp: str, protocol: str = "rtmp", srt: Optional[str] = None):
+        self.video_path = video_path
+        self.api = api.rstrip("/")
+        self.rtmp = rtmp.rstrip("/")
+        self.srt = srt
+        self.protocol = protocol
+        self.run_id = uuid.uuid4().hex[:6]
+        self.publishers: List[subprocess.Popen] = []
+        self.stream_ids: List[str] = []
+        self.clients: Dict[str, dict] = {}
+        self._client_tasks: List[asyncio.Task] = []
+        self._http = None
+
+    async def start(self):
+        import httpx
+        if not shutil.which("ffmpeg"):
+            raise RuntimeError("ffmpeg não encontrado no PATH (necessário no modo server)")
+        self._http = httpx.AsyncClient(base_url=self.api, timeout=10)
+        (await self._http.get("/health")).raise_for_status()
+
+    def _publish_command(self, key: str) -> List[str]:
+        command = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-re", "-stream_loop", "-1", "-i", self.video_path, "-c", "copy"]
+        if self.protocol == "srt":
+            return command + ["-f", "mpegts", f"{self.srt}?streamid=publish:{key}"]
+        return command + ["-f", "flv", f"{self.rtmp}/{key}"]
+
+    async def add_streams(self, n: int):
+        for _ in range(n):
+            key = f"loadgen-{self.run_id}-{len(self.publishers)}"
+            self.publishers.append(subprocess.Popen(self._publish_command(key), stdin=subprocess.DEVNULL))
+            response = await self._http.post("/api/stream/connect", data={"protocol": self.protocol, "stream_key": key})
+            response.raise_for_status()
+            data = response.json()
+            self.stream_ids.append(data["stream_id"])
+            self._client_tasks.append(asyncio.create_task(self._viewer(key, data["stream_url"])))
+
+    async def _viewer(self, key: str, stream_url: str):
+        import websockets
+        state = self.clients[key] = {"frames": 0, "ages": []}
+        url = self.api.replace("http", "ws", 1) + f"/api/ws/video/{key}"
+        async with websockets.connect(url, max_size=None) as ws:
+            await ws.send(json.dumps({"action": "start_processing", "stream_url": stream_url}))
+            async for raw in ws:
+                message = json.loads(raw)
+                if message.get("type") == "frame":
+                    state["frames"] += 1
+                    if "age_ms" in message:
+                        state["ages"].append(message["age_ms"])
+
+    async def _scrape(self) -> dict:
+        response = await self._http.get("/metrics")
+        values: Dict[str, float] = {}
+        for line in response.text.splitlines():
+            if not line or line.startswith("#"):
+                continue
+            key, value = line.rsplit(" ", 1)
+            name = key.split("{", 1)[0]
+            if name == "ppe_frames_total":
+                name = key
+            values[name] = values.get(name, 0.0) + float(value)
+        return {
+            "reconnects": values.get("ppe_stream_reconnects_total", 0.0),
+            "dropped": values.get('ppe_frames_total{result="dropped"}', 0.0),
+            "stale": values.get('ppe_frames_total{result="stale"}', 0.0),
+            "read": values.get('ppe_frames_total{result="read"}', 0.0),
+            "cpu_seconds": values.get("process_cpu_seconds_total", 0.0),
+            "rss_bytes": values.get("process_resident_memory_bytes", 0.0)
+        }
+
+    async def begin_window(self) -> dict:
+        for state in self.clients.values():
+            state["frames"] = 0
+            state["ages"] = []
+        return await self._scrape()
+
+    async def end_window(self, start: dict, elapsed: float) -> dict:
+        end = await self._scrape()
+        return {
+            "frames": {
+                "processed": [state["frames"] for state in self.clients.values()],
+                "dropped": int(end["dropped"] - start["dropped"]),
+                "stale": int(end["stale"] - start["stale"]),
+                "read": int(end["read"] - start["read"])
+            },
+            "ages": [age for state in self.clients.values() for age in state["ages"]],
+            "reconnects": int(end["reconnects"] - start["reconnects"]),
+            "cpu_seconds": end["cpu_seconds"] - start["cpu_seconds"],
+            "rss_bytes": int(end["rss_bytes"])
+        }
+
+    async def stop(self):
+        for task in self._client_tasks:
+            task.cancel()
+        await asyncio.gather(*self._client_tasks, return_exceptions=True)
+        for stream_id in self.stream_ids:
+            try:
+                await self._http.post("/api/stream/disconnect", data={"stream_id": stream_id})
+            except Exception as e:
+                print(f"Erro ao desconectar {stream_id}: {e}")
+        for publisher in self.publishers:
+            publisher.terminate()
+        for publisher in self.publishers:
+            try:
+                publisher.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                publisher.kill()
+        if self._http:
+            await self._http.aclose()
+
+
+async def run_ramp(target, ramp: List[int], settle: float, hold: float, min_fps: float, max_age_ms: float, stop_on_fail: bool = True) -> List[dict]:
+    """
+    Aumenta o número de streams em degraus, mantendo as anteriores
+
+    Em cada degrau, após `settle` segundos de estabilização, mede por
+    `hold` segundos. Um degrau atende ao limite se a stream mais lenta
+    mantém `min_fps` e o p95 da idade dos frames fica abaixo de `max_age_ms`.
+    """
+    steps = []
+    await target.start()
+    try:
+        active = 0
+        for count in ramp:
+            await target.add_streams(count - active)
+            active = count
+            await asyncio.sleep(settle)
+
+            start = await target.begin_window()
+            started = time.perf_counter()
+            await asyncio.sleep(hold)
+            elapsed = time.perf_counter() - started
+            window = await target.end_window(start, elapsed)
+
+            processed = window["frames"]["processed"]
+            fps = [n / elapsed for n in processed] or [0.0]
+            lost = window["frames"]["dropped"] + window["frames"]["stale"]
+            age = _percentiles(window["ages"])
+            step = {
+                "streams": count,
+                "fps_per_stream_mean": round(float(np.mean(fps)), 2),
+                "fps_per_stream_min": round(float(np.min(fps)), 2),
+                "fps_total": round(float(np.sum(fps)), 2),
+                "frames_read": window["frames"]["read"],
+                "frames_dropped": window["frames"]["dropped"],
+                "frames_stale": window["frames"]["stale"],
+                "dropped_ratio": round(lost / window["frames"]["read"], 4) if window["frames"]["read"] else None,
+                "reconnects": window["reconnects"],
+                "cpu_percent": round(window["cpu_seconds"] / elapsed * 100, 1),
+                "rss_bytes": window["rss_bytes"],
+                "frame_age": age
+            }
+            step["within_limits"] = (
+                step["fps_per_stream_min"] >= min_fps
+                and age["p95_ms"] is not None and age["p95_ms"] <= max_age_ms
+            )
+            steps.append(step)
+            print(
+                f"{count:4d} streams: {step['fps_per_stream_min']:6.2f} fps (mín) "
+                f"{step['fps_per_stream_mean']:6.2f} fps (média), idade p95 {age['p95_ms']} ms, "
+                f"descartados {lost}, reconexões {step['reconnects']}, CPU {step['cpu_percent']}%"
+                + ("" if step["within_limits"] else "  <- fora do limite")
+            )
+            if stop_on_fail and not step["within_limits"]:
+                break
+    finally:
+        await target.stop()
+    return steps
+
+
+def capacity(steps: List[dict]) -> Optional[int]:
+    """Maior número de streams do degrau contínuo que atende aos limites"""
+    best = None
+    for step in steps:
+        if not step["within_limits"]:
+            break
+        best = step["streams"]
+    return best
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Gerador de carga de câmeras simuladas")
+    parser.add_argument("--mode", choices=("inprocess", "server"), default="inprocess")
+    parser.add_argument("--video", help="Arquivo em ciclo por câmera (padrão: vídeo sintético)")
+    parser.add_argument("--ramp", default="1,2,4,8,16", type=lambda v: [int(n) for n in v.split(",")],
+                        help="Números de streams de cada degrau (crescente)")
+    parser.add_argument("--settle", type=float, default=5.0, help="Estabilização após cada degrau (s)")
+    parser.add_argument("--hold", type=float, default=20.0, help="Medição de cada degrau (s)")
+    parser.add_argument("--min-fps", type=float, default=10.0, help="FPS mínimo da stream mais lenta")
+    parser.add_argument("--max-age-ms", type=float, default=1000.0, help="p95 máximo da idade dos frames")
+    parser.add_argument("--no-stop", action="store_true", help="Continuar a rampa após o limite")
+    parser.add_argument("--fps", type=float, help="Taxa das câmeras no modo inprocess (padrão: do arquivo)")
+    parser.add_argument("--detector", choices=("stub", "yolo"), default="stub",
+                        help="Modo inprocess: detector simulado ou o modelo real")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Latência do detector simulado")
+    parser.add_argument("--api", default="http://localhost:8000", help="API (modo server)")
+    parser.add_argument("--protocol", choices=("rtmp", "srt"), default="rtmp")
+    parser.add_argument("--rtmp", default="rtmp://localhost:1935/live", help="Publicação RTMP no media server")
+    parser.add_argument("--srt", default="srt://localhost:8890", help="Publicação SRT no media server")
+    parser.add_argument("--output", help="Arquivo JSON de saída (padrão: benchmarks/results/)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    tmpdir = None
+    video = args.video
+    if not video:
+        from benchmarks.fixtures import synthetic_frames, write_synthetic_video
+        tmpdir = tempfile.TemporaryDirectory()
+        video = os.path.join(tmpdir.name, "camera.avi")
+        write_synthetic_video(video, synthetic_frames(90), fps=30.0, repeat=2)
+
+    if args.mode == "server":
+        target = ServerTarget(video, args.api, args.rtmp, args.protocol, args.srt)
+    else:
+        from benchmarks.fixtures import stub_detector
+        detector_cls = stub_detector(args.latency_ms, 4) if args.detector == "stub" else None
+        target = InProcessTarget(video, args.fps, detector_cls)
+
+    try:
+        steps = asyncio.run(run_ramp(
+            target, args.ramp, args.settle, args.hold, args.min_fps, args.max_age_ms, not args.no_stop
+        ))
+    finally:
+        if tmpdir:
+            tmpdir.cleanup()
+
+    result = {
+        "benchmark": "loadgen",
+        "created_at": datetime.now().isoformat(),
+        "git": git_revision(),
+        "params": {
+            "mode": args.mode,
+            "video": args.video,
+            "protocol": args.protocol if args.mode == "server" else None,
+            "detector": args.detector if args.mode == "inprocess" else None,
+            "detector_latency_ms": args.latency_ms if args.mode == "inprocess" and args.detector == "stub" else None,
+            "settle_s": args.settle,
+            "hold_s": args.hold,
+            "min_fps": args.min_fps,
+            "max_age_ms": args.max_age_ms,
+            "cpu_count": os.cpu_count()
+        },
+        "capacity_streams": capacity(steps),
+        "steps": steps
+    }
+    print(f"Capacidade: {result['capacity_streams']} streams dentro dos limites")
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        commit = result["git"]["commit"] or "unknown"
+        output = os.path.join(RESULTS_DIR, f"loadgen-{args.mode}-{commit}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"Resultado gravado em {output}")
+    return result
+
+
+if __name__ == "__main__":
+    main()
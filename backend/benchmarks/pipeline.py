@@ -0,0 +1,255 @@
+"""
+Benchmark ponta a ponta do pipeline de streaming (process_video_stream)
+
+Executa o pipeline real (leitura, redimensionamento, suavização, alertas,
+anotação, JPEG, base64 e envio) com fontes sintéticas, detector
+determinístico e clientes WebSocket simulados, para 1..N streams
+simultâneas, e grava o resultado em JSON para comparação entre commits.
+
+Uso:
+    python -m benchmarks.pipeline --streams 1,2,4 --duration 10
+    python -m benchmarks.pipeline --baseline benchmarks/results/anterior.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import List, Optional
+from unittest.mock import patch
+
+import cv2
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.api import websocket
+from app.api.routes import stream_handler
+from app.services.metrics import process_rss_bytes
+from app.services.pipeline_metrics import StreamTimings
+from benchmarks.fixtures import FakeViewer, SyntheticStream, stub_detector, synthetic_frames, write_synthetic_video
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def git_revision() -> dict:
+    """Commit atual (e se há alterações não commitadas)"""
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=cwd, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = bool(subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], cwd=cwd, capture_output=True, text=True
+        ).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+    return {"commit": commit, "dirty": dirty}
+
+
+async def run_streams(
+    n_streams: int,
+    duration: float,
+    warmup: float,
+    frames: list,
+    source: str = "stream",
+    video_path: Optional[str] = None,
+    fps: float = 30.0,
+    render: str = "server"
+) -> dict:
+    """
+    Executa `n_streams` pipelines simultâneos e mede o intervalo após o aquecimento
+
+    Returns:
+        FPS, tempos por etapa, idade dos frames e memória da execução
+    """
+    streams: List[SyntheticStream] = []
+    viewers = {}
+    tasks = {}
+    rss_before = process_rss_bytes()
+
+    for i in range(n_streams):
+        client_id = f"bench-{n_streams}-{i}"
+        if source == "stream":
+            stream = SyntheticStream(stream_handler, f"bench{n_streams}x{i}", frames, fps)
+            stream.start()
+            streams.append(stream)
+            url = stream.url
+        else:
+            url = video_path
+        viewers[client_id] = FakeViewer()
+        websocket.manager.active_connections[client_id] = viewers[client_id]
+        tasks[client_id] = asyncio.create_task(websocket.process_video_stream(client_id, url, render=render))
+        websocket.processing_tasks[client_id] = tasks[client_id]
+
+    await asyncio.sleep(warmup)
+    timings: List[StreamTimings] = [
+        websocket.pipeline_metrics.active[cid] for cid in tasks if cid in websocket.pipeline_metrics.active
+    ]
+    for t in timings:
+        t.reset()
+    for viewer in viewers.values():
+        viewer.frame_ages.clear()
+
+    started = time.perf_counter()
+    rss_peak = process_rss_bytes()
+    while time.perf_counter() - started < duration:
+        await asyncio.sleep(0.25)
+        rss_peak = max(rss_peak, process_rss_bytes())
+    elapsed = time.perf_counter() - started
+
+    # Encerrar: o pipeline sai no próximo frame ao sair de processing_tasks
+    for client_id in tasks:
+        websocket.processing_tasks.pop(client_id, None)
+    await asyncio.gather(*tasks.values(), return_exceptions=True)
+    for client_id in tasks:
+        websocket.manager.disconnect(client_id)
+    for stream in streams:
+        stream.stop()
+
+    overall = StreamTimings("all")
+    for t in timings:
+        overall.merge(t)
+    processed = overall.frames["processed"]
+    rss_end = process_rss_bytes()
+    return {
+        "streams": n_streams,
+        "duration_s": round(elapsed, 3),
+        "fps_total": round(processed / elapsed, 2),
+        "fps_per_stream": round(processed / elapsed / n_streams, 2),
+        "fps_per_stream_min": round(min((t.frames["processed"] for t in timings), default=0) / elapsed, 2),
+        "frames": overall.frames,
+        "bytes_sent": overall.bytes_sent,
+        "stages": {stage: hist.to_dict() for stage, hist in overall.stages.items() if hist.count},
+        "frame_age": overall.frame_age.to_dict(),
+        "memory": {
+            "rss_before_bytes": rss_before,
+            "rss_peak_bytes": rss_peak,
+            "rss_end_bytes": rss_end,
+            "rss_per_stream_bytes": max(0, rss_peak - rss_before) // n_streams
+        }
+    }
+
+
+async def run_benchmark(args) -> dict:
+    frames = synthetic_frames(args.frames, args.width, args.height, seed=args.seed)
+    video_path = None
+    tmpdir = None
+    if args.source == "file":
+        if args.video:
+            video_path = args.video
+        else:
+            tmpdir = tempfile.TemporaryDirectory()
+            video_path = os.path.join(tmpdir.name, "synthetic.avi")
+            # Duração suficiente para aquecimento + medição
+            repeat = int((args.warmup + args.duration + 2) * args.fps / len(frames)) + 1
+            write_synthetic_video(video_path, frames, args.fps, repeat)
+
+    detector_cls = stub_detector(args.latency_ms, args.boxes)
+    runs = []
+    try:
+        with patch.object(websocket, "PPEDetector", detector_cls):
+            for n in args.streams:
+                print(f"Benchmark: {n} stream(s), {args.duration}s...")
+                result = await run_streams(n, args.duration, args.warmup, frames, args.source, video_path, args.fps, args.render)
+                runs.append(result)
+                total = result["stages"].get("total", {})
+                print(
+                    f"  {result['fps_total']} fps total, {result['fps_per_stream']} fps/stream, "
+                    f"p95 total {total.get('p95_ms')} ms, idade p95 {result['frame_age']['p95_ms']} ms, "
+                    f"RSS pico {result['memory']['rss_peak_bytes'] / 2 ** 20:.0f} MB"
+                )
+    finally:
+        if tmpdir:
+            tmpdir.cleanup()
+
+    return {
+        "benchmark": "pipeline",
+        "created_at": datetime.now().isoformat(),
+        "git": git_revision(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "opencv": cv2.__version__
+        },
+        "params": {
+            "source": args.source,
+            "video": args.video,
+            "resolution": [args.width, args.height],
+            "source_fps": args.fps,
+            "frames": args.frames,
+            "seed": args.seed,
+            "detector_latency_ms": args.latency_ms,
+            "detector_boxes": args.boxes,
+            "render": args.render,
+            "warmup_s": args.warmup,
+            "duration_s": args.duration
+        },
+        "runs": runs
+    }
+
+
+def compare(result: dict, baseline: dict):
+    """Imprime a variação de FPS e p95 em relação a um resultado anterior"""
+    base_runs = {run["streams"]: run for run in baseline.get("runs", [])}
+    print(f"Comparação com {baseline.get('git', {}).get('commit')} ({baseline.get('created_at')}):")
+    for run in result["runs"]:
+        base = base_runs.get(run["streams"])
+        if not base:
+            continue
+        fps_delta = (run["fps_total"] - base["fps_total"]) / base["fps_total"] * 100 if base["fps_total"] else 0
+        p95 = run["stages"].get("total", {}).get("p95_ms")
+        base_p95 = base["stages"].get("total", {}).get("p95_ms")
+        p95_delta = (p95 - base_p95) / base_p95 * 100 if p95 and base_p95 else 0
+        print(f"  {run['streams']} stream(s): fps {fps_delta:+.1f}%, p95 total {p95_delta:+.1f}%")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark do pipeline de streaming")
+    parser.add_argument("--streams", default="1,2,4", type=lambda v: [int(n) for n in v.split(",")],
+                        help="Números de streams simultâneas (ex.: 1,2,4,8)")
+    parser.add_argument("--duration", type=float, default=10.0, help="Segundos medidos por execução")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Segundos descartados no início")
+    parser.add_argument("--source", choices=("stream", "file"), default="stream",
+                        help="stream: streams RTMP simuladas; file: arquivo de vídeo")
+    parser.add_argument("--video", help="Arquivo local usado com --source file (padrão: sintético)")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--fps", type=float, default=30.0, help="Taxa da fonte")
+    parser.add_argument("--frames", type=int, default=90, help="Frames sintéticos distintos (em ciclo)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Latência simulada do detector")
+    parser.add_argument("--boxes", type=int, default=4, help="Detecções por frame do detector simulado")
+    parser.add_argument("--render", choices=("server", "client"), default="server",
+                        help="Caixas desenhadas no JPEG ou enviadas como dados")
+    parser.add_argument("--output", help="Arquivo JSON de saída (padrão: benchmarks/results/)")
+    parser.add_argument("--baseline", help="Resultado anterior para comparação")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    result = asyncio.run(run_benchmark(args))
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        commit = result["git"]["commit"] or "unknown"
+        output = os.path.join(RESULTS_DIR, f"pipeline-{commit}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"Resultado gravado em {output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(result, json.load(f))
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Benchmark do modo de inferência em tiles contra a inferência em passada única
+
+Gera frames de alta resolução com objetos pequenos de posição conhecida e
+mede, para a passada única (frame inteiro reduzido à resolução do modelo)
+e para cada grade de tiles, a latência por frame (recorte, lote e NMS
+entre tiles), o recall e a precisão em relação às caixas reais. O detector
+é o BlobDetector: só encontra objetos a partir de um tamanho mínimo na
+resolução do modelo, como um detector real.
+
+Uso:
+    python -m benchmarks.tiling
+    python -m benchmarks.tiling --grids 2x2,3x2,4x3 --overlap 0.25 --batch-cost 0.3
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+from typing import Callable, List, Tuple
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.tiling import TileGrid
+from benchmarks.fixtures import BlobDetector, small_object_frames
+from benchmarks.pipeline import RESULTS_DIR, git_revision
+
+
+def match(truth: List[List[int]], detections: List[dict], iou_threshold: float = 0.5) -> int:
+    """Caixas reais encontradas (pareamento guloso por IoU, uma detecção por caixa)"""
+    if not truth or not detections:
+        return 0
+    a = np.asarray(truth, dtype=np.float64)
+    b = np.asarray([d["bbox"] for d in detections], dtype=np.float64)
+    w = np.clip(np.minimum(a[:, None, 2], b[None, :, 2]) - np.maximum(a[:, None, 0], b[None, :, 0]), 0, None)
+    h = np.clip(np.minimum(a[:, None, 3], b[None, :, 3]) - np.maximum(a[:, None, 1], b[None, :, 1]), 0, None)
+    inter = w * h
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    iou = inter / (area_a[:, None] + area_b[None, :] - inter)
+    matched = 0
+    for t, d in zip(*np.unravel_index(np.argsort(-iou, axis=None), iou.shape)):
+        if iou[t, d] < iou_threshold:
+            break
+        if np.isfinite(iou[t, d]):
+            matched += 1
+            iou[t, :] = -np.inf
+            iou[:, d] = -np.inf
+    return matched
+
+
+def evaluate(run: Callable[[np.ndarray], List[dict]], samples: List[Tuple[np.ndarray, List[List[int]]]], iou_threshold: float) -> dict:
+    """Latência por frame, recall e precisão de um modo de inferência"""
+    latencies, found, truth, detected = [], 0, 0, 0
+    for frame, boxes in samples:
+        start = time.perf_counter()
+        detections = run(frame)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found += match(boxes, detections, iou_threshold)
+        truth += len(boxes)
+        detected += len(detections)
+    latencies.sort()
+    return {
+        "latency_ms": {
+            "mean": round(statistics.fmean(latencies), 2),
+            "p50": round(latencies[len(latencies) // 2], 2),
+            "p95": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2)
+        },
+        "recall": round(found / truth, 4) if truth else None,
+        "precision": round(found / detected, 4) if detected else None,
+        "detections_per_frame": round(detected / len(samples), 2)
+    }
+
+
+def parse_grid(value: str) -> Tuple[int, int]:
+    cols, _, rows = value.lower().partition("x")
+    return int(cols), int(rows)
+
+
+def run_benchmark(args) -> dict:
+    samples = small_object_frames(args.frames, args.width, args.height, args.objects, (args.min_object, args.max_object), args.seed)
+    detector = BlobDetector(args.latency_ms, args.batch_cost)
+
+    runs = []
+    detector.model_calls = 0
+    single = evaluate(lambda frame: detector.detect(frame)["detections"], samples, args.iou)
+    runs.append({"mode": "single", "grid": None, "tiles": 1, **single})
+    print(f"single: {single['latency_ms']['mean']:.1f} ms, recall {single['recall']}, precisão {single['precision']}")
+
+    for cols, rows in args.grids:
+        grid = TileGrid(cols, rows, args.overlap, (0, 0, args.width, args.height))
+
+        def run(frame, grid=grid):
+            results = detector.detect_batch(grid.tiles(frame))
+            return grid.merge([r["detections"] for r in results])
+
+        result = evaluate(run, samples, args.iou)
+        latency_ratio = result["latency_ms"]["mean"] / single["latency_ms"]["mean"] if single["latency_ms"]["mean"] else None
+        runs.append({
+            "mode": "tiled",
+            "grid": f"{cols}x{rows}",
+            "tiles": cols * rows,
+            "tile_input": list(grid.tile_size),
+            **result,
+            "vs_single": {
+                "latency_ratio": round(latency_ratio, 2) if latency_ratio else None,
+                "recall_delta": round(result["recall"] - single["recall"], 4)
+                if result["recall"] is not None and single["recall"] is not None else None
+            }
+        })
+        print(f"{cols}x{rows}: {result['latency_ms']['mean']:.1f} ms (x{latency_ratio:.2f}), "
+              f"recall {result['recall']}, precisão {result['precision']}")
+
+    return {
+        "benchmark": "tiling",
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "git": git_revision(),
+        "environment": {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count()},
+        "params": {
+            "width": args.width, "height": args.height, "frames": args.frames, "objects": args.objects,
+            "object_width": [args.min_object, args.max_object], "overlap": args.overlap,
+            "latency_ms": args.latency_ms, "batch_cost": args.batch_cost, "iou": args.iou,
+            "model_size": detector.model_size, "detector_min_size": detector.min_size
+        },
+        "runs": runs
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark do modo de inferência em tiles")
+    parser.add_argument("--grids", default="2x2,3x2,4x3", type=lambda v: [parse_grid(g) for g in v.split(",")],
+                        help="Grades colunas x linhas (ex.: 2x2,3x2,4x3)")
+    parser.add_argument("--overlap", type=float, default=0.2, help="Sobreposição entre tiles vizinhos")
+    parser.add_argument("--width", type=int, default=3840)
+    parser.add_argument("--height", type=int, default=2160)
+    parser.add_argument("--frames", type=int, default=20, help="Frames avaliados")
+    parser.add_argument("--objects", type=int, default=30, help="Objetos por frame")
+    parser.add_argument("--min-object", type=int, default=8, help="Largura mínima dos objetos (px)")
+    parser.add_argument("--max-object", type=int, default=48, help="Largura máxima dos objetos (px)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Latência simulada por imagem")
+    parser.add_argument("--batch-cost", type=float, default=1.0,
+                        help="Custo de cada imagem extra de um lote, em fração da latência (GPU: < 1)")
+    parser.add_argument("--iou", type=float, default=0.5, help="IoU mínimo para contar uma caixa real como encontrada")
+    parser.add_argument("--output", help="Arquivo JSON de saída (padrão: benchmarks/results/)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    result = run_benchmark(args)
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        commit = result["git"]["commit"] or "unknown"
+        output = os.path.join(RESULTS_DIR, f"tiling-{commit}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"Resultado gravado em {output}")
+    return result
+
+
+if __name__ == "__main__":
+    main()
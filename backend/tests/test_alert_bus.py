@@ -0,0 +1,62 @@
+import unittest
+import asyncio
+import threading
+import sys
+import os
+
+# Adicionar diretório pai ao path para importar app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.alert_bus import AlertBus
+from app.services.alert_manager import AlertManager
+
+
+class TestAlertBus(unittest.IsolatedAsyncioTestCase):
+    async def test_filters_and_fan_out(self):
+        bus = AlertBus(queue_size=10)
+        everything = bus.subscribe("all")
+        cam1_high = bus.subscribe("cam1", stream_ids=["cam1"], severities=["high"])
+
+        bus.publish({"seq": 1, "stream_id": "cam1", "severity": "high"})
+        bus.publish({"seq": 2, "stream_id": "cam2", "severity": "high"})
+        bus.publish({"seq": 3, "stream_id": "cam1", "severity": "low"})
+
+        self.assertEqual(everything.queue.qsize(), 3)
+        self.assertEqual(cam1_high.queue.qsize(), 1)
+        self.assertEqual((await cam1_high.queue.get())["seq"], 1)
+
+    async def test_slow_subscriber_drops_oldest(self):
+        bus = AlertBus(queue_size=2)
+        subscription = bus.subscribe("slow")
+
+        for seq in range(1, 5):
+            bus.publish({"seq": seq})
+
+        self.assertEqual(subscription.dropped, 2)
+        self.assertEqual([subscription.queue.get_nowait()["seq"] for _ in range(2)], [3, 4])
+
+    async def test_publish_from_thread(self):
+        bus = AlertBus()
+        subscription = bus.subscribe("client")
+
+        thread = threading.Thread(target=bus.publish, args=({"seq": 1},))
+        thread.start()
+        thread.join()
+
+        alert = await asyncio.wait_for(subscription.queue.get(), timeout=1)
+        self.assertEqual(alert["seq"], 1)
+
+    async def test_manager_publishes_and_replays(self):
+        manager = AlertManager()
+        subscription = manager.bus.subscribe("client")
+
+        for cls in ('NO-Hardhat', 'NO-Mask', 'NO-Safety Vest'):
+            manager.add_alert(manager.create_alert(cls, 0.9, [0, 0, 1, 1]))
+
+        self.assertEqual(subscription.queue.qsize(), 3)
+        self.assertEqual([a["seq"] for a in manager.get_alerts_after(1)], [2, 3])
+        self.assertEqual(manager.get_alerts_after(3), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
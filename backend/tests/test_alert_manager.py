@@ -0,0 +1,150 @@
+import time
+import unittest
+import sys
+import os
+import tempfile
+
+# Adicionar diretório pai ao path para importar app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.alert_manager import AlertManager
+from app.services.alert_store import AlertStore
+
+
+class TestAlertManager(unittest.TestCase):
+    def setUp(self):
+        self.manager = AlertManager(max_alerts=3)
+
+    def _add(self, violation_class):
+        alert = self.manager.create_alert(violation_class, 0.9, [0, 0, 10, 10])
+        self.manager.add_alert(alert)
+        return alert
+
+    def test_recent_alerts_newest_first(self):
+        first = self._add('NO-Hardhat')
+        second = self._add('NO-Mask')
+
+        self.assertEqual([a["id"] for a in self.manager.get_recent_alerts()], [second["id"], first["id"]])
+        self.assertEqual([a["id"] for a in self.manager.get_alerts()], [second["id"], first["id"]])
+
+    def test_eviction_updates_indexes(self):
+        oldest = self._add('NO-Hardhat')
+        self._add('NO-Mask')
+        self._add('NO-Safety Vest')
+        self._add('NO-Mask')
+
+        stats = self.manager.get_stats()
+        self.assertEqual(stats["total"], 3)
+        self.assertEqual(stats["unacknowledged"], 3)
+        self.assertEqual(stats["by_class"], {'NO-Mask': 2, 'NO-Safety Vest': 1})
+        self.assertEqual(stats["by_severity"], {"high": 0, "medium": 1, "low": 2})
+        self.assertIsNone(self.manager.get_alert(oldest["id"]))
+        self.assertEqual(self.manager.get_alerts(severity="high"), [])
+
+    def test_acknowledge_and_filters(self):
+        hardhat = self._add('NO-Hardhat')
+        mask = self._add('NO-Mask')
+
+        self.assertTrue(self.manager.acknowledge_alert(mask["id"]))
+        self.assertFalse(self.manager.acknowledge_alert("unknown"))
+
+        unacked = self.manager.get_alerts(unacknowledged_only=True)
+        self.assertEqual([a["id"] for a in unacked], [hardhat["id"]])
+        self.assertEqual(self.manager.get_alerts(severity="low", unacknowledged_only=True), [])
+        self.assertEqual(self.manager.get_stats()["unacknowledged"], 1)
+
+    def test_clear_alerts(self):
+        self._add('NO-Hardhat')
+        self.manager.clear_alerts()
+
+        self.assertEqual(self.manager.get_stats()["total"], 0)
+        self.assertEqual(self.manager.get_alerts(), [])
+
+
+class TestAlertStore(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "alerts.db")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _manager(self):
+        manager = AlertManager(max_alerts=2)
+        manager.attach_store(AlertStore(self.db_path, flush_interval=0.01))
+        return manager
+
+    def test_acknowledgement_survives_restart(self):
+        manager = self._manager()
+        alerts = [
+            manager.create_alert(cls, 0.9, [0, 0, 10, 10], stream_id="cam1")
+            for cls in ('NO-Hardhat', 'NO-Mask', 'NO-Safety Vest')
+        ]
+        for alert in alerts:
+            manager.add_alert(alert)
+        # O mais antigo já saiu do buffer em memória, mas continua gravado
+        self.assertTrue(manager.acknowledge_alert(alerts[0]["id"]))
+        manager.close()
+
+        manager = self._manager()
+        self.assertEqual(manager.get_stats()["total"], 2)
+        stored = manager.store.query(limit=10)
+        self.assertEqual([a["id"] for a in stored], [a["id"] for a in reversed(alerts)])
+        self.assertTrue(stored[-1]["acknowledged"])
+
+        # Novos alertas continuam a sequência gravada
+        new_alert = manager.create_alert('NO-Mask', 0.8, [0, 0, 5, 5])
+        manager.add_alert(new_alert)
+        self.assertEqual(new_alert["seq"], stored[0]["seq"] + 1)
+        manager.close()
+
+    def test_keyset_pagination_and_filters(self):
+        manager = self._manager()
+        for i in range(5):
+            manager.add_alert(manager.create_alert('NO-Hardhat', 0.9, [0, 0, 1, 1], stream_id=f"cam{i % 2}"))
+        manager.store.flush()
+
+        first_page = manager.store.query(limit=2)
+        second_page = manager.store.query(limit=2, before=first_page[-1]["seq"])
+        self.assertEqual([a["seq"] for a in first_page], [5, 4])
+        self.assertEqual([a["seq"] for a in second_page], [3, 2])
+        self.assertEqual(len(manager.store.query(stream_id="cam0")), 3)
+        self.assertEqual(manager.store.query(severity="low"), [])
+        manager.close()
+
+    def test_alerts_after_combine_store_and_memory(self):
+        manager = self._manager()
+        for i in range(5):
+            manager.add_alert(manager.create_alert('NO-Hardhat', 0.9, [0, 0, 1, 1]))
+        manager.store.flush()
+        # Alertas 4 e 5 no buffer em memória, 2 e 3 apenas gravados
+        self.assertEqual([a["seq"] for a in manager.get_alerts_after(1)], [2, 3, 4, 5])
+        self.assertEqual([a["seq"] for a in manager.get_alerts_after(1, limit=3)], [3, 4, 5])
+        self.assertEqual([a["seq"] for a in manager.get_alerts_after(4)], [5])
+        manager.close()
+
+    def test_flush_does_not_wait_for_batch_interval(self):
+        store = AlertStore(self.db_path, flush_interval=5.0)
+        store.open()
+        alert = AlertManager().create_alert('NO-Hardhat', 0.9, [0, 0, 1, 1])
+        alert["seq"] = 1
+        store.append(alert)
+        started = time.monotonic()
+        store.flush()
+        self.assertLess(time.monotonic() - started, 1.0)
+        self.assertTrue(store.exists(alert["id"]))
+        store.close()
+
+    def test_flush_returns_when_batch_fails(self):
+        store = AlertStore(self.db_path, flush_interval=0.01)
+        store.open()
+        # Alerta sem campos obrigatórios: a gravação do lote falha
+        store.append({"id": "broken"})
+        started = time.monotonic()
+        store.flush()
+        self.assertLess(time.monotonic() - started, 1.0)
+        store.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,341 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import asyncio
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+import io
+import json
+import tempfile
+import threading
+import sys
+import os
+
+import cv2
+import numpy as np
+
+# Adicionar diretório pai ao path para importar app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.analysis_job import (
+    AnalysisJobManager, analyze_range, merge_counts, new_counts, remap_tracks, split_segments, stitch_tracks
+)
+from app.services.detector import PPEDetector
+from app.services.progressive_feed import ProgressiveFeed
+from app.services.result_cache import ResultCache, ResultReplay
+from app.services.upload_manager import UploadManager
+
+
+def write_test_video(path: str, frames: int = 10, fps: float = 10.0, fourcc: str = "MJPG"):
+    # O brilho de cada frame codifica seu índice (i * 5)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), fps, (64, 48))
+    for i in range(frames):
+        writer.write(np.full((48, 64, 3), i * 5, dtype=np.uint8))
+    writer.release()
+
+
+class FakeDetector(PPEDetector):
+    """
+    Detector sem modelo: violação presente em blocos alternados de 7 frames,
+    de modo que as trilhas aparecem e somem ao longo do vídeo
+    """
+
+    def load_model(self):
+        self._model_loaded = True
+
+    def detect_batch(self, frames, selected_classes=None, confidence_threshold=None):
+        results = []
+        for frame in frames:
+            index = int(round(frame.mean() / 5))
+            detections = []
+            if (index // 7) % 2 == 0:
+                detections.append({"class_name": "NO-Hardhat", "confidence": 0.9, "bbox": [1, 1, 20, 20]})
+            results.append(self._build_result(detections, selected_classes, 1.0))
+        return results
+
+
+class TestAnalysisJob(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.video_path = os.path.join(self.tmpdir.name, "video.avi")
+        write_test_video(self.video_path)
+        self.jobs = AnalysisJobManager(results_dir=self.tmpdir.name, batch_size=4)
+
+    async def asyncTearDown(self):
+        self.tmpdir.cleanup()
+
+    async def _wait(self, job_id):
+        while self.jobs.get_job(job_id)["status"] in ("queued", "running"):
+            await asyncio.sleep(0.01)
+        return self.jobs.get_job(job_id)
+
+    @patch('app.services.analysis_job.PPEDetector', FakeDetector)
+    async def test_writes_per_frame_results(self):
+        job = await self._wait((await self.jobs.create_job("video", self.video_path, frame_stride=2))["job_id"])
+
+        self.assertEqual(job["status"], "completed")
+        self.assertEqual(job["progress"], 1.0)
+        with open(job["result_path"]) as f:
+            records = [json.loads(line) for line in f]
+
+        self.assertEqual(records[0]["type"], "meta")
+        frames = [r for r in records if r["type"] == "frame"]
+        self.assertEqual([r["frame"] for r in frames], [0, 2, 4, 6, 8])
+        self.assertEqual(frames[1]["timestamp_ms"], 200.0)
+        self.assertEqual(len(frames[0]["violations"]), 1)
+        self.assertEqual(len(frames[0]["new_violations"]), 1)
+        self.assertEqual(records[-1]["violations_by_class"], {"NO-Hardhat": 5})
+        self.assertEqual(records[-1]["violation_events_by_class"], {"NO-Hardhat": 1})
+
+    @patch('app.services.analysis_job.PPEDetector', FakeDetector)
+    async def test_analyzes_only_requested_range(self):
+        job = await self._wait((await self.jobs.create_job("video", self.video_path, start_time=0.3, end_time=0.7))["job_id"])
+
+        self.assertEqual(job["status"], "completed")
+        self.assertEqual(job["total_frames"], 4)
+        with open(job["result_path"]) as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual([r["frame"] for r in records if r["type"] == "frame"], [3, 4, 5, 6])
+
+    async def test_invalid_file_fails(self):
+        job = await self._wait((await self.jobs.create_job("missing", os.path.join(self.tmpdir.name, "none.mp4")))["job_id"])
+
+        self.assertEqual(job["status"], "failed")
+        self.assertIsNotNone(job["error"])
+
+
+class TestResultCache(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.video_path = os.path.join(self.tmpdir.name, "video.avi")
+        write_test_video(self.video_path)
+        self.cache = ResultCache(os.path.join(self.tmpdir.name, "cache"), max_bytes=10 * 1024 * 1024)
+        self.jobs = AnalysisJobManager(results_dir=self.tmpdir.name, batch_size=4, cache=self.cache)
+
+    async def asyncTearDown(self):
+        self.tmpdir.cleanup()
+
+    async def _wait(self, job_id):
+        while self.jobs.get_job(job_id)["status"] in ("queued", "running"):
+            await asyncio.sleep(0.01)
+        return self.jobs.get_job(job_id)
+
+    @patch('app.services.analysis_job.PPEDetector', FakeDetector)
+    async def test_same_content_reuses_result(self):
+        first = await self._wait((await self.jobs.create_job("a", self.video_path, content_hash="abc"))["job_id"])
+
+        with patch('app.services.analysis_job.PPEDetector', side_effect=AssertionError("modelo executado")):
+            second = await self.jobs.create_job("b", self.video_path, content_hash="abc")
+        self.assertTrue(second["cached"])
+        self.assertEqual(second["status"], "completed")
+        self.assertEqual(second["summary"], first["summary"])
+        with open(first["result_path"]) as a, open(second["result_path"]) as b:
+            self.assertEqual(a.read(), b.read())
+
+        # Configuração diferente não reaproveita o resultado
+        third = await self.jobs.create_job("c", self.video_path, frame_stride=2, content_hash="abc")
+        self.assertFalse(third["cached"])
+        await self._wait(third["job_id"])
+
+    @patch('app.services.analysis_job.PPEDetector', FakeDetector)
+    async def test_replay_follows_frame_order(self):
+        job = await self._wait((await self.jobs.create_job("a", self.video_path, frame_stride=2, content_hash="abc"))["job_id"])
+
+        replay = ResultReplay(job["result_path"])
+        self.assertEqual(replay.frame_size, (64, 48))
+        self.assertEqual(len(replay.detections_at(0)), 1)
+        # Frame 1 não foi analisado: vale o último frame analisado
+        self.assertEqual(len(replay.detections_at(1)), 1)
+        self.assertEqual(replay.detections_at(8, (128, 96))[0]["bbox"], [2, 2, 40, 40])
+        replay.close()
+
+    def test_evicts_least_recently_used(self):
+        cache = ResultCache(os.path.join(self.tmpdir.name, "lru"), max_bytes=250)
+        source = os.path.join(self.tmpdir.name, "result.jsonl")
+        with open(source, "w") as f:
+            f.write("x" * 100)
+
+        cache.put("a", source)
+        cache.put("b", source)
+        self.assertIsNotNone(cache.get("a"))
+        cache.put("c", source)
+
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNotNone(cache.get("c"))
+        self.assertEqual(cache.get_stats()["size_bytes"], 200)
+
+        # Consultar presença não conta acerto nem protege do despejo
+        hits = cache.hits
+        self.assertTrue(cache.contains("a"))
+        self.assertFalse(cache.contains("b"))
+        self.assertEqual(cache.hits, hits)
+        cache.put("d", source)
+        self.assertFalse(cache.contains("a"))
+
+        # O índice é reconstruído a partir do disco
+        self.assertEqual(ResultCache(cache.cache_dir).get_stats()["entries"], 2)
+
+
+async def chunked(data: bytes, step: int = 1000):
+    for i in range(0, len(data), step):
+        yield data[i:i + step]
+
+
+class TestProgressiveAnalysis(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.uploads = UploadManager(os.path.join(self.tmpdir.name, "uploads"), chunk_size=1000)
+        self.jobs = AnalysisJobManager(results_dir=self.tmpdir.name, batch_size=4)
+
+    async def asyncTearDown(self):
+        self.tmpdir.cleanup()
+
+    async def _wait(self, job_id, until=("queued", "running")):
+        while self.jobs.get_job(job_id)["status"] in until:
+            await asyncio.sleep(0.01)
+        return self.jobs.get_job(job_id)
+
+    def _video(self, name: str, fourcc: str = "MJPG") -> bytes:
+        path = os.path.join(self.tmpdir.name, name)
+        write_test_video(path, frames=48, fourcc=fourcc)
+        with open(path, "rb") as f:
+            return f.read()
+
+    @patch('app.services.analysis_job.PPEDetector', FakeDetector)
+    async def test_detects_before_upload_finishes(self):
+        data = self._video("camera.mkv")
+        upload_id = self.uploads.create("camera.mkv", len(data))["upload_id"]
+        session = self.uploads.get_session(upload_id)
+        job = await self.jobs.create_job(upload_id, session.final_path, feed=ProgressiveFeed(session, poll_interval=0.01))
+
+        half = len(data) // 2
+        await self.uploads.append(upload_id, 0, chunked(data[:half]))
+        for _ in range(500):
+            if self.jobs.get_job(job["job_id"])["frames_processed"]:
+                break
+            await asyncio.sleep(0.01)
+        partial = self.jobs.get_job(job["job_id"])
+        self.assertGreater(partial["frames_processed"], 0)
+        self.assertEqual(partial["status"], "running")
+        self.assertLess(partial["upload_progress"], 1.0)
+
+        await self.uploads.append(upload_id, half, chunked(data[half:]))
+        meta = await self.uploads.finalize(upload_id)
+        job = await self._wait(job["job_id"])
+
+        self.assertEqual(job["status"], "completed")
+        self.assertEqual(job["content_hash"], meta["sha256"])
+        self.assertEqual(job["summary"]["frames_analyzed"], 48)
+        self.assertEqual(job["summary"]["violation_events_by_class"], {"NO-Hardhat": 4})
+
+    @patch('app.services.analysis_job.PPEDetector', FakeDetector)
+    async def test_waits_for_upload_when_index_is_at_the_end(self):
+        data = self._video("camera.mp4", fourcc="mp4v")
+        upload_id = self.uploads.create("camera.mp4", len(data))["upload_id"]
+        session = self.uploads.get_session(upload_id)
+        job = await self.jobs.create_job(upload_id, session.final_path, feed=ProgressiveFeed(session, poll_interval=0.01))
+
+        await self.uploads.append(upload_id, 0, chunked(data[:len(data) - 100]))
+        for _ in range(100):
+            if self.jobs.get_job(job["job_id"]).get("waiting_for_upload"):
+                break
+            await asyncio.sleep(0.01)
+        self.assertTrue(self.jobs.get_job(job["job_id"])["waiting_for_upload"])
+
+        await self.uploads.append(upload_id, len(data) - 100, chunked(data[len(data) - 100:]))
+        await self.uploads.finalize(upload_id)
+        job = await self._wait(job["job_id"])
+
+        self.assertEqual(job["status"], "completed")
+        self.assertEqual(job["summary"]["frames_analyzed"], 48)
+
+
+class TestSegmentedAnalysis(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.video_path = os.path.join(self.tmpdir.name, "video.avi")
+        write_test_video(self.video_path, frames=48)
+        self.detector = FakeDetector()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_split_segments_snaps_to_keyframes(self):
+        self.assertEqual(split_segments(100, 1, 10.0), [(0, 100)])
+        self.assertEqual(split_segments(100, 4, 10.0), [(0, 25), (25, 50), (50, 75), (75, 100)])
+        self.assertEqual(split_segments(100, 2, 10.0, keyframes=[0.0, 4.0, 6.0]), [(0, 40), (40, 100)])
+
+    def test_segments_with_warmup_match_sequential(self):
+        sequential = io.StringIO()
+        expected = analyze_range(self.detector, self.video_path, sequential, batch_size=4)
+
+        merged = io.StringIO()
+        counts = new_counts()
+        for start, end in split_segments(48, 3, 10.0):
+            part = analyze_range(
+                self.detector, self.video_path, merged,
+                start_frame=max(0, start - 12), end_frame=end, emit_from=start, batch_size=4
+            )
+            merge_counts(counts, part)
+
+        def frames(output):
+            return [(r["frame"], len(r["violations"]), len(r["new_violations"]))
+                    for r in map(json.loads, output.getvalue().splitlines())]
+
+        self.assertEqual(frames(merged), frames(sequential))
+        self.assertEqual(counts, expected)
+        self.assertEqual(expected["violation_events_by_class"], {"NO-Hardhat": 4})
+
+    def test_stitched_track_ids_match_sequential_tracks(self):
+        sequential = io.StringIO()
+        analyze_range(self.detector, self.video_path, sequential, batch_size=4)
+
+        outputs, boundaries = [], []
+        for start, end in split_segments(48, 3, 10.0):
+            out, boundary = io.StringIO(), {}
+            analyze_range(
+                self.detector, self.video_path, out,
+                start_frame=max(0, start - 12), end_frame=end, emit_from=start, batch_size=4, boundary=boundary
+            )
+            outputs.append(out)
+            boundaries.append(boundary)
+        mappings = stitch_tracks(boundaries)
+        merged = [
+            remap_tracks(json.loads(line), index, mapping)
+            for index, (out, mapping) in enumerate(zip(outputs, mappings))
+            for line in out.getvalue().splitlines()
+        ]
+
+        # Mesma trilha da análise sequencial <-> mesmo ID no resultado costurado,
+        # inclusive nas trilhas que atravessam as fronteiras (frames 16 e 32)
+        pairs = set()
+        for expected, record in zip(map(json.loads, sequential.getvalue().splitlines()), merged):
+            pairs.update(
+                (a["track_id"], b["track_id"]) for a, b in zip(expected["detections"], record["detections"])
+            )
+        self.assertEqual(len({a for a, _ in pairs}), len(pairs))
+        self.assertEqual(len({b for _, b in pairs}), len(pairs))
+
+
+    def test_broken_pool_is_shut_down_with_its_manager(self):
+        jobs = AnalysisJobManager(results_dir=self.tmpdir.name)
+        broken = Future()
+        broken.set_exception(BrokenProcessPool("worker morreu"))
+        pool = MagicMock()
+        pool.submit.return_value = broken
+        mp_manager = MagicMock()
+        mp_manager.Queue.return_value.empty.return_value = True
+        jobs._pool, jobs._mp_manager = pool, mp_manager
+
+        job = {"job_id": "j", "file_path": self.video_path, "frame_stride": 1, "selected_classes": None}
+        with self.assertRaises(BrokenProcessPool):
+            jobs._analyze_parallel(job, [(0, 24), (24, 48)], ["a", "b"], lambda n: None, threading.Event())
+
+        pool.shutdown.assert_called_once()
+        mp_manager.shutdown.assert_called_once()
+        self.assertIsNone(jobs._pool)
+        self.assertIsNone(jobs._mp_manager)
+
+
+if __name__ == '__main__':
+    unittest.main()
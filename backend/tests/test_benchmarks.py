@@ -0,0 +1,98 @@
+import json
+import tempfile
+import unittest
+from unittest.mock import patch
+import sys
+import os
+
+# Adicionar diretório pai ao path para importar app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.api import websocket
+from benchmarks.fixtures import stub_detector, synthetic_frames, write_synthetic_video
+from benchmarks import micro
+from benchmarks.loadgen import InProcessTarget, capacity, run_ramp
+from benchmarks.pipeline import run_streams
+
+
+class TestPipelineBenchmark(unittest.IsolatedAsyncioTestCase):
+    async def test_runs_synthetic_streams_through_pipeline(self):
+        frames = synthetic_frames(10, 320, 240)
+        with patch.object(websocket, "PPEDetector", stub_detector(1.0, 3)):
+            result = await run_streams(2, duration=0.6, warmup=0.3, frames=frames)
+
+        self.assertEqual(result["streams"], 2)
+        self.assertGreater(result["frames"]["processed"], 0)
+        self.assertGreater(result["fps_total"], 0)
+        for stage in ("wait", "inference", "annotation", "encode", "send", "total"):
+            self.assertIn(stage, result["stages"])
+        self.assertGreater(result["frame_age"]["count"], 0)
+        # Pipelines e streams simuladas encerrados
+        self.assertFalse([c for c in websocket.processing_tasks if c.startswith("bench-")])
+        self.assertFalse([c for c in websocket.manager.active_connections if c.startswith("bench-")])
+
+
+class TestLoadGenerator(unittest.IsolatedAsyncioTestCase):
+    async def test_ramp_reports_capacity_curve(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            video = os.path.join(tmpdir, "camera.avi")
+            write_synthetic_video(video, synthetic_frames(10, 320, 240), fps=30.0)
+            target = InProcessTarget(video, None, stub_detector(1.0, 2))
+            steps = await run_ramp(target, [1, 2], settle=0.3, hold=0.5, min_fps=1.0, max_age_ms=5000)
+
+        self.assertEqual([step["streams"] for step in steps], [1, 2])
+        for step in steps:
+            self.assertGreater(step["fps_per_stream_min"], 0)
+            self.assertGreater(step["frames_read"], 0)
+            self.assertIsNotNone(step["frame_age"]["p95_ms"])
+            self.assertIn("cpu_percent", step)
+        self.assertEqual(capacity(steps), 2)
+        self.assertFalse([c for c in websocket.processing_tasks if c.startswith("loadgen-")])
+
+    def test_capacity_stops_at_first_failing_step(self):
+        steps = [
+            {"streams": 1, "within_limits": True},
+            {"streams": 2, "within_limits": False},
+            {"streams": 4, "within_limits": True}
+        ]
+        self.assertEqual(capacity(steps), 1)
+        self.assertIsNone(capacity(steps[1:]))
+
+
+class TestMicrobenchmarks(unittest.TestCase):
+    def test_cases_cover_hot_path(self):
+        names = list(micro.build_cases())
+        for prefix in ("annotate/", "jpeg_encode/", "base64/", "iou_matrix/", "smoother_update/"):
+            self.assertTrue(any(name.startswith(prefix) for name in names), prefix)
+
+    def test_compare_scales_by_calibration_and_flags_regressions(self):
+        baseline = {"calibration_us": 100.0, "cases": {"a": {"min_us": 10.0}, "b": {"min_us": 10.0}}}
+        # Máquina 2x mais lenta: "a" acompanha, "b" regrediu além disso
+        results = {"calibration_us": 200.0, "cases": {"a": {"min_us": 21.0}, "b": {"min_us": 30.0}, "new": {"min_us": 1.0}}}
+        report, scale = micro.compare(results, baseline, tolerance=0.25)
+
+        self.assertEqual(scale, 2.0)
+        rows = {row["case"]: row for row in report}
+        self.assertEqual(set(rows), {"a", "b"})
+        self.assertFalse(rows["a"]["regression"])
+        self.assertTrue(rows["b"]["regression"])
+        self.assertAlmostEqual(rows["b"]["change"], 0.5)
+
+    def test_runner_exits_nonzero_on_regression(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "micro.json")
+            args = ["--filter", "base64/360p", "--baseline", path, "--min-time", "0.001", "--repeat", "2", "--no-calibration"]
+            self.assertEqual(micro.main(args + ["--update-baseline"]), 0)
+            with open(path) as f:
+                baseline = json.load(f)
+            self.assertIn("base64/360p", baseline["cases"])
+
+            # Baseline impossivelmente rápida: regressão mesmo após remedir
+            baseline["cases"]["base64/360p"]["min_us"] = 1e-6
+            with open(path, "w") as f:
+                json.dump(baseline, f)
+            self.assertEqual(micro.main(args + ["--retries", "1"]), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import asyncio
+import json
+import unittest
+from unittest.mock import patch
+import sys
+import os
+
+# Adicionar diretório pai ao path para importar app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.api import websocket
+from app.api.routes import stream_handler
+from app.services.client_render import DetectionDeltaEncoder, SharedFrameCache
+from benchmarks.fixtures import SyntheticStream, stub_detector, synthetic_frames
+
+
+def det(track_id, bbox, class_name="Person", confidence=0.9):
+    return {"track_id": track_id, "bbox": bbox, "class_name": class_name, "confidence": confidence}
+
+
+class RecordingViewer:
+    def __init__(self):
+        self.messages = []
+
+    async def send_text(self, text):
+        self.messages.append(json.loads(text))
+
+
+class TestDetectionDeltaEncoder(unittest.TestCase):
+    def test_first_message_is_keyframe(self):
+        encoder = DetectionDeltaEncoder(keyframe_interval=30)
+        message = encoder.encode([det(1, [0, 0, 10, 10]), det(2, [5, 5, 20, 20], "NO-Hardhat", 0.61)])
+
+        self.assertTrue(message["keyframe"])
+        self.assertEqual(message["set"], [[1, 0, 0, 10, 10, "Person", 0.9], [2, 5, 5, 20, 20, "NO-Hardhat", 0.61]])
+
+    def test_sends_only_changes(self):
+        encoder = DetectionDeltaEncoder(keyframe_interval=30)
+        encoder.encode([det(1, [0, 0, 10, 10]), det(2, [5, 5, 20, 20])])
+
+        # Sem alterações (confiança igual na precisão exibida)
+        self.assertIsNone(encoder.encode([det(1, [0, 0, 10, 10], confidence=0.901), det(2, [5, 5, 20, 20])]))
+
+        message = encoder.encode([det(1, [1, 0, 11, 10]), det(3, [30, 30, 40, 40])])
+        self.assertFalse(message["keyframe"])
+        self.assertEqual(message["set"], [[1, 1, 0, 11, 10, "Person", 0.9], [3, 30, 30, 40, 40, "Person", 0.9]])
+        self.assertEqual(message["removed"], [2])
+
+    def test_periodic_keyframe_and_reset(self):
+        encoder = DetectionDeltaEncoder(keyframe_interval=3)
+        detections = [det(1, [0, 0, 10, 10])]
+        keyframes = [bool(m and m["keyframe"]) for m in (encoder.encode(detections) for _ in range(7))]
+        self.assertEqual(keyframes, [True, False, False, True, False, False, True])
+
+        encoder.reset()
+        self.assertTrue(encoder.encode(detections)["keyframe"])
+
+    def test_untracked_detections_use_position(self):
+        encoder = DetectionDeltaEncoder()
+        message = encoder.encode([{"bbox": [0, 0, 1, 1], "class_name": "Hardhat", "confidence": 0.5}])
+        self.assertEqual(message["set"][0][0], -1)
+
+
+class TestSharedFrameCache(unittest.TestCase):
+    def test_returns_frame_only_for_same_sequence(self):
+        cache = SharedFrameCache()
+        cache.put("cam", 7, "jpeg7")
+        self.assertEqual(cache.get("cam", 7), "jpeg7")
+        self.assertIsNone(cache.get("cam", 8))
+        self.assertIsNone(cache.get("other", 7))
+
+    def test_evicts_least_recent_stream(self):
+        cache = SharedFrameCache(max_streams=2)
+        cache.put("a", 1, "a1")
+        cache.put("b", 1, "b1")
+        cache.get("a", 1)
+        cache.put("c", 1, "c1")
+        self.assertIsNone(cache.get("b", 1))
+        self.assertEqual(cache.get("a", 1), "a1")
+
+
+class TestClientRenderPipeline(unittest.IsolatedAsyncioTestCase):
+    async def test_viewers_share_clean_jpeg_and_receive_detections(self):
+        stream = SyntheticStream(stream_handler, "client-render", synthetic_frames(5, 320, 240), fps=10)
+        stream.start()
+        viewers = {f"client-render-{i}": RecordingViewer() for i in range(2)}
+        tasks = {}
+        with patch.object(websocket, "PPEDetector", stub_detector(0.0, 3)):
+            for client_id, viewer in viewers.items():
+                websocket.manager.active_connections[client_id] = viewer
+                tasks[client_id] = asyncio.create_task(
+                    websocket.process_video_stream(client_id, stream.url, render="client")
+                )
+                websocket.processing_tasks[client_id] = tasks[client_id]
+            await asyncio.sleep(0.8)
+            shared = sum(websocket.pipeline_metrics.active[c].frames["shared"] for c in tasks)
+            for client_id in tasks:
+                websocket.processing_tasks.pop(client_id, None)
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+        for client_id in tasks:
+            websocket.manager.disconnect(client_id)
+        stream.stop()
+
+        self.assertGreater(shared, 0)
+        for viewer in viewers.values():
+            frames = [m for m in viewer.messages if m["type"] == "frame"]
+            self.assertGreater(len(frames), 0)
+            first = next(m for m in frames if "detections" in m)
+            self.assertTrue(first["detections"]["keyframe"])
+            rows = next(m["detections"]["set"] for m in frames if m.get("detections", {}).get("set"))
+            self.assertEqual(len(rows[0]), 7)
+        # Mesmo frame da stream, mesmos bytes para os dois clientes
+        a, b = ([m["data"] for m in v.messages if m["type"] == "frame"] for v in viewers.values())
+        self.assertTrue(set(a) & set(b))
+
+
+if __name__ == '__main__':
+    unittest.main()
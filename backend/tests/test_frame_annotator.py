@@ -0,0 +1,98 @@
+import unittest
+import sys
+import os
+
+import cv2
+import numpy as np
+
+# Adicionar diretório pai ao path para importar app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.frame_annotator import FrameAnnotator
+from benchmarks.fixtures import synthetic_detections, synthetic_frames
+
+
+def reference_annotate(annotator, frame, detections):
+    """Desenho direto com cv2 (implementação original, sem cache)"""
+    annotated = frame.copy()
+    for det in detections:
+        x1, y1, x2, y2 = det["bbox"]
+        color = annotator.COLORS.get(det["class_name"], annotator.DEFAULT_COLOR)
+        cv2.rectangle(annotated, (x1, y1), (x2, y2), color, annotator.box_thickness)
+        label = f"{det['class_name']} {det['confidence']:.2f}"
+        (w, h), _ = cv2.getTextSize(label, annotator.font, annotator.font_scale, annotator.font_thickness)
+        cv2.rectangle(annotated, (x1, y1 - 20), (x1 + w, y1), color, -1)
+        text_color = (255, 255, 255) if sum(color) < 400 else (0, 0, 0)
+        cv2.putText(annotated, label, (x1, y1 - 5), annotator.font, annotator.font_scale, text_color, annotator.font_thickness)
+    return annotated
+
+
+class TestFrameAnnotator(unittest.TestCase):
+    def setUp(self):
+        self.annotator = FrameAnnotator()
+        self.frame = synthetic_frames(1, 640, 480)[0]
+        self.detections = synthetic_detections(20, 640, 480) + [
+            # Labels recortados nas bordas do frame
+            {"class_name": "NO-Hardhat", "confidence": 0.876, "bbox": [0, 0, 50, 50]},
+            {"class_name": "Unknown", "confidence": 0.1, "bbox": [610, 5, 650, 60]},
+            {"class_name": "Person", "confidence": 0.999, "bbox": [-10, 477, 40, 500]}
+        ]
+
+    def test_matches_direct_drawing(self):
+        expected = reference_annotate(self.annotator, self.frame, self.detections)
+        original = self.frame.copy()
+
+        annotated = self.annotator.annotate(self.frame, self.detections)
+
+        np.testing.assert_array_equal(annotated, expected)
+        np.testing.assert_array_equal(self.frame, original)
+
+    def test_in_place_draws_into_frame(self):
+        expected = reference_annotate(self.annotator, self.frame, self.detections)
+        frame = self.frame.copy()
+
+        annotated = self.annotator.annotate(frame, self.detections, in_place=True)
+
+        self.assertIs(annotated, frame)
+        np.testing.assert_array_equal(frame, expected)
+
+    def test_no_detections_returns_frame_without_copy(self):
+        self.assertIs(self.annotator.annotate(self.frame, []), self.frame)
+        self.assertIs(self.annotator.annotate(self.frame, [{"class_name": "Person", "bbox": []}]), self.frame)
+
+    def test_label_sprites_are_cached_by_rounded_confidence(self):
+        first = self.annotator._label_sprite("Hardhat", round(0.8712, 2))
+        self.assertIs(self.annotator._label_sprite("Hardhat", round(0.8749, 2)), first)
+        self.assertIs(FrameAnnotator()._label_sprite("Hardhat", 0.87), first)
+        self.assertIsNot(self.annotator._label_sprite("Hardhat", 0.88), first)
+
+    def test_overlays_blend_only_affected_region(self):
+        stats = {"total_detections": 12, "violations_count": 3, "fps": 29.7}
+        frame = self.frame.copy()
+
+        self.annotator.add_stats_overlay(frame, stats)
+
+        changed = np.argwhere((frame != self.frame).any(axis=2))
+        self.assertGreater(len(changed), 0)
+        # Apenas o canto superior esquerdo (textos) foi alterado
+        self.assertLess(changed[:, 0].max(), 110)
+        self.assertLess(changed[:, 1].max(), 250)
+
+    def test_alert_overlay_matches_full_frame_blend(self):
+        frame = self.frame.copy()
+        h, w = frame.shape[:2]
+        text = "ALERTA: 2 VIOLACOES DETECTADAS"
+        (tw, th), _ = cv2.getTextSize(text, self.annotator.font, 1.0, 2)
+        overlay = frame.copy()
+        cv2.rectangle(overlay, (0, 0), (w, h), (0, 0, 255), 20)
+        cv2.rectangle(overlay, (w//2 - tw//2 - 10, 50 - th - 10), (w//2 + tw//2 + 10, 60), (0, 0, 255), -1)
+        cv2.putText(overlay, text, (w//2 - tw//2, 50), self.annotator.font, 1.0, (255, 255, 255), 2)
+        expected = cv2.addWeighted(overlay, 0.3, frame, 0.7, 0)
+
+        self.annotator.draw_alert_overlay(frame, [{}, {}])
+
+        np.testing.assert_array_equal(frame, expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+
+# Adicionar diretório pai ao path para importar app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.frame_ring import FrameRing
+from app.services.stream_handler import StreamHandler
+
+
+class TestFrameRing(unittest.TestCase):
+    def setUp(self):
+        self.ring = FrameRing.create(slots=4, slot_bytes=64 * 48 * 3)
+        self.addCleanup(self.ring.close)
+
+    def test_reader_sees_published_frame_without_copy(self):
+        frame = np.full((48, 64, 3), 7, dtype=np.uint8)
+        self.ring.write(frame, 1, 123.0)
+        reader = FrameRing.attach(self.ring.name)
+        try:
+            seq, captured_at, view = reader.latest()
+            self.assertEqual((seq, captured_at), (1, 123.0))
+            np.testing.assert_array_equal(view, frame)
+            self.assertFalse(view.flags.writeable)
+
+            # Mesma memória: a próxima escrita no slot aparece na view
+            self.ring.write(np.full((48, 64, 3), 9, dtype=np.uint8), 5, 124.0)
+            self.assertEqual(int(view[0, 0, 0]), 9)
+            del view
+        finally:
+            reader.close()
+
+    def test_overwritten_and_in_progress_slots_are_rejected(self):
+        self.ring.write(np.zeros((48, 64, 3), dtype=np.uint8), 1, 1.0)
+        self.assertTrue(self.ring.is_current(1))
+
+        # Frame 5 usa o mesmo slot do frame 1
+        self.ring.reserve(5, (48, 64, 3))
+        self.assertFalse(self.ring.is_current(1))
+        self.assertIsNone(self.ring.frame(5))
+        self.ring.commit(5, 2.0)
+        self.assertIsNone(self.ring.frame(1))
+        self.assertEqual(self.ring.frame(5).shape, (48, 64, 3))
+
+    def test_rejects_frames_larger_than_slot(self):
+        with self.assertRaises(ValueError):
+            self.ring.write(np.zeros((480, 640, 3), dtype=np.uint8), 1, 1.0)
+
+
+class TestStreamHandlerRing(unittest.TestCase):
+    def test_publish_resizes_into_ring(self):
+        handler = StreamHandler()
+        handler.frame_ring_slots = 4
+        handler.active_streams["cam"] = {"frames_read": 0, "latest": None, "stop_signal": False}
+        handler.publish("cam", np.full((1080, 1920, 3), 50, dtype=np.uint8))
+        ring = handler.get_ring("cam")
+        try:
+            seq, _, frame, _ = handler.active_streams["cam"]["latest"]
+            self.assertEqual(seq, 1)
+            self.assertEqual(frame.shape, (480, 640, 3))
+            self.assertEqual(ring.latest()[0], 1)
+            self.assertTrue(np.shares_memory(frame, ring.frame(1)))
+            del frame
+        finally:
+            handler.close_ring("cam")
+        self.assertIsNone(handler.get_ring("cam"))
+        self.assertFalse(ring.is_current(1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+
+# Adicionar diretório pai ao path para importar app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.inference_scheduler import InferenceScheduler
+
+
+def _frame(x: int) -> np.ndarray:
+    """Frame 640x480 com um retângulo na posição x"""
+    frame = np.full((480, 640, 3), 60, dtype=np.uint8)
+    frame[200:360, x:x + 120] = 220
+    return frame
+
+
+class TestInferenceScheduler(unittest.TestCase):
+    def _feed(self, scheduler, key, moving, criticality="normal", frames=5):
+        for i in range(frames):
+            scheduler.observe(key, _frame(100 + (40 * i if moving else 0)), criticality)
+
+    def test_idle_stream_drops_to_minimum_rate(self):
+        scheduler = InferenceScheduler(enabled=True, budget_fps=0, min_fps=0.2, max_fps=10)
+        scheduler.register("parking")
+        scheduler.register("scaffold")
+        self._feed(scheduler, "parking", moving=False)
+        self._feed(scheduler, "scaffold", moving=True)
+
+        rates = {s["stream_id"]: s for s in scheduler.get_stats()["streams"]}
+        self.assertEqual(rates["parking"]["allocated_fps"], 0.2)
+        self.assertEqual(rates["scaffold"]["allocated_fps"], 10)
+        self.assertGreater(rates["scaffold"]["motion"], rates["parking"]["motion"])
+
+    def test_oversubscribed_budget_follows_priority(self):
+        scheduler = InferenceScheduler(enabled=True, budget_fps=8, min_fps=0.2, max_fps=10)
+        for key in ("scaffold", "dock", "yard", "parking"):
+            scheduler.register(key)
+        self._feed(scheduler, "scaffold", moving=True)
+        self._feed(scheduler, "dock", moving=True)
+        self._feed(scheduler, "yard", moving=True, criticality="low")
+        self._feed(scheduler, "parking", moving=False)
+        # Trilha NO-Hardhat aberta no andaime
+        scheduler.report("scaffold", 50.0, violations=1)
+
+        rates = {s["stream_id"]: s["allocated_fps"] for s in scheduler.get_stats()["streams"]}
+        self.assertAlmostEqual(sum(rates.values()), 8, delta=0.05)
+        self.assertEqual(rates["parking"], 0.2)
+        self.assertGreater(rates["scaffold"], rates["dock"])
+        self.assertGreater(rates["dock"], rates["yard"])
+
+    def test_viewers_of_one_stream_share_its_allocation(self):
+        scheduler = InferenceScheduler(enabled=True, budget_fps=4, min_fps=0.2, max_fps=10)
+        # Três clientes na doca, um no andaime, ambas com movimento
+        for key in ("viewer-1", "viewer-2", "viewer-3", "scaffold"):
+            scheduler.register(key)
+        for i in range(5):
+            frame = _frame(100 + 40 * i)
+            for key in ("viewer-1", "viewer-2", "viewer-3"):
+                scheduler.observe(key, frame, stream_id="dock", seq=i)
+            scheduler.observe("scaffold", frame, stream_id="scaffold", seq=i)
+
+        streams = {s["stream_id"]: s for s in scheduler.get_stats()["streams"]}
+        self.assertEqual(sorted(streams), ["dock", "scaffold"])
+        self.assertEqual(streams["dock"]["clients"], ["viewer-1", "viewer-2", "viewer-3"])
+        self.assertAlmostEqual(streams["dock"]["allocated_fps"], streams["scaffold"]["allocated_fps"], delta=0.01)
+
+        # A taxa da doca é dividida entre os espectadores, não multiplicada
+        interval = 1.0 / streams["dock"]["allocated_fps"]
+        self.assertTrue(scheduler.due("viewer-1", now=1000.0))
+        scheduler.report("viewer-1", 20.0, now=1000.0)
+        self.assertTrue(scheduler.due("viewer-2", now=1000.0))
+        self.assertFalse(scheduler.due("viewer-1", now=1000.0 + 2 * interval))
+        self.assertTrue(scheduler.due("viewer-1", now=1000.0 + 3 * interval))
+
+        for key in ("viewer-1", "viewer-2", "viewer-3"):
+            scheduler.unregister(key)
+        self.assertEqual([s["stream_id"] for s in scheduler.get_stats()["streams"]], ["scaffold"])
+
+    def test_budget_is_estimated_from_latency(self):
+        scheduler = InferenceScheduler(enabled=True, budget_fps=0)
+        self.assertIsNone(scheduler.budget)
+        scheduler.concurrency = 2
+        scheduler.report("cam", 100.0)
+        self.assertAlmostEqual(scheduler.budget, 2 * 10 * scheduler.UTILIZATION)
+
+    def test_due_respects_allocated_rate(self):
+        scheduler = InferenceScheduler(enabled=True, budget_fps=0, min_fps=0.2, max_fps=10)
+        scheduler.register("cam")
+        self._feed(scheduler, "cam", moving=False)
+        self.assertTrue(scheduler.due("cam", now=1000.0))
+        scheduler.report("cam", 20.0, now=1000.0)
+        self.assertFalse(scheduler.due("cam", now=1003.0))
+        self.assertTrue(scheduler.due("cam", now=1005.0))
+
+    def test_disabled_scheduler_always_runs(self):
+        scheduler = InferenceScheduler(enabled=False)
+        scheduler.register("cam")
+        scheduler.report("cam", 20.0)
+        self.assertTrue(scheduler.due("cam"))
+
+
+if __name__ == '__main__':
+    unittest.main()
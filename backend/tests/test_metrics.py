@@ -0,0 +1,61 @@
+import unittest
+import sys
+import os
+
+# Adicionar diretório pai ao path para importar app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.metrics import MetricsWriter
+from app.services.pipeline_metrics import StageHistogram, pipeline_metrics
+
+
+def parse(text: str) -> dict:
+    """Amostras da exposição de texto: 'nome{labels}' -> valor"""
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            key, value = line.rsplit(" ", 1)
+            samples[key] = float(value)
+    return samples
+
+
+class TestMetrics(unittest.TestCase):
+    def test_histogram_is_cumulative_in_seconds(self):
+        hist = StageHistogram()
+        for ms in (0.5, 3.0, 3.0, 250.0):
+            hist.record(ms)
+        out = MetricsWriter()
+        out.histogram("latency_seconds", "Latência", [({"stage": "inference"}, hist)])
+        samples = parse(out.render())
+
+        self.assertEqual(samples['latency_seconds_bucket{stage="inference",le="0.00064"}'], 1)
+        self.assertEqual(samples['latency_seconds_bucket{stage="inference",le="0.00512"}'], 3)
+        self.assertEqual(samples['latency_seconds_bucket{stage="inference",le="0.32768"}'], 4)
+        self.assertEqual(samples['latency_seconds_bucket{stage="inference",le="+Inf"}'], 4)
+        self.assertAlmostEqual(samples['latency_seconds_sum{stage="inference"}'], 0.2565)
+        self.assertIn("# TYPE latency_seconds histogram", out.render())
+
+    def test_metrics_endpoint(self):
+        timings = pipeline_metrics.open_stream("metrics-test", "video.mp4")
+        timings.count("read", 5)
+        timings.count("processed", 4)
+        timings.record("inference", 20.0)
+        try:
+            response = TestClient(app).get("/metrics")
+        finally:
+            pipeline_metrics.close_stream(timings)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/plain; version=0.0.4"))
+        samples = parse(response.text)
+        self.assertEqual(samples['ppe_pipeline_frames_total{client_id="metrics-test",result="processed"}'], 4)
+        self.assertEqual(samples['ppe_inference_duration_seconds_count{client_id="metrics-test"}'], 1)
+        self.assertGreater(samples["process_resident_memory_bytes"], 0)
+        self.assertIn('ppe_websocket_clients{channel="video"}', samples)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+import sys
+import os
+
+# Adicionar diretório pai ao path para importar app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.pipeline_metrics import PipelineMetrics, StageHistogram
+
+
+class TestPipelineMetrics(unittest.TestCase):
+    def test_percentiles_within_bucket_resolution(self):
+        hist = StageHistogram()
+        for ms in range(1, 101):
+            hist.record(float(ms))
+
+        stats = hist.to_dict()
+        self.assertEqual(stats["count"], 100)
+        self.assertAlmostEqual(stats["mean_ms"], 50.5)
+        self.assertEqual(stats["max_ms"], 100.0)
+        for key, expected in (("p50_ms", 50), ("p95_ms", 95), ("p99_ms", 99)):
+            self.assertGreaterEqual(stats[key], expected)
+            self.assertLessEqual(stats[key], expected * 1.2)
+
+    def test_streams_are_aggregated_when_closed(self):
+        metrics = PipelineMetrics(history=1)
+        a = metrics.open_stream("a")
+        b = metrics.open_stream("b")
+        a.record("inference", 10.0)
+        b.record("inference", 30.0)
+        b.record("send", 1.0)
+        b.frame_age.record(2500.0)
+        b.count("stale")
+
+        metrics.close_stream(a)
+        stats = metrics.get_stats()
+        self.assertEqual([s["stream_id"] for s in stats["active"]], ["b"])
+        self.assertEqual(stats["stages"]["inference"]["count"], 2)
+        self.assertEqual(stats["stages"]["send"]["count"], 1)
+        self.assertNotIn("resize", stats["stages"])
+        self.assertEqual(stats["frames"]["stale"], 1)
+        self.assertEqual(stats["frame_age"]["max_ms"], 2500.0)
+
+        metrics.close_stream(b)
+        self.assertEqual(metrics.get_stats()["stages"]["inference"]["count"], 2)
+        # Apenas o histórico mais recente é mantido por stream
+        self.assertIsNone(metrics.get_stream("a"))
+        self.assertIsNotNone(metrics.get_stream("b")["ended_at"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+import multiprocessing
+import tempfile
+import threading
+import sys
+import os
+
+# Adicionar diretório pai ao path para importar app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.profiler import PROFILE_SIGNAL, Profiler, install_worker_handler, parse_collapsed
+
+
+def spin(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def busy_worker(profile_dir, ready, stop):
+    """Simula um worker de análise ocupado"""
+    install_worker_handler(profile_dir)
+    ready.set()
+    spin(stop)
+
+
+class TestProfiler(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.profiler = Profiler(max_seconds=5, profile_dir=self.tmpdir.name)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_samples_all_threads_as_collapsed_stacks(self):
+        stop = threading.Event()
+        thread = threading.Thread(target=spin, args=(stop,), name="reader")
+        thread.start()
+        try:
+            folded = self.profiler.profile(0.3, hz=200)
+        finally:
+            stop.set()
+            thread.join()
+
+        stacks = parse_collapsed(folded)
+        reader = [s for s in stacks if s.split(";")[1] == "reader"]
+        self.assertTrue(reader)
+        self.assertTrue(all(s.startswith(f"server-{os.getpid()};") for s in stacks))
+        self.assertTrue(any("spin (test_profiler.py:" in s for s in reader))
+        # O próprio amostrador não aparece
+        self.assertFalse(any("sample_stacks" in s for s in stacks))
+
+    @unittest.skipIf(PROFILE_SIGNAL is None, "sinal de profiling indisponível")
+    def test_includes_worker_processes(self):
+        context = multiprocessing.get_context("spawn")
+        ready, stop = context.Event(), context.Event()
+        worker = context.Process(target=busy_worker, args=(self.tmpdir.name, ready, stop))
+        worker.start()
+        try:
+            self.assertTrue(ready.wait(30))
+            stacks = parse_collapsed(self.profiler.profile(0.3, hz=100, worker_pids=[worker.pid]))
+        finally:
+            stop.set()
+            worker.join(10)
+
+        worker_stacks = [s for s in stacks if s.startswith(f"analysis-worker-{worker.pid};")]
+        self.assertTrue(any("spin (test_profiler.py:" in s for s in worker_stacks))
+        self.assertEqual(os.listdir(self.tmpdir.name), ["request.json"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+
+# Adicionar diretório pai ao path para importar app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.roi import RegionFilter
+from app.services.stream_handler import StreamHandler
+
+# Portão no quadrante superior direito de uma câmera 1920x1080
+GATE = [[0.6, 0.1], [0.9, 0.1], [0.9, 0.5], [0.6, 0.5]]
+
+
+class TestRegionFilter(unittest.TestCase):
+    def test_crop_covers_roi_at_model_resolution(self):
+        region = RegionFilter([GATE], None, 1920, 1080)
+        x1, y1, x2, y2 = region.crop_rect
+        self.assertTrue(x1 <= 1152 and y1 <= 108 and x2 >= 1728 and y2 >= 540)
+        self.assertLess((x2 - x1) * (y2 - y1), 1920 * 1080 / 4)
+        # Menor que o modelo: sem redução, mais pixels por objeto que o frame reduzido
+        self.assertEqual(region.scale, 1.0)
+
+        frame = np.zeros((1080, 1920, 3), dtype=np.uint8)
+        frame[300, 1400] = 255
+        crop = region.crop(frame)
+        self.assertEqual(crop.shape, region.input_shape)
+        self.assertEqual(int(crop[300 - y1, 1400 - x1, 0]), 255)
+
+    def test_large_roi_is_reduced_to_model_size(self):
+        region = RegionFilter([[[0, 0], [1, 0], [1, 0.5]]], None, 3840, 2160)
+        self.assertLessEqual(max(region.input_size), 640)
+        crop = region.crop(np.zeros((2160, 3840, 3), dtype=np.uint8))
+        self.assertEqual(crop.shape, region.input_shape)
+
+    def test_restore_maps_crop_to_display_and_masks(self):
+        region = RegionFilter([GATE], [[[0.6, 0.1], [0.7, 0.1], [0.7, 0.3], [0.6, 0.3]]], 1920, 1080)
+        x1, y1 = region.crop_rect[:2]
+        inside = [1500 - x1, 300 - y1, 1600 - x1, 500 - y1]          # no portão
+        excluded = [1160 - x1, 110 - y1, 1260 - x1, 300 - y1]        # na exclusão
+        outside = [0, 0, 30, 30]                                    # na margem do recorte
+        detections = [{"class_name": "Person", "confidence": 0.9, "bbox": b} for b in (inside, excluded, outside)]
+
+        restored = region.restore(detections, (640, 480), space="crop")
+        self.assertEqual(len(restored), 1)
+        self.assertEqual(restored[0]["bbox"], [500, 133, 533, 222])
+
+    def test_exclusions_only_filter_full_frame(self):
+        region = RegionFilter(None, [[[0, 0], [0.5, 0], [0.5, 1], [0, 1]]], 1280, 720)
+        self.assertFalse(region.crops)
+        detections = [
+            {"class_name": "Person", "confidence": 0.9, "bbox": [10, 10, 100, 200]},
+            {"class_name": "Person", "confidence": 0.9, "bbox": [400, 10, 500, 200]}
+        ]
+        restored = region.restore(detections, (640, 480), space="display")
+        self.assertEqual([d["bbox"] for d in restored], [[400, 10, 500, 200]])
+
+    def test_no_zones_means_no_filter(self):
+        self.assertIsNone(RegionFilter.from_config({"criticality": "high"}, 640, 480))
+
+
+class TestStreamHandlerRegions(unittest.TestCase):
+    def _handler(self, slots):
+        handler = StreamHandler()
+        handler.frame_ring_slots = slots
+        handler.active_streams["cam"] = {"frames_read": 0, "latest": None, "stop_signal": False, "config": {}}
+        self.addCleanup(handler.close_ring, "cam")
+        return handler
+
+    def test_publish_crops_roi_and_follows_config_changes(self):
+        for slots in (0, 4):
+            handler = self._handler(slots)
+            frame = np.zeros((1080, 1920, 3), dtype=np.uint8)
+            handler.publish("cam", frame)
+            self.assertIsNone(handler.active_streams["cam"]["latest"][3])
+
+            handler.update_config("cam", {"roi": [GATE]})
+            handler.publish("cam", frame)
+            seq, _, display, (region, crop, tiled) = handler.active_streams["cam"]["latest"]
+            self.assertIsNone(tiled)
+            self.assertEqual(crop.shape, region.input_shape)
+            self.assertEqual(display.shape[:2], (480, 640) if slots else (1080, 1920))
+            if slots:
+                # Com o anel, o slot guarda o recorte lido pelos workers
+                self.assertTrue(np.shares_memory(crop, handler.get_ring("cam").frame(seq)))
+            del display, crop
+
+
+if __name__ == '__main__':
+    unittest.main()
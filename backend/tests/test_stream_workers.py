@@ -0,0 +1,182 @@
+import asyncio
+import os
+import signal
+import sys
+import time
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+# Adicionar diretório pai ao path para importar app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.frame_ring import FrameOverwritten, FrameRing
+from app.services.stream_workers import ConsistentHashRing, StreamWorkerPool, WorkerUnavailable
+from app.api import websocket
+from app.api.routes import stream_handler
+from benchmarks.fixtures import FakeViewer, SyntheticStream, synthetic_frames
+
+
+class TestConsistentHashRing(unittest.TestCase):
+    def test_keys_are_spread_and_stable(self):
+        ring = ConsistentHashRing(range(4))
+        keys = [f"camera-{i}" for i in range(2000)]
+        assignment = {key: ring.node_for(key) for key in keys}
+
+        counts = [list(assignment.values()).count(node) for node in range(4)]
+        self.assertTrue(all(300 < n < 700 for n in counts), counts)
+        self.assertEqual(assignment, {key: ConsistentHashRing(range(4)).node_for(key) for key in keys})
+
+    def test_removing_node_moves_only_its_keys(self):
+        ring = ConsistentHashRing(range(4))
+        keys = [f"camera-{i}" for i in range(1000)]
+        before = {key: ring.node_for(key) for key in keys}
+        ring.remove(2)
+        for key in keys:
+            if before[key] != 2:
+                self.assertEqual(ring.node_for(key), before[key])
+            else:
+                self.assertNotEqual(ring.node_for(key), 2)
+
+
+class TestStreamWorkerPool(unittest.IsolatedAsyncioTestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.pool = StreamWorkerPool(workers=2, detector="benchmarks.fixtures:StubDetector", slots=4)
+        cls.pool.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.stop()
+
+    def _keys_by_worker(self):
+        keys = {}
+        for i in range(100):
+            keys.setdefault(self.pool.worker_for(f"cam{i}"), f"cam{i}")
+        return keys
+
+    async def _wait_alive(self, timeout=60):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            stats = self.pool.get_stats()
+            if all(w["alive"] for w in stats["workers"]):
+                return stats
+            await asyncio.sleep(0.1)
+        self.fail("workers não reiniciaram")
+
+    async def test_detects_in_worker_of_stream(self):
+        frame = np.zeros((480, 640, 3), dtype=np.uint8)
+        results = await asyncio.wait_for(
+            asyncio.gather(*(self.pool.detect(key, frame) for key in self._keys_by_worker().values())), 60
+        )
+        for result in results:
+            self.assertEqual(len(result["detections"]), 4)
+
+        stats = self.pool.get_stats()
+        self.assertTrue(all(w["streams"] for w in stats["workers"]))
+        self.assertTrue(all(w["pending"] == 0 for w in stats["workers"]))
+
+    async def test_rejects_frames_larger_than_slot(self):
+        with self.assertRaises(ValueError):
+            await self.pool.detect("cam", np.zeros((1080, 1920, 3), dtype=np.uint8))
+
+    async def test_batch_larger_than_slots_is_split(self):
+        tiles = [np.zeros((360, 640, 3), dtype=np.uint8)] * 6
+        results = await asyncio.wait_for(self.pool.detect_batch("cam-tiles", tiles), 60)
+        self.assertEqual(len(results), 6)
+        self.assertTrue(all(len(r["detections"]) == 4 for r in results))
+        self.assertEqual(len(self.pool._workers[self.pool.worker_for("cam-tiles")].free_slots), self.pool.slots)
+
+    async def test_detects_from_frame_ring_without_slot(self):
+        ring = FrameRing.create(slots=4, slot_bytes=640 * 480 * 3)
+        try:
+            ring.write(np.zeros((480, 640, 3), dtype=np.uint8), 1, time.time())
+            result = await asyncio.wait_for(self.pool.detect_shared("cam-ring", ring, 1), 60)
+            self.assertEqual(len(result["detections"]), 4)
+            self.assertEqual(len(self.pool._workers[self.pool.worker_for("cam-ring")].free_slots), self.pool.slots)
+
+            # Slot reutilizado (frame 5 no lugar do 1) antes da leitura
+            ring.write(np.zeros((480, 640, 3), dtype=np.uint8), 5, time.time())
+            with self.assertRaises(FrameOverwritten):
+                await asyncio.wait_for(self.pool.detect_shared("cam-ring", ring, 1), 60)
+        finally:
+            ring.close()
+
+    async def test_crashed_worker_restarts_without_affecting_others(self):
+        frame = np.zeros((240, 320, 3), dtype=np.uint8)
+        keys = self._keys_by_worker()
+        await asyncio.wait_for(asyncio.gather(*(self.pool.detect(k, frame) for k in keys.values())), 60)
+        victim = self.pool.get_stats()["workers"][0]
+
+        # Requisição em andamento no worker que morre falha; o outro segue atendendo
+        pending = asyncio.ensure_future(self.pool.detect(keys[0], frame))
+        await asyncio.sleep(0.005)
+        os.kill(victim["pid"], signal.SIGKILL)
+        survivor = await asyncio.wait_for(self.pool.detect(keys[1], frame), 30)
+        self.assertEqual(len(survivor["detections"]), 4)
+        try:
+            await asyncio.wait_for(pending, 30)
+        except WorkerUnavailable:
+            pass
+
+        stats = await self._wait_alive()
+        restarted = stats["workers"][0]
+        self.assertNotEqual(restarted["pid"], victim["pid"])
+        self.assertEqual(restarted["restarts"], victim["restarts"] + 1)
+        result = await asyncio.wait_for(self.pool.detect(keys[0], frame), 60)
+        self.assertEqual(len(result["detections"]), 4)
+        self.assertEqual(len(self.pool._workers[0].free_slots), self.pool.slots)
+
+
+    async def test_restart_keeps_results_of_other_workers(self):
+        frame = np.zeros((240, 320, 3), dtype=np.uint8)
+        keys = self._keys_by_worker()
+        await asyncio.wait_for(asyncio.gather(*(self.pool.detect(k, frame) for k in keys.values())), 60)
+        before = self.pool.get_stats()["workers"][1]
+
+        restarting = asyncio.ensure_future(asyncio.to_thread(self.pool.restart, 1))
+        for _ in range(5):
+            result = await asyncio.wait_for(self.pool.detect(keys[0], frame), 30)
+            self.assertEqual(len(result["detections"]), 4)
+        self.assertTrue(await restarting)
+
+        stats = await self._wait_alive()
+        self.assertNotEqual(stats["workers"][1]["pid"], before["pid"])
+        result = await asyncio.wait_for(self.pool.detect(keys[1], frame), 60)
+        self.assertEqual(len(result["detections"]), 4)
+
+
+class RejectingPool:
+    """Pool cujo slot não comporta nenhum frame"""
+    enabled = True
+
+    async def detect(self, key, frame, selected_classes=None):
+        raise ValueError(f"Frame {frame.shape} não cabe no slot")
+
+    detect_batch = detect
+
+
+class TestPipelineWithWorkers(unittest.IsolatedAsyncioTestCase):
+    async def test_frame_rejected_by_worker_does_not_end_pipeline(self):
+        stream = SyntheticStream(stream_handler, "rejected", synthetic_frames(5, 320, 240), fps=20)
+        stream.start()
+        client_id = "rejected-viewer"
+        websocket.manager.active_connections[client_id] = FakeViewer()
+        with patch.object(websocket, "stream_workers", RejectingPool()):
+            task = asyncio.create_task(websocket.process_video_stream(client_id, stream.url, render="client"))
+            websocket.processing_tasks[client_id] = task
+            await asyncio.sleep(0.8)
+            timings = websocket.pipeline_metrics.active[client_id]
+            self.assertFalse(task.done())
+            websocket.processing_tasks.pop(client_id, None)
+            await asyncio.gather(task, return_exceptions=True)
+        websocket.manager.disconnect(client_id)
+        stream.stop()
+
+        self.assertGreater(timings.frames["rejected"], 0)
+        self.assertGreater(timings.frames["processed"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
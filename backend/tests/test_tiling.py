@@ -0,0 +1,147 @@
+import asyncio
+import os
+import sys
+import threading
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+# Adicionar diretório pai ao path para importar app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.api import websocket
+from app.api.routes import stream_handler
+from app.services.stream_handler import StreamHandler
+from app.services.tiling import TileGrid, nms
+from benchmarks import tiling
+from benchmarks.fixtures import BlobDetector, FakeViewer, SyntheticStream, small_object_frames
+
+
+class TestNms(unittest.TestCase):
+    def test_suppresses_duplicates_per_class(self):
+        boxes = np.array([[0, 0, 10, 20], [1, 1, 11, 21], [0, 0, 10, 20], [50, 50, 60, 70]])
+        scores = np.array([0.6, 0.9, 0.8, 0.7])
+        classes = np.array(["Person", "Person", "Hardhat", "Person"])
+        keep, merged = nms(boxes, scores, classes)
+        # A caixa de classe diferente e a distante sobrevivem
+        self.assertEqual(keep.tolist(), [1, 2, 3])
+        self.assertEqual(merged[0].tolist(), [1, 1, 11, 21])
+
+    def test_partial_box_at_tile_edge_is_absorbed(self):
+        # Objeto inteiro em um tile e cortado na borda do vizinho (IoU baixo)
+        boxes = np.array([[100, 40, 140, 120], [100, 40, 112, 120]])
+        keep, merged = nms(boxes, np.array([0.8, 0.9]), np.array(["Person", "Person"]))
+        self.assertEqual(len(keep), 1)
+        self.assertEqual(merged[0].tolist(), [100, 40, 140, 120])
+
+
+class TestTileGrid(unittest.TestCase):
+    def test_tiles_cover_area_with_overlap(self):
+        grid = TileGrid(3, 2, 0.2, (0, 0, 3840, 2160))
+        self.assertEqual(len(grid.rects), 6)
+        self.assertEqual(grid.rects[0][:2], (0, 0))
+        self.assertEqual(grid.rects[-1][2:], (3840, 2160))
+        tile_w = grid.rects[0][2] - grid.rects[0][0]
+        # Vizinhos se sobrepõem em ~20% do tile
+        self.assertAlmostEqual((grid.rects[0][2] - grid.rects[1][0]) / tile_w, 0.2, delta=0.01)
+        self.assertLessEqual(max(grid.tile_size), 640)
+        tiles = grid.tiles(np.zeros((2160, 3840, 3), dtype=np.uint8))
+        self.assertTrue(all(t.shape[:2] == grid.tile_size[::-1] for t in tiles))
+
+    def test_from_config(self):
+        self.assertIsNone(TileGrid.from_config({}, 3840, 2160))
+        self.assertIsNone(TileGrid.from_config({"tiling": {"cols": 1, "rows": 1}}, 3840, 2160))
+        # Área que já cabe no modelo: nada a ganhar
+        self.assertIsNone(TileGrid.from_config({"tiling": {"cols": 2, "rows": 2}}, 640, 480))
+        grid = TileGrid.from_config({"tiling": {"cols": 2, "rows": 2, "overlap": 0.1}}, 3840, 2160, (1000, 500, 3000, 1500))
+        self.assertEqual(grid.rects[0][:2], (1000, 500))
+        self.assertEqual(grid.rects[-1][2:], (3000, 1500))
+
+    def test_merge_maps_to_source_and_removes_overlap_duplicates(self):
+        grid = TileGrid(2, 1, 0.25, (0, 0, 2560, 1280))
+        # Objeto em x 1200..1240, dentro da sobreposição dos dois tiles
+        x0 = grid.rects[1][0]
+        person = {"class_name": "Person", "confidence": 0.9}
+        tile_detections = [
+            [{**person, "bbox": [v * grid.scale for v in (1200, 400, 1240, 480)]}],
+            [{**person, "confidence": 0.8, "bbox": [v * grid.scale for v in (1200 - x0, 400, 1240 - x0, 480)]}]
+        ]
+        merged = grid.merge(tile_detections)
+        self.assertEqual(len(merged), 1)
+        self.assertEqual(merged[0]["bbox"], [1200, 400, 1240, 480])
+        self.assertEqual(merged[0]["confidence"], 0.9)
+
+
+class TestTiledRecall(unittest.TestCase):
+    def test_tiles_find_small_objects_missed_by_single_pass(self):
+        samples = small_object_frames(2, 3840, 2160, objects=20, sizes=(10, 20))
+        detector = BlobDetector(latency_ms=0)
+        grid = TileGrid(4, 3, 0.2, (0, 0, 3840, 2160))
+
+        single = tiling.evaluate(lambda f: detector.detect(f)["detections"], samples, 0.5)
+        tiled = tiling.evaluate(
+            lambda f: grid.merge([r["detections"] for r in detector.detect_batch(grid.tiles(f))]), samples, 0.5
+        )
+        self.assertLess(single["recall"], 0.5)
+        self.assertGreater(tiled["recall"], 0.9)
+        self.assertGreater(tiled["precision"], 0.95)
+
+    def test_publish_keeps_native_frame_for_tiles(self):
+        handler = StreamHandler()
+        handler.active_streams["cam"] = {"frames_read": 0, "latest": None, "stop_signal": False, "config": {}}
+        handler.update_config("cam", {"tiling": {"cols": 3, "rows": 2, "overlap": 0.2}})
+        native = np.zeros((2160, 3840, 3), dtype=np.uint8)
+        with patch.object(TileGrid, "tiles", side_effect=AssertionError("tiles recortados na publicação")):
+            handler.publish("cam", native)
+        _, _, _, (region, crop, (grid, source, source_size)) = handler.active_streams["cam"]["latest"]
+        self.assertIsNone(region)
+        self.assertIsNone(crop)
+        # Sem cópia: os tiles são recortados pelo pipeline, só quando há inferência
+        self.assertIs(source, native)
+        self.assertEqual(len(grid.tiles(source)), 6)
+        self.assertEqual(source_size, (3840, 2160))
+
+
+
+class ThreadRecordingDetector(BlobDetector):
+    """BlobDetector que registra as threads em que roda o lote"""
+    threads = []
+
+    def __init__(self):
+        super().__init__(latency_ms=0)
+
+    def detect_batch(self, frames, selected_classes=None, confidence_threshold=None):
+        self.threads.append(threading.current_thread())
+        return super().detect_batch(frames, selected_classes)
+
+
+class TestTiledPipeline(unittest.IsolatedAsyncioTestCase):
+    async def test_local_tiled_inference_keeps_stream_running_off_event_loop(self):
+        frames = [frame for frame, _ in small_object_frames(3, 1920, 1080, objects=5)]
+        config = {"tiling": {"cols": 2, "rows": 2, "overlap": 0.2}}
+        stream = SyntheticStream(stream_handler, "tiled", frames, fps=20, config=config)
+        stream.start()
+        client_id = "tiled-viewer"
+        viewer = websocket.manager.active_connections[client_id] = FakeViewer()
+        ThreadRecordingDetector.threads = []
+        with patch.object(websocket, "PPEDetector", ThreadRecordingDetector), \
+                patch.object(websocket.stream_workers, "_running", False):
+            task = asyncio.create_task(websocket.process_video_stream(client_id, stream.url, render="client"))
+            websocket.processing_tasks[client_id] = task
+            await asyncio.sleep(0.8)
+            self.assertFalse(task.done())
+            websocket.processing_tasks.pop(client_id, None)
+            await asyncio.gather(task, return_exceptions=True)
+        websocket.manager.disconnect(client_id)
+        stream.stop()
+
+        # A stream segue após o primeiro frame em tiles
+        self.assertGreater(viewer.messages.get("frame", 0), 3)
+        self.assertNotIn("error", viewer.messages)
+        self.assertTrue(ThreadRecordingDetector.threads)
+        self.assertNotIn(threading.main_thread(), ThreadRecordingDetector.threads)
+
+
+if __name__ == '__main__':
+    unittest.main()
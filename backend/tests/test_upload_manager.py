@@ -0,0 +1,139 @@
+import unittest
+import hashlib
+import tempfile
+import sys
+import os
+import threading
+from unittest.mock import patch
+
+# Adicionar diretório pai ao path para importar app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+
+from app.api import routes
+from app.main import app
+from app.services.upload_manager import UploadError, UploadManager, sniff_container
+from app.utils.helpers import read_upload_meta
+from tests.test_analysis_job import write_test_video
+
+
+async def body(data: bytes, step: int = 100, fail_after: int = None):
+    """Simula o corpo de uma requisição, opcionalmente interrompido"""
+    for i in range(0, len(data), step):
+        if fail_after is not None and i >= fail_after:
+            raise ConnectionError("cliente desconectou")
+        yield data[i:i + step]
+
+
+class TestUploadManager(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.video_path = os.path.join(self.tmpdir.name, "video.avi")
+        write_test_video(self.video_path)
+        with open(self.video_path, "rb") as f:
+            self.video = f.read()
+        self.upload_dir = os.path.join(self.tmpdir.name, "uploads")
+        self.manager = UploadManager(self.upload_dir, max_size=10 * 1024 * 1024, chunk_size=256)
+
+    async def asyncTearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_sniff_container(self):
+        self.assertEqual(sniff_container(b"\x00\x00\x00\x20ftypisom\x00\x00"), "isobmff")
+        self.assertEqual(sniff_container(b"RIFF\x00\x00\x00\x00AVI LIST"), "avi")
+        self.assertEqual(sniff_container(b"\x1a\x45\xdf\xa3" + b"\x00" * 8), "matroska")
+        self.assertIsNone(sniff_container(b"<html><body>"))
+
+    async def test_resumes_after_interruption_and_restart(self):
+        upload = self.manager.create("camera.avi", len(self.video))
+        upload_id = upload["upload_id"]
+
+        with self.assertRaises(ConnectionError):
+            await self.manager.append(upload_id, 0, body(self.video, fail_after=1000))
+        self.assertEqual(self.manager.status(upload_id)["offset"], 1000)
+
+        # Novo processo: o estado é recuperado do disco
+        manager = UploadManager(self.upload_dir, chunk_size=256)
+        offset = manager.status(upload_id)["offset"]
+        with self.assertRaises(UploadError) as ctx:
+            await manager.append(upload_id, 0, body(self.video))
+        self.assertEqual(ctx.exception.status_code, 409)
+
+        upload = await manager.append(upload_id, offset, body(self.video[offset:]))
+        self.assertTrue(upload["complete"])
+        meta = await manager.finalize(upload_id)
+
+        self.assertEqual(meta["sha256"], hashlib.sha256(self.video).hexdigest())
+        self.assertEqual(meta["container"], "avi")
+        self.assertEqual(meta["video_info"]["frame_count"], 10)
+        self.assertEqual(read_upload_meta(upload_id, self.upload_dir)["sha256"], meta["sha256"])
+
+        # Índice de keyframes construído em segundo plano
+        await manager.indexing[upload_id]
+        self.assertEqual(manager.indexing, {})
+        self.assertEqual(sorted(os.listdir(self.upload_dir)), [f"{upload_id}.avi", f"{upload_id}.index.json", f"{upload_id}.meta.json"])
+
+    async def test_restored_session_is_rehashed_off_event_loop(self):
+        upload_id = self.manager.create("camera.avi", len(self.video))["upload_id"]
+        await self.manager.append(upload_id, 0, body(self.video[:1000]))
+
+        manager = UploadManager(self.upload_dir, chunk_size=256)
+        load = manager._load
+        threads = []
+
+        def recording_load(upload_id):
+            threads.append(threading.current_thread())
+            return load(upload_id)
+
+        with patch.object(manager, "_load", recording_load):
+            upload = await manager.append(upload_id, 1000, body(self.video[1000:]))
+        self.assertTrue(upload["complete"])
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], threading.main_thread())
+
+    async def test_enforces_declared_size(self):
+        with self.assertRaises(UploadError) as ctx:
+            self.manager.create("big.mp4", 11 * 1024 * 1024)
+        self.assertEqual(ctx.exception.status_code, 413)
+
+        upload = self.manager.create("camera.avi", 500)
+        with self.assertRaises(UploadError) as ctx:
+            await self.manager.append(upload["upload_id"], 0, body(self.video))
+        self.assertEqual(ctx.exception.status_code, 413)
+        self.assertLessEqual(self.manager.status(upload["upload_id"])["offset"], 500)
+
+    async def test_rejects_non_video_from_first_bytes(self):
+        upload = self.manager.create("fake.mp4", 10000)
+        with self.assertRaises(UploadError) as ctx:
+            await self.manager.append(upload["upload_id"], 0, body(b"<html>" + b"x" * 9994))
+        self.assertEqual(ctx.exception.status_code, 415)
+        self.assertEqual(os.listdir(self.upload_dir), [])
+
+
+    async def test_rejects_corrupt_video_with_valid_header(self):
+        # Caixa "free" passa pela identificação do contêiner, mas não há vídeo
+        data = b"\x00\x00\x00\x08free" + os.urandom(20000)
+        upload = self.manager.create("camera.mp4", len(data))
+        await self.manager.append(upload["upload_id"], 0, body(data, step=1000))
+        with self.assertRaises(UploadError) as ctx:
+            await self.manager.finalize(upload["upload_id"])
+        self.assertEqual(ctx.exception.status_code, 400)
+        self.assertEqual(os.listdir(self.upload_dir), [])
+        self.assertEqual(self.manager.indexing, {})
+
+    def test_simple_upload_removes_partial_file_on_error(self):
+        async def fail(upload_id):
+            raise UploadError("Upload incompleto", 409)
+
+        with patch.object(routes, "upload_manager", self.manager), patch.object(self.manager, "finalize", fail):
+            response = TestClient(app).post(
+                "/api/video/upload", files={"file": ("camera.avi", self.video, "video/x-msvideo")}
+            )
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(os.listdir(self.upload_dir), [])
+        self.assertEqual(self.manager.sessions, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
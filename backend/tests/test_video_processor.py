@@ -0,0 +1,69 @@
+import unittest
+import tempfile
+import sys
+import os
+
+import cv2
+import numpy as np
+
+# Adicionar diretório pai ao path para importar app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.video_processor import VideoProcessor, get_keyframe_index, keyframe_index_path
+
+
+def write_gop_video(path: str, frames: int = 50):
+    # Fundo com textura (força frames P entre keyframes) e um quadrado que
+    # muda a cada frame
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), 10.0, (64, 48))
+    background = np.random.default_rng(0).integers(0, 200, (48, 64, 3), dtype=np.uint8)
+    for i in range(frames):
+        frame = background.copy()
+        frame[:8, :8] = i * 5
+        writer.write(frame)
+    writer.release()
+
+
+class TestKeyframeIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.video_path = os.path.join(self.tmpdir.name, "video.mp4")
+        write_gop_video(self.video_path)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_index_is_built_once_and_persisted(self):
+        index = get_keyframe_index(self.video_path)
+
+        self.assertEqual(index["frame_count"], 50)
+        self.assertEqual(index["keyframes"][0], [0, 0.0])
+        self.assertGreater(len(index["keyframes"]), 1)
+        self.assertLess(len(index["keyframes"]), 50)
+        self.assertTrue(os.path.exists(keyframe_index_path(self.video_path)))
+
+        mtime = os.path.getmtime(keyframe_index_path(self.video_path))
+        self.assertEqual(get_keyframe_index(self.video_path), index)
+        self.assertEqual(os.path.getmtime(keyframe_index_path(self.video_path)), mtime)
+
+    def test_seek_lands_on_exact_frame(self):
+        sequential = VideoProcessor()
+        sequential.open_file(self.video_path)
+        frames = list(sequential.get_frames())
+
+        processor = VideoProcessor()
+        processor.open_file(self.video_path)
+        processor.set_keyframe_index(get_keyframe_index(self.video_path))
+
+        # Frames entre keyframes exigem decodificar a partir do keyframe anterior
+        for target in (37, 5, 49, 12, 0):
+            self.assertTrue(processor.seek_frame(target))
+            np.testing.assert_array_equal(processor.read_frame(), frames[target])
+
+        self.assertTrue(processor.seek_time(2.3))
+        np.testing.assert_array_equal(processor.read_frame(), frames[23])
+        processor.release()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import unittest
+import asyncio
+import json
+import tempfile
+import sys
+import os
+
+# Adicionar diretório pai ao path para importar app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.alert_bus import AlertBus
+from app.services.webhook_dispatcher import WebhookDispatcher
+from tests.webhook_sink import WebhookSink
+
+
+async def wait_until(predicate, timeout: float = 2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("Condição não atingida a tempo")
+        await asyncio.sleep(0.01)
+
+
+class TestWebhookDispatcher(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.sink = WebhookSink()
+        await self.sink.start()
+
+    async def asyncTearDown(self):
+        await self.sink.stop()
+        self.tmpdir.cleanup()
+
+    def _dispatcher(self, **kwargs):
+        options = dict(
+            batch_size=3, flush_interval=0.05, max_retries=1,
+            backoff_base=0.01, retry_interval=0.05, spool_dir=self.tmpdir.name
+        )
+        options.update(kwargs)
+        return WebhookDispatcher([self.sink.url], **options)
+
+    async def test_batches_from_bus_over_one_connection(self):
+        bus = AlertBus()
+        dispatcher = self._dispatcher()
+        await dispatcher.start(bus)
+
+        for seq in range(1, 6):
+            bus.publish({"seq": seq})
+        await wait_until(lambda: len(self.sink.alerts) == 5)
+        await dispatcher.stop()
+
+        self.assertEqual([len(batch["alerts"]) for batch in self.sink.received], [3, 2])
+        self.assertEqual([a["seq"] for a in self.sink.alerts], [1, 2, 3, 4, 5])
+        self.assertEqual(self.sink.connections, 1)
+
+    async def test_spools_while_down_and_drains_in_order(self):
+        dispatcher = self._dispatcher()
+        await dispatcher.start()
+        destination = dispatcher.destinations[self.sink.url]
+
+        self.sink.fail = True
+        for seq in range(1, 5):
+            dispatcher.enqueue({"seq": seq})
+        await wait_until(lambda: destination.spooled_batches == 2)
+        self.assertEqual(dispatcher.get_stats()["destinations"][0]["status"], "down")
+
+        self.sink.fail = False
+        dispatcher.enqueue({"seq": 5})
+        await wait_until(lambda: len(self.sink.alerts) == 5)
+
+        self.assertEqual([a["seq"] for a in self.sink.alerts], [1, 2, 3, 4, 5])
+        self.assertEqual(destination.spooled_batches, 0)
+        self.assertGreater(destination.get_stats()["failed_attempts"], 0)
+        await dispatcher.stop()
+
+    async def test_pending_alerts_survive_restart(self):
+        self.sink.fail = True
+        dispatcher = self._dispatcher(flush_interval=10)
+        await dispatcher.start()
+        dispatcher.enqueue({"seq": 1})
+        await dispatcher.stop()
+
+        self.sink.fail = False
+        dispatcher = self._dispatcher()
+        await dispatcher.start()
+        await wait_until(lambda: len(self.sink.alerts) == 1)
+        await dispatcher.stop()
+
+    async def test_batch_in_backoff_survives_restart(self):
+        self.sink.fail = True
+        dispatcher = self._dispatcher(max_retries=5, backoff_base=10)
+        await dispatcher.start()
+        destination = dispatcher.destinations[self.sink.url]
+        dispatcher.enqueue({"seq": 1})
+        # Lote fora da fila, aguardando a próxima tentativa
+        await wait_until(lambda: destination.failed_attempts == 1)
+        self.assertEqual(len(destination.pending), 0)
+        await dispatcher.stop()
+
+        self.sink.fail = False
+        dispatcher = self._dispatcher()
+        await dispatcher.start()
+        await wait_until(lambda: len(self.sink.alerts) == 1)
+        await dispatcher.stop()
+
+    async def test_corrupt_spool_file_is_skipped(self):
+        dispatcher = self._dispatcher()
+        await dispatcher.start()
+        spool_dir = dispatcher.destinations[self.sink.url].spool_dir
+        await dispatcher.stop()
+        with open(os.path.join(spool_dir, f"{1:020d}.json"), "w") as f:
+            f.write('[[1.0, {"seq"')
+        with open(os.path.join(spool_dir, f"{2:020d}.json"), "w") as f:
+            json.dump([[1.0, {"seq": 2}]], f)
+
+        dispatcher = self._dispatcher()
+        await dispatcher.start()
+        await wait_until(lambda: len(self.sink.alerts) == 1)
+        dispatcher.enqueue({"seq": 3})
+        await wait_until(lambda: len(self.sink.alerts) == 2)
+        await dispatcher.stop()
+
+        self.assertEqual([a["seq"] for a in self.sink.alerts], [2, 3])
+        self.assertTrue(os.path.exists(os.path.join(spool_dir, f"{1:020d}.json.bad")))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+"""
+Receptor HTTP local para testar o envio de webhooks de alertas
+
+Pode ser usado nos testes (WebhookSink) ou executado isoladamente:
+
+    python tests/webhook_sink.py --port 9000
+
+e configurado com WEBHOOK_URLS=http://127.0.0.1:9000/alerts
+"""
+import argparse
+import asyncio
+import json
+from typing import List
+
+
+class WebhookSink:
+    """
+    Servidor HTTP/1.1 mínimo com keep-alive que registra os lotes recebidos
+
+    `fail = True` faz o receptor responder 503, simulando indisponibilidade.
+    `connections` conta conexões TCP abertas, para verificar reuso do pool.
+    """
+
+    def __init__(self, verbose: bool = False):
+        self.received: List[dict] = []
+        self.fail = False
+        self.requests = 0
+        self.connections = 0
+        self.verbose = verbose
+        self.server = None
+        self.url = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0):
+        self.server = await asyncio.start_server(self._handle, host, port)
+        port = self.server.sockets[0].getsockname()[1]
+        self.url = f"http://{host}:{port}/alerts"
+
+    async def stop(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    @property
+    def alerts(self) -> List[dict]:
+        return [alert for batch in self.received for alert in batch["alerts"]]
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, value = line.decode().split(":", 1)
+                    headers[name.strip().lower()] = value.strip()
+
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                self.requests += 1
+
+                if self.fail:
+                    status = "503 Service Unavailable"
+                else:
+                    status = "200 OK"
+                    self.received.append(json.loads(body))
+                    if self.verbose:
+                        print(body.decode())
+
+                writer.write(f"HTTP/1.1 {status}\r\nContent-Length: 0\r\n\r\n".encode())
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+async def _main(host: str, port: int):
+    sink = WebhookSink(verbose=True)
+    await sink.start(host, port)
+    print(f"Receptor de webhooks em {sink.url}")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Receptor local de webhooks de alertas")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    args = parser.parse_args()
+    asyncio.run(_main(args.host, args.port))
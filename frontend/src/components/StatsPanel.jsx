@@ -40,6 +40,11 @@ const StatsPanel = ({ stats }) => {
                     <p className="text-2xl font-bold text-gray-800 dark:text-white">
                         {data.processing_time_ms ? data.processing_time_ms.toFixed(1) : '0.0'}
                     </p>
+                    {data.frame_age_ms !== undefined && (
+                        <p className="text-xs text-gray-500 dark:text-gray-400">
+                            Idade do frame: {data.frame_age_ms.toFixed(0)} ms
+                        </p>
+                    )}
                 </div>
             </div>
         </div>
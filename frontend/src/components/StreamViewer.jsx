@@ -11,21 +11,14 @@ const StreamViewer = ({ videoId, streamUrl, onStatsUpdate, onAlert, selectedEpis
     const WS_URL = API_URL.replace(/^http/, 'ws');
     
     const { isConnected, lastFrame, alerts, stats, sendMessage } = useWebSocket(`${WS_URL}/ws/video/${clientId}`);
-    const { isPlaying, fps, renderFrame, togglePlay } = useVideoStream(canvasRef);
+    const { isPlaying, fps, renderFrame, setOverlayOptions, togglePlay } = useVideoStream(canvasRef);
     
     const [processingStarted, setProcessingStarted] = useState(false);
 
-    // Update config when selectedEpis changes
+    // Caixas desenhadas no navegador: filtrar classes não exige nada do servidor
     useEffect(() => {
-        if (isConnected) {
-            sendMessage({
-                action: 'update_config',
-                config: {
-                    selected_classes: selectedEpis
-                }
-            });
-        }
-    }, [isConnected, selectedEpis, sendMessage]);
+        setOverlayOptions({ selectedClasses: selectedEpis });
+    }, [selectedEpis, setOverlayOptions]);
 
     // Handle incoming frames
     useEffect(() => {
@@ -53,7 +46,8 @@ const StreamViewer = ({ videoId, streamUrl, onStatsUpdate, onAlert, selectedEpis
             sendMessage({
                 action: 'start_processing',
                 video_id: videoId,
-                stream_url: streamUrl
+                stream_url: streamUrl,
+                render: 'client'
             });
             setProcessingStarted(true);
         }
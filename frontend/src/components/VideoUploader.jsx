@@ -1,6 +1,6 @@
 import React, { useState, useRef } from 'react';
 import { Upload, FileVideo, CheckCircle, AlertCircle } from 'lucide-react';
-import { uploadVideo } from '../services/api';
+import { uploadVideoResumable } from '../services/api';
 
 const VideoUploader = ({ onUploadComplete }) => {
     const [isDragging, setIsDragging] = useState(false);
@@ -39,11 +39,6 @@ const VideoUploader = ({ onUploadComplete }) => {
             return;
         }
 
-        if (file.size > 100 * 1024 * 1024) { // 100MB limit
-            setError('Arquivo muito grande. O limite é 100MB.');
-            return;
-        }
-
         setFile(file);
         setError(null);
     };
@@ -55,11 +50,14 @@ const VideoUploader = ({ onUploadComplete }) => {
         setError(null);
 
         try {
-            const result = await uploadVideo(file, []); // Empty selected_epis for now
+            const result = await uploadVideoResumable(file, []); // Empty selected_epis for now
             onUploadComplete(result);
         } catch (err) {
             console.error(err);
-            setError('Erro ao fazer upload do vídeo. Tente novamente.');
+            // O limite de tamanho é definido pelo servidor (MAX_FILE_SIZE)
+            setError(err.response?.status === 413
+                ? 'Arquivo muito grande para o servidor.'
+                : 'Erro ao fazer upload do vídeo. Tente novamente.');
         } finally {
             setUploading(false);
         }
@@ -1,25 +1,96 @@
 import { useState, useCallback, useEffect, useRef } from 'react';
 
+// Mesmas cores do FrameAnnotator do backend (convertidas de BGR)
+const CLASS_COLORS = {
+    'Hardhat': [0, 255, 0],
+    'Safety Vest': [0, 255, 0],
+    'Mask': [0, 255, 0],
+    'NO-Hardhat': [255, 0, 0],
+    'NO-Safety Vest': [255, 0, 0],
+    'NO-Mask': [255, 0, 0],
+    'Person': [0, 255, 0],
+    'Safety Cone': [0, 165, 255],
+    'machinery': [0, 149, 255],
+    'vehicle': [0, 149, 255],
+};
+const DEFAULT_COLOR = [128, 128, 128];
+
+// Selecionar um EPI também exibe a violação correspondente (NO-...)
+const NEGATIVE_CLASSES = {
+    'Hardhat': 'NO-Hardhat',
+    'Mask': 'NO-Mask',
+    'Safety Vest': 'NO-Safety Vest',
+};
+
+function expandSelection(selectedClasses) {
+    if (!selectedClasses) return null;
+    const expanded = new Set(selectedClasses);
+    for (const cls of selectedClasses) {
+        if (NEGATIVE_CLASSES[cls]) expanded.add(NEGATIVE_CLASSES[cls]);
+    }
+    return expanded;
+}
+
+function drawDetections(ctx, detections, options) {
+    if (!options.showBoxes || !detections?.length) return;
+    const selection = expandSelection(options.selectedClasses);
+
+    ctx.lineWidth = 2;
+    ctx.font = 'bold 15px sans-serif';
+    ctx.textBaseline = 'alphabetic';
+    for (const det of detections) {
+        if (selection && !selection.has(det.class_name)) continue;
+        const [x1, y1, x2, y2] = det.bbox;
+        const rgb = CLASS_COLORS[det.class_name] || DEFAULT_COLOR;
+        const color = `rgb(${rgb.join(',')})`;
+
+        ctx.strokeStyle = color;
+        ctx.strokeRect(x1, y1, x2 - x1, y2 - y1);
+
+        const label = `${det.class_name} ${det.confidence.toFixed(2)}`;
+        const width = ctx.measureText(label).width;
+        ctx.fillStyle = color;
+        ctx.fillRect(x1, y1 - 20, width + 4, 20);
+        ctx.fillStyle = rgb[0] + rgb[1] + rgb[2] < 400 ? '#fff' : '#000';
+        ctx.fillText(label, x1 + 2, y1 - 5);
+    }
+}
+
 export function useVideoStream(canvasRef) {
     const [isPlaying, setIsPlaying] = useState(false);
     const [fps, setFps] = useState(0);
     const frameCountRef = useRef(0);
     const lastTimeRef = useRef(Date.now());
+    // Último frame exibido, para redesenhar ao mudar filtros sem esperar o servidor
+    const lastImageRef = useRef(null);
+    const lastDetectionsRef = useRef([]);
+    const overlayOptionsRef = useRef({ showBoxes: true, selectedClasses: null });
 
-    const renderFrame = useCallback((frameData) => {
-        if (!canvasRef.current || !frameData) return;
+    const draw = useCallback(() => {
+        const canvas = canvasRef.current;
+        const img = lastImageRef.current;
+        if (!canvas || !img) return;
+
+        // Resize canvas to match image dimensions if needed
+        if (canvas.width !== img.width || canvas.height !== img.height) {
+            canvas.width = img.width;
+            canvas.height = img.height;
+        }
+        const ctx = canvas.getContext('2d');
+        ctx.drawImage(img, 0, 0);
+        drawDetections(ctx, lastDetectionsRef.current, overlayOptionsRef.current);
+    }, [canvasRef]);
+
+    const renderFrame = useCallback((frame) => {
+        if (!canvasRef.current || !frame?.data) return;
 
-        const ctx = canvasRef.current.getContext('2d');
         const img = new Image();
-        
+
         img.onload = () => {
-            // Resize canvas to match image dimensions if needed
-            if (canvasRef.current.width !== img.width || canvasRef.current.height !== img.height) {
-                canvasRef.current.width = img.width;
-                canvasRef.current.height = img.height;
-            }
-            ctx.drawImage(img, 0, 0);
-            
+            lastImageRef.current = img;
+            lastDetectionsRef.current = frame.detections || [];
+            draw();
+
             // Calculate FPS
             frameCountRef.current++;
             const now = Date.now();
@@ -29,13 +100,19 @@ export function useVideoStream(canvasRef) {
                 lastTimeRef.current = now;
             }
         };
-        
-        img.src = `data:image/jpeg;base64,${frameData}`;
-    }, [canvasRef]);
+
+        img.src = `data:image/jpeg;base64,${frame.data}`;
+    }, [canvasRef, draw]);
+
+    // Visibilidade das caixas e filtro de classes (renderização no cliente)
+    const setOverlayOptions = useCallback((options) => {
+        overlayOptionsRef.current = { ...overlayOptionsRef.current, ...options };
+        draw();
+    }, [draw]);
 
     const togglePlay = useCallback(() => {
         setIsPlaying(prev => !prev);
     }, []);
 
-    return { isPlaying, fps, renderFrame, togglePlay };
+    return { isPlaying, fps, renderFrame, setOverlayOptions, togglePlay };
 }
@@ -1,5 +1,21 @@
 import { useState, useEffect, useCallback, useRef } from 'react';
 
+/**
+ * Aplica uma mensagem de detecções (lista completa ou alterações).
+ * Linhas: [track_id, x1, y1, x2, y2, classe, confiança]
+ */
+function applyDetections(current, message) {
+    if (message.keyframe) {
+        current.clear();
+    }
+    for (const [trackId, x1, y1, x2, y2, className, confidence] of message.set || []) {
+        current.set(trackId, { track_id: trackId, bbox: [x1, y1, x2, y2], class_name: className, confidence });
+    }
+    for (const trackId of message.removed || []) {
+        current.delete(trackId);
+    }
+}
+
 export function useWebSocket(url) {
     const [isConnected, setIsConnected] = useState(false);
     const [lastFrame, setLastFrame] = useState(null);
@@ -7,6 +23,10 @@ export function useWebSocket(url) {
     const [stats, setStats] = useState({});
     const socketRef = useRef(null);
     const reconnectTimeoutRef = useRef(null);
+    // Detecções atuais por track_id (renderização no cliente). Aplicadas a cada
+    // mensagem, fora do estado do React, para não perder alterações entre renders
+    const detectionsRef = useRef(new Map());
+    const detectionListRef = useRef([]);
 
     const connect = useCallback(() => {
         if (socketRef.current?.readyState === WebSocket.OPEN) return;
@@ -16,6 +36,8 @@ export function useWebSocket(url) {
 
         ws.onopen = () => {
             console.log('WebSocket Connected');
+            detectionsRef.current = new Map();
+            detectionListRef.current = [];
             setIsConnected(true);
             if (reconnectTimeoutRef.current) {
                 clearTimeout(reconnectTimeoutRef.current);
@@ -29,7 +51,11 @@ export function useWebSocket(url) {
                 
                 switch (message.type) {
                     case 'frame':
-                        setLastFrame(message.data);
+                        if (message.detections) {
+                            applyDetections(detectionsRef.current, message.detections);
+                            detectionListRef.current = Array.from(detectionsRef.current.values());
+                        }
+                        setLastFrame({ data: message.data, detections: detectionListRef.current });
                         break;
                     case 'alert':
                         setAlerts(prev => [message.data, ...prev].slice(0, 50)); // Keep last 50 alerts
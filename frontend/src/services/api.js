@@ -19,6 +19,49 @@ export const uploadVideo = async (file, selectedEpis) => {
     return response.data;
 };
 
+const UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024;
+const UPLOAD_MAX_RETRIES = 5;
+
+// Upload retomável em blocos: em caso de falha, consulta o offset recebido
+// pelo servidor e continua dali
+export const uploadVideoResumable = async (file, selectedEpis, onProgress) => {
+    const form = new FormData();
+    form.append('filename', file.name);
+    form.append('size', file.size);
+    const { data: upload } = await api.post('/uploads', form);
+
+    let offset = 0;
+    let retries = 0;
+    while (true) {
+        const chunk = file.slice(offset, offset + UPLOAD_CHUNK_SIZE);
+        try {
+            const { data } = await api.patch(`/uploads/${upload.upload_id}`, chunk, {
+                headers: {
+                    'Content-Type': 'application/offset+octet-stream',
+                    'Upload-Offset': offset,
+                },
+                params: { selected_epis: JSON.stringify(selectedEpis) },
+            });
+            if (data.video_id) {
+                return data;
+            }
+            offset = data.offset;
+            retries = 0;
+        } catch (err) {
+            const status = err.response?.status;
+            if ((status && status !== 409 && status < 500) || ++retries > UPLOAD_MAX_RETRIES) {
+                throw err;
+            }
+            await new Promise((resolve) => setTimeout(resolve, 1000 * retries));
+            const { data } = await api.get(`/uploads/${upload.upload_id}`);
+            offset = data.offset;
+        }
+        if (onProgress) {
+            onProgress(offset / file.size);
+        }
+    }
+};
+
 export const getStatus = async () => {
     const response = await api.get('/status');
     return response.data;